@@ -34,12 +34,18 @@ import glob
 import json
 import os
 import pprint
+import sys
 import time
 from datetime import datetime, timedelta
 
 import requests
 from dotenv import load_dotenv
 
+# Add src/src to the path for the shared pooled HTTP client
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "src"))
+
+from http_client import get_session
+
 # Load environment variables
 load_dotenv()
 
@@ -130,6 +136,9 @@ password = UPS_PASSWORD
 
 payload = {"grant_type": "client_credentials"}
 
+# One pooled session for the token and every tracking request (keep-alive)
+session = get_session("ups", retry_methods=("GET", "POST"))
+
 headers = {
     "Content-Type": "application/x-www-form-urlencoded",
     "x-merchant-id": "string",
@@ -140,7 +149,7 @@ print(f"URL: {url}")
 print(f"Username: {username[:10]}...")
 
 try:
-    response = requests.post(
+    response = session.post(
         url, data=payload, headers=headers, auth=(username, password), timeout=10
     )
     print(f"OAuth response status: {response.status_code}")
@@ -200,7 +209,7 @@ for i, inquiry_number in enumerate(tracking_nums, 1):
     print(f"  Making tracking request to: {url}")
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = session.get(url, headers=headers, timeout=10)
         print(f"  Tracking response status: {response.status_code}")
 
         if response.status_code == 200:
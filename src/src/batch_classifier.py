@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Vectorized UPS Label-Only Classification
+========================================
+
+Classifies a batch of raw UPS Tracking API responses in one vectorized pass
+with DuckDB's JSON functions: ``json_transform`` decodes only the fields the
+label-only rules need into a typed struct and the rules of
+ups_label_only_filter.py are evaluated as SQL expressions, instead of
+``json.loads`` plus a nested-dict walk per response.
+
+Output is a Polars DataFrame with one row per tracking number:
+    tracking_number, activity_count, status_description, status_code,
+    status_type, shipment_date, classification ("label_only" / "excluded"), reason
+
+The reasons are identical to check_label_only_status() in the filter.
+
+Used by the label filter for cache hits and the results CSV, and standalone to
+re-classify a raw response file (UPS_FILTER_SAVE_RAW_RESPONSES=true) offline.
+
+Usage:
+    poetry run python src/src/batch_classifier.py data/output/ups_label_only_raw_responses_range_..._.jsonl.gz
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Union
+
+import duckdb
+import polars as pl
+
+# Target status description to filter for
+TARGET_STATUS_DESCRIPTION = (
+    "Shipper created a label, UPS has not received the package yet. "
+)
+TARGET_STATUS_CODE = "MP"
+TARGET_STATUS_TYPE = "M"
+
+# Only the fields needed for classification are decoded; everything else in
+# the payload is skipped by the JSON reader
+RESPONSE_STRUCTURE = json.dumps(
+    {
+        "trackResponse": {
+            "shipment": [
+                {
+                    "package": [
+                        {
+                            "activity": [
+                                {
+                                    "status": {
+                                        "description": "VARCHAR",
+                                        "code": "VARCHAR",
+                                        "type": "VARCHAR",
+                                    },
+                                    "date": "VARCHAR",
+                                }
+                            ]
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+)
+
+CSV_COLUMNS = [
+    "tracking_number",
+    "account_number",
+    "status_description",
+    "status_code",
+    "status_type",
+    "date_processed",
+]
+
+# Classification over a relation "responses" with a tracking_number and a JSON
+# "payload" column; other columns (e.g. account_number) are passed through.
+# DuckDB lists are 1-based and out-of-range indexes yield NULL.
+CLASSIFY_SQL = r"""
+decoded AS (
+    SELECT * EXCLUDE (payload),
+        json_transform(payload, $structure).trackResponse.shipment AS _shipment
+    FROM responses
+), parts AS (
+    SELECT * EXCLUDE (_shipment),
+        coalesce(len(_shipment), 0) AS _shipments,
+        coalesce(len(_shipment[1].package), 0) AS _packages,
+        _shipment[1].package[1].activity AS _activity
+    FROM decoded
+), fields AS (
+    SELECT * EXCLUDE (_activity),
+        coalesce(len(_activity), 0)::BIGINT AS activity_count,
+        regexp_replace(
+            coalesce(_activity[1].status.description, ''), '^\s+|\s+$', '', 'g'
+        ) AS _description,
+        coalesce(_activity[1].status.code, '') AS _code,
+        coalesce(_activity[1].status.type, '') AS _type,
+        _activity[1].date AS shipment_date
+    FROM parts
+), checks AS (
+    SELECT *,
+        _description = trim($target_description) AS _description_matches,
+        _code = $target_code AND _type = $target_type AS _code_type_match
+    FROM fields
+)
+SELECT * EXCLUDE (
+        _shipments, _packages, _description, _code, _type,
+        _description_matches, _code_type_match, activity_count, shipment_date
+    ),
+    activity_count,
+    CASE WHEN activity_count > 0 THEN _description ELSE 'Unknown' END AS status_description,
+    CASE WHEN activity_count > 0 THEN _code ELSE 'Unknown' END AS status_code,
+    CASE WHEN activity_count > 0 THEN _type ELSE 'Unknown' END AS status_type,
+    shipment_date,
+    CASE
+        WHEN _shipments > 0 AND _packages > 0 AND activity_count = 1
+            AND _description_matches AND _code_type_match THEN 'label_only'
+        ELSE 'excluded'
+    END AS classification,
+    CASE
+        WHEN _shipments = 0 THEN 'No shipment data found'
+        WHEN _packages = 0 THEN 'No package data found'
+        WHEN activity_count = 0 THEN 'No activity data found'
+        WHEN activity_count != 1
+            THEN 'Has ' || activity_count || ' activity records (expected exactly 1)'
+        WHEN _description_matches AND _code_type_match
+            THEN 'Matches label-only criteria exactly'
+        WHEN _description_matches
+            THEN 'Description matches but code/type differs: ' || _code || '/' || _type
+        ELSE 'Different status description: ''' || _description || ''''
+    END AS reason
+FROM checks
+"""
+
+
+def _run_classification(source_sql: str, params: Dict) -> pl.DataFrame:
+    """Run CLASSIFY_SQL with the ``responses`` relation defined by ``source_sql``"""
+    query = f"WITH responses AS ({source_sql}), {CLASSIFY_SQL}"
+    params = {
+        **params,
+        "structure": RESPONSE_STRUCTURE,
+        "target_description": TARGET_STATUS_DESCRIPTION,
+        "target_code": TARGET_STATUS_CODE,
+        "target_type": TARGET_STATUS_TYPE,
+    }
+
+    # Arrow hand-off: the result never becomes per-row Python objects
+    with duckdb.connect() as conn:
+        frame = conn.execute(query, params).pl()
+
+    return frame.with_columns(
+        pl.col("activity_count").cast(pl.Int64),
+        pl.exclude("activity_count").cast(pl.String),
+    )
+
+
+def classify_responses(
+    tracking_numbers: Sequence[str],
+    responses: Sequence[Union[str, Dict]],
+) -> pl.DataFrame:
+    """
+    Classify a batch of UPS tracking responses in one vectorized pass
+
+    Args:
+        tracking_numbers: Tracking numbers, aligned with ``responses``
+        responses: Raw responses as JSON strings or already parsed dicts
+
+    Returns:
+        Polars DataFrame with one row per tracking number (see module docstring)
+    """
+    payloads = [
+        response if isinstance(response, str) else json.dumps(response)
+        for response in responses
+    ]
+    return _run_classification(
+        """
+        SELECT UNNEST($tracking_numbers::VARCHAR[]) AS tracking_number,
+            UNNEST($payloads::VARCHAR[]) AS payload
+        """,
+        {"tracking_numbers": list(tracking_numbers), "payloads": payloads},
+    )
+
+
+def classify_raw_responses_file(path: str) -> pl.DataFrame:
+    """
+    Classify a raw response file written by the label filter (JSONL, optionally gzip)
+
+    Lines look like {"tracking_number": ..., "account_number": ..., "ups_response": {...}};
+    DuckDB reads and decompresses the file itself.
+    """
+    return _run_classification(
+        """
+        SELECT tracking_number, account_number, ups_response AS payload
+        FROM read_json(
+            $path,
+            format = 'newline_delimited',
+            columns = {
+                tracking_number: 'VARCHAR',
+                account_number: 'VARCHAR',
+                ups_response: 'JSON'
+            }
+        )
+        """,
+        {"path": path},
+    )
+
+
+def write_label_only_csv(frame: pl.DataFrame, path: str, date_processed: str) -> int:
+    """
+    Write label-only rows in the filter's CSV format
+
+    Commas in the status description are replaced with ";" (as the filter has
+    always done) so downstream readers see an unquoted CSV.
+
+    Args:
+        frame: Table with tracking_number, account_number and status columns;
+               rows are filtered on ``classification`` when that column exists
+        path: Output CSV path
+        date_processed: Value of the date_processed column (run timestamp)
+
+    Returns:
+        Number of rows written
+    """
+    if "classification" in frame.columns:
+        frame = frame.filter(pl.col("classification") == "label_only")
+
+    output = frame.select(
+        pl.col("tracking_number"),
+        pl.col("account_number"),
+        pl.col("status_description").str.replace_all(",", ";", literal=True),
+        pl.col("status_code"),
+        pl.col("status_type"),
+        pl.lit(date_processed).alias("date_processed"),
+    )
+    output.write_csv(path)
+    return output.height
+
+
+def label_only_frame(records: Sequence[Dict]) -> pl.DataFrame:
+    """Build a CSV-ready frame from the filter's label-only result records"""
+    schema = {column: pl.String for column in CSV_COLUMNS[:-1]}
+    return pl.DataFrame(
+        [{column: record.get(column) for column in schema} for record in records],
+        schema=schema,
+        orient="row",
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """Re-classify a raw response file and export the label-only CSV next to it"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if len(argv) != 1:
+        print("Usage: python src/src/batch_classifier.py <raw_responses.jsonl[.gz]>")
+        sys.exit(1)
+
+    path = argv[0]
+    print(f"🔍 Classifying {path}...")
+    frame = classify_raw_responses_file(path)
+
+    counts = dict(frame.group_by("classification").len().iter_rows())
+    print(f"📊 Responses: {frame.height:,}")
+    print(f"✅ Label-only: {counts.get('label_only', 0):,}")
+    print(f"❌ Excluded: {counts.get('excluded', 0):,}")
+
+    base = path[: -len(".gz")] if path.endswith(".gz") else path
+    csv_path = os.path.splitext(base)[0] + "_label_only.csv"
+    rows = write_label_only_csv(
+        frame, csv_path, datetime.now().strftime("%Y%m%d_%H%M%S")
+    )
+    print(f"💾 Saved {rows:,} label-only tracking numbers to {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Shared ClickHouse Client Factory
+================================
+
+One place that opens ClickHouse (and PeerDB, which is ClickHouse) clients for
+every extractor: dlt_pipeline_examples.py, full_extract_clickhouse.py, both
+PeerDB pipelines and query_transaction_dates.py.
+
+- Pooled clients: ClickHouseConnection.close() hands its client back to the
+  process-wide ClickHouseClientFactory instead of closing it, so the next
+  connect() with the same settings (the next resumable window, the clones of
+  a parallel extraction pool, the next table) reuses it.
+- Shared HTTP connections: all clients share one urllib3 pool manager, so
+  TCP+TLS connections are kept alive across clients. (With verify=False,
+  clickhouse-connect otherwise builds a private pool, i.e. a new TLS
+  handshake, per client.)
+- Bounded: at most DLT_CLICKHOUSE_MAX_CLIENTS clients are open at once;
+  further connects wait up to the connect timeout for one to be returned.
+- Cheap health checks: creating a client already talks to the server, and a
+  returned client counts as healthy (its last query succeeded). An idle client
+  is only checked again - with a /ping request, not a query - when it has not
+  been used for DLT_CLICKHOUSE_HEALTH_CHECK_SECONDS. Clients whose query failed
+  with a connection error are discarded, not reused.
+- Parallel extraction: ClickHouseClientPool lends a bounded set of cloned
+  connections to concurrent window / table fetches (clickhouse_extraction.py,
+  peerdb_flexible_pipeline.py) and returns their clients to the factory.
+- Wire compression (DLT_CLICKHOUSE_COMPRESSION: lz4, zstd, gzip, br or none),
+  timeouts and query settings (DLT_CLICKHOUSE_QUERY_SETTINGS, e.g.
+  ``max_threads=8,max_execution_time=900``) applied to every client.
+
+Configuration (environment variables):
+    CLICKHOUSE_HOST / CLICKHOUSE_PORT / CLICKHOUSE_USERNAME / CLICKHOUSE_PASSWORD
+    CLICKHOUSE_DATABASE / CLICKHOUSE_SECURE
+    DLT_CLICKHOUSE_COMPRESSION=lz4
+    DLT_CLICKHOUSE_CONNECT_TIMEOUT=60           # seconds
+    DLT_CLICKHOUSE_SEND_RECEIVE_TIMEOUT=300     # seconds
+    DLT_CLICKHOUSE_QUERY_SETTINGS=              # name=value,name=value
+    DLT_CLICKHOUSE_MAX_CLIENTS=16
+    DLT_CLICKHOUSE_HEALTH_CHECK_SECONDS=60
+
+Usage:
+    from clickhouse_client import ClickHouseConnection
+
+    ch_conn = ClickHouseConnection.from_env()
+    if ch_conn.connect():
+        rows = ch_conn.execute_query("SELECT ...", parameters)
+        ch_conn.close()  # client goes back to the pool
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# ClickHouse imports with fallback handling
+try:
+    import clickhouse_connect
+    from clickhouse_connect.driver.exceptions import OperationalError
+    from clickhouse_connect.driver.httputil import get_pool_manager
+
+    CLICKHOUSE_AVAILABLE = True
+except ImportError:
+    CLICKHOUSE_AVAILABLE = False
+    OperationalError = None
+    print("⚠️ clickhouse_connect not available")
+
+COMPRESSIONS = ("lz4", "zstd", "gzip", "br", "none")
+COMPRESSION = os.getenv("DLT_CLICKHOUSE_COMPRESSION", "lz4").lower()
+CONNECT_TIMEOUT = int(os.getenv("DLT_CLICKHOUSE_CONNECT_TIMEOUT", "60"))
+SEND_RECEIVE_TIMEOUT = int(os.getenv("DLT_CLICKHOUSE_SEND_RECEIVE_TIMEOUT", "300"))
+QUERY_SETTINGS = os.getenv("DLT_CLICKHOUSE_QUERY_SETTINGS", "")
+MAX_CLIENTS = int(os.getenv("DLT_CLICKHOUSE_MAX_CLIENTS", "16"))
+HEALTH_CHECK_SECONDS = float(os.getenv("DLT_CLICKHOUSE_HEALTH_CHECK_SECONDS", "60"))
+
+REQUIRED_ENV_VARS = (
+    "CLICKHOUSE_HOST",
+    "CLICKHOUSE_USERNAME",
+    "CLICKHOUSE_PASSWORD",
+    "CLICKHOUSE_DATABASE",
+)
+
+
+def parse_query_settings(text: str) -> Tuple[Tuple[str, str], ...]:
+    """``name=value,name=value`` -> sorted (name, value) pairs"""
+    settings = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, separator, value = item.partition("=")
+        if not separator or not name.strip():
+            raise ValueError(f"Invalid ClickHouse query setting '{item.strip()}' (expected name=value)")
+        settings[name.strip()] = value.strip()
+    return tuple(sorted(settings.items()))
+
+
+def resolve_compression(compression: Optional[str] = None) -> Union[bool, str]:
+    """clickhouse-connect ``compress`` argument for a compression name"""
+    compression = (compression or COMPRESSION).lower()
+    if compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown ClickHouse compression '{compression}' (expected one of: {', '.join(COMPRESSIONS)})"
+        )
+    return False if compression == "none" else compression
+
+
+def missing_env_vars() -> List[str]:
+    """Required connection variables that are not set"""
+    return [var for var in REQUIRED_ENV_VARS if not os.getenv(var)]
+
+
+@dataclass(frozen=True)
+class ClickHouseSettings:
+    """Everything a client is created from; clients are pooled per settings"""
+
+    host: str
+    port: int
+    username: str
+    password: str = field(repr=False)
+    database: str
+    secure: bool = True
+    compression: str = COMPRESSION
+    connect_timeout: int = CONNECT_TIMEOUT
+    send_receive_timeout: int = SEND_RECEIVE_TIMEOUT
+    query_settings: Tuple[Tuple[str, str], ...] = parse_query_settings(QUERY_SETTINGS)
+
+    @classmethod
+    def from_env(cls, database: Optional[str] = None) -> "ClickHouseSettings":
+        """Settings from the CLICKHOUSE_* variables (database: default when unset)"""
+        return cls(
+            host=os.getenv("CLICKHOUSE_HOST"),
+            port=int(os.getenv("CLICKHOUSE_PORT", "8443")),
+            username=os.getenv("CLICKHOUSE_USERNAME"),
+            password=os.getenv("CLICKHOUSE_PASSWORD"),
+            database=os.getenv("CLICKHOUSE_DATABASE", database),
+            secure=os.getenv("CLICKHOUSE_SECURE", "true").lower() == "true",
+        )
+
+    def client_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for clickhouse_connect.get_client"""
+        return {
+            "host": self.host,
+            "port": self.port,
+            "username": self.username,
+            "password": self.password,
+            "database": self.database,
+            "secure": self.secure,
+            "compress": resolve_compression(self.compression),
+            "connect_timeout": self.connect_timeout,
+            "send_receive_timeout": self.send_receive_timeout,
+            "settings": dict(self.query_settings),
+            "verify": False,  # Disable SSL verification for Windows compatibility
+        }
+
+
+def create_client(settings: ClickHouseSettings, pool_manager) -> Any:
+    """New clickhouse-connect client (its constructor already queries the server)"""
+    return clickhouse_connect.get_client(**settings.client_kwargs(), pool_mgr=pool_manager)
+
+
+def is_connection_error(error: Exception) -> bool:
+    """True when a failed query leaves the client unusable (network, not SQL)"""
+    if OperationalError is not None and isinstance(error, OperationalError):
+        return True
+    return isinstance(error, (ConnectionError, OSError))
+
+
+class ClickHouseClientFactory:
+    """
+    Process-wide, bounded pool of ClickHouse clients keyed by settings
+
+    A client runs one query at a time, so every concurrent user gets its own
+    client; clients are handed back with release() and reused afterwards.
+    """
+
+    def __init__(
+        self,
+        max_clients: Optional[int] = None,
+        health_check_seconds: Optional[float] = None,
+        client_factory: Callable[[ClickHouseSettings, Any], Any] = create_client,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_clients: Clients open at once (default: DLT_CLICKHOUSE_MAX_CLIENTS)
+            health_check_seconds: Idle time after which a pooled client is
+                                  pinged before reuse (default: DLT_CLICKHOUSE_HEALTH_CHECK_SECONDS)
+            client_factory: Creates a client from (settings, pool manager)
+            clock: Time source for the health check interval
+        """
+        self.max_clients = max(1, max_clients or MAX_CLIENTS)
+        self.health_check_seconds = (
+            HEALTH_CHECK_SECONDS if health_check_seconds is None else health_check_seconds
+        )
+        self.client_factory = client_factory
+        self.clock = clock
+        self.stats = {"created": 0, "reused": 0, "pings": 0, "discarded": 0}
+        self._idle: Dict[ClickHouseSettings, List[Tuple[Any, float]]] = {}
+        self._open = 0
+        self._pool_manager = None
+        self._cond = threading.Condition()
+
+    @property
+    def open_clients(self) -> int:
+        return self._open
+
+    def pool_manager(self):
+        """urllib3 pool manager shared by every client (kept-alive TLS connections)"""
+        with self._cond:
+            if self._pool_manager is None and CLICKHOUSE_AVAILABLE:
+                # Silence the unverified HTTPS warnings of verify=False
+                import urllib3
+
+                urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+                self._pool_manager = get_pool_manager(
+                    verify=False, maxsize=self.max_clients, num_pools=4
+                )
+            return self._pool_manager
+
+    def _close_client(self, client):
+        try:
+            client.close()
+        except Exception as e:
+            print(f"⚠️ Failed to close ClickHouse client: {e}")
+
+    def _reserve(self, settings: ClickHouseSettings) -> Tuple[Optional[Any], float]:
+        """An idle client for settings, or (None, 0) after reserving a new slot"""
+        deadline = self.clock() + settings.connect_timeout
+        evicted = []
+        try:
+            with self._cond:
+                while True:
+                    idle = self._idle.get(settings)
+                    if idle:
+                        return idle.pop()
+                    if self._open < self.max_clients:
+                        self._open += 1
+                        return None, 0.0
+                    # Make room by closing an idle client of other settings
+                    other = next((clients for clients in self._idle.values() if clients), None)
+                    if other:
+                        evicted.append(other.pop(0)[0])
+                        self._open -= 1
+                        continue
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        raise ConnectionError(
+                            f"All {self.max_clients} ClickHouse clients are in use "
+                            "(raise DLT_CLICKHOUSE_MAX_CLIENTS?)"
+                        )
+                    self._cond.wait(remaining)
+        finally:
+            for client in evicted:
+                self._close_client(client)
+
+    def acquire(self, settings: ClickHouseSettings) -> Any:
+        """A healthy client for settings: reused when one is idle, else new"""
+        while True:
+            client, last_ok = self._reserve(settings)
+            if client is None:
+                break
+            if self.clock() - last_ok < self.health_check_seconds:
+                self.stats["reused"] += 1
+                return client
+            self.stats["pings"] += 1
+            try:
+                healthy = client.ping()
+            except Exception:
+                healthy = False
+            if healthy:
+                self.stats["reused"] += 1
+                return client
+            self.release(settings, client, healthy=False)
+
+        try:
+            client = self.client_factory(settings, self.pool_manager())
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        self.stats["created"] += 1
+        return client
+
+    def release(self, settings: ClickHouseSettings, client: Any, healthy: bool = True):
+        """Hand a client back; unhealthy clients are closed instead of pooled"""
+        with self._cond:
+            if healthy:
+                self._idle.setdefault(settings, []).append((client, self.clock()))
+            else:
+                self._open -= 1
+                self.stats["discarded"] += 1
+            self._cond.notify()
+        if not healthy:
+            self._close_client(client)
+
+    def close(self):
+        """Close every idle client (clients in use are closed when released)"""
+        with self._cond:
+            idle = [client for clients in self._idle.values() for client, _ in clients]
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for client in idle:
+            self._close_client(client)
+
+    def summary(self) -> str:
+        return (
+            f"🔌 ClickHouse clients: {self.stats['created']} created, "
+            f"{self.stats['reused']} reused, {self.stats['pings']} health pings, "
+            f"{self.stats['discarded']} discarded"
+        )
+
+
+_factory: Optional[ClickHouseClientFactory] = None
+_factory_lock = threading.Lock()
+
+
+def get_client_factory() -> ClickHouseClientFactory:
+    """The process-wide client factory (created on first use)"""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            _factory = ClickHouseClientFactory()
+        return _factory
+
+
+class ClickHouseConnection:
+    """Manages ClickHouse connections for carrier invoice data extraction"""
+
+    label = "ClickHouse"
+
+    def __init__(
+        self,
+        host,
+        port,
+        username,
+        password,
+        database,
+        secure=True,
+        factory: Optional[ClickHouseClientFactory] = None,
+        **options,
+    ):
+        """
+        Args:
+            host, port, username, password, database, secure: Connection settings
+            factory: Client pool (default: the process-wide factory)
+            **options: Other ClickHouseSettings fields (compression, timeouts, query_settings)
+        """
+        self.settings = ClickHouseSettings(
+            host, port, username, password, database, secure, **options
+        )
+        self.factory = factory
+        self.client = None
+        self.connected = False
+        self._healthy = True
+        # ClickHouse summary (read_rows, read_bytes, ...) of the last row query
+        self.last_query_summary = {}
+
+    @classmethod
+    def from_env(cls, database: Optional[str] = None, **kwargs):
+        """Connection with the CLICKHOUSE_* settings (see ClickHouseSettings.from_env)"""
+        return cls(**asdict(ClickHouseSettings.from_env(database)), **kwargs)
+
+    @property
+    def host(self):
+        return self.settings.host
+
+    @property
+    def port(self):
+        return self.settings.port
+
+    @property
+    def database(self):
+        return self.settings.database
+
+    def _factory(self) -> ClickHouseClientFactory:
+        return self.factory or get_client_factory()
+
+    def connect(self):
+        """Take a client from the pool (or create one) with error handling"""
+        if not CLICKHOUSE_AVAILABLE:
+            print(f"⚠️ {self.label} library not available")
+            return False
+        if self.connected:
+            return True
+
+        try:
+            self.client = self._factory().acquire(self.settings)
+            self.connected = True
+            self._healthy = True
+            print(f"✅ Connected to {self.label}: {self.host}:{self.port}/{self.database}")
+            return True
+        except Exception as e:
+            print(f"❌ {self.label} connection failed: {type(e).__name__}: {str(e)}")
+            self.connected = False
+            return False
+
+    def clone(self):
+        """New, unconnected connection with the same settings (for parallel extraction)"""
+        return self.__class__(factory=self.factory, **asdict(self.settings))
+
+    def close(self):
+        """Return the client to the pool (closed instead if it failed)"""
+        if self.client is not None:
+            self._factory().release(self.settings, self.client, healthy=self._healthy)
+        self.client = None
+        self.connected = False
+
+    def _failed(self, error: Exception):
+        if is_connection_error(error):
+            self._healthy = False
+
+    def execute_query(self, query, parameters=None):
+        """Execute query with error handling"""
+        if not self.connected:
+            raise ConnectionError(f"Not connected to {self.label}")
+
+        try:
+            if parameters:
+                result = self.client.query(query, parameters=parameters)
+            else:
+                result = self.client.query(query)
+            self.last_query_summary = getattr(result, "summary", None) or {}
+            return result.result_rows
+        except Exception as e:
+            self._failed(e)
+            print(f"❌ Query execution failed: {e}")
+            raise
+
+    def execute_query_arrow(self, query, parameters=None):
+        """Execute query and return the result as a pyarrow Table"""
+        if not self.connected:
+            raise ConnectionError(f"Not connected to {self.label}")
+
+        # The Arrow format does not report a query summary
+        self.last_query_summary = {}
+        try:
+            return self.client.query_arrow(query, parameters=parameters, use_strings=True)
+        except Exception as e:
+            self._failed(e)
+            print(f"❌ Arrow query execution failed: {e}")
+            raise
+
+    def get_table_schema(self, table_name):
+        """Get table schema information"""
+        if not self.connected:
+            return []
+
+        try:
+            schema_query = f"""
+            SELECT
+                name,
+                type,
+                default_kind,
+                default_expression
+            FROM system.columns
+            WHERE database = '{self.database}' AND table = '{table_name}'
+            ORDER BY position
+            """
+            return self.execute_query(schema_query)
+        except Exception as e:
+            print(f"❌ Failed to get schema for table {table_name}: {e}")
+            return []
+
+
+class ClickHouseClientPool:
+    """
+    Bounded pool of connected ClickHouse connections for parallel window fetches
+
+    A clickhouse-connect client runs one query at a time, so every concurrent
+    window needs its own client. Connections are created lazily (at most
+    ``size``), reused across windows and closed with the pool - which hands
+    their clients back to the shared ClickHouseClientFactory for the next
+    pool; ``primary`` (the resource's own, already connected connection) is
+    used first and left open.
+    """
+
+    def __init__(
+        self,
+        connection_factory: Callable[[], Any],
+        size: int,
+        primary: Optional[Any] = None,
+    ):
+        """
+        Args:
+            connection_factory: Returns a new, unconnected connection object
+                                with connect() / close()
+            size: Maximum number of connections (including ``primary``)
+            primary: Existing connected connection to hand out first
+        """
+        self.connection_factory = connection_factory
+        self.size = max(1, size)
+        self.primary = primary
+        self.created: List[Any] = []
+        self._idle: "queue.Queue[Any]" = queue.Queue()
+        self._count = 0
+        self._lock = threading.Lock()
+
+        if primary is not None:
+            self._idle.put(primary)
+            self._count = 1
+
+    def _acquire(self) -> Any:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._count < self.size
+            if create:
+                self._count += 1
+        if not create:
+            return self._idle.get()
+
+        conn = self.connection_factory()
+        if not conn.connect():
+            with self._lock:
+                self._count -= 1
+            raise ConnectionError("Failed to open an additional ClickHouse connection")
+        with self._lock:
+            self.created.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection for the duration of the block"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """Close every connection the pool opened (not ``primary``)"""
+        with self._lock:
+            created, self.created = self.created, []
+        for conn in created:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"⚠️ Failed to close ClickHouse connection: {e}")
+
+    def __enter__(self) -> "ClickHouseClientPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,981 @@
+#!/usr/bin/env python3
+"""
+ClickHouse Time-Window Extraction
+=================================
+
+Shared extraction loop for the carrier invoice dlt resources: the
+import_time range is split into windows and every window is read with keyset
+pagination on the tie column (invoice_number), DLT_CLICKHOUSE_BATCH_SIZE rows
+per query. invoice_number repeats across an invoice's lines, so a full page
+is cut before its last invoice, whose lines are then read whole in one extra
+query; no line is skipped at a page boundary.
+
+Planning (plan_windows): one aggregate query returns min/max import_time and
+a row histogram per DLT_CLICKHOUSE_WINDOW_SECONDS bucket. Empty buckets are
+skipped, consecutive sparse buckets are merged and dense buckets are split, so
+every extraction window holds about DLT_CLICKHOUSE_WINDOW_TARGET_ROWS rows
+(default: the batch size) and the number of queries follows the data volume
+instead of the number of elapsed hours.
+
+Extraction modes:
+- sequential: windows are read one after another over the resource's
+  connection (previous behaviour)
+- parallel:   windows are independent partitions, so up to
+  DLT_CLICKHOUSE_PARALLEL_WINDOWS of them are fetched concurrently, each over
+  its own ClickHouse client from a bounded pool. Batches are still yielded in
+  window order, so dlt (and its incremental cursor) sees exactly the same
+  sequence as in sequential mode. At most that many windows are held in
+  memory at once.
+
+Fetch formats:
+- rows:  batches are lists of Python row tuples (turned into dicts by the resource)
+- arrow: batches are pyarrow Tables read with clickhouse-connect's Arrow
+         format; resources add their metadata as constant columns and yield the
+         tables to dlt as-is, so no Python object is created per row or value.
+         Falls back to "rows" when pyarrow is not installed.
+
+Batch sizing (DLT_CLICKHOUSE_BATCH_SIZING):
+- fixed:    every query reads DLT_CLICKHOUSE_BATCH_SIZE rows (previous behaviour)
+- adaptive: DLT_CLICKHOUSE_BATCH_SIZE is the starting size; after every full
+            batch the size is re-aimed at DLT_CLICKHOUSE_TARGET_BATCH_SECONDS
+            per query (measured rows/sec) and DLT_CLICKHOUSE_BATCH_MEMORY_MB
+            per batch (measured bytes/row), within
+            [DLT_CLICKHOUSE_MIN_BATCH_SIZE, DLT_CLICKHOUSE_MAX_BATCH_SIZE].
+            Every decision is printed. Pagination stays keyset based, so the
+            extracted rows do not depend on the batch sizes chosen.
+
+Prefetching (DLT_CLICKHOUSE_PREFETCH_BATCHES=K, 0 = off):
+    the resources fetch and convert batches in a background thread
+    (BatchPrefetcher) and keep up to K finished batches in a bounded queue, so
+    the next queries run while dlt processes the current batch. When dlt falls
+    behind, the queue fills and the fetch thread waits (backpressure). Queue
+    depth and the time either side spent waiting are reported at the end.
+
+transaction_date filter strategies (detect_date_filter):
+- column:     a typed Date column holding the normalized transaction_date
+              (e.g. ``transaction_date_parsed Nullable(Date) MATERIALIZED
+              toDate(parseDateTimeBestEffortOrNull(transaction_date))``), so
+              partition / primary key / skip indexes on it can prune
+- expression: the normalized date expression itself, used when a skip index
+              or projection on exactly that expression exists
+- parse:      the original predicate (string comparison OR
+              parseDateTimeBestEffortOrNull on every row); always works, never prunes
+"auto" picks the first one the table supports. Rows scanned per query are
+taken from ClickHouse's query summary (row fetch format) and reported, so
+the strategies can be compared (see compare_date_filters()).
+
+Configuration (environment variables):
+    DLT_CLICKHOUSE_WINDOW_TARGET_ROWS=0         # rows per planned window (0 = batch size)
+    DLT_CLICKHOUSE_EXTRACTION_MODE=sequential   # or "parallel"
+    DLT_CLICKHOUSE_PARALLEL_WINDOWS=4
+    DLT_CLICKHOUSE_FETCH_FORMAT=rows            # or "arrow"
+    DLT_CLICKHOUSE_BATCH_SIZING=fixed           # or "adaptive"
+    DLT_CLICKHOUSE_TARGET_BATCH_SECONDS=5
+    DLT_CLICKHOUSE_BATCH_MEMORY_MB=256
+    DLT_CLICKHOUSE_MIN_BATCH_SIZE=1000
+    DLT_CLICKHOUSE_MAX_BATCH_SIZE=500000
+    DLT_CLICKHOUSE_PREFETCH_BATCHES=0           # batches fetched ahead (0 = off)
+    DLT_CLICKHOUSE_DATE_STRATEGY=auto           # or "column" / "expression" / "parse"
+    DLT_CLICKHOUSE_DATE_COLUMN=transaction_date_parsed
+    DLT_CLICKHOUSE_DATE_EXPRESSION=toDate(parseDateTimeBestEffortOrNull(transaction_date))
+
+Usage:
+    extractor = WindowExtractor(table_name, column_names, where_sql, where_parameters, batch_size)
+    plan = plan_windows(ch_conn, table_name, date_filter, date_parameters, window_seconds, batch_size)
+    with ClickHouseClientPool(ch_conn.clone, size=4, primary=ch_conn) as pool:
+        for rows in extractor.iter_batches(ch_conn, plan.windows, mode="parallel", pool=pool):
+            ...
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from clickhouse_client import ClickHouseClientPool
+
+# Arrow imports with fallback handling
+try:
+    import pyarrow as pa
+
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+EXTRACTION_MODES = ("sequential", "parallel")
+EXTRACTION_MODE = os.getenv("DLT_CLICKHOUSE_EXTRACTION_MODE", "sequential").lower()
+PARALLEL_WINDOWS = int(os.getenv("DLT_CLICKHOUSE_PARALLEL_WINDOWS", "4"))
+WINDOW_TARGET_ROWS = int(os.getenv("DLT_CLICKHOUSE_WINDOW_TARGET_ROWS", "0"))
+
+FETCH_FORMATS = ("rows", "arrow")
+FETCH_FORMAT = os.getenv("DLT_CLICKHOUSE_FETCH_FORMAT", "rows").lower()
+
+BATCH_SIZINGS = ("fixed", "adaptive")
+BATCH_SIZING = os.getenv("DLT_CLICKHOUSE_BATCH_SIZING", "fixed").lower()
+TARGET_BATCH_SECONDS = float(os.getenv("DLT_CLICKHOUSE_TARGET_BATCH_SECONDS", "5"))
+BATCH_MEMORY_MB = float(os.getenv("DLT_CLICKHOUSE_BATCH_MEMORY_MB", "256"))
+MIN_BATCH_SIZE = int(os.getenv("DLT_CLICKHOUSE_MIN_BATCH_SIZE", "1000"))
+MAX_BATCH_SIZE = int(os.getenv("DLT_CLICKHOUSE_MAX_BATCH_SIZE", "500000"))
+
+PREFETCH_BATCHES = int(os.getenv("DLT_CLICKHOUSE_PREFETCH_BATCHES", "0"))
+
+DATE_STRATEGIES = ("auto", "column", "expression", "parse")
+DATE_STRATEGY = os.getenv("DLT_CLICKHOUSE_DATE_STRATEGY", "auto").lower()
+NORMALIZED_DATE_COLUMN = os.getenv("DLT_CLICKHOUSE_DATE_COLUMN", "transaction_date_parsed")
+NORMALIZED_DATE_EXPRESSION = os.getenv(
+    "DLT_CLICKHOUSE_DATE_EXPRESSION",
+    "toDate(parseDateTimeBestEffortOrNull(transaction_date))",
+)
+
+# Original transaction_date predicate: handles both date formats, but parses
+# the string of every row, so no index can be used
+PARSE_DATE_FILTER_SQL = """
+    -- Match YYYY-MM-DD format
+    (transaction_date >= %(start_date_str)s AND transaction_date <= %(end_date_str)s)
+    OR
+    -- Match M/D/YYYY format by converting to date
+    (parseDateTimeBestEffortOrNull(transaction_date) >= toDate(%(start_date_str)s)
+     AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate(%(end_date_str)s))
+"""
+
+Window = Tuple[datetime, datetime]
+Batch = Union[List[tuple], "pa.Table"]
+
+
+@dataclass
+class DateFilter:
+    """transaction_date predicate; uses %(start_date_str)s / %(end_date_str)s (YYYY-MM-DD)"""
+
+    strategy: str
+    sql: str
+    target: str = "transaction_date"
+
+
+def normalized_date_filter(strategy: str, target: str) -> DateFilter:
+    """Range predicate on a normalized Date column or expression"""
+    return DateFilter(
+        strategy,
+        f"{target} >= toDate(%(start_date_str)s) AND {target} <= toDate(%(end_date_str)s)",
+        target,
+    )
+
+
+def _compact_sql(sql: str) -> str:
+    return "".join(sql.split()).lower()
+
+
+def select_star_columns(schema: Sequence[Sequence[Any]]) -> List[str]:
+    """Column names returned by SELECT * (MATERIALIZED / ALIAS columns are not)"""
+    return [col[0] for col in schema if len(col) < 3 or col[2] not in ("MATERIALIZED", "ALIAS")]
+
+
+def has_date_column(schema: Sequence[Sequence[Any]], column: str = None) -> bool:
+    """Whether the table schema (system.columns rows) has the normalized Date column"""
+    column = column or NORMALIZED_DATE_COLUMN
+    return any(col[0] == column and "Date" in col[1] for col in schema)
+
+
+def has_date_expression_index(ch_conn, table_name: str, expression: str = None) -> bool:
+    """Whether a skip index or projection is defined on the normalized date expression"""
+    expression = _compact_sql(expression or NORMALIZED_DATE_EXPRESSION)
+    try:
+        rows = ch_conn.execute_query(
+            """
+            SELECT
+                (SELECT groupArray(expr) FROM system.data_skipping_indices
+                 WHERE database = currentDatabase() AND table = %(table_name)s),
+                (SELECT any(create_table_query) FROM system.tables
+                 WHERE database = currentDatabase() AND name = %(table_name)s)
+            """,
+            {"table_name": table_name},
+        )
+    except Exception as e:
+        print(f"⚠️ Could not inspect indexes of {table_name}: {e}")
+        return False
+    if not rows:
+        return False
+
+    index_expressions, create_query = rows[0]
+    if any(_compact_sql(expr) == expression for expr in index_expressions or []):
+        return True
+    create_query = _compact_sql(create_query or "")
+    return "projection" in create_query and expression in create_query
+
+
+def detect_date_filter(
+    ch_conn, table_name: str, schema: Sequence[Sequence[Any]], strategy: str = None
+) -> DateFilter:
+    """
+    Choose the transaction_date predicate for a table
+
+    Args:
+        ch_conn: ClickHouse connection (for the index/projection lookup)
+        table_name: Source table
+        schema: Rows of system.columns (name, type, ...) for the table
+        strategy: "auto", "column", "expression" or "parse"
+                  (default: DLT_CLICKHOUSE_DATE_STRATEGY)
+    """
+    strategy = (strategy or DATE_STRATEGY).lower()
+    if strategy not in DATE_STRATEGIES:
+        raise ValueError(
+            f"Unknown date strategy '{strategy}' (expected one of: {', '.join(DATE_STRATEGIES)})"
+        )
+
+    if strategy == "column" or (strategy == "auto" and has_date_column(schema)):
+        if not has_date_column(schema):
+            raise ValueError(
+                f"Date column '{NORMALIZED_DATE_COLUMN}' not found in {table_name} schema"
+            )
+        return normalized_date_filter("column", NORMALIZED_DATE_COLUMN)
+    if strategy == "expression" or (
+        strategy == "auto" and has_date_expression_index(ch_conn, table_name)
+    ):
+        return normalized_date_filter("expression", NORMALIZED_DATE_EXPRESSION)
+    return DateFilter("parse", PARSE_DATE_FILTER_SQL)
+
+
+def query_read_rows(ch_conn) -> Optional[int]:
+    """Rows ClickHouse read for the connection's last query (None if not reported)"""
+    summary = getattr(ch_conn, "last_query_summary", None)
+    if not summary or "read_rows" not in summary:
+        return None
+    return int(summary["read_rows"])
+
+
+def compare_date_filters(
+    ch_conn,
+    table_name: str,
+    schema: Sequence[Sequence[Any]],
+    start_date_str: str,
+    end_date_str: str,
+) -> List[Dict[str, Any]]:
+    """
+    Count matching rows with every strategy the table supports and report how
+    many rows ClickHouse scanned for each
+
+    Returns:
+        [{"strategy", "target", "matched_rows", "read_rows"}, ...]
+    """
+    filters = [DateFilter("parse", PARSE_DATE_FILTER_SQL)]
+    if has_date_column(schema):
+        filters.append(normalized_date_filter("column", NORMALIZED_DATE_COLUMN))
+    # The expression can always be evaluated; it prunes only with an index/projection
+    filters.append(normalized_date_filter("expression", NORMALIZED_DATE_EXPRESSION))
+
+    results = []
+    for date_filter in filters:
+        rows = ch_conn.execute_query(
+            f"SELECT count() FROM {table_name} WHERE ({date_filter.sql})",
+            {"start_date_str": start_date_str, "end_date_str": end_date_str},
+        )
+        results.append(
+            {
+                "strategy": date_filter.strategy,
+                "target": date_filter.target,
+                "matched_rows": rows[0][0] if rows else 0,
+                "read_rows": query_read_rows(ch_conn),
+            }
+        )
+    return results
+
+
+def resolve_fetch_format(fetch_format: Optional[str] = None) -> str:
+    """Validate a fetch format (default: DLT_CLICKHOUSE_FETCH_FORMAT)"""
+    fetch_format = (fetch_format or FETCH_FORMAT).lower()
+    if fetch_format not in FETCH_FORMATS:
+        raise ValueError(
+            f"Unknown fetch format '{fetch_format}' (expected one of: {', '.join(FETCH_FORMATS)})"
+        )
+    if fetch_format == "arrow" and not ARROW_AVAILABLE:
+        print("⚠️ pyarrow not available - falling back to row fetch format")
+        return "rows"
+    return fetch_format
+
+
+def batch_num_rows(batch: Batch) -> int:
+    return batch.num_rows if ARROW_AVAILABLE and isinstance(batch, pa.Table) else len(batch)
+
+
+def add_metadata_columns(
+    table: "pa.Table", table_name: str, extracted_at: Optional[datetime] = None
+) -> "pa.Table":
+    """Append the _extracted_at / _source_table columns as constant columns"""
+    num_rows = table.num_rows
+    extracted_at = extracted_at or datetime.now()
+    table = table.append_column(
+        "_extracted_at", pa.repeat(pa.scalar(extracted_at, pa.timestamp("us")), num_rows)
+    )
+    return table.append_column(
+        "_source_table", pa.repeat(pa.scalar(table_name, pa.string()), num_rows)
+    )
+
+
+def build_windows(
+    start_time: datetime, max_time: datetime, window_seconds: int
+) -> List[Window]:
+    """
+    Split [start_time, max_time] into consecutive half-open windows
+
+    The last window starts at or before max_time, so rows at max_time are
+    included (same bounds as the original while-loop).
+    """
+    windows = []
+    step = timedelta(seconds=window_seconds)
+    while start_time <= max_time:
+        windows.append((start_time, start_time + step))
+        start_time += step
+    return windows
+
+
+# (bucket start, rows) per DLT_CLICKHOUSE_WINDOW_SECONDS bucket, in time order
+Histogram = List[Tuple[datetime, int]]
+
+
+def build_adaptive_windows(
+    histogram: Histogram,
+    window_seconds: int,
+    target_rows: int,
+    start_time: Optional[datetime] = None,
+) -> List[Window]:
+    """
+    Turn a row histogram into extraction windows of about ``target_rows`` rows
+
+    - empty buckets get no window (they are not in the histogram)
+    - consecutive buckets are merged while their rows fit in ``target_rows``;
+      the merged window also spans the empty buckets between them
+    - a bucket with more rows is split into equal whole-second slices
+
+    Args:
+        histogram: (bucket start, rows) pairs, ascending, rows > 0
+        window_seconds: Bucket width
+        target_rows: Desired rows per window
+        start_time: Lower bound of the extraction (incremental runs); the
+                    first window starts here instead of at its bucket start
+    """
+    step = timedelta(seconds=window_seconds)
+    target_rows = max(1, target_rows)
+    windows: List[Window] = []
+    merged: Optional[List] = None  # [start, end, rows]
+
+    def flush():
+        if merged:
+            windows.append((merged[0], merged[1]))
+
+    for bucket_start, rows in histogram:
+        if rows <= 0:
+            continue
+        bucket_end = bucket_start + step
+        if start_time is not None and bucket_start < start_time:
+            bucket_start = start_time
+
+        if rows > target_rows:
+            flush()
+            merged = None
+            slices = math.ceil(rows / target_rows)
+            span = (bucket_end - bucket_start).total_seconds()
+            slice_seconds = max(1, math.ceil(span / slices))
+            slice_start = bucket_start
+            while slice_start < bucket_end:
+                slice_end = min(bucket_end, slice_start + timedelta(seconds=slice_seconds))
+                windows.append((slice_start, slice_end))
+                slice_start = slice_end
+        elif merged and merged[2] + rows <= target_rows:
+            merged[1] = bucket_end
+            merged[2] += rows
+        else:
+            flush()
+            merged = [bucket_start, bucket_end, rows]
+
+    flush()
+    return windows
+
+
+@dataclass
+class WindowPlan:
+    """Result of the planning query"""
+
+    min_time: Optional[datetime]
+    max_time: Optional[datetime]
+    total_rows: int
+    histogram: Histogram
+    windows: List[Window]
+    rows_read: Optional[int] = None  # rows ClickHouse scanned for the plan
+
+
+def plan_windows(
+    ch_conn,
+    table_name: str,
+    date_filter: "DateFilter",
+    date_parameters: Dict[str, Any],
+    window_seconds: int,
+    target_rows: int,
+    start_time: Optional[datetime] = None,
+    order_time_col: str = "import_time",
+) -> WindowPlan:
+    """
+    Plan the extraction windows with one aggregate query
+
+    Replaces the separate min()/max() queries and the probing of empty
+    windows: min, max and the row count of every non-empty bucket come back
+    together.
+
+    Args:
+        ch_conn: ClickHouse connection
+        table_name: Source table
+        date_filter: transaction_date predicate (detect_date_filter())
+        date_parameters: start_date_str / end_date_str
+        window_seconds: Histogram bucket width
+        target_rows: Desired rows per window (0: WINDOW_TARGET_ROWS)
+        start_time: Only plan rows with import_time >= start_time (incremental runs)
+        order_time_col: Column the windows are cut on
+    """
+    target_rows = target_rows if WINDOW_TARGET_ROWS <= 0 else WINDOW_TARGET_ROWS
+    parameters = dict(date_parameters)
+    time_filter = ""
+    if start_time is not None:
+        time_filter = f"AND {order_time_col} >= %(plan_start_time)s"
+        parameters["plan_start_time"] = start_time
+
+    rows = ch_conn.execute_query(
+        f"""
+        SELECT
+            toStartOfInterval({order_time_col}, INTERVAL {int(window_seconds)} SECOND) AS bucket,
+            count() AS rows,
+            min({order_time_col}) AS bucket_min,
+            max({order_time_col}) AS bucket_max
+        FROM {table_name}
+        WHERE ({date_filter.sql}) {time_filter}
+        GROUP BY bucket
+        ORDER BY bucket
+        """,
+        parameters,
+    )
+    rows_read = query_read_rows(ch_conn)
+
+    histogram = [(bucket, count) for bucket, count, _, _ in rows or [] if count]
+    if not histogram:
+        return WindowPlan(None, None, 0, [], [], rows_read)
+
+    return WindowPlan(
+        min_time=min(row[2] for row in rows),
+        max_time=max(row[3] for row in rows),
+        total_rows=sum(count for _, count in histogram),
+        histogram=histogram,
+        windows=build_adaptive_windows(histogram, window_seconds, target_rows, start_time),
+        rows_read=rows_read,
+    )
+
+
+def describe_plan(plan: WindowPlan, window_seconds: int) -> str:
+    """One-line summary of a plan for the extraction logs"""
+    if not plan.histogram:
+        return "🗺️ Plan: no matching rows"
+    elapsed_windows = (
+        int((plan.max_time - plan.histogram[0][0]).total_seconds() // window_seconds) + 1
+    )
+    scanned = f", {plan.rows_read:,} rows scanned" if plan.rows_read is not None else ""
+    return (
+        f"🗺️ Plan: {plan.total_rows:,} rows from {plan.min_time} to {plan.max_time} - "
+        f"{len(plan.histogram)} of {elapsed_windows} {window_seconds}s windows have data, "
+        f"extracting {len(plan.windows)} window(s){scanned}"
+    )
+
+
+def batch_num_bytes(batch: Batch, sample_rows: int = 64) -> int:
+    """
+    Approximate in-memory size of a batch
+
+    Arrow tables report their buffer size; for row tuples the size of a sample
+    of rows (tuple + values) is extrapolated to the whole batch.
+    """
+    if ARROW_AVAILABLE and isinstance(batch, pa.Table):
+        return batch.nbytes
+    if not batch:
+        return 0
+    step = max(1, len(batch) // sample_rows)
+    sample = batch[::step][:sample_rows]
+    sample_bytes = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample
+    )
+    return int(sample_bytes / len(sample) * len(batch))
+
+
+class BatchSizer:
+    """
+    Chooses the LIMIT of every keyset query from observed batches
+
+    After a full batch the next size is the smaller of
+    - target_seconds x measured rows/sec (query latency), and
+    - memory_budget_bytes / measured bytes per row (row width)
+    clamped to [min_size, max_size] and to at most twice the previous size,
+    so one fast query cannot cause a huge jump. Measurements are smoothed
+    (EWMA). Short batches end their window and are not representative of
+    throughput, so only their row width is used. Thread-safe: windows
+    fetched in parallel share one sizer.
+    """
+
+    SMOOTHING = 0.5
+    MAX_GROWTH = 2.0
+
+    def __init__(
+        self,
+        initial_size: int,
+        target_seconds: float = TARGET_BATCH_SECONDS,
+        memory_budget_mb: float = BATCH_MEMORY_MB,
+        min_size: int = MIN_BATCH_SIZE,
+        max_size: int = MAX_BATCH_SIZE,
+        log: Callable[[str], None] = print,
+    ):
+        self.min_size = max(1, min(min_size, max_size))
+        self.max_size = max(self.min_size, max_size)
+        self.size = self._clamp(initial_size)
+        self.target_seconds = target_seconds
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.log = log
+
+        self.rows_per_second: Optional[float] = None
+        self.bytes_per_row: Optional[float] = None
+        self.decisions = 0
+        self.sizes_used: List[int] = []
+        self._lock = threading.Lock()
+
+    def _clamp(self, size: float) -> int:
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def _smooth(self, previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return self.SMOOTHING * value + (1 - self.SMOOTHING) * previous
+
+    def next_size(self) -> int:
+        with self._lock:
+            self.sizes_used.append(self.size)
+            return self.size
+
+    def observe(self, limit: int, num_rows: int, seconds: float, num_bytes: int) -> int:
+        """
+        Record one query (its LIMIT, rows returned, latency and batch bytes)
+        and return the size for the next query
+        """
+        with self._lock:
+            if num_rows:
+                self.bytes_per_row = self._smooth(self.bytes_per_row, num_bytes / num_rows)
+            if num_rows < limit or seconds <= 0:
+                return self.size
+            self.rows_per_second = self._smooth(self.rows_per_second, num_rows / seconds)
+
+            by_time = self.target_seconds * self.rows_per_second
+            by_memory = (
+                self.memory_budget_bytes / self.bytes_per_row
+                if self.bytes_per_row
+                else self.max_size
+            )
+            previous = self.size
+            limits = {
+                "latency": by_time,
+                "memory": by_memory,
+                "growth cap": previous * self.MAX_GROWTH,
+            }
+            reason = min(limits, key=limits.get)
+            self.size = self._clamp(limits[reason])
+            self.decisions += 1
+
+        self.log(
+            f"📏 Batch size {previous:,} -> {self.size:,} ({reason}: {num_rows:,} rows in "
+            f"{seconds:.2f}s, ~{self.rows_per_second:,.0f} rows/s, "
+            f"~{self.bytes_per_row:,.0f} B/row)"
+        )
+        return self.size
+
+    def summary(self) -> str:
+        if not self.sizes_used:
+            return "📏 Adaptive batch size: no queries"
+        return (
+            f"📏 Adaptive batch size: {len(self.sizes_used)} queries, "
+            f"{min(self.sizes_used):,}-{max(self.sizes_used):,} rows, final {self.size:,}"
+        )
+
+
+def resolve_batch_sizer(
+    batch_size: int, batch_sizing: Optional[str] = None
+) -> Optional[BatchSizer]:
+    """BatchSizer starting at ``batch_size`` for "adaptive", None for "fixed" """
+    batch_sizing = (batch_sizing or BATCH_SIZING).lower()
+    if batch_sizing not in BATCH_SIZINGS:
+        raise ValueError(
+            f"Unknown batch sizing '{batch_sizing}' (expected one of: {', '.join(BATCH_SIZINGS)})"
+        )
+    if batch_sizing == "fixed":
+        return None
+    return BatchSizer(batch_size)
+
+
+class BatchPrefetcher:
+    """
+    Runs a batch iterator in a background thread, up to ``depth`` batches ahead
+
+    The producer thread puts finished batches into a bounded queue; iterating
+    the prefetcher takes them out in order. Exceptions raised by the source
+    iterator are re-raised in the consumer. Closing the prefetcher early (or
+    leaving the ``with`` block) stops the producer and closes the source.
+    With depth 0 the source is iterated inline, without a thread.
+
+    Metrics:
+        batches:           batches handed to the consumer
+        max_depth:         most batches ever waiting in the queue
+        average_depth:     batches waiting when the consumer asked for one
+        consumer_wait:     seconds the consumer waited for the next batch
+                           (fetching is the bottleneck)
+        producer_wait:     seconds the producer waited for a free slot
+                           (the consumer is the bottleneck / backpressure)
+    """
+
+    _DONE = object()
+    POLL_SECONDS = 0.1
+
+    def __init__(self, source: Iterator[Any], depth: Optional[int] = None):
+        """
+        Args:
+            source: Batch iterator (e.g. WindowExtractor.iter_batches())
+            depth: Batches fetched ahead (default: DLT_CLICKHOUSE_PREFETCH_BATCHES)
+        """
+        self.depth = max(0, PREFETCH_BATCHES if depth is None else depth)
+        self._source = source
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, self.depth))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.batches = 0
+        self.max_depth = 0
+        self.consumer_wait = 0.0
+        self.producer_wait = 0.0
+        self._depth_total = 0
+
+    @property
+    def average_depth(self) -> float:
+        return self._depth_total / self.batches if self.batches else 0.0
+
+    def _put(self, item) -> bool:
+        started = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=self.POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.producer_wait += time.perf_counter() - started
+
+    def _produce(self):
+        try:
+            for item in self._source:
+                if not self._put(item):
+                    break
+                self.max_depth = max(self.max_depth, self._queue.qsize())
+        except BaseException as e:  # handed to the consumer
+            self._put(e)
+            return
+        finally:
+            self._close_source()
+        self._put(self._DONE)
+
+    def _close_source(self):
+        close = getattr(self._source, "close", None)
+        if close:
+            close()
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self.depth:
+            for item in self._source:
+                self.batches += 1
+                yield item
+            return
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._produce, name="clickhouse-prefetch", daemon=True
+            )
+            self._thread.start()
+
+        while True:
+            self._depth_total += self._queue.qsize()
+            started = time.perf_counter()
+            item = self._queue.get()
+            self.consumer_wait += time.perf_counter() - started
+            if item is self._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            self.batches += 1
+            yield item
+
+    def close(self):
+        """Stop the producer thread (drops batches not consumed yet)"""
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self._close_source()
+
+    def __enter__(self) -> "BatchPrefetcher":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def summary(self) -> str:
+        return (
+            f"🚚 Prefetch ({self.depth} batches): {self.batches} batches, "
+            f"queue depth avg {self.average_depth:.1f} / max {self.max_depth}, "
+            f"waiting for ClickHouse {self.consumer_wait:.2f}s, "
+            f"waiting for dlt {self.producer_wait:.2f}s"
+        )
+
+
+class WindowExtractor:
+    """Keyset-paginated extraction of one table, window by window"""
+
+    def __init__(
+        self,
+        table_name: str,
+        column_names: Sequence[str],
+        where_sql: str,
+        where_parameters: Dict[str, Any],
+        batch_size: int,
+        order_time_col: str = "import_time",
+        order_tie_col: str = "invoice_number",
+        fetch_format: Optional[str] = None,
+        batch_sizer: Optional[BatchSizer] = None,
+    ):
+        """
+        Args:
+            table_name: Source table
+            column_names: Columns of ``SELECT *`` in order (from system.columns)
+            where_sql: Boolean SQL expression restricting the rows (e.g. the
+                       transaction_date predicate), combined with the window bounds
+            where_parameters: Query parameters used by ``where_sql``
+            batch_size: Rows per query (starting size with adaptive sizing)
+            order_time_col: Column the windows are cut on
+            order_tie_col: Keyset pagination column within a window
+            fetch_format: "rows" or "arrow" (default: DLT_CLICKHOUSE_FETCH_FORMAT)
+            batch_sizer: Adaptive batch sizing (default: from
+                         DLT_CLICKHOUSE_BATCH_SIZING, None when "fixed")
+        """
+        if order_tie_col not in column_names:
+            raise ValueError(
+                f"Keyset column '{order_tie_col}' not found in {table_name} schema"
+            )
+
+        self.table_name = table_name
+        self.column_names = list(column_names)
+        self.where_sql = where_sql
+        self.where_parameters = where_parameters
+        self.batch_size = batch_size
+        self.order_time_col = order_time_col
+        self.order_tie_col = order_tie_col
+        self.tie_index = self.column_names.index(order_tie_col)
+        self.fetch_format = resolve_fetch_format(fetch_format)
+        self.batch_sizer = batch_sizer or resolve_batch_sizer(batch_size)
+
+        # Statistics (rows_read: rows ClickHouse scanned, when reported)
+        self.queries = 0
+        self.rows_read = 0
+        self._lock = threading.Lock()
+
+    def build_query(self, limit: Optional[int] = None) -> str:
+        return f"""
+            SELECT * FROM {self.table_name}
+            WHERE ({self.where_sql})
+            AND {self.order_time_col} >= %(start_time)s
+            AND {self.order_time_col} < %(end_time)s
+            AND (
+                %(has_cursor)s = 0
+                OR {self.order_tie_col} > %(cursor_id)s
+                OR {self.order_tie_col} IS NULL
+            )
+            ORDER BY {self.order_tie_col} NULLS LAST
+            LIMIT {limit or self.batch_size}
+        """
+
+    def build_group_query(self, null_tie: bool = False) -> str:
+        """Every row of the window with one tie value (the lines of one invoice)"""
+        tie_sql = f"{self.order_tie_col} IS NULL" if null_tie else f"{self.order_tie_col} = %(cursor_id)s"
+        return f"""
+            SELECT * FROM {self.table_name}
+            WHERE ({self.where_sql})
+            AND {self.order_time_col} >= %(start_time)s
+            AND {self.order_time_col} < %(end_time)s
+            AND {tie_sql}
+        """
+
+    def _run(self, ch_conn, query: str, parameters: Dict[str, Any]) -> Tuple[Batch, float]:
+        started = time.perf_counter()
+        if self.fetch_format == "arrow":
+            batch = ch_conn.execute_query_arrow(query, parameters)
+        else:
+            batch = ch_conn.execute_query(query, parameters)
+        elapsed = time.perf_counter() - started
+        read_rows = query_read_rows(ch_conn)
+        with self._lock:
+            self.queries += 1
+            self.rows_read += read_rows or 0
+        return batch, elapsed
+
+    def _tie_values(self, batch: Batch) -> List[Any]:
+        if self.fetch_format == "arrow":
+            return batch.column(self.order_tie_col).to_pylist()
+        return [row[self.tie_index] for row in batch]
+
+    def _head(self, batch: Batch, num_rows: int) -> Batch:
+        if self.fetch_format == "arrow":
+            return batch.slice(0, num_rows)
+        return batch[:num_rows]
+
+    def fetch_window(self, ch_conn, start_time: datetime, end_time: datetime) -> Iterator[Batch]:
+        """
+        Yield the batches of one window (keyset pagination)
+
+        The tie column is not unique (an invoice's lines share its
+        invoice_number), so ``tie > cursor`` would skip the lines of the last
+        invoice that did not fit on a full page. The last tie value of a full
+        page is therefore cut off the page and read whole with one extra
+        query (the same key-group paging as peerdb_extraction.KeysetPaginator).
+
+        ``tie > cursor`` is NULL for NULL ties, so every page also matches the
+        NULL group; it sorts last and is read once, after the non-NULL keys.
+        Whether a cursor is set is a separate flag, so an empty-string tie
+        value pages like any other.
+        """
+        query = self.build_query()
+        limit = self.batch_size
+        cursor_id = ""
+        has_cursor = False
+        while True:
+            if self.batch_sizer:
+                limit = self.batch_sizer.next_size()
+                query = self.build_query(limit)
+            parameters = {
+                **self.where_parameters,
+                "start_time": start_time,
+                "end_time": end_time,
+                "has_cursor": int(has_cursor),
+                "cursor_id": cursor_id,
+            }
+            batch, elapsed = self._run(ch_conn, query, parameters)
+
+            num_rows = batch_num_rows(batch)
+            if self.batch_sizer and num_rows:
+                self.batch_sizer.observe(limit, num_rows, elapsed, batch_num_bytes(batch))
+            if not num_rows:
+                return
+            if num_rows < limit:
+                yield batch
+                return
+
+            # Full page: the last invoice may continue past it
+            tie_values = self._tie_values(batch)
+            last_value = tie_values[-1]
+            head_rows = num_rows
+            while head_rows and tie_values[head_rows - 1] == last_value:
+                head_rows -= 1
+            if head_rows:
+                yield self._head(batch, head_rows)
+
+            # NULL ties sort last and cannot be paged past: read them and stop
+            group, _ = self._run(
+                ch_conn,
+                self.build_group_query(null_tie=last_value is None),
+                {**parameters, "cursor_id": last_value},
+            )
+            if batch_num_rows(group):
+                yield group
+            if last_value is None:
+                return
+            cursor_id = last_value
+            has_cursor = True
+
+    def iter_batches(
+        self,
+        ch_conn,
+        windows: Sequence[Window],
+        mode: Optional[str] = None,
+        pool: Optional[ClickHouseClientPool] = None,
+        parallelism: Optional[int] = None,
+    ) -> Iterator[Batch]:
+        """
+        Yield the batches of all windows, in window order
+
+        Args:
+            ch_conn: Connection used in sequential mode
+            windows: Windows from build_windows()
+            mode: "sequential" or "parallel" (default: DLT_CLICKHOUSE_EXTRACTION_MODE)
+            pool: Client pool for parallel mode (required there)
+            parallelism: Windows fetched concurrently (default: DLT_CLICKHOUSE_PARALLEL_WINDOWS)
+        """
+        mode = (mode or EXTRACTION_MODE).lower()
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(
+                f"Unknown extraction mode '{mode}' (expected one of: {', '.join(EXTRACTION_MODES)})"
+            )
+
+        if mode == "sequential" or len(windows) <= 1:
+            for start_time, end_time in windows:
+                yield from self.fetch_window(ch_conn, start_time, end_time)
+            return
+
+        if pool is None:
+            raise ValueError("Parallel extraction requires a ClickHouseClientPool")
+        yield from self._iter_parallel(windows, pool, parallelism or PARALLEL_WINDOWS)
+
+    def _iter_parallel(
+        self, windows: Sequence[Window], pool: ClickHouseClientPool, parallelism: int
+    ) -> Iterator[Batch]:
+        parallelism = max(1, min(parallelism, pool.size, len(windows)))
+        print(
+            f"⚡ Parallel extraction: {len(windows)} windows, up to {parallelism} in flight"
+        )
+
+        def fetch(window: Window) -> List[Batch]:
+            with pool.connection() as conn:
+                return list(self.fetch_window(conn, *window))
+
+        pending_windows = iter(windows)
+        in_flight = deque()
+        executor = ThreadPoolExecutor(
+            max_workers=parallelism, thread_name_prefix="clickhouse-window"
+        )
+        try:
+            for window in pending_windows:
+                in_flight.append(executor.submit(fetch, window))
+                if len(in_flight) >= parallelism:
+                    break
+
+            # Yield the oldest window as soon as it is complete and refill the
+            # slot it frees, so at most `parallelism` windows are buffered
+            while in_flight:
+                batches = in_flight.popleft().result()
+                next_window = next(pending_windows, None)
+                if next_window is not None:
+                    in_flight.append(executor.submit(fetch, next_window))
+                yield from batches
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
@@ -31,8 +31,19 @@ Configuration:
     - DLT_PIPELINE_START_DAYS=99
     - DLT_PIPELINE_END_DAYS=60
 
+    Window extraction (see clickhouse_extraction.py):
+    - DLT_CLICKHOUSE_EXTRACTION_MODE=sequential   # or "parallel"
+    - DLT_CLICKHOUSE_PARALLEL_WINDOWS=4           # windows fetched concurrently
+    - DLT_CLICKHOUSE_FETCH_FORMAT=rows            # or "arrow" (pyarrow tables to dlt)
+    - DLT_CLICKHOUSE_DATE_STRATEGY=auto           # normalized date column/expression if present
+
+    DuckDB export (see duckdb_export.py):
+    - DLT_DUCKDB_EXPORT_MODE=full                 # or "incremental" (apply only changed loads)
+    - DLT_PARQUET_LAKE=false                      # also write Parquet partitioned by transaction date
+
 Output:
     - DuckDB: data/output/carrier_invoice_extraction.duckdb
+    - Parquet (DLT_PARQUET_LAKE=true): data/output/carrier_invoice_lake/transaction_date_parsed=YYYY-MM-DD/
 
 Author: Gabriel Jerdhy Lapuz
 Project: gsr_automation
@@ -44,7 +55,37 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List
 
 import dlt
-from dateutil import parser
+
+from clickhouse_client import ClickHouseClientPool, ClickHouseConnection, missing_env_vars
+from clickhouse_extraction import (
+    EXTRACTION_MODE,
+    PARALLEL_WINDOWS,
+    BatchPrefetcher,
+    WindowExtractor,
+    add_metadata_columns,
+    batch_num_rows,
+    describe_plan,
+    detect_date_filter,
+    plan_windows,
+    select_star_columns,
+)
+from date_normalization import (
+    normalize_date_array,
+    normalize_date_column,
+    normalize_date_value,
+    to_date_array,
+    to_date_column,
+)
+from duckdb_export import (
+    EXPORT_MODE,
+    EXPORT_STATE_TABLE,
+    EXPORT_TABLE,
+    PARQUET_LAKE,
+    PARSED_DATE_COLUMN,
+    PARQUET_LAKE_DIR,
+    export_window,
+    write_partitions,
+)
 
 # ============================================================================
 # CONFIGURATION: Date Window for Data Extraction
@@ -67,15 +108,6 @@ TRANSACTION_DATE_END_DAYS_AGO = int(os.getenv("DLT_PIPELINE_END_DAYS", "79"))
 
 # ============================================================================
 
-# ClickHouse imports with fallback handling
-try:
-    import clickhouse_connect
-
-    CLICKHOUSE_AVAILABLE = True
-except ImportError:
-    CLICKHOUSE_AVAILABLE = False
-    print("⚠️ clickhouse_connect not available")
-
 # DuckDB imports for querying
 try:
     import duckdb
@@ -95,114 +127,76 @@ def standardize_date_format(record, date_column):
         date_column (str): The name of the date column to standardize
     """
     if date_column in record and record[date_column]:
-        try:
-            # Handle various date formats and convert to YYYY-MM-DD
-            date_val = record[date_column]
-            if isinstance(date_val, str):
-                # Parse string dates and standardize
-                from dateutil import parser
-
-                parsed_date = parser.parse(date_val)
-                record[date_column] = parsed_date.strftime("%Y-%m-%d")
-            elif hasattr(date_val, "strftime"):
-                # Handle datetime/date objects
-                record[date_column] = date_val.strftime("%Y-%m-%d")
-        except Exception as e:
-            print(
-                f"⚠️ Date formatting warning for {date_column} '{record[date_column]}': {e}"
-            )
-            # Keep original value if parsing fails
+        # Keeps the original value if parsing fails (see date_normalization.py)
+        record[date_column] = normalize_date_value(record[date_column])
 
 
-class ClickHouseConnection:
-    """Manages ClickHouse connections for carrier invoice data extraction"""
-
-    def __init__(self, host, port, username, password, database, secure=True):
-        self.host = host
-        self.port = port
-        self.username = username
-        self.password = password
-        self.database = database
-        self.secure = secure
-        self.client = None
-        self.connected = False
-
-    def connect(self):
-        """Establish connection to ClickHouse with error handling"""
-        if not CLICKHOUSE_AVAILABLE:
-            print("⚠️ ClickHouse library not available")
-            return False
+def standardize_date_column(table, date_column):
+    """
+    Standardize a date column of a pyarrow Table to YYYY-MM-DD
 
-        try:
-            # Disable SSL warnings for ClickHouse Cloud connections
-            import urllib3
-
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-            self.client = clickhouse_connect.get_client(
-                host=self.host,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                database=self.database,
-                secure=self.secure,
-                connect_timeout=60,
-                send_receive_timeout=300,
-                verify=False,  # Disable SSL verification for Windows compatibility
-            )
+    Args:
+        table (pa.Table): Batch from the Arrow fetch path
+        date_column (str): The name of the date column to standardize
+    """
+    if date_column not in table.column_names:
+        return table
 
-            # Test connection
-            result = self.client.command("SELECT 1")
-            if result == 1:
-                self.connected = True
-                print(
-                    f"✅ Connected to ClickHouse: {self.host}:{self.port}/{self.database}"
-                )
-                return True
-            else:
-                print(f"❌ ClickHouse connection test failed")
-                return False
+    return table.set_column(
+        table.column_names.index(date_column),
+        date_column,
+        normalize_date_array(table.column(date_column)),
+    )
 
-        except Exception as e:
-            print(f"❌ ClickHouse connection failed: {type(e).__name__}: {str(e)}")
-            self.connected = False
-            return False
 
-    def execute_query(self, query, parameters=None):
-        """Execute query with error handling"""
-        if not self.connected:
-            raise ConnectionError("Not connected to ClickHouse")
+# Key date columns standardized to YYYY-MM-DD on extraction
+DATE_COLUMNS = ("invoice_date", "transaction_date")
+# Loaded as a typed DATE next to transaction_date, so the DuckDB export does
+# not re-parse the string on every run
+PARSED_DATE_SOURCE = "transaction_date"
 
-        try:
-            if parameters:
-                result = self.client.query(query, parameters=parameters)
-            else:
-                result = self.client.query(query)
-            return result.result_rows
-        except Exception as e:
-            print(f"❌ Query execution failed: {e}")
-            raise
 
-    def get_table_schema(self, table_name):
-        """Get table schema information"""
-        if not self.connected:
-            return []
-
-        try:
-            schema_query = f"""
-            SELECT
-                name,
-                type,
-                default_kind,
-                default_expression
-            FROM system.columns
-            WHERE database = '{self.database}' AND table = '{table_name}'
-            ORDER BY position
-            """
-            return self.execute_query(schema_query)
-        except Exception as e:
-            print(f"❌ Failed to get schema for table {table_name}: {e}")
-            return []
+def rows_to_records(rows, column_names, table_name):
+    """Turn a batch of row tuples into dict records with standardized dates"""
+    # Dates are normalized column by column (each distinct value once)
+    date_columns = [
+        (column_names.index(name), name) for name in DATE_COLUMNS if name in column_names
+    ]
+    normalized = {
+        name: normalize_date_column([row[index] for row in rows])
+        for index, name in date_columns
+    }
+    parsed_dates = None
+    if PARSED_DATE_SOURCE in normalized:
+        parsed_dates = to_date_column(normalized[PARSED_DATE_SOURCE])
+
+    batch = []
+    for position, row in enumerate(rows):
+        record = dict(zip(column_names, row))
+        for _, name in date_columns:
+            record[name] = normalized[name][position]
+        if parsed_dates is not None:
+            record[PARSED_DATE_COLUMN] = parsed_dates[position]
+
+        record["_extracted_at"] = datetime.now()
+        record["_source_table"] = table_name
+        batch.append(record)
+    return batch
+
+
+def arrow_to_batch(table, table_name):
+    """Standardize the date columns of an Arrow batch and add metadata columns"""
+    for date_column in DATE_COLUMNS:
+        table = standardize_date_column(table, date_column)
+    if PARSED_DATE_SOURCE in table.column_names:
+        parsed = to_date_array(table.column(PARSED_DATE_SOURCE))
+        if PARSED_DATE_COLUMN in table.column_names:
+            table = table.set_column(
+                table.column_names.index(PARSED_DATE_COLUMN), PARSED_DATE_COLUMN, parsed
+            )
+        else:
+            table = table.append_column(PARSED_DATE_COLUMN, parsed)
+    return add_metadata_columns(table, table_name)
 
 
 def clickhouse_carrier_invoice_source():
@@ -219,23 +213,10 @@ def clickhouse_carrier_invoice_source():
     table_name = "carrier_carrier_invoice_original_flat_ups"
 
     # Create connection with environment variables
-    ch_conn = ClickHouseConnection(
-        host=os.getenv("CLICKHOUSE_HOST"),
-        port=int(os.getenv("CLICKHOUSE_PORT", "8443")),
-        username=os.getenv("CLICKHOUSE_USERNAME"),
-        password=os.getenv("CLICKHOUSE_PASSWORD"),
-        database=os.getenv("CLICKHOUSE_DATABASE"),
-        secure=os.getenv("CLICKHOUSE_SECURE", "true").lower() == "true",
-    )
+    ch_conn = ClickHouseConnection.from_env()
 
     # Validate required environment variables
-    required_vars = [
-        "CLICKHOUSE_HOST",
-        "CLICKHOUSE_USERNAME",
-        "CLICKHOUSE_PASSWORD",
-        "CLICKHOUSE_DATABASE",
-    ]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    missing_vars = missing_env_vars()
     if missing_vars:
         raise ValueError(
             f"Missing required environment variables: {', '.join(missing_vars)}. Please check your .env file."
@@ -319,7 +300,34 @@ def create_carrier_invoice_resource(ch_conn, table_name):
                     "♻️ Force full-load mode enabled. Incremental cursor will be bypassed."
                 )
 
-            if (not FORCE_FULL) and timestamp_columns and updated_at.last_value:
+            # Window configuration (seconds). Default: 1 hour
+            WINDOW_SECONDS = int(os.getenv("DLT_CLICKHOUSE_WINDOW_SECONDS", "3600"))
+
+            # Date range for transaction_date using centralized configuration
+            start_target_date = (
+                datetime.utcnow() - timedelta(days=TRANSACTION_DATE_START_DAYS_AGO)
+            ).date()
+            end_target_date = (
+                datetime.utcnow() - timedelta(days=TRANSACTION_DATE_END_DAYS_AGO)
+            ).date()
+
+            # Handle both date formats: M/D/YYYY and YYYY-MM-DD
+            # Convert to YYYY-MM-DD for comparison
+            start_date_str = start_target_date.strftime("%Y-%m-%d")
+            end_date_str = end_target_date.strftime("%Y-%m-%d")
+            date_parameters = {
+                "start_date_str": start_date_str,
+                "end_date_str": end_date_str,
+            }
+            # Normalized date column / indexed expression when the table has
+            # one (ClickHouse can prune), else the parse-every-row predicate
+            date_filter = detect_date_filter(ch_conn, table_name, schema)
+            print(f"🗓️ transaction_date filter: {date_filter.strategy} ({date_filter.target})")
+
+            incremental = bool(
+                (not FORCE_FULL) and timestamp_columns and updated_at.last_value
+            )
+            if incremental:
                 # Incremental load using time-windowed, keyset pagination to avoid large sorts
                 timestamp_col = timestamp_columns[0]
                 print(
@@ -327,242 +335,92 @@ def create_carrier_invoice_resource(ch_conn, table_name):
                 )
                 print(f"📅 Using timestamp column: {timestamp_col}")
 
-                # Window configuration (seconds). Default: 1 hour
-                WINDOW_SECONDS = int(os.getenv("DLT_CLICKHOUSE_WINDOW_SECONDS", "3600"))
-                # Date range for transaction_date using centralized configuration
-                start_target_date = (
-                    datetime.utcnow() - timedelta(days=TRANSACTION_DATE_START_DAYS_AGO)
-                ).date()
-                end_target_date = (
-                    datetime.utcnow() - timedelta(days=TRANSACTION_DATE_END_DAYS_AGO)
-                ).date()
                 cutoff_time = datetime.utcnow() - timedelta(
                     days=TRANSACTION_DATE_START_DAYS_AGO
                 )
-
-                # Get upper bound for this run (respecting transaction_date range)
-                # Handle both date formats: M/D/YYYY and YYYY-MM-DD
-                # Convert to YYYY-MM-DD for comparison
-                start_date_str = start_target_date.strftime("%Y-%m-%d")
-                end_date_str = end_target_date.strftime("%Y-%m-%d")
-
-                max_time_rows = ch_conn.execute_query(
-                    f"""
-                    SELECT max({order_time_col}) FROM {table_name}
-                    WHERE (
-                        -- Match YYYY-MM-DD format
-                        (transaction_date >= %(start_date_str)s AND transaction_date <= %(end_date_str)s)
-                        OR
-                        -- Match M/D/YYYY format by converting to date
-                        (parseDateTimeBestEffortOrNull(transaction_date) >= toDate(%(start_date_str)s)
-                         AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate(%(end_date_str)s))
-                    )
-                    """,
-                    {
-                        "start_date_str": start_date_str,
-                        "end_date_str": end_date_str,
-                    },
-                )
-                max_time = (
-                    max_time_rows[0][0] if max_time_rows and max_time_rows[0] else None
-                )
-
                 # Start no earlier than the cutoff window to avoid scanning old ranges
-                start_time = updated_at.last_value
-                if start_time < cutoff_time:
-                    start_time = cutoff_time
-                while max_time and start_time <= max_time:
-                    end_time = start_time + timedelta(seconds=WINDOW_SECONDS)
-                    cursor_id = ""
-
-                    while True:
-                        query = f"""
-                            SELECT * FROM {table_name}
-                            WHERE (
-                                -- Match YYYY-MM-DD format
-                                (transaction_date >= %(start_date_str)s AND transaction_date <= %(end_date_str)s)
-                                OR
-                                -- Match M/D/YYYY format by converting to date
-                                (parseDateTimeBestEffortOrNull(transaction_date) >= toDate(%(start_date_str)s)
-                                 AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate(%(end_date_str)s))
-                            )
-                            AND {order_time_col} >= %(start_time)s
-                            AND {order_time_col} < %(end_time)s
-                            AND ( %(cursor_id)s = '' OR {order_tie_col} > %(cursor_id)s )
-                            ORDER BY {order_tie_col}
-                            LIMIT {BATCH_SIZE}
-                        """
-                        parameters = {
-                            "start_date_str": start_date_str,
-                            "end_date_str": end_date_str,
-                            "start_time": start_time,
-                            "end_time": end_time,
-                            "cursor_id": cursor_id,
-                        }
-                        rows = ch_conn.execute_query(query, parameters)
-                        if not rows:
-                            break
-
-                        column_names = (
-                            [col[0] for col in schema]
-                            if schema
-                            else [f"col_{i}" for i in range(len(rows[0]))]
-                        )
-
-                        batch = []
-                        for row in rows:
-                            record = dict(zip(column_names, row))
-
-                            # Standardize date formats to YYYY-MM-DD
-                            # Key date columns: invoice_date, transaction_date
-                            standardize_date_format(record, "invoice_date")
-                            standardize_date_format(record, "transaction_date")
-
-                            record["_extracted_at"] = datetime.now()
-                            record["_source_table"] = table_name
-                            batch.append(record)
-
-                        total_extracted += len(batch)
-                        print(
-                            f"✅ Extracted batch: {len(batch)} rows (total: {total_extracted:,})"
-                        )
-                        yield batch
-
-                        cursor_id = batch[-1].get(order_tie_col, "")
-
-                    start_time = end_time
-
-                if total_extracted == 0:
-                    print(f"ℹ️ No new data in {table_name}")
-                    yield []
+                start_time = max(updated_at.last_value, cutoff_time)
             else:
                 # Full load: time-windowed, keyset pagination across the entire table
                 print(f"📥 Full load from {table_name} (no LIMIT; batching enabled)")
+                start_time = None
+
+            # One aggregate query for the bounds and rows per window
+            # (respecting transaction_date range); empty windows are skipped
+            plan = plan_windows(
+                ch_conn,
+                table_name,
+                date_filter,
+                date_parameters,
+                WINDOW_SECONDS,
+                BATCH_SIZE,
+                start_time=start_time,
+                order_time_col=order_time_col,
+            )
+            print(describe_plan(plan, WINDOW_SECONDS))
+            windows = plan.windows
+            column_names = select_star_columns(schema)
+            extractor = WindowExtractor(
+                table_name,
+                column_names,
+                date_filter.sql,
+                date_parameters,
+                BATCH_SIZE,
+                order_time_col=order_time_col,
+                order_tie_col=order_tie_col,
+            )
 
-                WINDOW_SECONDS = int(os.getenv("DLT_CLICKHOUSE_WINDOW_SECONDS", "3600"))
-
-                # Determine bounds limited by transaction_date range using centralized configuration
-                start_target_date = (
-                    datetime.utcnow() - timedelta(days=TRANSACTION_DATE_START_DAYS_AGO)
-                ).date()
-                end_target_date = (
-                    datetime.utcnow() - timedelta(days=TRANSACTION_DATE_END_DAYS_AGO)
-                ).date()
-
-                # Handle both date formats: M/D/YYYY and YYYY-MM-DD
-                start_date_str = start_target_date.strftime("%Y-%m-%d")
-                end_date_str = end_target_date.strftime("%Y-%m-%d")
-
-                min_time_rows = ch_conn.execute_query(
-                    f"""
-                    SELECT min({order_time_col}) FROM {table_name}
-                    WHERE (
-                        -- Match YYYY-MM-DD format
-                        (transaction_date >= %(start_date_str)s AND transaction_date <= %(end_date_str)s)
-                        OR
-                        -- Match M/D/YYYY format by converting to date
-                        (parseDateTimeBestEffortOrNull(transaction_date) >= toDate(%(start_date_str)s)
-                         AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate(%(end_date_str)s))
-                    )
-                    """,
-                    {
-                        "start_date_str": start_date_str,
-                        "end_date_str": end_date_str,
-                    },
-                )
-                max_time_rows = ch_conn.execute_query(
-                    f"""
-                    SELECT max({order_time_col}) FROM {table_name}
-                    WHERE (
-                        -- Match YYYY-MM-DD format
-                        (transaction_date >= %(start_date_str)s AND transaction_date <= %(end_date_str)s)
-                        OR
-                        -- Match M/D/YYYY format by converting to date
-                        (parseDateTimeBestEffortOrNull(transaction_date) >= toDate(%(start_date_str)s)
-                         AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate(%(end_date_str)s))
-                    )
-                    """,
-                    {
-                        "start_date_str": start_date_str,
-                        "end_date_str": end_date_str,
-                    },
+            parallel = EXTRACTION_MODE == "parallel" and len(windows) > 1
+            with ClickHouseClientPool(
+                ch_conn.clone,
+                size=PARALLEL_WINDOWS if parallel else 1,
+                primary=ch_conn,
+            ) as pool:
+
+                def to_batch(rows):
+                    if extractor.fetch_format == "arrow":
+                        # Arrow tables go to dlt as-is (no per-row Python objects)
+                        return arrow_to_batch(rows, table_name)
+                    return rows_to_records(rows, column_names, table_name)
+
+                # Fetch + convert run ahead of dlt when prefetching is enabled
+                prefetcher = BatchPrefetcher(
+                    to_batch(rows)
+                    for rows in extractor.iter_batches(ch_conn, windows, pool=pool)
                 )
-                min_time = (
-                    min_time_rows[0][0] if min_time_rows and min_time_rows[0] else None
+                with prefetcher:
+                    for batch in prefetcher:
+                        batch_rows = batch_num_rows(batch)
+                        total_extracted += batch_rows
+                        print(
+                            f"✅ Extracted batch: {batch_rows} rows (total: {total_extracted:,})"
+                        )
+                        yield batch
+
+            print(
+                f"📊 {len(windows)} windows, {extractor.queries} batch queries "
+                f"({EXTRACTION_MODE} extraction, {extractor.fetch_format} format)"
+            )
+            if extractor.batch_sizer:
+                print(extractor.batch_sizer.summary())
+            if prefetcher.depth:
+                print(prefetcher.summary())
+            print(
+                f"🔎 Rows scanned by ClickHouse ({date_filter.strategy} date filter): "
+                f"plan {plan.rows_read or 0:,}, batches "
+                + (
+                    f"{extractor.rows_read:,}"
+                    if extractor.fetch_format == "rows"
+                    else "n/a (not reported for Arrow)"
                 )
-                max_time = (
-                    max_time_rows[0][0] if max_time_rows and max_time_rows[0] else None
+            )
+            if total_extracted == 0:
+                print(
+                    f"ℹ️ No new data in {table_name}"
+                    if incremental
+                    else f"ℹ️ No data found in {table_name}"
                 )
-
-                if not (min_time and max_time):
-                    print(f"ℹ️ No data found in {table_name}")
-                    yield []
-                else:
-                    start_time = min_time
-                    while start_time <= max_time:
-                        end_time = start_time + timedelta(seconds=WINDOW_SECONDS)
-                        cursor_id = ""
-
-                        while True:
-                            query = f"""
-                                SELECT * FROM {table_name}
-                                WHERE (
-                                    -- Match YYYY-MM-DD format
-                                    (transaction_date >= %(start_date_str)s AND transaction_date <= %(end_date_str)s)
-                                    OR
-                                    -- Match M/D/YYYY format by converting to date
-                                    (parseDateTimeBestEffortOrNull(transaction_date) >= toDate(%(start_date_str)s)
-                                     AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate(%(end_date_str)s))
-                                )
-                                AND {order_time_col} >= %(start_time)s
-                                AND {order_time_col} < %(end_time)s
-                                AND ( %(cursor_id)s = '' OR {order_tie_col} > %(cursor_id)s )
-                                ORDER BY {order_tie_col}
-                                LIMIT {BATCH_SIZE}
-                            """
-                            parameters = {
-                                "start_date_str": start_date_str,
-                                "end_date_str": end_date_str,
-                                "start_time": start_time,
-                                "end_time": end_time,
-                                "cursor_id": cursor_id,
-                            }
-                            rows = ch_conn.execute_query(query, parameters)
-                            if not rows:
-                                break
-
-                            column_names = (
-                                [col[0] for col in schema]
-                                if schema
-                                else [f"col_{i}" for i in range(len(rows[0]))]
-                            )
-
-                            batch = []
-                            for row in rows:
-                                record = dict(zip(column_names, row))
-
-                                # Standardize date formats to YYYY-MM-DD
-                                # Key date columns: invoice_date, transaction_date
-                                standardize_date_format(record, "invoice_date")
-                                standardize_date_format(record, "transaction_date")
-
-                                record["_extracted_at"] = datetime.now()
-                                record["_source_table"] = table_name
-                                batch.append(record)
-
-                            total_extracted += len(batch)
-                            print(
-                                f"✅ Extracted batch: {len(batch)} rows (total: {total_extracted:,})"
-                            )
-                            yield batch
-
-                            cursor_id = batch[-1].get(order_tie_col, "")
-
-                        start_time = end_time
-
-                    if total_extracted == 0:
-                        print(f"ℹ️ No data found in {table_name}")
-                        yield []
+                yield []
 
         except Exception as e:
             print(f"❌ Failed to extract from {table_name}: {e}")
@@ -599,6 +457,10 @@ def run_carrier_invoice_extraction(destination="duckdb", pipeline_name_suffix=""
         f"🎯 Target transaction date range: {start_target_date} to {end_target_date} ({TRANSACTION_DATE_START_DAYS_AGO}-{TRANSACTION_DATE_END_DAYS_AGO} days ago)"
     )
 
+    # Incremental exports need the load id on every row, Arrow loads included
+    if EXPORT_MODE == "incremental":
+        os.environ.setdefault("NORMALIZE__PARQUET_NORMALIZER__ADD_DLT_LOAD_ID", "true")
+
     # Create pipeline with optional suffix to avoid file locks
     pipeline_name = "carrier_invoice_extraction" + pipeline_name_suffix
     pipeline = dlt.pipeline(
@@ -659,10 +521,6 @@ def run_carrier_invoice_extraction(destination="duckdb", pipeline_name_suffix=""
             # Force close any DLT connections to avoid file locking
             if hasattr(pipeline, "_sql_job_client") and pipeline._sql_job_client:
                 pipeline._sql_job_client.close()
-            # Add a small delay to ensure file handles are released
-            import time
-
-            time.sleep(1)
         except Exception:
             pass  # Ignore errors during connection cleanup
 
@@ -696,18 +554,22 @@ def run_carrier_invoice_extraction(destination="duckdb", pipeline_name_suffix=""
         return None
 
 
-def export_to_duckdb(pipeline):
+def export_to_duckdb(pipeline, export_mode=None):
     """
     Export the extracted carrier invoice data to a single DuckDB file.
     This is the sole output format for all pipeline runs.
 
-    Creates a complete copy of the main DuckDB database with fixed filename:
-    carrier_invoice_extraction.duckdb (replaces existing file each run)
+    Writes the rows of the target transaction_date window to the fixed file
+    data/output/carrier_invoice_extraction.duckdb. With
+    DLT_DUCKDB_EXPORT_MODE=incremental only the rows changed since the last
+    export are applied (see duckdb_export.py); "full" rebuilds the table.
 
     Args:
         pipeline: The DLT pipeline object
+        export_mode: "full" or "incremental" (default DLT_DUCKDB_EXPORT_MODE)
     """
     import os
+    import time
     from datetime import datetime, timedelta
 
     print("\n📤 Exporting data to DuckDB (sole output format)...")
@@ -728,7 +590,6 @@ def export_to_duckdb(pipeline):
         print(f"📁 Source: {source_duckdb_path}")
         print(f"📁 Target: {duckdb_path}")
 
-        # Create a new DuckDB file with only records matching the exact target date
         if os.path.exists(source_duckdb_path):
             import duckdb
 
@@ -743,96 +604,96 @@ def export_to_duckdb(pipeline):
                 f"🎯 Filtering for transaction_date range: {start_date_str} to {end_date_str}"
             )
 
-            # Use a separate DuckDB connection to avoid file locking issues
-            # Create new database and copy only matching records
+            # One connection for the export and the statistics
             target_conn = duckdb.connect(duckdb_path)
-
-            # Copy the schema and data with transaction date range filtering using ATTACH
             try:
-                target_conn.execute(f"ATTACH '{source_duckdb_path}' AS source_db")
-
-                # Handle multiple date formats in transaction_date column:
-                # - YYYY-MM-DD (ISO format)
-                # - M/D/YYYY or MM/DD/YYYY (US format with or without leading zeros)
-                # Use COALESCE with TRY_STRPTIME to try multiple formats
-                # Use CREATE OR REPLACE to handle existing table
-                target_conn.execute(
-                    f"""
-                    CREATE OR REPLACE TABLE carrier_invoice_data AS
-                    SELECT * FROM source_db.carrier_invoice_data.carrier_invoice_data
-                    WHERE (
-                        -- Try parsing with multiple formats using COALESCE
-                        -- COALESCE returns the first non-NULL value
-                        COALESCE(
-                            TRY_STRPTIME(transaction_date, '%Y-%m-%d'),  -- YYYY-MM-DD
-                            TRY_STRPTIME(transaction_date, '%m/%d/%Y'),  -- MM/DD/YYYY
-                            TRY_STRPTIME(transaction_date, '%-m/%-d/%Y')   -- M/D/YYYY (single digit)
-                        ) BETWEEN CAST('{start_date_str}' AS DATE) AND CAST('{end_date_str}' AS DATE)
-                    )
-                """
-                )
-
-                target_conn.execute("DETACH source_db")
-
-            except Exception as e:
-                print(f"❌ Error during database copy: {e}")
-                # Fallback: drop and create empty table with same structure
-                target_conn.execute("DROP TABLE IF EXISTS carrier_invoice_data")
-                target_conn.execute(
-                    """
-                    CREATE TABLE carrier_invoice_data (
-                        version VARCHAR, recipient_number VARCHAR, account_number VARCHAR,
-                        account_country_territory VARCHAR, invoice_date VARCHAR,
-                        tracking_number VARCHAR
+                try:
+                    started = time.perf_counter()
+                    result = export_window(
+                        target_conn,
+                        source_duckdb_path,
+                        start_date_str,
+                        end_date_str,
+                        export_mode,
                     )
-                """
-                )
-            finally:
-                target_conn.close()
-
-            # Get file size for reporting
-            file_size = os.path.getsize(duckdb_path)
-            file_size_mb = file_size / (1024 * 1024)
-
-            print(f"✅ DuckDB export completed successfully!")
-            print(f"📁 File saved: {duckdb_path}")
-            print(f"📊 File size: {file_size_mb:.1f} MB")
-
-            # Query the exported database to show statistics
-            try:
-                import duckdb
-
-                stats_conn = duckdb.connect(duckdb_path)
-
-                # Get row count
-                count_result = stats_conn.execute(
-                    "SELECT COUNT(*) FROM carrier_invoice_data"
-                ).fetchone()
-                total_rows = count_result[0] if count_result else 0
-
-                # Get transaction date range
-                date_range_result = stats_conn.execute(
-                    "SELECT MIN(transaction_date), MAX(transaction_date) FROM carrier_invoice_data WHERE transaction_date IS NOT NULL"
-                ).fetchone()
-                if date_range_result and date_range_result[0]:
-                    min_date, max_date = date_range_result
-                    print(f"📅 Transaction date range: {min_date} to {max_date}")
-
-                # Get tracking number statistics
-                tracking_result = stats_conn.execute(
-                    "SELECT COUNT(*), COUNT(DISTINCT tracking_number) FROM carrier_invoice_data WHERE tracking_number IS NOT NULL AND tracking_number != ''"
-                ).fetchone()
-                if tracking_result:
-                    total_tracking, unique_tracking = tracking_result
                     print(
-                        f"📦 Tracking numbers: {total_tracking:,} total, {unique_tracking:,} unique"
+                        f"🔄 {result['mode'].capitalize()} export: "
+                        f"{result['inserted']:,} rows inserted, {result['deleted']:,} rows deleted "
+                        f"in {time.perf_counter() - started:.2f}s"
                     )
+                except Exception as e:
+                    print(f"❌ Error during database copy: {e}")
+                    # Fallback: drop and create empty table with same structure
+                    target_conn.execute("DROP TABLE IF EXISTS carrier_invoice_data")
+                    target_conn.execute(
+                        """
+                        CREATE TABLE carrier_invoice_data (
+                            version VARCHAR, recipient_number VARCHAR, account_number VARCHAR,
+                            account_country_territory VARCHAR, invoice_date VARCHAR,
+                            tracking_number VARCHAR, transaction_date VARCHAR,
+                            transaction_date_parsed DATE
+                        )
+                    """
+                    )
+                    target_conn.execute(f"DROP TABLE IF EXISTS {EXPORT_STATE_TABLE}")
+                    result = None
+                target_conn.execute("CHECKPOINT")
+
+                # Rewrite only the Parquet partitions of the dates that changed
+                if PARQUET_LAKE and result:
+                    try:
+                        started = time.perf_counter()
+                        lake = write_partitions(
+                            target_conn, EXPORT_TABLE, PARQUET_LAKE_DIR, result["dates"]
+                        )
+                        print(
+                            f"🗂️ Parquet lake: {lake['written']} partitions written, "
+                            f"{lake['removed']} removed in {time.perf_counter() - started:.2f}s "
+                            f"({PARQUET_LAKE_DIR})"
+                        )
+                    except Exception as e:
+                        print(f"⚠️ Parquet lake export failed: {e}")
+
+                # Get file size for reporting
+                file_size = os.path.getsize(duckdb_path)
+                file_size_mb = file_size / (1024 * 1024)
+
+                print(f"✅ DuckDB export completed successfully!")
+                print(f"📁 File saved: {duckdb_path}")
+                print(f"📊 File size: {file_size_mb:.1f} MB")
+
+                # Query the exported database to show statistics
+                try:
+                    # Get row count
+                    count_result = target_conn.execute(
+                        "SELECT COUNT(*) FROM carrier_invoice_data"
+                    ).fetchone()
+                    total_rows = count_result[0] if count_result else 0
+
+                    # Get transaction date range
+                    date_range_result = target_conn.execute(
+                        "SELECT MIN(transaction_date_parsed), MAX(transaction_date_parsed) FROM carrier_invoice_data"
+                    ).fetchone()
+                    if date_range_result and date_range_result[0]:
+                        min_date, max_date = date_range_result
+                        print(f"📅 Transaction date range: {min_date} to {max_date}")
+
+                    # Get tracking number statistics
+                    tracking_result = target_conn.execute(
+                        "SELECT COUNT(*), COUNT(DISTINCT tracking_number) FROM carrier_invoice_data WHERE tracking_number IS NOT NULL AND tracking_number != ''"
+                    ).fetchone()
+                    if tracking_result:
+                        total_tracking, unique_tracking = tracking_result
+                        print(
+                            f"📦 Tracking numbers: {total_tracking:,} total, {unique_tracking:,} unique"
+                        )
 
-                print(f"📊 Total records: {total_rows:,}")
-                stats_conn.close()
+                    print(f"📊 Total records: {total_rows:,}")
 
-            except Exception as e:
-                print(f"⚠️ Could not query statistics: {e}")
+                except Exception as e:
+                    print(f"⚠️ Could not query statistics: {e}")
+            finally:
+                target_conn.close()
         else:
             print(f"❌ Source DuckDB file not found: {source_duckdb_path}")
 
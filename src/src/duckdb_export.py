@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Carrier Invoice DuckDB Export
+=============================
+
+Keeps data/output/carrier_invoice_extraction.duckdb in sync with the dlt
+DuckDB store for the current transaction_date window.
+
+Export modes (DLT_DUCKDB_EXPORT_MODE):
+- full: rebuild the output table from the dlt store on every run
+  (CREATE OR REPLACE TABLE ... AS SELECT, the previous behaviour).
+- incremental: keep the output table and only apply what changed since the
+  last export:
+    * rows of dlt loads newer than the last exported load are inserted
+    * rows of loads that no longer exist in the dlt store (replace runs) and
+      rows that fell out of the date window are deleted
+    * for a merge table (DLT_WRITE_DISPOSITION=merge), rows whose primary or
+      merge key appears in a newer load are deleted first, as dlt's
+      delete-insert/upsert merge replaced them in the store
+    * rows of older loads are inserted only for the dates the window newly
+      covers
+  so the work scales with the daily delta instead of the window size.
+
+Every export materializes transaction_date as a typed DATE column,
+transaction_date_parsed, and writes rows sorted by (transaction_date_parsed,
+tracking_number). The pipeline fills that column when it normalizes rows on
+extraction, so the export copies it; the VARCHAR is only parsed for rows
+loaded before the column existed. Date window lookups (ups_label_only_filter.py) then compare
+a DATE instead of re-parsing the VARCHAR, and DuckDB skips row groups whose
+min/max (zone map) lies outside the window.
+
+The last exported load id and window are kept in the _export_state table of
+the output file. An incremental export falls back to a full rebuild when there
+is no previous state, the output columns differ from the dlt table (schema
+evolution), the dlt table has no _dlt_load_id column (Arrow loads need
+NORMALIZE__PARQUET_NORMALIZER__ADD_DLT_LOAD_ID=true), or its write
+disposition cannot be applied row by row: the disposition and keys are read
+from the newest dlt schema stored with the table, and only append, replace and
+merge with the delete-insert or upsert strategy are exported incrementally
+(scd2 and unknown dispositions are always rebuilt).
+
+The output stays a standalone DuckDB file: ups_label_only_filter.py and
+gcs_upload.py open or upload it without access to the dlt store.
+
+Parquet lake (DLT_PARQUET_LAKE=true): the export is also written as
+Hive-partitioned Parquet, one directory per day,
+    <lake>/transaction_date_parsed=YYYY-MM-DD/data_0.parquet
+ZSTD-compressed, with DuckDB's per-row-group min/max statistics. Only the
+partitions of the dates an export changed are rewritten (every date of the
+window for a full export); partitions outside the window are kept, so the
+lake accumulates history. Readers prune partitions by path:
+    SELECT ... FROM read_parquet('<lake>/*/*.parquet', hive_partitioning = true)
+    WHERE transaction_date_parsed BETWEEN ...
+
+Configuration (environment variables):
+    DLT_DUCKDB_EXPORT_MODE=full
+    DLT_PARQUET_LAKE=false
+    DLT_PARQUET_LAKE_DIR=data/output/carrier_invoice_lake
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import json
+import os
+import shutil
+import uuid
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+EXPORT_MODES = ("full", "incremental")
+EXPORT_MODE = os.getenv("DLT_DUCKDB_EXPORT_MODE", "full").lower()
+
+PARQUET_LAKE = os.getenv("DLT_PARQUET_LAKE", "false").lower() in ("1", "true", "yes")
+PARQUET_LAKE_DIR = os.getenv("DLT_PARQUET_LAKE_DIR", "data/output/carrier_invoice_lake")
+PARQUET_COMPRESSION = "zstd"
+
+EXPORT_TABLE = "carrier_invoice_data"
+EXPORT_STATE_TABLE = "_export_state"
+SOURCE_ALIAS = "source_db"
+SOURCE_TABLE = f"{SOURCE_ALIAS}.carrier_invoice_data.carrier_invoice_data"
+SOURCE_VERSION_TABLE = f"{SOURCE_ALIAS}.carrier_invoice_data._dlt_version"
+LOAD_ID_COLUMN = "_dlt_load_id"
+PARSED_DATE_COLUMN = "transaction_date_parsed"
+SORT_ORDER = f"{PARSED_DATE_COLUMN}, tracking_number"
+
+# transaction_date is YYYY-MM-DD since rows are normalized on extraction; the
+# US formats are still accepted for rows loaded before that
+TRANSACTION_DATE_SQL = """COALESCE(
+    TRY_STRPTIME(transaction_date, '%Y-%m-%d'),
+    TRY_STRPTIME(transaction_date, '%m/%d/%Y'),
+    TRY_STRPTIME(transaction_date, '%-m/%-d/%Y')
+)::DATE"""
+
+
+def resolve_export_mode(export_mode: Optional[str] = None) -> str:
+    """Validated export mode (argument, else DLT_DUCKDB_EXPORT_MODE)"""
+    export_mode = (export_mode or EXPORT_MODE).lower()
+    if export_mode not in EXPORT_MODES:
+        raise ValueError(
+            f"Unknown DuckDB export mode '{export_mode}' (expected one of {EXPORT_MODES})"
+        )
+    return export_mode
+
+
+def date_filter_sql(conn, table_name: str = EXPORT_TABLE) -> str:
+    """
+    SQL for the transaction date of a table's rows (name may be qualified)
+
+    The typed transaction_date_parsed column when the table has it (exports
+    since it was added), else the string parsing expression.
+    """
+    columns = [row[0] for row in conn.execute(f"DESCRIBE {table_name}").fetchall()]
+    if PARSED_DATE_COLUMN in columns:
+        return PARSED_DATE_COLUMN
+    return TRANSACTION_DATE_SQL
+
+
+def _source_date_sql(source_columns: List[str]) -> str:
+    """Transaction date of dlt rows: typed on extraction, else parsed"""
+    if PARSED_DATE_COLUMN in source_columns:
+        # NULL for rows loaded before the column was filled on extraction
+        return f"COALESCE({PARSED_DATE_COLUMN}, {TRANSACTION_DATE_SQL})"
+    return TRANSACTION_DATE_SQL
+
+
+def _select_sql(source_columns: List[str]) -> str:
+    """SELECT list of the dlt table plus the parsed date as the last column"""
+    if PARSED_DATE_COLUMN in source_columns:
+        return f"* REPLACE ({_source_date_sql(source_columns)} AS {PARSED_DATE_COLUMN})"
+    return f"*, {TRANSACTION_DATE_SQL} AS {PARSED_DATE_COLUMN}"
+
+
+def export_columns(source_columns: List[str]) -> List[str]:
+    """Columns of the output table for the given dlt table columns"""
+    if PARSED_DATE_COLUMN in source_columns:
+        return list(source_columns)
+    return list(source_columns) + [PARSED_DATE_COLUMN]
+
+
+def _window_dates(start_date: str, end_date: str) -> List[date]:
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _columns(conn, database: str, schema: str, table: str) -> List[str]:
+    rows = conn.execute(
+        """
+        SELECT column_name FROM duckdb_columns()
+        WHERE database_name = ? AND schema_name = ? AND table_name = ?
+        ORDER BY column_index
+        """,
+        [database, schema, table],
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def read_table_hints(conn) -> Optional[Dict]:
+    """
+    Write disposition and key columns of the attached dlt table, or None
+
+    Read from the newest dlt schema stored in the _dlt_version table that
+    describes carrier_invoice_data.
+
+    Returns:
+        {"write_disposition": ..., "merge_strategy": ..., "keys": [[columns], ...]}
+        where keys holds the primary key and the merge key (when set)
+    """
+    if not _columns(conn, SOURCE_ALIAS, "carrier_invoice_data", "_dlt_version"):
+        return None
+    for (schema_json,) in conn.execute(
+        f"SELECT schema FROM {SOURCE_VERSION_TABLE} ORDER BY inserted_at DESC"
+    ).fetchall():
+        table = json.loads(schema_json).get("tables", {}).get(EXPORT_TABLE)
+        if table is None:
+            continue
+        columns = table.get("columns", {})
+        keys = [
+            [name for name, column in columns.items() if column.get(hint)]
+            for hint in ("primary_key", "merge_key")
+        ]
+        return {
+            "write_disposition": table.get("write_disposition", "append"),
+            "merge_strategy": table.get("x-merge-strategy", "delete-insert"),
+            "keys": [key for key in keys if key],
+        }
+    return None
+
+
+def _incremental_blocker(hints: Optional[Dict]) -> Optional[str]:
+    """Why rows of new loads cannot simply be applied, or None"""
+    if hints is None:
+        return "no dlt schema for the table"
+    if hints["write_disposition"] in ("append", "replace"):
+        return None
+    if hints["write_disposition"] == "merge":
+        if hints["merge_strategy"] in ("delete-insert", "upsert"):
+            return None
+        return f"merge strategy {hints['merge_strategy']}"
+    return f"write disposition {hints['write_disposition']}"
+
+
+def read_export_state(conn) -> Optional[Dict]:
+    """Last export state of the output file, or None"""
+    exists = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = current_database() "
+        "AND schema_name = 'main' AND table_name = ?",
+        [EXPORT_STATE_TABLE],
+    ).fetchone()[0]
+    if not exists:
+        return None
+    row = conn.execute(
+        f"SELECT last_load_id, start_date, end_date FROM {EXPORT_STATE_TABLE}"
+    ).fetchone()
+    if not row:
+        return None
+    return {"last_load_id": row[0], "start_date": row[1], "end_date": row[2]}
+
+
+def _write_export_state(conn, last_load_id, start_date: str, end_date: str):
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TABLE {EXPORT_STATE_TABLE} (
+            last_load_id VARCHAR, start_date DATE, end_date DATE, exported_at TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        f"INSERT INTO {EXPORT_STATE_TABLE} VALUES (?, ?::DATE, ?::DATE, now()::TIMESTAMP)",
+        [last_load_id, start_date, end_date],
+    )
+
+
+def _full_export(
+    conn, start_date: str, end_date: str, source_columns: List[str]
+) -> Dict:
+    conn.execute(
+        f"""
+        CREATE OR REPLACE TABLE {EXPORT_TABLE} AS
+        SELECT {_select_sql(source_columns)} FROM {SOURCE_TABLE}
+        WHERE {_source_date_sql(source_columns)} BETWEEN ?::DATE AND ?::DATE
+        ORDER BY {SORT_ORDER}
+        """,
+        [start_date, end_date],
+    )
+    inserted = conn.execute(f"SELECT COUNT(*) FROM {EXPORT_TABLE}").fetchone()[0]
+    last_load_id = None
+    if LOAD_ID_COLUMN in source_columns:
+        last_load_id = conn.execute(
+            f"SELECT MAX({LOAD_ID_COLUMN}) FROM {SOURCE_TABLE}"
+        ).fetchone()[0]
+    _write_export_state(conn, last_load_id, start_date, end_date)
+    return {
+        "mode": "full",
+        "inserted": inserted,
+        "deleted": 0,
+        "dates": _window_dates(start_date, end_date),
+    }
+
+
+def _incremental_export(
+    conn,
+    state: Dict,
+    start_date: str,
+    end_date: str,
+    source_columns: List[str],
+    merge_keys: List[List[str]],
+) -> Dict:
+    last_load_id = state["last_load_id"] or ""
+    # Windows are compared as dates; an empty previous window matches nothing
+    old_start, old_end = state["start_date"], state["end_date"]
+
+    # Merge tables: rows superseded by a newer load with the same key
+    deleted = []
+    for key in merge_keys:
+        matches = " AND ".join(
+            f'source_row."{column}" = {EXPORT_TABLE}."{column}"' for column in key
+        )
+        deleted += conn.execute(
+            f"""
+            DELETE FROM {EXPORT_TABLE}
+            WHERE EXISTS (
+                SELECT 1 FROM {SOURCE_TABLE} AS source_row
+                WHERE source_row.{LOAD_ID_COLUMN} > ? AND {matches}
+            )
+            RETURNING {PARSED_DATE_COLUMN}
+            """,
+            [last_load_id],
+        ).fetchall()
+
+    # Loads gone from the dlt store (replace runs) and dates outside the window
+    deleted += conn.execute(
+        f"""
+        DELETE FROM {EXPORT_TABLE}
+        WHERE {PARSED_DATE_COLUMN} IS NULL
+           OR {PARSED_DATE_COLUMN} NOT BETWEEN ?::DATE AND ?::DATE
+           OR {LOAD_ID_COLUMN} NOT IN (SELECT DISTINCT {LOAD_ID_COLUMN} FROM {SOURCE_TABLE})
+        RETURNING {PARSED_DATE_COLUMN}
+        """,
+        [start_date, end_date],
+    ).fetchall()
+
+    # New loads, plus older loads for dates the previous window did not cover
+    date_sql = _source_date_sql(source_columns)
+    inserted = conn.execute(
+        f"""
+        INSERT INTO {EXPORT_TABLE}
+        SELECT {_select_sql(source_columns)} FROM {SOURCE_TABLE}
+        WHERE {date_sql} BETWEEN ?::DATE AND ?::DATE
+          AND (
+              {LOAD_ID_COLUMN} > ?
+              OR NOT COALESCE({date_sql} BETWEEN ?::DATE AND ?::DATE, FALSE)
+          )
+        ORDER BY {SORT_ORDER}
+        RETURNING {PARSED_DATE_COLUMN}
+        """,
+        [start_date, end_date, last_load_id, old_start, old_end],
+    ).fetchall()
+
+    new_last_load_id = conn.execute(
+        f"SELECT MAX({LOAD_ID_COLUMN}) FROM {SOURCE_TABLE}"
+    ).fetchone()[0]
+    _write_export_state(conn, new_last_load_id, start_date, end_date)
+
+    # Dates whose rows changed; deletions that only moved out of the window
+    # leave their (archived) partitions alone
+    window = set(_window_dates(start_date, end_date))
+    dates = {row[0] for row in inserted} | {row[0] for row in deleted if row[0] in window}
+    return {
+        "mode": "incremental",
+        "inserted": len(inserted),
+        "deleted": len(deleted),
+        "dates": sorted(dates),
+    }
+
+
+def export_window(
+    conn,
+    source_path: str,
+    start_date: str,
+    end_date: str,
+    export_mode: Optional[str] = None,
+) -> Dict:
+    """
+    Sync the output table of an open DuckDB connection with the dlt store
+
+    Args:
+        conn: DuckDB connection to the output file
+        source_path: Path of the dlt DuckDB database
+        start_date, end_date: transaction_date window (YYYY-MM-DD, inclusive)
+        export_mode: "full" or "incremental" (default DLT_DUCKDB_EXPORT_MODE)
+
+    Returns:
+        {"mode": mode used, "inserted": rows inserted, "deleted": rows deleted,
+         "dates": transaction dates whose rows changed}
+    """
+    export_mode = resolve_export_mode(export_mode)
+
+    conn.execute(f"ATTACH '{source_path}' AS {SOURCE_ALIAS} (READ_ONLY)")
+    try:
+        source_columns = _columns(
+            conn, SOURCE_ALIAS, "carrier_invoice_data", "carrier_invoice_data"
+        )
+        has_load_id = LOAD_ID_COLUMN in source_columns
+
+        reason = None
+        state = None
+        hints = None
+        if export_mode == "incremental":
+            state = read_export_state(conn)
+            hints = read_table_hints(conn)
+            target_columns = _columns(
+                conn, conn.execute("SELECT current_database()").fetchone()[0], "main", EXPORT_TABLE
+            )
+            if not has_load_id:
+                reason = f"no {LOAD_ID_COLUMN} column in the dlt table"
+            elif state is None or state["last_load_id"] is None:
+                reason = "no previous export"
+            elif target_columns != export_columns(source_columns):
+                reason = "columns changed"
+            else:
+                reason = _incremental_blocker(hints)
+
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            if export_mode == "incremental" and reason is None:
+                merge_keys = hints["keys"] if hints["write_disposition"] == "merge" else []
+                result = _incremental_export(
+                    conn, state, start_date, end_date, source_columns, merge_keys
+                )
+            else:
+                if reason:
+                    print(f"ℹ️ Full DuckDB export ({reason})")
+                result = _full_export(conn, start_date, end_date, source_columns)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+    finally:
+        conn.execute(f"DETACH {SOURCE_ALIAS}")
+
+
+def partition_path(lake_dir: str, day: date) -> str:
+    """Hive partition directory of one transaction date"""
+    return os.path.join(lake_dir, f"{PARSED_DATE_COLUMN}={day.isoformat()}")
+
+
+def write_partitions(
+    conn, relation: str, lake_dir: str, dates: Iterable[date]
+) -> Dict[str, int]:
+    """
+    Replace the Parquet partitions of the given dates with a relation's rows
+
+    The rows are written to a staging directory first; each partition is then
+    swapped in with renames, and dates without rows lose their partition.
+
+    Args:
+        conn: DuckDB connection
+        relation: Table or view with a transaction_date_parsed DATE column
+        lake_dir: Root directory of the lake
+        dates: Transaction dates to rewrite
+
+    Returns:
+        {"written": partitions written, "removed": partitions removed}
+    """
+    dates = sorted(set(dates))
+    stats = {"written": 0, "removed": 0}
+    if not dates:
+        return stats
+
+    os.makedirs(lake_dir, exist_ok=True)
+    staging = os.path.join(lake_dir, f".staging-{uuid.uuid4().hex}")
+    try:
+        conn.execute(
+            f"""
+            COPY (
+                SELECT * FROM {relation}
+                WHERE list_contains(?, {PARSED_DATE_COLUMN})
+                ORDER BY {SORT_ORDER}
+            ) TO '{staging}' (
+                FORMAT PARQUET,
+                COMPRESSION {PARQUET_COMPRESSION},
+                PARTITION_BY ({PARSED_DATE_COLUMN}),
+                FILENAME_PATTERN 'data_{{i}}'
+            )
+            """,
+            [dates],
+        )
+        for day in dates:
+            target = partition_path(lake_dir, day)
+            staged = partition_path(staging, day)
+            retired = None
+            if os.path.exists(target):
+                retired = os.path.join(staging, f".retired-{day.isoformat()}")
+                os.replace(target, retired)
+            if os.path.exists(staged):
+                os.replace(staged, target)
+                stats["written"] += 1
+            elif retired:
+                stats["removed"] += 1
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return stats
+
+
+def read_lake_sql(lake_dir: str) -> str:
+    """read_parquet() over every partition of a lake"""
+    return (
+        f"read_parquet('{lake_dir}/*/*.parquet', hive_partitioning = true, "
+        f"hive_types = {{'{PARSED_DATE_COLUMN}': DATE}})"
+    )
+
+
+def write_store_partitions(
+    conn,
+    source_path: str,
+    source_table: str,
+    lake_dir: str,
+    start_date: str,
+    end_date: str,
+) -> Dict[str, int]:
+    """
+    Write a date window of a dlt DuckDB table straight to a Parquet lake
+
+    Args:
+        conn: DuckDB connection (e.g. in-memory)
+        source_path: Path of the dlt DuckDB database
+        source_table: "dataset.table" inside it
+        lake_dir: Root directory of the lake
+        start_date, end_date: transaction_date window (YYYY-MM-DD, inclusive)
+
+    Returns:
+        {"written": partitions written, "removed": partitions removed}
+    """
+    schema, table = source_table.split(".")
+    conn.execute(f"ATTACH '{source_path}' AS lake_source (READ_ONLY)")
+    try:
+        columns = _columns(conn, "lake_source", schema, table)
+        conn.execute(
+            f"CREATE OR REPLACE TEMP VIEW lake_rows AS "
+            f"SELECT {_select_sql(columns)} FROM lake_source.{schema}.{table}"
+        )
+        return write_partitions(
+            conn, "lake_rows", lake_dir, _window_dates(start_date, end_date)
+        )
+    finally:
+        conn.execute("DROP VIEW IF EXISTS lake_rows")
+        conn.execute("DETACH lake_source")
@@ -1,37 +1,85 @@
 #!/usr/bin/env python3
 """
-ClickHouse Biannual Data Extraction (H2 2025)
-==============================================
-
-This script extracts ONLY second half of 2025 data (July 1 - December 31, 2025)
-from the carrier_carrier_invoice_original_flat_ups table from ClickHouse.
-Used for data analysis and verification.
+ClickHouse Full Date-Range Extraction
+=====================================
+
+This script extracts every row of a transaction_date range from the
+carrier_carrier_invoice_original_flat_ups table from ClickHouse. The range is
+set with --start-date/--end-date or DLT_FULL_START_DATE/DLT_FULL_END_DATE
+(default: second half of 2025, July 1 - December 31). Used for data analysis
+and verification.
+
+Extraction modes (DLT_FULL_EXTRACT_MODE / --mode):
+- replace:   one dlt run over the whole range, replacing the table (previous
+             behaviour)
+- resumable: the range is cut into DLT_FULL_CHUNK_DAYS-day windows and every
+             window is its own dlt run. A window's rows replace that window's
+             transaction dates in the table (delete-insert on
+             transaction_date) and its completion is recorded in the dlt source
+             state, committed together with the rows. A later run skips
+             completed windows, so an interrupted (e.g. preempted) extract
+             resumes at the first unfinished window; --resync re-extracts the
+             windows of the given range anyway. A replace run clears the
+             completed windows.
+
+             Delete-insert matches the raw transaction_date strings of the
+             new rows only: a date whose source rows have all disappeared
+             (including a window that comes back empty) keeps its old rows.
+             Run in replace mode to drop those.
 
 Output:
     - DuckDB: full_carrier_invoice_extraction.duckdb
+    - Parquet (DLT_PARQUET_LAKE=true): data/output/full_carrier_invoice_lake/transaction_date_parsed=YYYY-MM-DD/
+      (see duckdb_export.py; only the days of the windows extracted by a run
+      are rewritten)
 
 Usage:
     poetry run python src/src/full_extract_clickhouse.py
+    poetry run python src/src/full_extract_clickhouse.py --mode resumable --start-date 2025-07-01 --end-date 2025-12-31
+    poetry run python src/src/full_extract_clickhouse.py --mode resumable --start-date 2025-08-01 --end-date 2025-08-14 --resync
+
+Configuration (environment variables, overridden by the command line):
+    DLT_FULL_START_DATE=2025-07-01
+    DLT_FULL_END_DATE=2025-12-31
+    DLT_FULL_EXTRACT_MODE=replace    # or "resumable"
+    DLT_FULL_CHUNK_DAYS=7
+
+Extraction mode, fetch format and transaction_date filter strategy follow
+DLT_CLICKHOUSE_EXTRACTION_MODE, DLT_CLICKHOUSE_PARALLEL_WINDOWS,
+DLT_CLICKHOUSE_FETCH_FORMAT and DLT_CLICKHOUSE_DATE_STRATEGY
+(see clickhouse_extraction.py).
 
 Author: Gabriel Jerdhy Lapuz
 Project: gsr_automation
 """
 
+import argparse
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 import dlt
 
-# ClickHouse imports with fallback handling
-try:
-    import clickhouse_connect
-
-    CLICKHOUSE_AVAILABLE = True
-except ImportError:
-    CLICKHOUSE_AVAILABLE = False
-    print("⚠️ clickhouse_connect not available")
+from clickhouse_client import (
+    ClickHouseClientPool,
+    ClickHouseConnection,
+    get_client_factory,
+    missing_env_vars,
+)
+from clickhouse_extraction import (
+    EXTRACTION_MODE,
+    PARALLEL_WINDOWS,
+    BatchPrefetcher,
+    WindowExtractor,
+    add_metadata_columns,
+    batch_num_rows,
+    describe_plan,
+    detect_date_filter,
+    plan_windows,
+    select_star_columns,
+)
+from duckdb_export import PARQUET_LAKE, write_store_partitions
 
 # DuckDB imports for querying
 try:
@@ -42,129 +90,56 @@ except ImportError:
     DUCKDB_AVAILABLE = False
     print("⚠️ duckdb not available")
 
+FULL_PARQUET_LAKE_DIR = os.getenv(
+    "DLT_FULL_PARQUET_LAKE_DIR", "data/output/full_carrier_invoice_lake"
+)
 
-class ClickHouseConnection:
-    """Manages ClickHouse connections for carrier invoice data extraction"""
+FULL_EXTRACT_MODES = ("replace", "resumable")
+FULL_EXTRACT_MODE = os.getenv("DLT_FULL_EXTRACT_MODE", "replace").lower()
+FULL_START_DATE = os.getenv("DLT_FULL_START_DATE", "2025-07-01")
+FULL_END_DATE = os.getenv("DLT_FULL_END_DATE", "2025-12-31")
+FULL_CHUNK_DAYS = int(os.getenv("DLT_FULL_CHUNK_DAYS", "7"))
 
-    def __init__(self, host, port, username, password, database, secure=True):
-        self.host = host
-        self.port = port
-        self.username = username
-        self.password = password
-        self.database = database
-        self.secure = secure
-        self.client = None
-        self.connected = False
+TABLE_NAME = "carrier_carrier_invoice_original_flat_ups"
+SOURCE_NAME = "clickhouse_full_source"
 
-    def connect(self):
-        """Establish connection to ClickHouse with error handling"""
-        if not CLICKHOUSE_AVAILABLE:
-            print("⚠️ ClickHouse library not available")
-            return False
 
-        try:
-            # Disable SSL warnings for ClickHouse Cloud connections
-            import urllib3
-
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-            self.client = clickhouse_connect.get_client(
-                host=self.host,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                database=self.database,
-                secure=self.secure,
-                connect_timeout=60,
-                send_receive_timeout=300,
-                verify=False,  # Disable SSL verification for Windows compatibility
-            )
+def build_date_chunks(
+    start_date: str, end_date: str, chunk_days: int = None
+) -> List[Tuple[str, str]]:
+    """Cut [start_date, end_date] into consecutive windows of chunk_days days (inclusive bounds)"""
+    chunk_days = max(1, chunk_days or FULL_CHUNK_DAYS)
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if start > end:
+        raise ValueError(f"Start date {start_date} is after end date {end_date}")
+    chunks = []
+    while start <= end:
+        chunk_end = min(end, start + timedelta(days=chunk_days - 1))
+        chunks.append((start.isoformat(), chunk_end.isoformat()))
+        start = chunk_end + timedelta(days=1)
+    return chunks
 
-            # Test connection
-            result = self.client.command("SELECT 1")
-            if result == 1:
-                self.connected = True
-                print(
-                    f"✅ Connected to ClickHouse: {self.host}:{self.port}/{self.database}"
-                )
-                return True
-            else:
-                print(f"❌ ClickHouse connection test failed")
-                return False
 
-        except Exception as e:
-            print(f"❌ ClickHouse connection failed: {type(e).__name__}: {str(e)}")
-            self.connected = False
-            return False
-
-    def execute_query(self, query, parameters=None):
-        """Execute query with error handling"""
-        if not self.connected:
-            raise ConnectionError("Not connected to ClickHouse")
-
-        try:
-            if parameters:
-                result = self.client.query(query, parameters=parameters)
-            else:
-                result = self.client.query(query)
-            return result.result_rows
-        except Exception as e:
-            print(f"❌ Query execution failed: {e}")
-            raise
+def chunk_id(start_date: str, end_date: str) -> str:
+    return f"{start_date}..{end_date}"
 
-    def get_table_schema(self, table_name):
-        """Get table schema information"""
-        if not self.connected:
-            return []
 
-        try:
-            schema_query = f"""
-            SELECT
-                name,
-                type,
-                default_kind,
-                default_expression
-            FROM system.columns
-            WHERE database = '{self.database}' AND table = '{table_name}'
-            ORDER BY position
-            """
-            return self.execute_query(schema_query)
-        except Exception as e:
-            print(f"❌ Failed to get schema for table {table_name}: {e}")
-            return []
+def completed_chunks(pipeline) -> Dict[str, Dict[str, Any]]:
+    """Windows a resumable extract has committed, from the pipeline state"""
+    return pipeline.state.get("sources", {}).get(SOURCE_NAME, {}).get("chunks", {})
 
 
-def clickhouse_full_extraction_source():
-    """
-    DLT source that extracts ONLY H2 2025 data (July 1 - December 31, 2025)
-    FROM ClickHouse carrier_carrier_invoice_original_flat_ups table
-    Filters by transaction_date to only include second half of 2025
-    """
+def connect_to_clickhouse():
+    """Connect to ClickHouse with the .env settings"""
     from dotenv import load_dotenv
 
     load_dotenv()
 
-    # Target table name
-    table_name = "carrier_carrier_invoice_original_flat_ups"
-
     # Create connection with environment variables
-    ch_conn = ClickHouseConnection(
-        host=os.getenv("CLICKHOUSE_HOST"),
-        port=int(os.getenv("CLICKHOUSE_PORT", "8443")),
-        username=os.getenv("CLICKHOUSE_USERNAME"),
-        password=os.getenv("CLICKHOUSE_PASSWORD"),
-        database=os.getenv("CLICKHOUSE_DATABASE"),
-        secure=os.getenv("CLICKHOUSE_SECURE", "true").lower() == "true",
-    )
+    ch_conn = ClickHouseConnection.from_env()
 
     # Validate required environment variables
-    required_vars = [
-        "CLICKHOUSE_HOST",
-        "CLICKHOUSE_USERNAME",
-        "CLICKHOUSE_PASSWORD",
-        "CLICKHOUSE_DATABASE",
-    ]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    missing_vars = missing_env_vars()
     if missing_vars:
         raise ValueError(
             f"Missing required environment variables: {', '.join(missing_vars)}. Please check your .env file."
@@ -176,34 +151,77 @@ def clickhouse_full_extraction_source():
         raise ConnectionError(
             "Failed to connect to ClickHouse. Please check your connection settings and SSL configuration."
         )
+    return ch_conn
+
+
+def clickhouse_full_extraction_source(
+    start_date=None, end_date=None, ch_conn=None, resumable=False
+):
+    """
+    DLT source that extracts a transaction_date range (default: H2 2025)
+    FROM ClickHouse carrier_carrier_invoice_original_flat_ups table
+
+    Args:
+        start_date, end_date: transaction_date range (YYYY-MM-DD, inclusive)
+        ch_conn: Open ClickHouse connection (default: connect with the .env settings)
+        resumable: Merge the range into the table and record it as completed
+    """
+    start_date = start_date or FULL_START_DATE
+    end_date = end_date or FULL_END_DATE
+    ch_conn = ch_conn or connect_to_clickhouse()
 
-    print(f"🎯 Extracting H2 2025 data (July 1 - December 31) from table: {table_name}")
+    print(f"🎯 Extracting {start_date} to {end_date} from table: {TABLE_NAME}")
     print(
-        f"📅 Filtering: transaction_date from 2025-07-01 to 2025-12-31 (both M/D/YYYY and YYYY-MM-DD formats)"
+        f"📅 Filtering: transaction_date from {start_date} to {end_date} (both M/D/YYYY and YYYY-MM-DD formats)"
     )
 
     # Create resource for the target table
-    resource = create_full_extraction_resource(ch_conn, table_name)
+    resource = create_full_extraction_resource(
+        ch_conn, TABLE_NAME, start_date, end_date, resumable=resumable
+    )
 
     return [resource]
 
 
-@dlt.source
-def clickhouse_full_source():
+@dlt.source(name=SOURCE_NAME)
+def clickhouse_full_source(start_date=None, end_date=None, ch_conn=None, resumable=False):
     """DLT source wrapper for full carrier invoice extraction"""
-    return clickhouse_full_extraction_source()
+    return clickhouse_full_extraction_source(start_date, end_date, ch_conn, resumable)
 
 
-def create_full_extraction_resource(ch_conn, table_name):
-    """Create a dlt resource for FULL table extraction without date filtering"""
-
-    @dlt.resource(
-        name="full_carrier_invoice_data",
-        write_disposition="replace",  # Replace mode for full extraction
-        primary_key="invoice_number",
-    )
+def create_full_extraction_resource(
+    ch_conn, table_name, start_date=None, end_date=None, resumable=False
+):
+    """
+    Create a dlt resource for the extraction of a transaction_date range
+
+    Replace mode rewrites the table and clears the completed ranges.
+    Resumable mode replaces only the transaction dates of this range
+    (delete-insert on transaction_date) and marks the range as completed in
+    the source state. Dates missing from the new rows are not deleted, so
+    rows removed at the source (or a range that is now empty) stay in the
+    table until the next replace run.
+    """
+    start_date = start_date or FULL_START_DATE
+    end_date = end_date or FULL_END_DATE
+    if resumable:
+        # invoice_number repeats across an invoice's lines (and dates): as a
+        # merge key it would dedupe lines and delete other windows' rows, so
+        # the hint a replace run left in the schema is switched off
+        resource_hints = {
+            "write_disposition": {"disposition": "merge", "strategy": "delete-insert"},
+            "merge_key": "transaction_date",
+            "columns": {"invoice_number": {"primary_key": False}},
+        }
+    else:
+        resource_hints = {
+            "write_disposition": "replace",  # Replace mode for full extraction
+            "primary_key": "invoice_number",
+        }
+
+    @dlt.resource(name="full_carrier_invoice_data", **resource_hints)
     def full_extraction_resource():
-        """Extract ALL data from ClickHouse carrier_carrier_invoice_original_flat_ups table"""
+        """Extract the range from ClickHouse carrier_carrier_invoice_original_flat_ups table"""
 
         try:
             # Get table schema
@@ -219,102 +237,119 @@ def create_full_extraction_resource(ch_conn, table_name):
             order_tie_col = "invoice_number"
 
             print(
-                f"📥 Full load from {table_name} (H2 2025: July 1 - December 31, batching enabled)"
+                f"📥 Full load from {table_name} ({start_date} to {end_date}, batching enabled)"
             )
 
             # Window configuration (seconds). Default: 1 hour
             WINDOW_SECONDS = int(os.getenv("DLT_CLICKHOUSE_WINDOW_SECONDS", "3600"))
 
-            # Get min/max time bounds for H2 2025 data only (July 1 - December 31, 2025)
-            # Handle both date formats: M/D/YYYY and YYYY-MM-DD
-            date_filter_clause = """
-                WHERE (
-                    -- Match YYYY-MM-DD format (2025-07-01 to 2025-12-31)
-                    (transaction_date >= '2025-07-01' AND transaction_date <= '2025-12-31')
-                    OR
-                    -- Match M/D/YYYY format by converting to date
-                    (parseDateTimeBestEffortOrNull(transaction_date) >= toDate('2025-07-01')
-                     AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate('2025-12-31'))
-                )
-            """
-
-            min_time_rows = ch_conn.execute_query(
-                f"SELECT min({order_time_col}) FROM {table_name} {date_filter_clause}"
-            )
-            max_time_rows = ch_conn.execute_query(
-                f"SELECT max({order_time_col}) FROM {table_name} {date_filter_clause}"
-            )
-            min_time = (
-                min_time_rows[0][0] if min_time_rows and min_time_rows[0] else None
-            )
-            max_time = (
-                max_time_rows[0][0] if max_time_rows and max_time_rows[0] else None
+            # Plan windows for the transaction_date range only
+            # Handle both date formats: M/D/YYYY and YYYY-MM-DD (or the
+            # normalized date column / indexed expression when the table has one)
+            date_parameters = {
+                "start_date_str": start_date,
+                "end_date_str": end_date,
+            }
+            date_filter = detect_date_filter(ch_conn, table_name, schema)
+            print(f"🗓️ transaction_date filter: {date_filter.strategy} ({date_filter.target})")
+
+            # (bounds and rows per window in one aggregate query)
+            plan = plan_windows(
+                ch_conn,
+                table_name,
+                date_filter,
+                date_parameters,
+                WINDOW_SECONDS,
+                BATCH_SIZE,
+                order_time_col=order_time_col,
             )
 
-            if not (min_time and max_time):
+            if not plan.windows:
                 print(f"ℹ️ No data found in {table_name}")
                 yield []
             else:
-                print(f"📅 Data range: {min_time} to {max_time}")
-                start_time = min_time
-                while start_time <= max_time:
-                    end_time = start_time + timedelta(seconds=WINDOW_SECONDS)
-                    cursor_id = ""
-
-                    while True:
-                        # Query WITH H2 2025 transaction_date filtering (July 1 - December 31)
-                        query = f"""
-                            SELECT * FROM {table_name}
-                            WHERE (
-                                -- Match YYYY-MM-DD format (2025-07-01 to 2025-12-31)
-                                (transaction_date >= '2025-07-01' AND transaction_date <= '2025-12-31')
-                                OR
-                                -- Match M/D/YYYY format by converting to date
-                                (parseDateTimeBestEffortOrNull(transaction_date) >= toDate('2025-07-01')
-                                 AND parseDateTimeBestEffortOrNull(transaction_date) <= toDate('2025-12-31'))
-                            )
-                            AND {order_time_col} >= %(start_time)s
-                            AND {order_time_col} < %(end_time)s
-                            AND ( %(cursor_id)s = '' OR {order_tie_col} > %(cursor_id)s )
-                            ORDER BY {order_tie_col}
-                            LIMIT {BATCH_SIZE}
-                        """
-                        parameters = {
-                            "start_time": start_time,
-                            "end_time": end_time,
-                            "cursor_id": cursor_id,
-                        }
-                        rows = ch_conn.execute_query(query, parameters)
-                        if not rows:
-                            break
-
-                        column_names = (
-                            [col[0] for col in schema]
-                            if schema
-                            else [f"col_{i}" for i in range(len(rows[0]))]
-                        )
+                print(f"📅 Data range: {plan.min_time} to {plan.max_time}")
+                print(describe_plan(plan, WINDOW_SECONDS))
+                windows = plan.windows
+                column_names = select_star_columns(schema)
+                extractor = WindowExtractor(
+                    table_name,
+                    column_names,
+                    date_filter.sql,
+                    date_parameters,
+                    BATCH_SIZE,
+                    order_time_col=order_time_col,
+                    order_tie_col=order_tie_col,
+                )
 
+                parallel = EXTRACTION_MODE == "parallel" and len(windows) > 1
+                with ClickHouseClientPool(
+                    ch_conn.clone,
+                    size=PARALLEL_WINDOWS if parallel else 1,
+                    primary=ch_conn,
+                ) as pool:
+
+                    def to_batch(rows):
+                        if extractor.fetch_format == "arrow":
+                            # Arrow tables go to dlt as-is (no per-row Python objects)
+                            return add_metadata_columns(rows, table_name)
                         batch = []
                         for row in rows:
                             record = dict(zip(column_names, row))
                             record["_extracted_at"] = datetime.now()
                             record["_source_table"] = table_name
                             batch.append(record)
+                        return batch
 
-                        total_extracted += len(batch)
-                        print(
-                            f"✅ Extracted batch: {len(batch)} rows (total: {total_extracted:,})"
-                        )
-                        yield batch
-
-                        cursor_id = batch[-1].get(order_tie_col, "")
-
-                    start_time = end_time
+                    # Fetch + convert run ahead of dlt when prefetching is enabled
+                    prefetcher = BatchPrefetcher(
+                        to_batch(rows)
+                        for rows in extractor.iter_batches(ch_conn, windows, pool=pool)
+                    )
+                    with prefetcher:
+                        for batch in prefetcher:
+                            batch_rows = batch_num_rows(batch)
+                            total_extracted += batch_rows
+                            print(
+                                f"✅ Extracted batch: {batch_rows} rows (total: {total_extracted:,})"
+                            )
+                            yield batch
 
+                print(
+                    f"📊 {len(windows)} windows, {extractor.queries} batch queries "
+                    f"({EXTRACTION_MODE} extraction, {extractor.fetch_format} format)"
+                )
+                if extractor.batch_sizer:
+                    print(extractor.batch_sizer.summary())
+                if prefetcher.depth:
+                    print(prefetcher.summary())
+                print(
+                    f"🔎 Rows scanned by ClickHouse ({date_filter.strategy} date filter): "
+                    f"plan {plan.rows_read or 0:,}, batches "
+                    + (
+                        f"{extractor.rows_read:,}"
+                        if extractor.fetch_format == "rows"
+                        else "n/a (not reported for Arrow)"
+                    )
+                )
                 if total_extracted == 0:
                     print(f"ℹ️ No data found in {table_name}")
                     yield []
 
+            if resumable:
+                # Committed with this run's rows: a crash before the load
+                # leaves the range pending for the next run
+                dlt.current.source_state().setdefault("chunks", {})[
+                    chunk_id(start_date, end_date)
+                ] = {
+                    "rows": total_extracted,
+                    "max_import_time": str(plan.max_time) if plan.max_time else None,
+                    "completed_at": datetime.utcnow().isoformat(),
+                }
+            else:
+                # The replace run truncates the table: no window stays completed
+                dlt.current.source_state()["chunks"] = {}
+
         except Exception as e:
             print(f"❌ Failed to extract from {table_name}: {e}")
             import traceback
@@ -325,20 +360,117 @@ def create_full_extraction_resource(ch_conn, table_name):
     return full_extraction_resource
 
 
-def run_full_extraction(destination="duckdb"):
+def export_parquet_lake(pipeline, windows: List[Tuple[str, str]]):
+    """Replace the lake partitions of the date windows extracted by this run"""
+    if not windows:
+        print("\nℹ️ No windows extracted: Parquet lake unchanged")
+        return
+    print(f"\n🗂️ Writing Parquet lake: {FULL_PARQUET_LAKE_DIR}")
+    try:
+        lake = {"written": 0, "removed": 0}
+        conn = duckdb.connect()
+        try:
+            for start_date, end_date in windows:
+                written = write_store_partitions(
+                    conn,
+                    pipeline.pipeline_name + ".duckdb",
+                    "full_carrier_invoice_data.full_carrier_invoice_data",
+                    FULL_PARQUET_LAKE_DIR,
+                    start_date,
+                    end_date,
+                )
+                for key in lake:
+                    lake[key] += written[key]
+        finally:
+            conn.close()
+        print(
+            f"✅ Parquet lake: {lake['written']} partitions written, {lake['removed']} removed"
+        )
+    except Exception as e:
+        print(f"⚠️ Parquet lake export failed: {e}")
+
+
+def resolve_full_extract_mode(mode: Optional[str] = None) -> str:
+    """Validated extraction mode (argument, else DLT_FULL_EXTRACT_MODE)"""
+    mode = (mode or FULL_EXTRACT_MODE).lower()
+    if mode not in FULL_EXTRACT_MODES:
+        raise ValueError(
+            f"Unknown full extract mode '{mode}' (expected one of: {', '.join(FULL_EXTRACT_MODES)})"
+        )
+    return mode
+
+
+def run_resumable_extraction(
+    pipeline, start_date, end_date, ch_conn=None, resync=False, chunk_days=None
+):
+    """
+    Extract [start_date, end_date] window by window, skipping completed windows
+
+    Returns:
+        (start_date, end_date) of the windows extracted in this run
+    """
+    if pipeline.has_pending_data:
+        # An earlier run stopped after extracting: load what it left first
+        print("🔁 Loading pending data of an interrupted run...")
+        pipeline.run()
+
+    chunks = build_date_chunks(start_date, end_date, chunk_days)
+    done = completed_chunks(pipeline)
+    pending = [
+        chunk for chunk in chunks if resync or chunk_id(*chunk) not in done
+    ]
+    print(
+        f"🧩 {len(chunks)} windows of up to {chunk_days or FULL_CHUNK_DAYS} days: "
+        f"{len(chunks) - len(pending)} already completed, {len(pending)} to extract"
+        + (" (resync)" if resync else "")
+    )
+    if not pending:
+        return []
+
+    ch_conn = ch_conn or connect_to_clickhouse()
+    for index, (chunk_start, chunk_end) in enumerate(pending, start=1):
+        print(f"\n🧩 Window {index}/{len(pending)}: {chunk_start} to {chunk_end}")
+        pipeline.run(
+            clickhouse_full_source(chunk_start, chunk_end, ch_conn=ch_conn, resumable=True)
+        )
+        rows = completed_chunks(pipeline)[chunk_id(chunk_start, chunk_end)]["rows"]
+        print(f"✅ Window {chunk_start} to {chunk_end} committed: {rows:,} rows")
+    print(get_client_factory().summary())
+    return pending
+
+
+def run_full_extraction(
+    destination="duckdb",
+    start_date=None,
+    end_date=None,
+    mode=None,
+    resync=False,
+    ch_conn=None,
+    chunk_days=None,
+):
     """
-    Run the biannual extraction pipeline that extracts H2 2025 (July 1 - December 31)
-    carrier invoice data from ClickHouse
+    Run the extraction pipeline for a transaction_date range (default: H2 2025,
+    July 1 - December 31) of carrier invoice data from ClickHouse
 
     Args:
         destination: Destination for the extracted data (default: "duckdb")
+        start_date, end_date: transaction_date range (default: DLT_FULL_START_DATE /
+                              DLT_FULL_END_DATE)
+        mode: "replace" or "resumable" (default: DLT_FULL_EXTRACT_MODE)
+        resync: Resumable mode: re-extract completed windows of the range too
+        ch_conn: Open ClickHouse connection (default: connect with the .env settings)
+        chunk_days: Resumable mode: days per window (default: DLT_FULL_CHUNK_DAYS)
 
     Returns:
         dlt.Pipeline: The completed pipeline object
     """
-    print("🚀 ClickHouse Biannual Data Extraction Pipeline (H2 2025)")
+    start_date = start_date or FULL_START_DATE
+    end_date = end_date or FULL_END_DATE
+    mode = resolve_full_extract_mode(mode)
+
+    print("🚀 ClickHouse Full Date-Range Extraction Pipeline")
     print("=" * 60)
-    print("📅 Extracting July 1 - December 31, 2025 records from source table")
+    print(f"📅 Extracting {start_date} to {end_date} records from source table ({mode} mode)")
     print("=" * 60)
 
     # Create pipeline with unique name to avoid conflicts
@@ -350,19 +482,26 @@ def run_full_extraction(destination="duckdb"):
     )
 
     # Run extraction
-    print(f"📥 Extracting H2 2025 data (July 1 - December 31) from ClickHouse...")
-    print(f"🎯 Target table: carrier_carrier_invoice_original_flat_ups")
-    print(f"📅 Date filter: 2025-07-01 to 2025-12-31 (both date formats)")
+    print(f"📥 Extracting {start_date} to {end_date} from ClickHouse...")
+    print(f"🎯 Target table: {TABLE_NAME}")
+    print(f"📅 Date filter: {start_date} to {end_date} (both date formats)")
     print(f"📍 Destination: {destination}")
     print(f"📁 Output file: full_carrier_invoice_extraction.duckdb")
 
     try:
-        # Create and run the ClickHouse source
-        source = clickhouse_full_source()
-        info = pipeline.run(source)
+        if mode == "resumable":
+            extracted_windows = run_resumable_extraction(
+                pipeline, start_date, end_date, ch_conn, resync, chunk_days
+            )
+            print(f"\n✅ Full extraction pipeline completed successfully!")
+        else:
+            # Create and run the ClickHouse source
+            source = clickhouse_full_source(start_date, end_date, ch_conn=ch_conn)
+            info = pipeline.run(source)
+            extracted_windows = [(start_date, end_date)]
 
-        print(f"\n✅ Full extraction pipeline completed successfully!")
-        print(f"📊 Load info: {info}")
+            print(f"\n✅ Full extraction pipeline completed successfully!")
+            print(f"📊 Load info: {info}")
 
         # Analyze extracted data
         with pipeline.sql_client() as client:
@@ -427,6 +566,9 @@ def run_full_extraction(destination="duckdb"):
             except Exception as e:
                 print(f"⚠️ Could not analyze data: {e}")
 
+        if PARQUET_LAKE and DUCKDB_AVAILABLE:
+            export_parquet_lake(pipeline, extracted_windows)
+
         return pipeline
 
     except Exception as e:
@@ -444,8 +586,27 @@ if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
 
+    parser = argparse.ArgumentParser(description="Extract a transaction_date range from ClickHouse")
+    parser.add_argument("--start-date", default=FULL_START_DATE, help="First transaction_date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", default=FULL_END_DATE, help="Last transaction_date (YYYY-MM-DD)")
+    parser.add_argument("--mode", choices=FULL_EXTRACT_MODES, default=FULL_EXTRACT_MODE)
+    parser.add_argument("--chunk-days", type=int, default=FULL_CHUNK_DAYS, help="Days per resumable window")
+    parser.add_argument(
+        "--resync",
+        action="store_true",
+        help="Resumable mode: re-extract the range's windows even if completed",
+    )
+    args = parser.parse_args()
+
     # Run the full extraction pipeline
-    pipeline = run_full_extraction(destination="duckdb")
+    pipeline = run_full_extraction(
+        destination="duckdb",
+        start_date=args.start_date,
+        end_date=args.end_date,
+        mode=args.mode,
+        resync=args.resync,
+        chunk_days=args.chunk_days,
+    )
 
     print("\n✅ Full extraction completed!")
     print(f"📁 Output file: full_carrier_invoice_extraction.duckdb")
@@ -21,6 +21,9 @@ Usage:
     # Upload multiple files
     poetry run python src/src/gcs_upload.py --step 3 --files data/output/ups_label_only_*.csv data/output/ups_label_only_*.json
 
+    # Upload a Parquet lake directory, only the partitions of a date window
+    poetry run python src/src/gcs_upload.py --step 1 --files data/output/carrier_invoice_lake --from-date 2025-07-01 --to-date 2025-07-10
+
     # Dry run (no actual upload)
     poetry run python src/src/gcs_upload.py --step 4 --files data/output/ups_void_*.csv --dry-run
 
@@ -36,10 +39,11 @@ Project: gsr_automation
 import argparse
 import logging
 import os
+import re
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from dotenv import load_dotenv
 from google.cloud import storage
@@ -72,6 +76,56 @@ STEP_NAMES = {
 }
 
 
+# Hive partition directory of a date, e.g. transaction_date_parsed=2025-07-01
+PARTITION_DIR_PATTERN = re.compile(r"^\w+=(\d{4}-\d{2}-\d{2})$")
+
+
+def expand_upload_paths(
+    files: List[str],
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Resolve the upload arguments to (local path, GCS name) pairs
+
+    Files keep their name. Directories are uploaded recursively with their
+    relative path (lake/partition=.../data_0.parquet); date partition
+    directories outside [from_date, to_date] are skipped.
+
+    Args:
+        files: File and directory paths
+        from_date, to_date: Optional YYYY-MM-DD partition window (inclusive)
+
+    Returns:
+        List of (local path, name under the step folder)
+    """
+    uploads = []
+    for path in files:
+        if not os.path.isdir(path):
+            uploads.append((path, Path(path).name))
+            continue
+
+        root = Path(path)
+        for dirpath, dirnames, filenames in os.walk(root):
+            kept = []
+            for dirname in sorted(dirnames):
+                if dirname.startswith("."):
+                    continue  # staging directories of an export in progress
+                match = PARTITION_DIR_PATTERN.match(dirname)
+                if match and (
+                    (from_date and match.group(1) < from_date)
+                    or (to_date and match.group(1) > to_date)
+                ):
+                    continue
+                kept.append(dirname)
+            dirnames[:] = kept
+            for filename in sorted(filenames):
+                local_path = Path(dirpath) / filename
+                name = Path(root.name) / local_path.relative_to(root)
+                uploads.append((str(local_path), name.as_posix()))
+    return uploads
+
+
 def get_gcs_client() -> Optional[storage.Client]:
     """
     Initialize and return a GCS client
@@ -137,6 +191,7 @@ def upload_file_to_gcs(
     step: int,
     run_timestamp: str,
     dry_run: bool = False,
+    name: Optional[str] = None,
 ) -> bool:
     """
     Upload a single file to GCS
@@ -147,6 +202,7 @@ def upload_file_to_gcs(
         step: Pipeline step number
         run_timestamp: Run timestamp for folder organization
         dry_run: If True, don't actually upload
+        name: Path under the step folder (default: the file name)
 
     Returns:
         True if upload successful, False otherwise
@@ -168,9 +224,10 @@ def upload_file_to_gcs(
 
         # Build GCS path: pipeline_runs/YYYY-MM-DD_HH-MM-SS/stepN_name/filename
         step_name = STEP_NAMES.get(step, f"step{step}")
-        gcs_path = f"pipeline_runs/{run_timestamp}/{step_name}/{file_path.name}"
+        name = name or file_path.name
+        gcs_path = f"pipeline_runs/{run_timestamp}/{step_name}/{name}"
 
-        logger.info(f"📤 Uploading: {file_path.name} ({file_size_mb:.2f} MB)")
+        logger.info(f"📤 Uploading: {name} ({file_size_mb:.2f} MB)")
         logger.info(f"   Local:  {local_filepath}")
         logger.info(f"   GCS:    gs://{GCS_BUCKET_NAME}/{gcs_path}")
 
@@ -200,14 +257,17 @@ def upload_files(
     files: List[str],
     step: int,
     dry_run: bool = False,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
 ) -> int:
     """
     Upload multiple files to GCS
 
     Args:
-        files: List of file paths to upload
+        files: List of file or directory paths to upload
         step: Pipeline step number
         dry_run: If True, don't actually upload
+        from_date, to_date: Partition window for directories (see expand_upload_paths)
 
     Returns:
         Number of files successfully uploaded
@@ -221,11 +281,13 @@ def upload_files(
         logger.warning("⚠️  No files specified for upload")
         return 0
 
+    uploads = expand_upload_paths(files, from_date, to_date)
+
     logger.info("=" * 60)
     logger.info(f"🚀 GCS UPLOAD - STEP {step}")
     logger.info("=" * 60)
     logger.info(f"📦 Bucket: gs://{GCS_BUCKET_NAME}")
-    logger.info(f"📁 Files to upload: {len(files)}")
+    logger.info(f"📁 Files to upload: {len(uploads)}")
     if dry_run:
         logger.info("🔍 DRY RUN MODE - No actual uploads")
     logger.info("=" * 60)
@@ -242,23 +304,23 @@ def upload_files(
 
     # Upload each file
     success_count = 0
-    for filepath in files:
-        if upload_file_to_gcs(client, filepath, step, run_timestamp, dry_run):
+    for filepath, name in uploads:
+        if upload_file_to_gcs(client, filepath, step, run_timestamp, dry_run, name):
             success_count += 1
 
     # Summary
     logger.info("=" * 60)
     logger.info(f"📊 Upload Summary:")
-    logger.info(f"   Total files: {len(files)}")
+    logger.info(f"   Total files: {len(uploads)}")
     logger.info(f"   Successful: {success_count}")
-    logger.info(f"   Failed: {len(files) - success_count}")
+    logger.info(f"   Failed: {len(uploads) - success_count}")
     logger.info("=" * 60)
 
-    if success_count == len(files):
+    if success_count == len(uploads):
         logger.info("✅ All files uploaded successfully!")
     elif success_count > 0:
         logger.warning(
-            f"⚠️  Partial success: {success_count}/{len(files)} files uploaded"
+            f"⚠️  Partial success: {success_count}/{len(uploads)} files uploaded"
         )
     else:
         logger.error("❌ All uploads failed!")
@@ -282,7 +344,15 @@ def main():
         "--files",
         nargs="+",
         required=True,
-        help="Files to upload (supports wildcards)",
+        help="Files or directories to upload (supports wildcards)",
+    )
+    parser.add_argument(
+        "--from-date",
+        help="Only upload date partitions from this day (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--to-date",
+        help="Only upload date partitions up to this day (YYYY-MM-DD)",
     )
     parser.add_argument(
         "--dry-run",
@@ -297,10 +367,13 @@ def main():
         files=args.files,
         step=args.step,
         dry_run=args.dry_run,
+        from_date=args.from_date,
+        to_date=args.to_date,
     )
 
     # Exit with appropriate code
-    if success_count == len(args.files):
+    total = len(expand_upload_paths(args.files, args.from_date, args.to_date))
+    if success_count == total:
         sys.exit(0)
     elif success_count > 0:
         sys.exit(1)  # Partial failure
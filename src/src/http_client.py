@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP Client
+==================
+
+Shared ``requests`` session factory with connection pooling (keep-alive),
+explicit connect/read timeouts and a retry policy, so repeated calls to the
+same host reuse TCP+TLS connections instead of paying a new handshake each time.
+
+Used by the UPS label filter, examples/ups_api.py and slack_whitelist_ip.py.
+
+Retry policy:
+- Connection errors are always retried (the request never reached the server).
+- Read errors and HTTP 500/502/503/504 are retried only for ``retry_methods``,
+  so non-idempotent calls (e.g. posting a Slack message) are not duplicated.
+- HTTP 429 is NOT retried here: callers handle it (see rate_limiter.py).
+
+Configuration (environment variables):
+    HTTP_POOL_SIZE=10            # connections kept alive per host
+    HTTP_CONNECT_TIMEOUT=10      # seconds
+    HTTP_READ_TIMEOUT=30         # seconds
+    HTTP_MAX_RETRIES=3
+    HTTP_RETRY_BACKOFF=0.5       # urllib3 backoff factor (0.5s, 1s, 2s, ...)
+
+Usage:
+    from http_client import get_session
+
+    session = get_session("ups")
+    response = session.get(url, headers=headers)  # default timeouts applied
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+Timeout = Union[float, Tuple[float, float]]
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class NoRateLimitRetry(Retry):
+    """
+    urllib3 Retry that leaves HTTP 429 to the caller
+
+    urllib3 retries 429 responses carrying a Retry-After header even when 429
+    is not in status_forcelist (and rejects fractional Retry-After values), which
+    would bypass the adaptive rate limiter and credential cooldowns.
+    """
+
+    RETRY_AFTER_STATUS_CODES = frozenset({413, 503})
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to every request"""
+
+    def __init__(self, *args, timeout: Optional[Timeout] = None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session(
+    pool_size: Optional[int] = None,
+    timeout: Optional[Timeout] = None,
+    max_retries: Optional[int] = None,
+    backoff_factor: Optional[float] = None,
+    retry_methods: Iterable[str] = ("GET", "HEAD", "OPTIONS"),
+    headers: Optional[Dict[str, str]] = None,
+) -> requests.Session:
+    """
+    Create a pooled session with default timeouts and retries
+
+    Args:
+        pool_size: Connections kept alive per host (default: HTTP_POOL_SIZE).
+                   Should be at least the number of threads sharing the session.
+        timeout: Default timeout, seconds or (connect, read) tuple
+                 (default: (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        max_retries: Retries for connection errors, read errors and 5xx
+                     responses (default: HTTP_MAX_RETRIES)
+        backoff_factor: urllib3 exponential backoff factor (default: HTTP_RETRY_BACKOFF)
+        retry_methods: HTTP methods that are safe to retry after the request was sent
+        headers: Default headers for every request
+
+    Returns:
+        Configured requests.Session
+    """
+    pool_size = pool_size or HTTP_POOL_SIZE
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+
+    retry = NoRateLimitRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=(
+            HTTP_RETRY_BACKOFF if backoff_factor is None else backoff_factor
+        ),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(method.upper() for method in retry_methods),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the final response back to the caller
+    )
+    adapter = TimeoutHTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def get_session(name: str = "default", **kwargs) -> requests.Session:
+    """
+    Get (or lazily create) a named session shared across the process
+
+    Keyword arguments are passed to create_session() the first time the
+    session is created and ignored afterwards.
+    """
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = create_session(**kwargs)
+            _sessions[name] = session
+        return session
+
+
+def close_sessions():
+    """Close all shared sessions and their pooled connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
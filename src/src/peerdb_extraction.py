@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+PeerDB Keyset Extraction
+========================
+
+Shared batch reader for the PeerDB dlt resources (peerdb_pipeline.py and
+peerdb_flexible_pipeline.py).
+
+Tables are read with keyset pagination instead of LIMIT/OFFSET:
+
+    SELECT * FROM t ORDER BY k1, k2 LIMIT n                              -- first page
+    SELECT * FROM t WHERE (k1, k2) > (last_k1, last_k2) ORDER BY k1, k2 LIMIT n
+
+Every page starts right after the previous one, so ClickHouse never sorts and
+skips the rows of earlier pages (OFFSET makes page k cost k x n rows) and no
+COUNT(*) is needed up front: extraction stops at the first short page. When
+the key is the table's sorting key, pages are read in index order.
+
+Key columns:
+- explicit (e.g. peerdb_pipeline's ``primary_key_for_updating``), or
+- detected: the table's ORDER BY (sorting) key when it consists of plain
+  columns - PeerDB creates ReplacingMergeTree tables ordered by the source
+  primary key - else the first id/key/number column (previous heuristic)
+``_peerdb_version`` is appended as a tie-breaker when present, so row
+versions not yet merged by ReplacingMergeTree are not skipped at a page
+boundary. Rows whose key contains NULL cannot be paged by key; they are read
+in one final query.
+
+Key uniqueness: ``(key) > (last key)`` skips the rows of the last key value
+that did not fit on the page, so plain keyset paging is only used when the
+key is known to be unique (is_unique_key: the sorting key of a
+ReplacingMergeTree table plus ``_peerdb_version``). Any other key (explicit
+--key, the id/key/number fallback, a MergeTree sorting key) is paged by key
+group: the last key value of a full page is cut off the page and read
+completely in one extra query, so rows sharing a key value (e.g. the charge
+lines of an invoice) are never lost.
+
+Sync modes (DLT_PEERDB_SYNC_MODE):
+- replace:     every run re-extracts the whole table (previous behaviour)
+- incremental: CDC-style sync. A dlt incremental cursor on PeerDB's sync
+               column (DLT_PEERDB_CURSOR_COLUMN, default ``_peerdb_synced_at``,
+               falling back to ``_peerdb_version``) keeps the high-water mark in
+               the pipeline state; each run reads only rows synced since then
+               (``cursor >= last_value``, still keyset-paginated on the table
+               key) and merges them into the destination on the primary key.
+               When a row changed several times, the highest ``_peerdb_version``
+               wins. Deletes arrive as rows with ``_peerdb_is_deleted = 1``
+               (PeerDB soft deletes) and are merged like any other change.
+
+Several tables (peerdb_flexible_pipeline.py --table a b 'carrier_*'):
+    resolve_table_names() expands glob patterns against system.tables. The
+    tables become parallelized dlt resources of one source that share a
+    bounded client pool (PooledConnection: each query borrows a connection,
+    so connections are reused across tables and batches and at most
+    DLT_PEERDB_PARALLEL_TABLES queries run at once). TableProgress records
+    rows, batches and throughput per table for the final report.
+
+Connections: PeerDBConnection takes its clients from the shared ClickHouse
+client pool (clickhouse_client.py), for both pipelines.
+
+Usage:
+    key_columns = detect_key_columns(peerdb_conn, table_name, schema_rows)
+    paginator = KeysetPaginator(
+        table_name,
+        key_columns,
+        batch_size,
+        nullable_keys=nullable_columns(schema_rows),
+        unique_key=is_unique_key(peerdb_conn, table_name, key_columns),
+    )
+    for column_names, rows in paginator.iter_pages(peerdb_conn):
+        ...
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import fnmatch
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from clickhouse_client import ClickHouseConnection
+
+# PeerDB's row version column (ReplacingMergeTree version) and sync time
+PEERDB_VERSION_COLUMN = "_peerdb_version"
+PEERDB_SYNCED_AT_COLUMN = "_peerdb_synced_at"
+
+SYNC_MODES = ("replace", "incremental")
+SYNC_MODE = os.getenv("DLT_PEERDB_SYNC_MODE", "replace").lower()
+CURSOR_COLUMN = os.getenv("DLT_PEERDB_CURSOR_COLUMN", PEERDB_SYNCED_AT_COLUMN)
+
+PARALLEL_TABLES = int(os.getenv("DLT_PEERDB_PARALLEL_TABLES", "4"))
+
+# Column name hints for the fallback key detection
+KEY_HINTS = ("id", "key", "number")
+
+Page = Tuple[List[str], List[tuple]]
+
+
+def resolve_table_names(peerdb_conn, patterns: Sequence[str]) -> List[str]:
+    """
+    Expand table names / glob patterns (``carrier_*``) against the tables of
+    the current database; plain names are kept as given. Order is preserved,
+    duplicates are dropped.
+    """
+    names: List[str] = []
+    existing: Optional[List[str]] = None
+    for pattern in patterns:
+        if not any(char in pattern for char in "*?["):
+            matches = [pattern]
+        else:
+            if existing is None:
+                result = peerdb_conn.query(
+                    "SELECT name FROM system.tables WHERE database = currentDatabase() ORDER BY name"
+                )
+                existing = [row[0] for row in result.result_rows] if result else []
+            matches = fnmatch.filter(existing, pattern)
+            if not matches:
+                print(f"⚠️ No tables match '{pattern}'")
+        names.extend(name for name in matches if name not in names)
+    return names
+
+
+class PeerDBConnection(ClickHouseConnection):
+    """PeerDB (ClickHouse) connection from the shared client pool (see clickhouse_client.py)"""
+
+    label = "PeerDB"
+
+    @classmethod
+    def from_env(cls, database="peerdb", **kwargs):
+        return super().from_env(database, **kwargs)
+
+    def query(self, sql, parameters=None):
+        """Execute query with error handling (QueryResult, or None on failure)"""
+        if not self.connected:
+            print("❌ Not connected to PeerDB")
+            return None
+
+        try:
+            if parameters:
+                return self.client.query(sql, parameters=parameters)
+            else:
+                return self.client.query(sql)
+        except Exception as e:
+            self._failed(e)
+            print(f"❌ Query failed: {e}")
+            return None
+
+
+class PooledConnection:
+    """
+    PeerDBConnection-like view of a ClickHouseClientPool
+
+    Every query borrows a connection for its duration only, so parallel
+    resources share (and reuse) the pool's connections without holding one
+    while dlt processes a batch.
+    """
+
+    connected = True
+
+    def __init__(self, pool, users: int = 1):
+        """
+        Args:
+            pool: ClickHouseClientPool of PeerDBConnections
+            users: Resources sharing the pool; the pool is closed when the
+                   last of them calls release()
+        """
+        self.pool = pool
+        self._users = users
+        self._lock = threading.Lock()
+
+    def query(self, sql, parameters=None):
+        with self.pool.connection() as conn:
+            return conn.query(sql, parameters)
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            last = self._users == 0
+        if last:
+            self.pool.close()
+
+
+class TableProgress:
+    """Rows, batches and throughput per table (thread-safe)"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, table_name: str):
+        with self._lock:
+            self.tables[table_name] = {
+                "rows": 0,
+                "batches": 0,
+                "started": time.perf_counter(),
+                "seconds": 0.0,
+                "status": "running",
+            }
+
+    def add_batch(self, table_name: str, rows: int) -> Dict[str, Any]:
+        with self._lock:
+            stats = self.tables[table_name]
+            stats["rows"] += rows
+            stats["batches"] += 1
+            stats["seconds"] = time.perf_counter() - stats["started"]
+            return dict(stats)
+
+    def finish(self, table_name: str, status: str = "done"):
+        with self._lock:
+            stats = self.tables[table_name]
+            stats["seconds"] = time.perf_counter() - stats["started"]
+            stats["status"] = status
+
+    @staticmethod
+    def rate(stats: Dict[str, Any]) -> float:
+        return stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+
+    def report(self, wall_seconds: Optional[float] = None) -> str:
+        lines = [f"{'table':<45} {'rows':>12} {'batches':>8} {'seconds':>9} {'rows/s':>10}  status"]
+        with self._lock:
+            for table_name, stats in self.tables.items():
+                lines.append(
+                    f"{table_name:<45} {stats['rows']:>12,} {stats['batches']:>8} "
+                    f"{stats['seconds']:>9.1f} {self.rate(stats):>10,.0f}  {stats['status']}"
+                )
+            total_rows = sum(stats["rows"] for stats in self.tables.values())
+            slowest = max((stats["seconds"] for stats in self.tables.values()), default=0.0)
+            summed = sum(stats["seconds"] for stats in self.tables.values())
+        footer = f"{len(self.tables)} tables, {total_rows:,} rows; slowest table {slowest:.1f}s, sum {summed:.1f}s"
+        if wall_seconds is not None:
+            footer += f", wall {wall_seconds:.1f}s"
+        lines.append(footer)
+        return "\n".join(lines)
+
+
+def _is_nullable(column_type: str) -> bool:
+    return column_type.startswith("Nullable(") or column_type.startswith(
+        "LowCardinality(Nullable("
+    )
+
+
+def nullable_columns(schema_rows: Sequence[tuple]) -> List[str]:
+    """Names of the Nullable columns in ``DESCRIBE TABLE`` rows"""
+    return [row[0] for row in schema_rows if _is_nullable(row[1])]
+
+
+def _table_sorting_key(peerdb_conn, table_name: str) -> Tuple[List[str], str]:
+    """(sorting key columns, engine) of a table from system.tables"""
+    result = peerdb_conn.query(
+        "SELECT sorting_key, engine FROM system.tables "
+        "WHERE database = currentDatabase() AND name = %(table_name)s",
+        {"table_name": table_name},
+    )
+    row = result.result_rows[0] if result and result.result_rows else ("", "")
+    columns = [part.strip().strip("`") for part in (row[0] or "").split(",")]
+    return [column for column in columns if column], (row[1] if len(row) > 1 else "") or ""
+
+
+def is_unique_key(peerdb_conn, table_name: str, key_columns: Sequence[str]) -> bool:
+    """
+    True when the key columns are known to identify a row: the sorting key of
+    a ReplacingMergeTree table followed by ``_peerdb_version`` (unmerged
+    versions of a row differ in their version)
+    """
+    sorting_key, engine = _table_sorting_key(peerdb_conn, table_name)
+    if "ReplacingMergeTree" not in engine or not sorting_key:
+        return False
+    versioned = sorting_key + [
+        column for column in (PEERDB_VERSION_COLUMN,) if column not in sorting_key
+    ]
+    return list(key_columns) == versioned
+
+
+def detect_key_columns(
+    peerdb_conn,
+    table_name: str,
+    schema_rows: Sequence[tuple],
+    preferred: Optional[Sequence[str]] = None,
+) -> List[str]:
+    """
+    Choose the keyset pagination columns of a table
+
+    Args:
+        peerdb_conn: PeerDBConnection
+        table_name: Table to read
+        schema_rows: ``DESCRIBE TABLE`` rows (name, type, ...)
+        preferred: Key columns to use when they exist (e.g. primary_key_for_updating)
+
+    Returns:
+        Key column names, most significant first (empty if the table has no columns)
+    """
+    column_types = {row[0]: row[1] for row in schema_rows}
+    columns = list(column_types)
+
+    key_columns: List[str] = []
+    if preferred and all(column in column_types for column in preferred):
+        key_columns = list(preferred)
+    else:
+        candidates = _table_sorting_key(peerdb_conn, table_name)[0]
+        if candidates and all(column in column_types for column in candidates):
+            key_columns = candidates
+
+    if not key_columns:
+        hinted = [
+            column
+            for column in columns
+            if any(hint in column.lower() for hint in KEY_HINTS)
+            and not _is_nullable(column_types[column])
+        ]
+        key_columns = hinted[:1] or columns[:1]
+
+    if (
+        PEERDB_VERSION_COLUMN in column_types
+        and key_columns
+        and PEERDB_VERSION_COLUMN not in key_columns
+    ):
+        key_columns.append(PEERDB_VERSION_COLUMN)
+
+    nullable = [column for column in key_columns if _is_nullable(column_types[column])]
+    if nullable:
+        print(
+            f"⚠️ Key column(s) {', '.join(nullable)} are Nullable; rows with NULL keys "
+            "are read in a separate final query"
+        )
+    return key_columns
+
+
+def resolve_sync_mode(sync_mode: Optional[str] = None) -> str:
+    sync_mode = (sync_mode or SYNC_MODE).lower()
+    if sync_mode not in SYNC_MODES:
+        raise ValueError(
+            f"Unknown PeerDB sync mode '{sync_mode}' (expected one of: {', '.join(SYNC_MODES)})"
+        )
+    return sync_mode
+
+
+def choose_cursor_column(
+    schema_rows: Sequence[tuple], preferred: Optional[str] = None
+) -> Optional[str]:
+    """Incremental cursor column: ``preferred`` (DLT_PEERDB_CURSOR_COLUMN) or a PeerDB sync column"""
+    columns = {row[0] for row in schema_rows}
+    for column in (preferred or CURSOR_COLUMN, PEERDB_SYNCED_AT_COLUMN, PEERDB_VERSION_COLUMN):
+        if column in columns:
+            return column
+    return None
+
+
+def cursor_filter(cursor_column: str, last_value: Any) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    WHERE clause + parameters for the rows changed since ``last_value``
+
+    ``>=`` re-reads the rows at the high-water mark; dlt's incremental drops
+    the ones it already loaded. Returns (None, {}) on the first run.
+    """
+    if last_value is None:
+        return None, {}
+    return f"{cursor_column} >= %(cursor_start)s", {"cursor_start": _cursor_value(last_value)}
+
+
+def _cursor_value(value: Any) -> Any:
+    # clickhouse-connect binds datetimes with second precision; keep the
+    # fraction for DateTime64 keys so the next page starts at the right row
+    if isinstance(value, datetime) and value.microsecond:
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return value
+
+
+class KeysetPaginator:
+    """Reads a table in key order, ``batch_size`` rows per query"""
+
+    def __init__(
+        self,
+        table_name: str,
+        key_columns: Sequence[str],
+        batch_size: int,
+        limit: Optional[int] = None,
+        nullable_keys: Sequence[str] = (),
+        where_sql: Optional[str] = None,
+        where_parameters: Optional[Dict[str, Any]] = None,
+        unique_key: bool = False,
+    ):
+        """
+        Args:
+            table_name: Table to read
+            key_columns: Keyset columns (from detect_key_columns())
+            batch_size: Rows per query
+            limit: Maximum rows to read in total (None for all)
+            nullable_keys: Key columns that may hold NULL
+            where_sql: Extra row filter (e.g. cursor_filter())
+            where_parameters: Query parameters used by ``where_sql``
+            unique_key: The key identifies a row (see is_unique_key()); else
+                        the last key value of every full page is read as a
+                        whole group in an extra query
+        """
+        if not key_columns:
+            raise ValueError(f"No key columns for keyset pagination of {table_name}")
+
+        self.table_name = table_name
+        self.key_columns = list(key_columns)
+        self.batch_size = batch_size
+        self.limit = limit
+        self.nullable_keys = [column for column in nullable_keys if column in self.key_columns]
+        self.where_sql = where_sql
+        self.where_parameters = dict(where_parameters or {})
+        self.unique_key = unique_key
+
+        self.queries = 0
+        self.rows = 0
+
+    def _not_null_sql(self) -> str:
+        return " AND ".join(f"{column} IS NOT NULL" for column in self.nullable_keys)
+
+    def build_query(self, with_cursor: bool, page_size: Optional[int], operator: str = ">") -> str:
+        """Page query (``key > cursor``) or, with operator "=", key group query"""
+        conditions = [f"({self.where_sql})"] if self.where_sql else []
+        if self.nullable_keys:
+            conditions.append(self._not_null_sql())
+        if with_cursor:
+            keys = ", ".join(self.key_columns)
+            values = ", ".join(f"%(key_{i})s" for i in range(len(self.key_columns)))
+            conditions.append(f"({keys}) {operator} ({values})")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit = f"LIMIT {page_size}" if page_size is not None else ""
+        return f"""
+            SELECT * FROM {self.table_name}
+            {where}
+            ORDER BY {', '.join(self.key_columns)}
+            {limit}
+        """
+
+    def _run(self, peerdb_conn, query: str, parameters: Optional[Dict[str, Any]] = None):
+        result = peerdb_conn.query(query, parameters)
+        self.queries += 1
+        if result is None:
+            # A failed page cannot be skipped: the next page starts after it
+            raise RuntimeError(f"Batch query failed for {self.table_name}")
+        return result
+
+    def _parameters(self, cursor: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        parameters = dict(self.where_parameters)
+        if cursor is not None:
+            parameters.update({f"key_{i}": _cursor_value(value) for i, value in enumerate(cursor)})
+        return parameters or None
+
+    def _remaining(self) -> Optional[int]:
+        return None if self.limit is None else self.limit - self.rows
+
+    def iter_pages(self, peerdb_conn) -> Iterator[Page]:
+        """Yield (column_names, rows) per page until the table (or limit) is exhausted"""
+        cursor: Optional[tuple] = None
+        key_indexes: Optional[List[int]] = None
+
+        while True:
+            remaining = self._remaining()
+            if remaining is not None and remaining <= 0:
+                return
+            page_size = self.batch_size if remaining is None else min(self.batch_size, remaining)
+
+            result = self._run(
+                peerdb_conn,
+                self.build_query(cursor is not None, page_size),
+                self._parameters(cursor),
+            )
+            rows = result.result_rows
+            if not rows:
+                break
+
+            column_names = list(result.column_names)
+            full_page = len(rows) == page_size
+            if key_indexes is None:
+                key_indexes = [column_names.index(column) for column in self.key_columns]
+            cursor = tuple(rows[-1][index] for index in key_indexes)
+
+            if full_page and not self.unique_key:
+                # The last key value may continue past the page: cut it off
+                # and read its rows as one group
+                head_rows = len(rows)
+                while (
+                    head_rows
+                    and tuple(rows[head_rows - 1][index] for index in key_indexes) == cursor
+                ):
+                    head_rows -= 1
+                rows = rows[:head_rows]
+                if rows:
+                    self.rows += len(rows)
+                    yield column_names, rows
+                remaining = self._remaining()
+                group = self._run(
+                    peerdb_conn,
+                    self.build_query(True, remaining, operator="="),
+                    self._parameters(cursor),
+                ).result_rows
+                if group:
+                    self.rows += len(group)
+                    yield column_names, group
+                continue
+
+            self.rows += len(rows)
+            yield column_names, rows
+
+            if not full_page:
+                break
+
+        if self.nullable_keys:
+            yield from self._iter_null_key_rows(peerdb_conn)
+
+    def _iter_null_key_rows(self, peerdb_conn) -> Iterator[Page]:
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            return
+        limit_sql = f"LIMIT {remaining}" if remaining is not None else ""
+        where_sql = f"({self.where_sql}) AND " if self.where_sql else ""
+        result = self._run(
+            peerdb_conn,
+            f"SELECT * FROM {self.table_name} "
+            f"WHERE {where_sql}NOT ({self._not_null_sql()}) {limit_sql}",
+            self.where_parameters or None,
+        )
+        if result.result_rows:
+            self.rows += len(result.result_rows)
+            yield list(result.column_names), result.result_rows
@@ -20,6 +20,15 @@ Usage:
     
     # Extract limited records for testing
     poetry run python src/src/peerdb_flexible_pipeline.py --table carrier_carrier_invoice_original_flat_ups --limit 1000
+    
+    # Page on explicit (composite) key columns instead of the table's sorting key.
+    # A key that is not unique (charge lines share invoice_number and
+    # tracking_number) still reads every row, with one extra query per batch
+    # for the key group at the batch boundary
+    poetry run python src/src/peerdb_flexible_pipeline.py --table carrier_carrier_invoice_original_flat_ups --key invoice_number,tracking_number
+    
+    # Extract several tables (names or glob patterns) concurrently into one pipeline
+    poetry run python src/src/peerdb_flexible_pipeline.py --table 'carrier_*' industry_index_logins
 
 Configuration:
     Set in .env file:
@@ -29,9 +38,10 @@ Configuration:
     - CLICKHOUSE_PASSWORD: PeerDB password
     - CLICKHOUSE_DATABASE: Database name (should be 'peerdb')
     - CLICKHOUSE_SECURE: Use SSL (default: true)
+    - DLT_PEERDB_PARALLEL_TABLES: Concurrent table queries with several tables (default: 4)
 
 Output:
-    - DuckDB: peerdb_{table_name}.duckdb
+    - DuckDB: peerdb_{table_name}.duckdb (peerdb_multi_table.duckdb for several tables)
     - CSV: data/output/peerdb_{table_name}_YYYYMMDD_HHMMSS.csv
 
 Author: Gabriel Jerdhy Lapuz
@@ -41,19 +51,25 @@ Project: gsr_automation
 import argparse
 import logging
 import os
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 import dlt
 from dotenv import load_dotenv
 
-# ClickHouse imports with fallback handling
-try:
-    import clickhouse_connect
-    CLICKHOUSE_AVAILABLE = True
-except ImportError:
-    CLICKHOUSE_AVAILABLE = False
-    print("⚠️ clickhouse_connect not available")
+from clickhouse_client import ClickHouseClientPool, get_client_factory
+from peerdb_extraction import (
+    PARALLEL_TABLES,
+    KeysetPaginator,
+    PeerDBConnection,
+    PooledConnection,
+    TableProgress,
+    detect_key_columns,
+    is_unique_key,
+    nullable_columns,
+    resolve_table_names,
+)
 
 # DuckDB imports with fallback handling
 try:
@@ -75,83 +91,27 @@ output_dir = os.getenv("OUTPUT_DIR", "data/output")
 os.makedirs(output_dir, exist_ok=True)
 
 
-class PeerDBConnection:
-    """Manages PeerDB ClickHouse connections with error handling"""
-    
-    def __init__(self, host, port, username, password, database, secure=True):
-        self.host = host
-        self.port = port
-        self.username = username
-        self.password = password
-        self.database = database
-        self.secure = secure
-        self.client = None
-        self.connected = False
-        
-    def connect(self):
-        """Establish connection to PeerDB ClickHouse with error handling"""
-        if not CLICKHOUSE_AVAILABLE:
-            print("⚠️ ClickHouse library not available")
-            return False
-
-        try:
-            self.client = clickhouse_connect.get_client(
-                host=self.host,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                database=self.database,
-                secure=self.secure,
-                connect_timeout=60,
-                send_receive_timeout=300,
-                verify=False,  # Disable SSL verification for cloud connections
-            )
-
-            # Test connection
-            result = self.client.command("SELECT 1")
-            if result == 1:
-                self.connected = True
-                print(f"✅ Connected to PeerDB: {self.host}:{self.port}/{self.database}")
-                return True
-            else:
-                print(f"❌ PeerDB connection test failed")
-                return False
-
-        except Exception as e:
-            print(f"❌ Failed to connect to PeerDB: {e}")
-            return False
-
-    def query(self, sql, parameters=None):
-        """Execute query with error handling"""
-        if not self.connected:
-            print("❌ Not connected to PeerDB")
-            return None
-
-        try:
-            if parameters:
-                return self.client.query(sql, parameters=parameters)
-            else:
-                return self.client.query(sql)
-        except Exception as e:
-            print(f"❌ Query failed: {e}")
-            return None
-
-    def close(self):
-        """Close the connection"""
-        if self.client:
-            self.client.close()
-            self.connected = False
-
+def create_peerdb_table_resource(
+    peerdb_conn, table_name, batch_size=10000, limit=None, key=None, parallelized=False, progress=None
+):
+    """
+    Create a DLT resource for any PeerDB table
 
-def create_peerdb_table_resource(peerdb_conn, table_name, batch_size=10000, limit=None):
-    """Create a DLT resource for any PeerDB table"""
+    Args:
+        peerdb_conn: PeerDBConnection (or PooledConnection shared by several tables)
+        key: Keyset columns (detected if None)
+        parallelized: Let dlt extract this resource concurrently with the others
+        progress: TableProgress collecting rows / throughput per table
+    """
     
     resource_name = table_name.replace("_", "_")  # Clean up name for DLT
+    progress = progress if progress is not None else TableProgress()
 
     @dlt.resource(
         name=resource_name,
         write_disposition=os.getenv("DLT_WRITE_DISPOSITION", "replace"),
         primary_key=None,  # Will be determined dynamically
+        parallelized=parallelized,
     )
     def peerdb_table_resource():
         """Extract data from any PeerDB table"""
@@ -160,137 +120,132 @@ def create_peerdb_table_resource(peerdb_conn, table_name, batch_size=10000, limi
             print("❌ PeerDB connection not available")
             return
 
+        progress.start(table_name)
+        status = "failed"
         try:
             # Get table schema first
             schema_query = f"DESCRIBE TABLE {table_name}"
             schema_result = peerdb_conn.query(schema_query)
             
-            columns = []
-            primary_key_candidates = []
-            
-            if schema_result:
+            schema_rows = schema_result.result_rows if schema_result else []
+            if schema_rows:
                 print(f"📋 Table schema for {table_name}:")
-                for row in schema_result.result_rows:
-                    column_name = row[0]
-                    column_type = row[1]
-                    columns.append(column_name)
-                    print(f"   {column_name}: {column_type}")
-                    
-                    # Look for potential primary key columns
-                    if any(pk_hint in column_name.lower() for pk_hint in ['id', 'key', 'number']):
-                        primary_key_candidates.append(column_name)
-            
-            # Choose ordering column (prefer primary key candidates, fallback to first column)
-            order_column = primary_key_candidates[0] if primary_key_candidates else columns[0] if columns else None
-            
-            # Get total count
-            count_query = f"SELECT COUNT(*) FROM {table_name}"
-            count_result = peerdb_conn.query(count_query)
-            total_count = count_result.result_rows[0][0] if count_result else 0
+                for row in schema_rows:
+                    print(f"   {row[0]}: {row[1]}")
             
-            print(f"📊 Total records in {table_name}: {total_count:,}")
-            print(f"🔑 Using '{order_column}' for ordering")
-            
-            if total_count == 0:
-                print("ℹ️ No data found in table")
-                return
-
-            # Apply limit if specified
-            records_to_extract = min(total_count, limit) if limit else total_count
-            total_batches = (records_to_extract + batch_size - 1) // batch_size
+            # Keyset columns: --key, else the table's sorting key (composite
+            # keys supported), else the first id/key/number column
+            key_columns = detect_key_columns(peerdb_conn, table_name, schema_rows, preferred=key)
+            paginator = KeysetPaginator(
+                table_name,
+                key_columns,
+                batch_size,
+                limit=limit,
+                nullable_keys=nullable_columns(schema_rows),
+                unique_key=is_unique_key(peerdb_conn, table_name, key_columns),
+            )
             
-            print(f"🎯 Extracting {records_to_extract:,} records")
-            print(f"🔄 Processing {total_batches} batches of {batch_size:,} records each")
+            print(
+                f"🔑 Using '{', '.join(key_columns)}' for keyset pagination"
+                + ("" if paginator.unique_key else " (not known to be unique: paged by key group)")
+            )
+            if limit:
+                print(f"🎯 Extracting up to {limit:,} records")
+            print(f"🔄 Processing batches of {batch_size:,} records each")
 
             # Extract data in batches
-            for batch_num in range(total_batches):
-                offset = batch_num * batch_size
-                current_batch_size = min(batch_size, records_to_extract - offset)
-                
-                # Query with LIMIT and OFFSET for pagination
-                if order_column:
-                    data_query = f"""
-                    SELECT * FROM {table_name}
-                    ORDER BY {order_column}
-                    LIMIT {current_batch_size} OFFSET {offset}
-                    """
-                else:
-                    data_query = f"""
-                    SELECT * FROM {table_name}
-                    LIMIT {current_batch_size} OFFSET {offset}
-                    """
+            for batch_num, (columns, rows) in enumerate(paginator.iter_pages(peerdb_conn), 1):
+                # Convert to list of dictionaries
+                batch_data = [dict(zip(columns, row)) for row in rows]
                 
-                print(f"📥 Extracting batch {batch_num + 1}/{total_batches} (offset: {offset:,}, size: {current_batch_size:,})")
+                stats = progress.add_batch(table_name, len(batch_data))
+                print(
+                    f"✅ {table_name} batch {batch_num}: {len(batch_data):,} records extracted "
+                    f"(total: {stats['rows']:,}, {TableProgress.rate(stats):,.0f} rows/s)"
+                )
                 
-                result = peerdb_conn.query(data_query)
-                
-                if result and result.result_rows:
-                    # Convert to list of dictionaries
-                    batch_data = []
-                    
-                    for row in result.result_rows:
-                        record = dict(zip(columns, row))
-                        batch_data.append(record)
-                    
-                    print(f"✅ Batch {batch_num + 1}: {len(batch_data):,} records extracted")
-                    
-                    # Yield the batch data
-                    yield batch_data
-                else:
-                    print(f"⚠️ Batch {batch_num + 1}: No data returned")
+                # Yield the batch data
+                yield batch_data
+            
+            if paginator.rows == 0:
+                print(f"ℹ️ No data found in {table_name}")
+            else:
+                print(f"📊 Total records extracted from {table_name}: {paginator.rows:,}")
+            status = "done"
 
         except Exception as e:
             print(f"❌ Failed to extract from {table_name}: {e}")
             import traceback
             traceback.print_exc()
             raise
+        finally:
+            progress.finish(table_name, status)
+            if isinstance(peerdb_conn, PooledConnection):
+                peerdb_conn.release()
 
     return peerdb_table_resource
 
 
-def peerdb_table_source(table_name, batch_size=10000, limit=None):
+def peerdb_table_source(table_name, batch_size=10000, limit=None, key=None, progress=None):
     """
-    DLT source that extracts data FROM any PeerDB table
+    DLT source that extracts data FROM one or more PeerDB tables
+    
+    table_name may be a table name, a glob pattern or a list of either. Several
+    tables become parallelized resources sharing a pool of up to
+    DLT_PEERDB_PARALLEL_TABLES connections.
     
     Note: Using environment variables for secure credential management
     """
     
     # Create connection with environment variables
-    peerdb_conn = PeerDBConnection(
-        host=os.getenv("CLICKHOUSE_HOST"),
-        port=int(os.getenv("CLICKHOUSE_PORT", "8443")),
-        username=os.getenv("CLICKHOUSE_USERNAME"),
-        password=os.getenv("CLICKHOUSE_PASSWORD"),
-        database=os.getenv("CLICKHOUSE_DATABASE", "peerdb"),
-        secure=os.getenv("CLICKHOUSE_SECURE", "true").lower() == "true",
-    )
+    peerdb_conn = PeerDBConnection.from_env()
     
     # Test connection
     if not peerdb_conn.connect():
         print("❌ Failed to connect to PeerDB")
         return None
     
-    print(f"🎯 Target table: {table_name}")
+    patterns = [table_name] if isinstance(table_name, str) else list(table_name)
+    table_names = resolve_table_names(peerdb_conn, patterns)
+    if not table_names:
+        print("❌ No tables to extract")
+        return None
+    
+    if len(table_names) == 1:
+        print(f"🎯 Target table: {table_names[0]}")
+        # Create and return the resource
+        return create_peerdb_table_resource(
+            peerdb_conn, table_names[0], batch_size, limit, key, progress=progress
+        )
     
-    # Create and return the resource
-    return create_peerdb_table_resource(peerdb_conn, table_name, batch_size, limit)
+    # One resource per table, extracted concurrently over a shared, bounded pool
+    pool = ClickHouseClientPool(peerdb_conn.clone, size=PARALLEL_TABLES, primary=peerdb_conn)
+    pooled_conn = PooledConnection(pool, users=len(table_names))
+    print(f"🎯 Target tables ({len(table_names)}, up to {pool.size} queries at once): {', '.join(table_names)}")
+    return [
+        create_peerdb_table_resource(
+            pooled_conn, name, batch_size, limit, key, parallelized=True, progress=progress
+        )
+        for name in table_names
+    ]
 
 
 @dlt.source
-def peerdb_source(table_name, batch_size=10000, limit=None):
-    """DLT source wrapper for PeerDB table extraction"""
-    return peerdb_table_source(table_name, batch_size, limit)
+def peerdb_source(table_name, batch_size=10000, limit=None, key=None, progress=None):
+    """DLT source wrapper for PeerDB table extraction (one or more tables)"""
+    return peerdb_table_source(table_name, batch_size, limit, key, progress)
 
 
-def run_peerdb_extraction(table_name, batch_size=10000, limit=None, destination="duckdb"):
+def run_peerdb_extraction(table_name, batch_size=10000, limit=None, destination="duckdb", key=None):
     """
     Run the main pipeline that extracts data from any PeerDB table to DuckDB
     
     Args:
-        table_name: Name of the table to extract
+        table_name: Name of the table to extract, or a list of names / glob patterns
         batch_size: Number of records per batch
         limit: Maximum number of records to extract (None for all)
         destination: Destination for the extracted data (default: "duckdb")
+        key: Keyset pagination columns (None: detect from the table's sorting key)
     
     Returns:
         dlt.Pipeline: The completed pipeline object
@@ -299,7 +254,8 @@ def run_peerdb_extraction(table_name, batch_size=10000, limit=None, destination=
     print("=" * 60)
     
     # Create pipeline with table-specific name
-    pipeline_name = f"peerdb_{table_name}"
+    single_table = isinstance(table_name, str) and not any(char in table_name for char in "*?[")
+    pipeline_name = f"peerdb_{table_name}" if single_table else "peerdb_multi_table"
     pipeline = dlt.pipeline(
         pipeline_name=pipeline_name,
         destination=destination,
@@ -316,15 +272,19 @@ def run_peerdb_extraction(table_name, batch_size=10000, limit=None, destination=
     
     try:
         # Create and run the PeerDB source
-        source = peerdb_source(table_name, batch_size, limit)
-        if source is None:
+        progress = TableProgress()
+        source = peerdb_source(table_name, batch_size, limit, key, progress)
+        if source is None or not source.resources:
             print("❌ Failed to create PeerDB source")
             return None
             
+        started = time.perf_counter()
         info = pipeline.run(source)
         
         print(f"\n✅ Extraction pipeline completed successfully!")
         print(f"📊 Load info: {info}")
+        print(f"\n⏱️ Per-table extraction:\n{progress.report(time.perf_counter() - started)}")
+        print(get_client_factory().summary())
         
         return pipeline
         
@@ -388,16 +348,26 @@ def export_to_csv(pipeline, table_name):
 def main():
     """Main function with command line argument parsing"""
     parser = argparse.ArgumentParser(description="Extract data from PeerDB tables")
-    parser.add_argument("--table", required=True, help="Table name to extract")
+    parser.add_argument(
+        "--table",
+        required=True,
+        nargs="+",
+        help="Table name(s) or glob patterns to extract (comma-separated also accepted)",
+    )
     parser.add_argument("--batch-size", type=int, default=10000, help="Batch size for extraction")
     parser.add_argument("--limit", type=int, help="Maximum number of records to extract")
     parser.add_argument("--destination", default="duckdb", help="Destination for extracted data")
+    parser.add_argument(
+        "--key",
+        help="Comma-separated keyset pagination columns (default: the table's sorting key)",
+    )
     
     args = parser.parse_args()
     
     print("🚀 PeerDB Flexible Pipeline")
     print("=" * 50)
-    print(f"📋 Table: {args.table}")
+    tables = [name.strip() for value in args.table for name in value.split(",") if name.strip()]
+    print(f"📋 Table(s): {', '.join(tables)}")
     print(f"📦 Batch size: {args.batch_size:,}")
     if args.limit:
         print(f"🎯 Limit: {args.limit:,}")
@@ -405,11 +375,15 @@ def main():
     
     # Run the extraction pipeline
     print("\n1. Running PeerDB extraction...")
-    pipeline = run_peerdb_extraction(args.table, args.batch_size, args.limit, args.destination)
+    key = [column.strip() for column in args.key.split(",")] if args.key else None
+    pipeline = run_peerdb_extraction(
+        tables[0] if len(tables) == 1 else tables, args.batch_size, args.limit, args.destination, key
+    )
     
     if pipeline:
         print("\n2. Exporting to CSV...")
-        export_to_csv(pipeline, args.table)
+        for resource_name in pipeline.default_schema.data_table_names():
+            export_to_csv(pipeline, resource_name)
     
     print("\n✅ Pipeline execution completed!")
 
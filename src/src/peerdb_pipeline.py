@@ -16,6 +16,9 @@ Usage:
 
 Configuration:
     Set in .env file:
+    - DLT_PEERDB_SYNC_MODE: "replace" (full re-extract, default) or "incremental"
+      (merge only the rows PeerDB synced since the last run)
+    - DLT_PEERDB_CURSOR_COLUMN: incremental cursor (default: _peerdb_synced_at)
     - CLICKHOUSE_HOST: PeerDB ClickHouse host
     - CLICKHOUSE_PORT: PeerDB ClickHouse port (default: 8443)
     - CLICKHOUSE_USERNAME: PeerDB username
@@ -39,14 +42,18 @@ from typing import Any, Dict, List, Optional
 import dlt
 from dotenv import load_dotenv
 
-# ClickHouse imports with fallback handling
-try:
-    import clickhouse_connect
-
-    CLICKHOUSE_AVAILABLE = True
-except ImportError:
-    CLICKHOUSE_AVAILABLE = False
-    print("⚠️ clickhouse_connect not available")
+from clickhouse_client import missing_env_vars
+from peerdb_extraction import (
+    PEERDB_VERSION_COLUMN,
+    KeysetPaginator,
+    PeerDBConnection,
+    choose_cursor_column,
+    cursor_filter,
+    detect_key_columns,
+    is_unique_key,
+    nullable_columns,
+    resolve_sync_mode,
+)
 
 # DuckDB imports with fallback handling
 try:
@@ -69,88 +76,78 @@ output_dir = os.getenv("OUTPUT_DIR", "data/output")
 os.makedirs(output_dir, exist_ok=True)
 
 
-class PeerDBConnection:
-    """Manages PeerDB ClickHouse connections with error handling"""
+def create_peerdb_table_resource(
+    peerdb_conn, table_name, resource_name=None, sync_mode=None
+):
+    """
+    Create a DLT resource for any PeerDB table
+
+    sync_mode (default: DLT_PEERDB_SYNC_MODE): "replace" re-extracts the whole
+    table; "incremental" reads only the rows PeerDB synced since the last run
+    (dlt incremental cursor on _peerdb_synced_at / _peerdb_version) and merges
+    them into the destination on the primary key. Tables without a unique key
+    (primary_key_for_updating, or a ReplacingMergeTree sorting key) fall back
+    to a full replace.
+    """
 
-    def __init__(self, host, port, username, password, database, secure=True):
-        self.host = host
-        self.port = port
-        self.username = username
-        self.password = password
-        self.database = database
-        self.secure = secure
-        self.client = None
-        self.connected = False
+    if resource_name is None:
+        resource_name = table_name.replace("_", "_")  # Clean up name for DLT
 
-    def connect(self):
-        """Establish connection to PeerDB ClickHouse with error handling"""
-        if not CLICKHOUSE_AVAILABLE:
-            print("⚠️ ClickHouse library not available")
-            return False
+    sync_mode = resolve_sync_mode(sync_mode)
 
-        try:
-            self.client = clickhouse_connect.get_client(
-                host=self.host,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                database=self.database,
-                secure=self.secure,
-                connect_timeout=60,
-                send_receive_timeout=300,
-                verify=False,  # Disable SSL verification for cloud connections
+    # Get table schema first (the incremental cursor and merge key depend on it)
+    schema_result = (
+        peerdb_conn.query(f"DESCRIBE TABLE {table_name}")
+        if peerdb_conn.connected
+        else None
+    )
+    schema_rows = schema_result.result_rows if schema_result else []
+    schema_columns = [row[0] for row in schema_rows]
+
+    # Keyset pagination on the actual primary key column (no COUNT(*),
+    # no OFFSET: every batch starts after the last key of the previous one)
+    key_columns = (
+        detect_key_columns(
+            peerdb_conn, table_name, schema_rows, preferred=["primary_key_for_updating"]
+        )
+        if schema_rows
+        else []
+    )
+    unique_key = bool(key_columns) and is_unique_key(peerdb_conn, table_name, key_columns)
+
+    cursor_column = None
+    merge_key = [column for column in key_columns if column != PEERDB_VERSION_COLUMN]
+    if sync_mode == "incremental":
+        cursor_column = choose_cursor_column(schema_rows)
+        # Merging on a key that is not unique would collapse distinct rows
+        if merge_key != ["primary_key_for_updating"] and not unique_key:
+            merge_key = []
+        if cursor_column is None or not merge_key:
+            print(
+                f"⚠️ {table_name} has no PeerDB sync column or unique primary key - "
+                "falling back to a full replace"
             )
-
-            # Test connection
-            result = self.client.command("SELECT 1")
-            if result == 1:
-                self.connected = True
-                print(
-                    f"✅ Connected to PeerDB: {self.host}:{self.port}/{self.database}"
-                )
-                return True
-            else:
-                print(f"❌ PeerDB connection test failed")
-                return False
-
-        except Exception as e:
-            print(f"❌ Failed to connect to PeerDB: {e}")
-            return False
-
-    def query(self, sql, parameters=None):
-        """Execute query with error handling"""
-        if not self.connected:
-            print("❌ Not connected to PeerDB")
-            return None
-
-        try:
-            if parameters:
-                return self.client.query(sql, parameters=parameters)
-            else:
-                return self.client.query(sql)
-        except Exception as e:
-            print(f"❌ Query failed: {e}")
-            return None
-
-    def close(self):
-        """Close the connection"""
-        if self.client:
-            self.client.close()
-            self.connected = False
-
-
-def create_peerdb_table_resource(peerdb_conn, table_name, resource_name=None):
-    """Create a DLT resource for any PeerDB table"""
-
-    if resource_name is None:
-        resource_name = table_name.replace("_", "_")  # Clean up name for DLT
+            sync_mode = "replace"
+    incremental = sync_mode == "incremental"
 
     @dlt.resource(
         name=resource_name,
-        write_disposition=os.getenv("DLT_WRITE_DISPOSITION", "replace"),
-        primary_key=None,  # Will be determined dynamically
+        write_disposition=(
+            "merge" if incremental else os.getenv("DLT_WRITE_DISPOSITION", "replace")
+        ),
+        primary_key=merge_key if incremental else None,
+        # Several changes of one row in a run: keep the latest version
+        columns=(
+            {PEERDB_VERSION_COLUMN: {"dedup_sort": "desc"}}
+            if incremental and PEERDB_VERSION_COLUMN in schema_columns
+            else None
+        ),
     )
-    def peerdb_table_resource():
+    def peerdb_table_resource(
+        synced=(
+            dlt.sources.incremental(cursor_column) if incremental else None
+        )
+    ):
         """Extract data from PeerDB industry_index_logins table"""
 
         if not peerdb_conn.connected:
@@ -158,69 +155,62 @@ def create_peerdb_table_resource(peerdb_conn, table_name, resource_name=None):
             return
 
         try:
-            # Get table schema first
-            schema_query = f"DESCRIBE TABLE {table_name}"
-            schema_result = peerdb_conn.query(schema_query)
-
-            if schema_result:
+            if schema_rows:
                 print(f"📋 Table schema for {table_name}:")
-                for row in schema_result.result_rows:
+                for row in schema_rows:
                     print(f"   {row[0]}: {row[1]}")
 
-            # Get total count
-            count_query = f"SELECT COUNT(*) FROM {table_name}"
-            count_result = peerdb_conn.query(count_query)
-            total_count = count_result.result_rows[0][0] if count_result else 0
-
-            print(f"📊 Total records in {table_name}: {total_count:,}")
-
-            if total_count == 0:
-                print("ℹ️ No data found in table")
-                return
-
             # Configure batch processing
             batch_size = int(os.getenv("DLT_CLICKHOUSE_BATCH_SIZE", "50000"))
-            total_batches = (total_count + batch_size - 1) // batch_size
 
+            where_sql, where_parameters = None, {}
+            if incremental:
+                where_sql, where_parameters = cursor_filter(cursor_column, synced.last_value)
+                if where_sql:
+                    print(
+                        f"🔄 Incremental sync of {table_name}: rows with "
+                        f"{cursor_column} >= {synced.last_value}"
+                    )
+                else:
+                    print(f"📥 Initial sync of {table_name} (no {cursor_column} state yet)")
+
+            paginator = KeysetPaginator(
+                table_name,
+                key_columns,
+                batch_size,
+                nullable_keys=nullable_columns(schema_rows),
+                where_sql=where_sql,
+                where_parameters=where_parameters,
+                unique_key=unique_key,
+            )
             print(
-                f"🔄 Processing {total_batches} batches of {batch_size:,} records each"
+                f"🔄 Processing batches of {batch_size:,} records each "
+                f"(keyset on {', '.join(key_columns)})"
             )
 
             # Extract data in batches
-            for batch_num in range(total_batches):
-                offset = batch_num * batch_size
-
-                # Query with LIMIT and OFFSET for pagination
-                data_query = f"""
-                SELECT * FROM {table_name}
-                ORDER BY primary_key_for_updating  -- Using the actual primary key column
-                LIMIT {batch_size} OFFSET {offset}
-                """
+            for batch_num, (columns, rows) in enumerate(paginator.iter_pages(peerdb_conn), 1):
+                # Convert to list of dictionaries
+                batch_data = [dict(zip(columns, row)) for row in rows]
 
                 print(
-                    f"📥 Extracting batch {batch_num + 1}/{total_batches} (offset: {offset:,})"
+                    f"✅ Batch {batch_num}: {len(batch_data):,} records extracted "
+                    f"(total: {paginator.rows:,})"
                 )
 
-                result = peerdb_conn.query(data_query)
+                # Yield the batch data
+                yield batch_data
 
-                if result and result.result_rows:
-                    # Convert to list of dictionaries
-                    # Get column names from the result metadata
-                    columns = result.column_names
-                    batch_data = []
-
-                    for row in result.result_rows:
-                        record = dict(zip(columns, row))
-                        batch_data.append(record)
-
-                    print(
-                        f"✅ Batch {batch_num + 1}: {len(batch_data):,} records extracted"
-                    )
-
-                    # Yield the batch data
-                    yield batch_data
-                else:
-                    print(f"⚠️ Batch {batch_num + 1}: No data returned")
+            if paginator.rows == 0:
+                print(
+                    f"ℹ️ No rows synced since {synced.last_value}"
+                    if incremental and where_sql
+                    else "ℹ️ No data found in table"
+                )
+            elif incremental and where_sql:
+                print(f"📊 Changed records in {table_name}: {paginator.rows:,}")
+            else:
+                print(f"📊 Total records in {table_name}: {paginator.rows:,}")
 
         except Exception as e:
             print(f"❌ Failed to extract from {table_name}: {e}")
@@ -236,21 +226,20 @@ def peerdb_industry_index_source():
     """
     DLT source that extracts data FROM PeerDB industry_index_logins table
 
-    Note: Using direct connection credentials like dlt_pipeline_examples.py
+    Note: Using environment variables for secure credential management
     """
 
     # Target table name (using the view in peerdb schema)
     table_name = "industry_index_logins"
 
-    # Create connection with direct credentials (same as dlt_pipeline_examples.py)
-    peerdb_conn = PeerDBConnection(
-        host="pgy8egpix3.us-east-1.aws.clickhouse.cloud",
-        port=8443,
-        username="gabriellapuz",
-        password="PTN.776)RR3s",
-        database="peerdb",
-        secure=True,
-    )
+    # Validate required environment variables
+    missing_vars = missing_env_vars()
+    if missing_vars:
+        print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
+        return None
+
+    # Create connection with environment variables
+    peerdb_conn = PeerDBConnection.from_env()
 
     # Test connection
     if not peerdb_conn.connect():
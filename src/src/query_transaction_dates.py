@@ -6,6 +6,10 @@ Query Transaction Dates from ClickHouse
 This script queries the ClickHouse table directly to get distinct transaction_date values
 without extracting the full dataset.
 
+The date range checks use the same transaction_date filter strategy as the
+extraction pipelines (DLT_CLICKHOUSE_DATE_STRATEGY) and finish with a
+comparison of rows scanned by every strategy the table supports.
+
 Usage:
     poetry run python src/src/query_transaction_dates.py
 
@@ -13,17 +17,11 @@ Author: Gabriel Jerdhy Lapuz
 Project: gsr_automation
 """
 
-import os
 from datetime import datetime
 from dotenv import load_dotenv
 
-# ClickHouse imports
-try:
-    import clickhouse_connect
-    CLICKHOUSE_AVAILABLE = True
-except ImportError:
-    CLICKHOUSE_AVAILABLE = False
-    print("⚠️ clickhouse_connect not available")
+from clickhouse_client import CLICKHOUSE_AVAILABLE, ClickHouseConnection, missing_env_vars
+from clickhouse_extraction import compare_date_filters, detect_date_filter, query_read_rows
 
 
 def query_transaction_dates():
@@ -40,38 +38,22 @@ def query_transaction_dates():
     print("=" * 60)
     
     # Validate required environment variables
-    required_vars = [
-        "CLICKHOUSE_HOST",
-        "CLICKHOUSE_USERNAME",
-        "CLICKHOUSE_PASSWORD",
-        "CLICKHOUSE_DATABASE",
-    ]
-    missing_vars = [var for var in required_vars if not os.getenv(var)]
+    missing_vars = missing_env_vars()
     if missing_vars:
         print(f"❌ Missing required environment variables: {', '.join(missing_vars)}")
         return
     
+    ch_conn = None
     try:
-        # Disable SSL warnings
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        
-        # Connect to ClickHouse
-        client = clickhouse_connect.get_client(
-            host=os.getenv("CLICKHOUSE_HOST"),
-            port=int(os.getenv("CLICKHOUSE_PORT", "8443")),
-            username=os.getenv("CLICKHOUSE_USERNAME"),
-            password=os.getenv("CLICKHOUSE_PASSWORD"),
-            database=os.getenv("CLICKHOUSE_DATABASE"),
-            secure=os.getenv("CLICKHOUSE_SECURE", "true").lower() == "true",
-            connect_timeout=60,
-            send_receive_timeout=300,
-            verify=False,
-        )
-        
-        print(f"✅ Connected to ClickHouse: {os.getenv('CLICKHOUSE_HOST')}")
+        # Connect to ClickHouse (shared client settings, see clickhouse_client.py)
+        ch_conn = ClickHouseConnection.from_env()
+        if not ch_conn.connect():
+            return
+        client = ch_conn.client
         
         table_name = "carrier_carrier_invoice_original_flat_ups"
+        schema = ch_conn.get_table_schema(table_name)
+        date_filter = detect_date_filter(ch_conn, table_name, schema)
         
         # Query 1: Get min/max transaction_date
         print(f"\n📅 Query 1: Min/Max transaction_date")
@@ -145,27 +127,35 @@ def query_transaction_dates():
         start_89_v2 = (today - timedelta(days=89)).strftime("%Y-%m-%d")
         end_01 = (today - timedelta(days=1)).strftime("%Y-%m-%d")
         
+        print(f"   🗓️ transaction_date filter: {date_filter.strategy} ({date_filter.target})")
+        query4 = f"SELECT COUNT(*) as count FROM {table_name} WHERE ({date_filter.sql})"
+        
         print(f"\n   Range 1: {start_89} to {end_79} (89-79 days ago)")
-        query4a = f"""
-        SELECT COUNT(*) as count
-        FROM {table_name}
-        WHERE transaction_date >= '{start_89}' AND transaction_date <= '{end_79}'
-        """
-        result4a = client.query(query4a)
-        if result4a.result_rows:
-            count = result4a.result_rows[0][0]
-            print(f"   📊 Records found: {count:,}")
+        result4a = ch_conn.execute_query(
+            query4, {"start_date_str": start_89, "end_date_str": end_79}
+        )
+        if result4a:
+            print(f"   📊 Records found: {result4a[0][0]:,}")
+            print(f"   🔎 Rows scanned: {query_read_rows(ch_conn) or 0:,}")
         
         print(f"\n   Range 2: {start_89_v2} to {end_01} (89-1 days ago)")
-        query4b = f"""
-        SELECT COUNT(*) as count
-        FROM {table_name}
-        WHERE transaction_date >= '{start_89_v2}' AND transaction_date <= '{end_01}'
-        """
-        result4b = client.query(query4b)
-        if result4b.result_rows:
-            count = result4b.result_rows[0][0]
-            print(f"   📊 Records found: {count:,}")
+        result4b = ch_conn.execute_query(
+            query4, {"start_date_str": start_89_v2, "end_date_str": end_01}
+        )
+        if result4b:
+            print(f"   📊 Records found: {result4b[0][0]:,}")
+            print(f"   🔎 Rows scanned: {query_read_rows(ch_conn) or 0:,}")
+        
+        # Query 5: Rows scanned per transaction_date filter strategy
+        print(f"\n📅 Query 5: Rows scanned per transaction_date filter strategy ({start_89} to {end_79})")
+        print("-" * 60)
+        print(f"   {'Strategy':<12} {'Matched':>12} {'Scanned':>14}  Target")
+        for stats in compare_date_filters(ch_conn, table_name, schema, start_89, end_79):
+            scanned = stats["read_rows"]
+            print(
+                f"   {stats['strategy']:<12} {stats['matched_rows']:>12,} "
+                f"{(f'{scanned:,}' if scanned is not None else 'n/a'):>14}  {stats['target']}"
+            )
         
         print(f"\n✅ Query completed successfully!")
         
@@ -173,6 +163,9 @@ def query_transaction_dates():
         print(f"❌ Query failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if ch_conn:
+            ch_conn.close()
 
 
 if __name__ == "__main__":
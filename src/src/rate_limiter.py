@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Adaptive Rate Limiter
+=====================
+
+Thread-safe token-bucket rate limiter that adapts its rate to HTTP 429 feedback.
+
+The limiter starts at a configured requests-per-second and:
+- backs off multiplicatively when the API answers HTTP 429, pausing for the
+  ``Retry-After`` duration when the server provides one
+- ramps back up additively after a run of consecutive successful requests
+
+This keeps throughput just under the real API quota instead of relying on a
+fixed worst-case delay between requests.
+
+Usage:
+    limiter = AdaptiveRateLimiter(rate=2.0, max_rate=10.0)
+
+    limiter.acquire()                 # blocks until a request may be sent
+    response = session.get(url)
+    if response.status_code == 429:
+        limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After")))
+    else:
+        limiter.on_success()
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse an HTTP Retry-After header value
+
+    Args:
+        value: Header value, either delay-seconds ("120") or an HTTP-date
+
+    Returns:
+        Number of seconds to wait, or None if the header is missing/invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Token-bucket rate limiter with AIMD adjustment driven by HTTP 429 responses"""
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 0.1,
+        max_rate: Optional[float] = None,
+        burst: float = 1.0,
+        backoff_factor: float = 0.5,
+        increase_step: Optional[float] = None,
+        ramp_up_after: int = 50,
+        default_penalty_seconds: float = 1.0,
+        name: str = "default",
+    ):
+        """
+        Args:
+            rate: Initial requests per second
+            min_rate: Lower bound for the rate after repeated backoffs
+            max_rate: Upper bound when ramping up (default: the initial rate)
+            burst: Bucket capacity, i.e. how many requests may be sent back-to-back
+            backoff_factor: Multiplier applied to the rate on HTTP 429
+            increase_step: Requests per second added after a successful run
+                           (default: 10% of the initial rate)
+            ramp_up_after: Consecutive successes required before ramping up
+            default_penalty_seconds: Pause applied on HTTP 429 without Retry-After
+            name: Friendly name for logging
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate or rate, rate)
+        self.burst = max(1.0, burst)
+        self.backoff_factor = backoff_factor
+        self.increase_step = increase_step or rate * 0.1
+        self.ramp_up_after = ramp_up_after
+        self.default_penalty_seconds = default_penalty_seconds
+        self.name = name
+
+        self._rate = rate
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._success_streak = 0
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.total_acquired = 0
+        self.total_wait_seconds = 0.0
+        self.rate_limit_hits = 0
+
+    @property
+    def rate(self) -> float:
+        """Current requests-per-second target"""
+        return self._rate
+
+    def _refill(self, now: float):
+        """Add tokens accumulated since the last refill (no refill while paused)"""
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+            self._last_refill = now
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be sent
+
+        A token is reserved under the lock and the caller sleeps outside of it,
+        so concurrent workers queue up fairly without holding the lock.
+
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            # Time at which the bucket is back at zero after this reservation
+            ready_at = self._last_refill + max(0.0, -self._tokens) / self._rate
+            wait = max(0.0, ready_at - now)
+            self.total_acquired += 1
+            self.total_wait_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def next_available_in(self) -> float:
+        """Seconds until acquire() would return without waiting (no token is reserved)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            ready_at = self._last_refill + max(0.0, 1.0 - self._tokens) / self._rate
+            return max(0.0, ready_at - now)
+
+    def on_success(self):
+        """Record a successful request and ramp up after a sustained run"""
+        with self._lock:
+            self._success_streak += 1
+            if self._success_streak < self.ramp_up_after:
+                return
+
+            self._success_streak = 0
+            if self._rate < self.max_rate:
+                old_rate = self._rate
+                self._rate = min(self.max_rate, self._rate + self.increase_step)
+                logger.info(
+                    f"📈 Rate limiter ({self.name}): {old_rate:.2f} → {self._rate:.2f} req/s"
+                )
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """
+        Record an HTTP 429 response: lower the rate and pause the bucket
+
+        Args:
+            retry_after: Seconds from the Retry-After header, if present
+        """
+        with self._lock:
+            self.rate_limit_hits += 1
+            self._success_streak = 0
+
+            old_rate = self._rate
+            self._rate = max(self.min_rate, self._rate * self.backoff_factor)
+
+            pause = (
+                retry_after if retry_after is not None else self.default_penalty_seconds
+            )
+            now = time.monotonic()
+            self._refill(now)
+            # Drain the bucket and start refilling only after the pause
+            self._tokens = min(self._tokens, 0.0)
+            self._last_refill = max(self._last_refill, now + pause)
+
+            logger.warning(
+                f"📉 Rate limiter ({self.name}): HTTP 429 - {old_rate:.2f} → {self._rate:.2f} req/s, "
+                f"pausing {pause:.1f}s"
+                + (" (Retry-After)" if retry_after is not None else "")
+            )
+
+    def stats(self) -> dict:
+        """Return a snapshot of limiter statistics"""
+        with self._lock:
+            return {
+                "current_rate": round(self._rate, 3),
+                "requests": self.total_acquired,
+                "rate_limit_hits": self.rate_limit_hits,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+            }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+UPS Label-Only Filter Result Checkpoint
+=======================================
+
+Append-only JSONL file of classified tracking numbers for one date window, so
+ups_label_only_filter.py streams its results to disk as it goes and a re-run of
+the same window (e.g. after a crash at number 15,000 of 20,000) skips every
+tracking number that was already classified.
+
+Each line is one result record plus its outcome:
+    {"outcome": "label_only", "tracking_number": "1Z...", "account_number": "...", ...}
+
+Resume rules:
+- "label_only" and "excluded" lines mark a tracking number as done.
+- "error" lines are recorded for reference but the number is retried.
+- The last line for a tracking number wins.
+- A partially written last line (process killed mid-write) is discarded.
+
+Only label-only records are loaded back into memory; excluded numbers are kept
+as a set of tracking numbers, so memory stays flat regardless of window size.
+
+Off by default: with the checkpoint on, excluded records are written to it
+instead of the JSON output (see ups_label_only_filter.py).
+
+Configuration (environment variables):
+    UPS_FILTER_CHECKPOINT=false
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ENABLED = os.getenv("UPS_FILTER_CHECKPOINT", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+COMPLETED_OUTCOMES = ("label_only", "excluded")
+
+
+class ResultCheckpoint:
+    """Thread-safe, line-buffered JSONL checkpoint of classified tracking numbers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.label_only_records: Dict[str, Dict] = {}
+        self.excluded: Set[str] = set()
+        self.written = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._load()
+        # Line buffering: every record reaches the OS as soon as it is written
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+        if self.completed_count:
+            logger.info(
+                f"♻️  Checkpoint {path}: {self.completed_count} tracking numbers already classified "
+                f"({len(self.label_only_records)} label-only)"
+            )
+
+    def _load(self):
+        """Read previous results and drop a trailing partial line"""
+        if not os.path.exists(self.path):
+            return
+
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(raw_line)
+                    tracking_number = entry["tracking_number"]
+                    outcome = entry.get("outcome")
+                except (ValueError, KeyError, TypeError):
+                    break
+                valid_bytes += len(raw_line)
+
+                self.label_only_records.pop(tracking_number, None)
+                self.excluded.discard(tracking_number)
+                if outcome == "label_only":
+                    entry.pop("outcome", None)
+                    self.label_only_records[tracking_number] = entry
+                elif outcome == "excluded":
+                    self.excluded.add(tracking_number)
+
+        if valid_bytes < os.path.getsize(self.path):
+            logger.warning(
+                f"⚠️ Discarding incomplete trailing data in checkpoint {self.path}"
+            )
+            with open(self.path, "rb+") as f:
+                f.truncate(valid_bytes)
+
+    @property
+    def completed_count(self) -> int:
+        return len(self.label_only_records) + len(self.excluded)
+
+    def get_outcome(self, tracking_number: str) -> Optional[str]:
+        """Outcome of an already classified tracking number, or None if it must be (re)processed"""
+        if tracking_number in self.label_only_records:
+            return "label_only"
+        if tracking_number in self.excluded:
+            return "excluded"
+        return None
+
+    def append(self, outcome: str, record: Dict):
+        """Stream one classified tracking number to the checkpoint file"""
+        line = json.dumps({"outcome": outcome, **record}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -45,6 +45,8 @@ import requests
 
 from dotenv import load_dotenv
 
+from http_client import get_session
+
 # Load .env if present (keeps behavior consistent with other project scripts)
 load_dotenv()
 
@@ -68,6 +70,16 @@ METADATA_IP_URL = (
 METADATA_HEADERS = {"Metadata-Flavor": "Google"}
 
 
+def get_http_session() -> requests.Session:
+    """Return the pooled HTTP session used for metadata and Slack calls.
+
+    chat.postMessage is not idempotent, so only GET requests are retried after
+    they were sent; connection errors are retried for every method.
+    """
+
+    return get_session("slack", pool_size=2, retry_methods=("GET",))
+
+
 def validate_ipv4(ip: str) -> str:
     """Return the IP if it's a valid IPv4 address, else raise ValueError."""
 
@@ -86,7 +98,7 @@ def get_ip_from_metadata(timeout: float = 2.0) -> str:
 
     logger.info("Attempting to retrieve public IP from GCE metadata service...")
     try:
-        resp = requests.get(
+        resp = get_http_session().get(
             METADATA_IP_URL, headers=METADATA_HEADERS, timeout=timeout
         )
     except requests.RequestException as exc:
@@ -169,7 +181,9 @@ def send_slack_message(
 
     logger.info("Posting whitelist command to Slack channel %s...", channel)
     try:
-        resp = requests.post(SLACK_API_URL, headers=headers, json=payload, timeout=10)
+        resp = get_http_session().post(
+            SLACK_API_URL, headers=headers, json=payload, timeout=10
+        )
     except requests.RequestException as exc:
         raise RuntimeError(f"Failed to call Slack API: {exc}") from exc
 
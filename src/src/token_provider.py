@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Background OAuth Token Provider
+===============================
+
+Keeps an access token fresh in a background thread so API workers never wait
+on a token request (including its retry sleeps) in the middle of a run.
+
+- The first token is fetched synchronously by ``start()``.
+- A daemon thread refreshes the token ``refresh_after_minutes`` after it was
+  obtained, i.e. well before the point where it is no longer handed out
+  (``expiry_minutes``, the 55-minute mark used by the UPS filter).
+- A failed refresh is retried with a growing delay while the current token is
+  still handed out, so a temporary outage of the token endpoint does not
+  interrupt processing.
+- ``get_token()`` never blocks on the network: it returns the current token, or
+  None if there is no usable token (never obtained or past its expiry).
+
+One provider per credential pair; a provider is safe to share across threads.
+
+Configuration (environment variables):
+    UPS_TOKEN_REFRESH_MINUTES=50   # proactive refresh age
+    UPS_TOKEN_EXPIRY_MINUTES=55    # token is not handed out after this age
+
+Usage:
+    provider = TokenProvider("Primary", lambda: get_ups_access_token(credentials))
+    provider.start()
+    token = provider.get_token()
+    ...
+    provider.stop()
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_MINUTES = float(os.getenv("UPS_TOKEN_REFRESH_MINUTES", "50"))
+TOKEN_EXPIRY_MINUTES = float(os.getenv("UPS_TOKEN_EXPIRY_MINUTES", "55"))
+
+# Delay between failed background refresh attempts (grows linearly up to the max)
+REFRESH_RETRY_SECONDS = 15.0
+REFRESH_RETRY_MAX_SECONDS = 120.0
+
+TokenFetcher = Callable[[], Optional[Tuple[str, datetime]]]
+
+
+class TokenProvider:
+    """Thread-safe access token holder with proactive background refresh"""
+
+    def __init__(
+        self,
+        name: str,
+        fetch: TokenFetcher,
+        refresh_after_minutes: float = TOKEN_REFRESH_MINUTES,
+        expiry_minutes: float = TOKEN_EXPIRY_MINUTES,
+        retry_seconds: float = REFRESH_RETRY_SECONDS,
+        max_retry_seconds: float = REFRESH_RETRY_MAX_SECONDS,
+    ):
+        """
+        Args:
+            name: Friendly name for logging (e.g. the credential name)
+            fetch: Callable returning (access_token, obtained_at) or None on failure
+            refresh_after_minutes: Token age at which the background refresh runs
+            expiry_minutes: Token age after which get_token() returns None
+            retry_seconds: Base delay between failed refresh attempts
+            max_retry_seconds: Upper bound for the retry delay
+        """
+        self.name = name
+        self.fetch = fetch
+        self.refresh_after_seconds = min(refresh_after_minutes, expiry_minutes) * 60
+        self.expiry_seconds = expiry_minutes * 60
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+
+        self._token: Optional[str] = None
+        self._obtained_at = 0.0  # time.monotonic() of the current token
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Statistics
+        self.refreshes = 0
+        self.failed_refreshes = 0
+
+    def start(self) -> bool:
+        """
+        Fetch the first token (blocking) and start the background refresh thread
+
+        Returns:
+            True if a token is available
+        """
+        if self._thread is None:
+            self.refresh()
+            self._thread = threading.Thread(
+                target=self._run, name=f"token-refresh-{self.name}", daemon=True
+            )
+            self._thread.start()
+        return self.get_token() is not None
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def get_token(self) -> Optional[str]:
+        """Current token, or None if there is no token younger than the expiry age"""
+        with self._lock:
+            if self._token and self._age() < self.expiry_seconds:
+                return self._token
+            return None
+
+    def refresh(self) -> bool:
+        """Fetch a new token now; the current token stays in use if this fails"""
+        result = self.fetch()
+        if not result:
+            with self._lock:
+                self.failed_refreshes += 1
+            return False
+
+        token, _ = result
+        with self._lock:
+            if self._token:
+                self.refreshes += 1
+            self._token = token
+            self._obtained_at = time.monotonic()
+        return True
+
+    def _age(self) -> float:
+        return time.monotonic() - self._obtained_at
+
+    def _seconds_until_refresh(self) -> float:
+        with self._lock:
+            if not self._token:
+                return 0.0
+            return self.refresh_after_seconds - self._age()
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            delay = self._seconds_until_refresh()
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+
+            logger.info(f"🔄 Refreshing token ({self.name}) in the background...")
+            if self.refresh():
+                failures = 0
+                logger.info(f"✅ Token ({self.name}) refreshed")
+                continue
+
+            failures += 1
+            retry_in = min(self.max_retry_seconds, self.retry_seconds * failures)
+            logger.warning(
+                f"⚠️ Background token refresh failed ({self.name}) - retrying in {retry_in:.0f}s"
+                + (" (current token still valid)" if self.get_token() else "")
+            )
+            self._stop.wait(retry_in)
+
+    def stats(self) -> Dict:
+        """Return a snapshot of provider statistics"""
+        with self._lock:
+            return {
+                "has_token": bool(self._token) and self._age() < self.expiry_seconds,
+                "token_age_seconds": round(self._age(), 1) if self._token else None,
+                "refreshes": self.refreshes,
+                "failed_refreshes": self.failed_refreshes,
+            }
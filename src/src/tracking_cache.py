@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+UPS Tracking Response Cache
+===========================
+
+Persistent on-disk cache (DuckDB) of UPS Tracking API responses keyed by
+tracking number, so overlapping date windows of ups_label_only_filter.py only
+spend API calls on new or expired tracking numbers.
+
+Cache policy:
+- "terminal":   more than one activity record (in transit / delivered). Such a
+                package can never become label-only again, so it never expires.
+- "label_only": matches the label-only criteria. Expires after
+                UPS_CACHE_LABEL_ONLY_TTL_HOURS because the package may still be
+                picked up.
+- "other":      any other successful response (e.g. a single non-label activity
+                or no activity data). Expires after UPS_CACHE_OTHER_TTL_HOURS.
+
+API errors are never cached.
+
+Configuration (environment variables):
+    UPS_CACHE_ENABLED=true
+    UPS_CACHE_PATH=data/output/ups_tracking_cache.duckdb
+    UPS_CACHE_LABEL_ONLY_TTL_HOURS=24
+    UPS_CACHE_OTHER_TTL_HOURS=24
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("UPS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_PATH = os.getenv(
+    "UPS_CACHE_PATH",
+    os.path.join(os.getenv("OUTPUT_DIR", "data/output"), "ups_tracking_cache.duckdb"),
+)
+LABEL_ONLY_TTL_HOURS = float(os.getenv("UPS_CACHE_LABEL_ONLY_TTL_HOURS", "24"))
+OTHER_TTL_HOURS = float(os.getenv("UPS_CACHE_OTHER_TTL_HOURS", "24"))
+
+# Pending writes are flushed to disk in batches of this size
+FLUSH_EVERY = 100
+
+
+@dataclass
+class CachedTracking:
+    """A cached UPS Tracking API response"""
+
+    tracking_number: str
+    classification: str  # "terminal", "label_only" or "other"
+    activity_count: int
+    ups_response_json: str  # stored JSON text, handed to DuckDB without parsing
+    checked_at: datetime
+
+
+def classify_for_cache(is_label_only: bool, activity_count: int) -> str:
+    """Map a label-only check result onto a cache class (see module docstring)"""
+    if activity_count > 1:
+        return "terminal"
+    if is_label_only:
+        return "label_only"
+    return "other"
+
+
+class TrackingCache:
+    """Thread-safe DuckDB cache of UPS tracking responses"""
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        label_only_ttl_hours: float = LABEL_ONLY_TTL_HOURS,
+        other_ttl_hours: float = OTHER_TTL_HOURS,
+    ):
+        self.path = path
+        self.label_only_ttl = timedelta(hours=label_only_ttl_hours)
+        self.other_ttl = timedelta(hours=other_ttl_hours)
+        self._pending: List[Tuple] = []
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = duckdb.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tracking_cache (
+                tracking_number VARCHAR PRIMARY KEY,
+                classification VARCHAR NOT NULL,
+                activity_count INTEGER,
+                ups_response VARCHAR,
+                checked_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+        logger.info(f"🗄️  Tracking cache: {path}")
+
+    def get_many(self, tracking_numbers: Iterable[str]) -> Dict[str, CachedTracking]:
+        """
+        Look up fresh (non-expired) cache entries
+
+        Args:
+            tracking_numbers: Tracking numbers to look up
+
+        Returns:
+            Dictionary of tracking_number -> CachedTracking for cache hits
+        """
+        now = datetime.now()
+        with self._lock:
+            self._flush()
+            rows = self.conn.execute(
+                """
+                SELECT tracking_number, classification, activity_count, ups_response, checked_at
+                FROM tracking_cache
+                WHERE tracking_number IN (SELECT UNNEST(?::VARCHAR[]))
+                AND (
+                    classification = 'terminal'
+                    OR (classification = 'label_only' AND checked_at >= ?)
+                    OR (classification = 'other' AND checked_at >= ?)
+                )
+                """,
+                [
+                    list(tracking_numbers),
+                    now - self.label_only_ttl,
+                    now - self.other_ttl,
+                ],
+            ).fetchall()
+
+        return {
+            row[0]: CachedTracking(
+                tracking_number=row[0],
+                classification=row[1],
+                activity_count=row[2],
+                ups_response_json=row[3] or "{}",
+                checked_at=row[4],
+            )
+            for row in rows
+        }
+
+    def put(
+        self,
+        tracking_number: str,
+        is_label_only: bool,
+        activity_count: int,
+        ups_response: Dict,
+    ):
+        """Store a successful tracking response (written to disk in batches)"""
+        classification = classify_for_cache(is_label_only, activity_count)
+        with self._lock:
+            self._pending.append(
+                (
+                    tracking_number,
+                    classification,
+                    activity_count,
+                    json.dumps(ups_response, ensure_ascii=False),
+                    datetime.now(),
+                )
+            )
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self):
+        """Write pending entries (caller must hold the lock)"""
+        if not self._pending:
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tracking_cache VALUES (?, ?, ?, ?, ?)",
+            self._pending,
+        )
+        self._pending = []
+
+    def flush(self):
+        """Write all pending entries to disk"""
+        with self._lock:
+            self._flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Number of cached entries per classification"""
+        with self._lock:
+            self._flush()
+            rows = self.conn.execute(
+                "SELECT classification, COUNT(*) FROM tracking_cache GROUP BY classification"
+            ).fetchall()
+        return {classification: count for classification, count in rows}
+
+    def close(self):
+        """Flush pending entries and close the database"""
+        with self._lock:
+            self._flush()
+            self.conn.close()
@@ -27,16 +27,70 @@ Configuration:
     - UPS_FILTER_START_DAYS=99
     - UPS_FILTER_END_DAYS=60
 
+    UPS API credentials (requests are balanced across all pairs):
+    - UPS_USERNAME / UPS_PASSWORD
+    - UPS_USERNAME_1 / UPS_PASSWORD_1, UPS_USERNAME_2 / UPS_PASSWORD_2, ...
+    - UPS_CREDENTIAL_COOLDOWN_SECONDS=30   # skip a pair after HTTP 429
+
+    Processing engine (compare both on the same input):
+    - UPS_FILTER_ENGINE=sequential    # or "concurrent"
+    - UPS_FILTER_CONCURRENCY=4        # max in-flight requests for "concurrent"
+                                      # (2 lookups per worker are queued at most)
+
+    Adaptive rate limiting (token bucket per credential, backs off on HTTP 429):
+    - UPS_RATE_LIMIT_RPS=2.0          # starting requests per second
+    - UPS_RATE_LIMIT_MIN_RPS=0.2
+    - UPS_RATE_LIMIT_MAX_RPS=8.0
+    - UPS_RATE_LIMIT_RAMP_AFTER=50    # successes before ramping back up
+
+    Tracking response cache (see tracking_cache.py for the TTL policy):
+    - UPS_CACHE_ENABLED=true
+    - UPS_CACHE_PATH=data/output/ups_tracking_cache.duckdb
+    - UPS_CACHE_LABEL_ONLY_TTL_HOURS=24
+    - UPS_CACHE_OTHER_TTL_HOURS=24
+
+    Access tokens are refreshed by a background thread per credential pair
+    (see token_provider.py), so lookups never wait on the token endpoint:
+    - UPS_TOKEN_REFRESH_MINUTES=50
+    - UPS_TOKEN_EXPIRY_MINUTES=55
+
+    HTTP connection pooling / timeouts / retries (see http_client.py):
+    - HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES
+
+    Input (Step 1 output):
+    - UPS_FILTER_INPUT=duckdb          # or "parquet": read only the window's partitions
+                                       # of the Parquet lake (DLT_PARQUET_LAKE_DIR)
+
+    Raw UPS responses (result records only keep the status fields we use):
+    - UPS_FILTER_SAVE_RAW_RESPONSES=false   # true = spill raw payloads to .jsonl.gz
+
+    Streaming checkpoint (see result_checkpoint.py): results are appended to a
+    per-window JSONL file as they are classified; re-running the same window
+    skips tracking numbers that are already done.
+    - UPS_FILTER_CHECKPOINT=false     # true = stream to a checkpoint and resume
+
 Output:
     - CSV: ups_label_only_tracking_range_YYYYMMDD_to_YYYYMMDD_timestamp.csv
     - JSON: ups_label_only_filter_range_YYYYMMDD_to_YYYYMMDD_timestamp.json
+    - Raw responses (optional): ups_label_only_raw_responses_range_YYYYMMDD_to_YYYYMMDD_timestamp.jsonl.gz
+    - Checkpoint (optional): ups_label_only_checkpoint_range_YYYYMMDD_to_YYYYMMDD.jsonl
+      (every classified tracking number, including excluded ones). With the
+      checkpoint enabled, the JSON's excluded_tracking_numbers list is empty;
+      total_excluded has the count and excluded_tracking_numbers_file points
+      to the checkpoint holding the records. The JSON's processing_time
+      summarizes the lookups of the run either way.
 """
 
+import gzip
 import json
 import logging
 import os
+import re
+import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
@@ -44,6 +98,21 @@ import duckdb
 import requests
 from dotenv import load_dotenv
 
+from batch_classifier import (
+    TARGET_STATUS_CODE,
+    TARGET_STATUS_DESCRIPTION,
+    TARGET_STATUS_TYPE,
+    classify_responses,
+    label_only_frame,
+    write_label_only_csv,
+)
+from duckdb_export import PARQUET_LAKE_DIR, date_filter_sql, read_lake_sql
+from http_client import HTTP_POOL_SIZE, get_session
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from result_checkpoint import CHECKPOINT_ENABLED, ResultCheckpoint
+from token_provider import TOKEN_EXPIRY_MINUTES, TOKEN_REFRESH_MINUTES, TokenProvider
+from tracking_cache import CACHE_ENABLED, CachedTracking, TrackingCache
+
 # Load environment variables
 load_dotenv()
 
@@ -66,12 +135,49 @@ class UPSCredentials:
     name: str  # Friendly name for logging (e.g., "Primary", "Secondary")
 
 
+@dataclass
+class CredentialState:
+    """Per-credential token, quota tracking and cooldown state"""
+
+    credentials: UPSCredentials
+    rate_limiter: AdaptiveRateLimiter
+    token_provider: Optional[TokenProvider] = None
+    cooldown_until: float = 0.0  # time.monotonic() deadline
+    requests: int = 0
+    api_calls: int = 0
+    rate_limit_hits: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def name(self) -> str:
+        return self.credentials.name
+
+    def in_cooldown(self, now: Optional[float] = None) -> bool:
+        return self.cooldown_until > (now if now is not None else time.monotonic())
+
+
 class CredentialManager:
-    """Manages multiple UPS API credential pairs with automatic failover"""
+    """
+    Manages N UPS API credential pairs and balances requests across them
 
-    def __init__(self):
+    Credentials are loaded from UPS_USERNAME/UPS_PASSWORD plus any number of
+    UPS_USERNAME_<n>/UPS_PASSWORD_<n> pairs. Every credential keeps its own
+    access token and adaptive rate limiter, and is put into a cooldown after an
+    HTTP 429, so requests are spread over all healthy credentials at once and
+    adding API keys adds throughput.
+    """
+
+    def __init__(self, cooldown_seconds: Optional[float] = None):
         self.credentials: List[UPSCredentials] = []
-        self.current_index = 0
+        self.states: List[CredentialState] = []
+        self.cooldown_seconds = (
+            cooldown_seconds
+            if cooldown_seconds is not None
+            else CREDENTIAL_COOLDOWN_SECONDS
+        )
+        self.credential_switches = 0
+        self._next_index = 0
+        self._lock = threading.Lock()
         self.load_credentials()
 
     def load_credentials(self):
@@ -88,54 +194,192 @@ class CredentialManager:
             )
             logger.info("✅ Loaded primary UPS credentials")
 
-        # Secondary credentials
-        secondary_username = os.getenv("UPS_USERNAME_1")
-        secondary_password = os.getenv("UPS_PASSWORD_1")
+        # Numbered credentials: UPS_USERNAME_1, UPS_USERNAME_2, ...
+        suffixes = sorted(
+            int(match.group(1))
+            for match in (
+                re.fullmatch(r"UPS_USERNAME_(\d+)", key) for key in os.environ
+            )
+            if match
+        )
+        for suffix in suffixes:
+            username = os.getenv(f"UPS_USERNAME_{suffix}")
+            password = os.getenv(f"UPS_PASSWORD_{suffix}")
 
-        if secondary_username and secondary_password:
-            self.credentials.append(
-                UPSCredentials(
-                    username=secondary_username,
-                    password=secondary_password,
-                    name="Secondary",
+            if not (username and password):
+                logger.warning(
+                    f"⚠️ Skipping UPS_USERNAME_{suffix}: UPS_PASSWORD_{suffix} is not set"
                 )
+                continue
+
+            name = "Secondary" if suffix == 1 else f"Credential {suffix}"
+            self.credentials.append(
+                UPSCredentials(username=username, password=password, name=name)
             )
-            logger.info("✅ Loaded secondary UPS credentials")
+            logger.info(f"✅ Loaded {name.lower()} UPS credentials (UPS_USERNAME_{suffix})")
 
         if not self.credentials:
             raise ValueError("No UPS credentials found in environment variables")
 
+        self.states = [
+            CredentialState(
+                credentials=credentials,
+                rate_limiter=create_rate_limiter(credentials.name),
+            )
+            for credentials in self.credentials
+        ]
+
         logger.info(f"📊 Total credential pairs available: {len(self.credentials)}")
 
-    def get_current_credentials(self) -> UPSCredentials:
-        """Get the currently active credentials"""
-        return self.credentials[self.current_index]
+    def initialize_tokens(self) -> int:
+        """
+        Obtain an access token for every credential pair up front and start
+        their background refresh threads
+
+        Returns:
+            Number of credentials that obtained a token
+        """
+        return sum(1 for state in self.states if self._start_provider(state))
+
+    def _start_provider(self, state: CredentialState) -> bool:
+        """Create and start the credential's token provider (once)"""
+        with state.lock:
+            if state.token_provider is None:
+                credentials = state.credentials
+                state.token_provider = TokenProvider(
+                    credentials.name,
+                    lambda: get_ups_access_token(credentials),
+                )
+                return state.token_provider.start()
+        return state.token_provider.get_token() is not None
+
+    def close(self):
+        """Stop all background token refresh threads"""
+        for state in self.states:
+            if state.token_provider is not None:
+                state.token_provider.stop()
 
-    def switch_to_next_credentials(self) -> Optional[UPSCredentials]:
+    def acquire(self, exclude: Optional[CredentialState] = None) -> CredentialState:
         """
-        Switch to the next available credential pair
+        Pick a healthy credential and reserve a request slot on its rate limiter
+
+        Credentials in cooldown are skipped; among the rest, the one whose
+        limiter can serve soonest wins (round-robin on ties). If every credential
+        is cooling down, this blocks until the earliest cooldown ends.
+
+        Args:
+            exclude: Credential to avoid if any other one is healthy (used when
+                     retrying a request that just failed on it)
 
         Returns:
-            Next credentials if available, None if no more credentials
+            The selected credential state
         """
-        if self.current_index + 1 < len(self.credentials):
-            self.current_index += 1
-            new_creds = self.credentials[self.current_index]
-            logger.warning(
-                f"🔄 SWITCHING CREDENTIALS: {self.credentials[self.current_index - 1].name} → {new_creds.name}"
-            )
-            return new_creds
-        else:
-            logger.error("❌ No more credential pairs available for failover")
-            return None
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                healthy = [state for state in self.states if not state.in_cooldown(now)]
+                candidates = [state for state in healthy if state is not exclude]
+                candidates = candidates or healthy
+
+                if candidates:
+                    count = len(self.states)
+                    state = min(
+                        candidates,
+                        key=lambda s: (
+                            s.rate_limiter.next_available_in(),
+                            (self.states.index(s) - self._next_index) % count,
+                        ),
+                    )
+                    self._next_index = (self.states.index(state) + 1) % count
+                    wait = 0.0
+                else:
+                    wait = min(state.cooldown_until for state in self.states) - now
+
+            if wait > 0:
+                logger.warning(
+                    f"⏳ All {len(self.states)} credential(s) cooling down - waiting {wait:.1f}s"
+                )
+                time.sleep(wait)
+                continue
+
+            state.rate_limiter.acquire()
+            with state.lock:
+                state.requests += 1
+            return state
+
+    def get_token(self, state: CredentialState) -> Optional[str]:
+        """
+        Return the credential's current access token without blocking
 
-    def has_more_credentials(self) -> bool:
-        """Check if there are more credential pairs available"""
-        return self.current_index + 1 < len(self.credentials)
+        Tokens are refreshed by the credential's background TokenProvider. A
+        credential without a usable token is put into cooldown while its
+        provider keeps retrying.
+        """
+        if state.token_provider is None:
+            self._start_provider(state)
 
-    def get_credential_name(self) -> str:
-        """Get the name of the current credential pair"""
-        return self.credentials[self.current_index].name
+        access_token = state.token_provider.get_token()
+        if access_token:
+            return access_token
+
+        logger.warning(f"⚠️ No access token for {state.name} credentials - cooling down")
+        with self._lock:
+            state.cooldown_until = time.monotonic() + self.cooldown_seconds
+        return None
+
+    def record_success(self, state: CredentialState):
+        """Feed a successful request back into the credential's rate limiter"""
+        state.rate_limiter.on_success()
+
+    def record_rate_limited(
+        self, state: CredentialState, retry_after: Optional[float] = None
+    ):
+        """Back off the credential's rate limiter and put it into cooldown after HTTP 429"""
+        state.rate_limiter.on_rate_limited(retry_after)
+        cooldown = retry_after if retry_after is not None else self.cooldown_seconds
+        with self._lock:
+            state.rate_limit_hits += 1
+            state.cooldown_until = max(
+                state.cooldown_until, time.monotonic() + cooldown
+            )
+        logger.warning(f"🧊 {state.name} credentials cooling down for {cooldown:.1f}s")
+
+    def record_api_call(self, state: CredentialState):
+        """Count a Tracking API request sent with the credential"""
+        with state.lock:
+            state.api_calls += 1
+
+    def record_switch(self, from_state: CredentialState, to_state: CredentialState):
+        """Count a request that was retried on a different credential"""
+        if from_state is to_state:
+            return
+        with self._lock:
+            self.credential_switches += 1
+        logger.warning(f"🔄 SWITCHING CREDENTIALS: {from_state.name} → {to_state.name}")
+
+    def has_alternative(self) -> bool:
+        """Check if there is more than one credential pair to retry on"""
+        return len(self.states) > 1
+
+    def get_credential_names(self) -> List[str]:
+        """Get the names of all loaded credential pairs"""
+        return [credentials.name for credentials in self.credentials]
+
+    def stats(self) -> List[Dict]:
+        """Per-credential usage statistics"""
+        return [
+            {
+                "name": state.name,
+                "requests": state.requests,
+                "api_calls": state.api_calls,
+                "rate_limit_hits": state.rate_limit_hits,
+                "token_refreshes": (
+                    state.token_provider.refreshes if state.token_provider else 0
+                ),
+                "current_rate": round(state.rate_limiter.rate, 3),
+            }
+            for state in self.states
+        ]
 
 
 # ============================================================================
@@ -161,6 +405,7 @@ TRANSACTION_DATE_END_DAYS_AGO = int(os.getenv("UPS_FILTER_END_DAYS", "88"))
 
 # Configuration
 DUCKDB_PATH = os.getenv("DUCKDB_PATH", "data/output/carrier_invoice_extraction.duckdb")
+FILTER_INPUT = os.getenv("UPS_FILTER_INPUT", "duckdb").lower()
 TABLE_NAME = "carrier_invoice_extraction.carrier_invoice_data"
 OUTPUT_DIR = os.getenv("OUTPUT_DIR", "data/output")
 
@@ -174,19 +419,78 @@ if not UPS_TOKEN_URL:
 if not UPS_TRACKING_URL:
     raise ValueError("UPS_TRACKING_URL environment variable is required")
 
-# Target status description to filter for
-TARGET_STATUS_DESCRIPTION = (
-    "Shipper created a label, UPS has not received the package yet. "
+# Target status to filter for (TARGET_STATUS_DESCRIPTION / _CODE / _TYPE) is
+# defined in batch_classifier.py, shared with the vectorized classifier
+
+# Processing engine for the UPS Tracking API lookups:
+# - "sequential": one tracking number at a time (original behaviour)
+# - "concurrent": bounded thread pool with UPS_FILTER_CONCURRENCY workers
+PROCESSING_ENGINES = ("sequential", "concurrent")
+PROCESSING_ENGINE = os.getenv("UPS_FILTER_ENGINE", "sequential").lower()
+MAX_CONCURRENCY = int(os.getenv("UPS_FILTER_CONCURRENCY", "4"))
+# Submitted-but-unrecorded lookups per worker: bounds memory and what a crash
+# can lose before results reach the checkpoint
+IN_FLIGHT_PER_WORKER = 2
+
+# Adaptive rate limiting for UPS Tracking API calls (one limiter per credential pair).
+# Starts at UPS_RATE_LIMIT_RPS, halves on HTTP 429 (pausing for Retry-After when
+# present) and ramps back up after UPS_RATE_LIMIT_RAMP_AFTER consecutive successes.
+RATE_LIMIT_RPS = float(os.getenv("UPS_RATE_LIMIT_RPS", "2.0"))
+RATE_LIMIT_MIN_RPS = float(os.getenv("UPS_RATE_LIMIT_MIN_RPS", "0.2"))
+RATE_LIMIT_MAX_RPS = float(os.getenv("UPS_RATE_LIMIT_MAX_RPS", "8.0"))
+RATE_LIMIT_RAMP_AFTER = int(os.getenv("UPS_RATE_LIMIT_RAMP_AFTER", "50"))
+
+# Seconds a credential pair is skipped after HTTP 429 without Retry-After
+# (or after failing to obtain a token)
+CREDENTIAL_COOLDOWN_SECONDS = float(os.getenv("UPS_CREDENTIAL_COOLDOWN_SECONDS", "30"))
+
+# HTTP client errors that depend on the credential; these and 5xx responses are
+# retried on another credential pair, other 4xx responses are not
+CREDENTIAL_ERROR_STATUS_CODES = (401, 403)
+
+# Result records only keep the status fields; full UPS payloads are written to a
+# gzip JSONL side file when enabled instead of being held in memory
+SAVE_RAW_RESPONSES = os.getenv("UPS_FILTER_SAVE_RAW_RESPONSES", "false").lower() in (
+    "1",
+    "true",
+    "yes",
 )
-TARGET_STATUS_CODE = "MP"
-TARGET_STATUS_TYPE = "M"
 
 # Ensure output directory exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 
+def connect_to_parquet_lake() -> Optional[duckdb.DuckDBPyConnection]:
+    """
+    In-memory DuckDB exposing the Parquet lake as TABLE_NAME
+
+    The view's transaction_date_parsed comes from the partition paths, so a
+    date window only opens the Parquet files of its days.
+    """
+    if not os.path.isdir(PARQUET_LAKE_DIR):
+        logger.error(f"❌ Parquet lake not found: {PARQUET_LAKE_DIR}")
+        logger.info("💡 Run the pipeline with DLT_PARQUET_LAKE=true first")
+        return None
+
+    try:
+        conn = duckdb.connect()
+        catalog, table = TABLE_NAME.split(".")
+        conn.execute(f"ATTACH ':memory:' AS {catalog}")
+        conn.execute(
+            f"CREATE VIEW {catalog}.{table} AS SELECT * FROM {read_lake_sql(PARQUET_LAKE_DIR)}"
+        )
+        logger.info(f"✅ Reading Parquet lake: {PARQUET_LAKE_DIR}")
+        return conn
+    except Exception as e:
+        logger.error(f"❌ Failed to open Parquet lake: {e}")
+        return None
+
+
 def connect_to_duckdb() -> Optional[duckdb.DuckDBPyConnection]:
-    """Connect to the DuckDB file and return connection"""
+    """Connect to the DuckDB file (or the Parquet lake) and return connection"""
+    if FILTER_INPUT == "parquet":
+        return connect_to_parquet_lake()
+
     if not os.path.exists(DUCKDB_PATH):
         logger.error(f"❌ DuckDB file not found: {DUCKDB_PATH}")
         logger.info("💡 Run the pipeline first to create the database")
@@ -245,24 +549,16 @@ def extract_tracking_numbers_from_duckdb(limit: int = 0) -> List[Dict[str, str]]
         end_date_str = end_target_date.strftime("%Y-%m-%d")
 
         # Base query with transaction_date filtering - include account_number
-        # Handle multiple date formats in transaction_date column:
-        # - YYYY-MM-DD (ISO format)
-        # - M/D/YYYY or MM/DD/YYYY (US format with or without leading zeros)
-        # Use COALESCE with TRY_STRPTIME to try multiple formats
+        # Exports keep a typed transaction_date_parsed column (sorted, so the
+        # range is pruned by zone maps); older files fall back to parsing the
+        # YYYY-MM-DD / M/D/YYYY / MM/DD/YYYY strings with TRY_STRPTIME
+        transaction_date_sql = date_filter_sql(conn, TABLE_NAME)
         base_where_clause = f"""
             WHERE tracking_number IS NOT NULL
             AND tracking_number != ''
             AND LENGTH(TRIM(tracking_number)) > 0
             AND tracking_number LIKE '1Z%'  -- UPS tracking numbers start with 1Z
-            AND (
-                -- Try parsing with multiple formats using COALESCE
-                -- COALESCE returns the first non-NULL value
-                COALESCE(
-                    TRY_STRPTIME(transaction_date, '%Y-%m-%d'),  -- YYYY-MM-DD
-                    TRY_STRPTIME(transaction_date, '%m/%d/%Y'),  -- MM/DD/YYYY
-                    TRY_STRPTIME(transaction_date, '%-m/%-d/%Y')   -- M/D/YYYY (single digit)
-                ) BETWEEN CAST('{start_date_str}' AS DATE) AND CAST('{end_date_str}' AS DATE)
-            )
+            AND {transaction_date_sql} BETWEEN CAST('{start_date_str}' AS DATE) AND CAST('{end_date_str}' AS DATE)
         """
 
         if limit > 0:
@@ -312,116 +608,62 @@ def extract_tracking_numbers_from_duckdb(limit: int = 0) -> List[Dict[str, str]]
             conn.close()
 
 
-def get_ups_access_token(
-    credentials: UPSCredentials, retry_count: int = 3
-) -> Optional[Tuple[str, datetime]]:
+def get_http_session() -> requests.Session:
     """
-    Get UPS API access token with retry logic
-
-    Args:
-        credentials: UPS credentials to use for authentication
-        retry_count: Number of retry attempts if token request fails
+    Pooled HTTP session shared by token and tracking calls
 
-    Returns:
-        Tuple of (access_token, token_timestamp) or None if failed
+    Sized for the concurrent engine so every worker keeps its own keep-alive
+    connection. The OAuth token request is safe to retry, so POST is retried too;
+    these adapter retries are the only retries of a token request.
     """
-    for attempt in range(1, retry_count + 1):
-        try:
-            payload = {"grant_type": "client_credentials"}
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "x-merchant-id": "string",
-            }
-
-            response = requests.post(
-                UPS_TOKEN_URL,
-                data=payload,
-                headers=headers,
-                auth=(credentials.username, credentials.password),
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            access_token = data["access_token"]
-            token_timestamp = datetime.now()
-
-            logger.info(
-                f"✅ Successfully obtained UPS access token ({credentials.name}) at {token_timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
-            )
-            return access_token, token_timestamp
-
-        except Exception as e:
-            logger.error(
-                f"❌ Failed to get UPS access token ({credentials.name}) (attempt {attempt}/{retry_count}): {e}"
-            )
-            if attempt < retry_count:
-                wait_time = 5 * attempt  # Exponential backoff: 5s, 10s, 15s
-                logger.info(f"⏳ Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"❌ All {retry_count} token request attempts failed")
-                return None
-
-    return None
+    return get_session(
+        "ups",
+        pool_size=max(HTTP_POOL_SIZE, MAX_CONCURRENCY),
+        retry_methods=("GET", "POST"),
+    )
 
 
-def is_token_expired(token_timestamp: datetime, expiry_minutes: int = 55) -> bool:
+def get_ups_access_token(credentials: UPSCredentials) -> Optional[Tuple[str, datetime]]:
     """
-    Check if the access token is expired or about to expire
+    Get UPS API access token
+
+    Connection errors, read errors and HTTP 5xx are retried with backoff by the
+    pooled session (see get_http_session); a failed background refresh is
+    retried later by the credential's TokenProvider.
 
     Args:
-        token_timestamp: Timestamp when the token was obtained
-        expiry_minutes: Minutes before considering token expired (default: 55 minutes,
-                       to refresh before the 60-minute expiration)
+        credentials: UPS credentials to use for authentication
 
     Returns:
-        True if token should be refreshed, False otherwise
-    """
-    if token_timestamp is None:
-        return True
-
-    elapsed_time = datetime.now() - token_timestamp
-    elapsed_minutes = elapsed_time.total_seconds() / 60
-
-    return elapsed_minutes >= expiry_minutes
-
-
-def refresh_token_if_needed(
-    current_token: str,
-    token_timestamp: datetime,
-    credentials: UPSCredentials,
-    expiry_minutes: int = 55,
-) -> Tuple[str, datetime]:
+        Tuple of (access_token, token_timestamp) or None if failed
     """
-    Refresh the UPS API access token if it's expired or about to expire
+    try:
+        payload = {"grant_type": "client_credentials"}
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "x-merchant-id": "string",
+        }
 
-    Args:
-        current_token: Current access token
-        token_timestamp: Timestamp when current token was obtained
-        credentials: UPS credentials to use for token refresh
-        expiry_minutes: Minutes before considering token expired (default: 55)
+        response = get_http_session().post(
+            UPS_TOKEN_URL,
+            data=payload,
+            headers=headers,
+            auth=(credentials.username, credentials.password),
+        )
+        response.raise_for_status()
 
-    Returns:
-        Tuple of (access_token, token_timestamp) - either refreshed or current
-    """
-    if is_token_expired(token_timestamp, expiry_minutes):
-        elapsed_time = datetime.now() - token_timestamp
-        elapsed_minutes = elapsed_time.total_seconds() / 60
+        data = response.json()
+        access_token = data["access_token"]
+        token_timestamp = datetime.now()
 
         logger.info(
-            f"🔄 Token has been active for {elapsed_minutes:.1f} minutes - refreshing..."
+            f"✅ Successfully obtained UPS access token ({credentials.name}) at {token_timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
         )
+        return access_token, token_timestamp
 
-        result = get_ups_access_token(credentials)
-        if result:
-            new_token, new_timestamp = result
-            logger.info("✅ Token successfully refreshed")
-            return new_token, new_timestamp
-        else:
-            logger.warning("⚠️ Token refresh failed - continuing with current token")
-            return current_token, token_timestamp
-
-    return current_token, token_timestamp
+    except Exception as e:
+        logger.error(f"❌ Failed to get UPS access token ({credentials.name}): {e}")
+        return None
 
 
 def query_ups_tracking(
@@ -450,7 +692,7 @@ def query_ups_tracking(
             "Authorization": f"Bearer {access_token}",
         }
 
-        response = requests.get(url, headers=headers)
+        response = get_http_session().get(url, headers=headers)
 
         # Check for rate limit or other HTTP errors before raising
         if response.status_code == 429:
@@ -459,6 +701,7 @@ def query_ups_tracking(
                 "error_type": "rate_limit",
                 "error_message": "Rate limit exceeded (HTTP 429)",
                 "response_text": response.text,
+                "retry_after": parse_retry_after(response.headers.get("Retry-After")),
             }
             logger.warning(
                 f"⚠️ Rate limit hit for {tracking_number}: HTTP 429 - {response.text[:100]}"
@@ -504,6 +747,17 @@ def query_ups_tracking(
         return None, error_info
 
 
+def create_rate_limiter(name: str = "UPS Tracking") -> AdaptiveRateLimiter:
+    """Create an adaptive rate limiter from the UPS_RATE_LIMIT_* configuration"""
+    return AdaptiveRateLimiter(
+        rate=RATE_LIMIT_RPS,
+        min_rate=RATE_LIMIT_MIN_RPS,
+        max_rate=RATE_LIMIT_MAX_RPS,
+        ramp_up_after=RATE_LIMIT_RAMP_AFTER,
+        name=name,
+    )
+
+
 def check_label_only_status(ups_response: Dict) -> Tuple[bool, str]:
     """
     Check if tracking number has exclusively the label-only status
@@ -556,25 +810,348 @@ def check_label_only_status(ups_response: Dict) -> Tuple[bool, str]:
         return False, f"Error parsing response: {e}"
 
 
+def get_activity_count(ups_response: Dict) -> int:
+    """Number of activity records on the first package of a UPS tracking response"""
+    try:
+        shipment = ups_response.get("trackResponse", {}).get("shipment", [])
+        package = shipment[0].get("package", []) if shipment else []
+        return len(package[0].get("activity", [])) if package else 0
+    except (AttributeError, IndexError, TypeError):
+        return 0
+
+
+def summarize_ups_response(ups_response: Dict) -> Dict:
+    """
+    Extract the fields kept in result records from a UPS tracking response
+
+    Args:
+        ups_response: UPS API response data
+
+    Returns:
+        Dictionary with status_description, status_code, status_type (of the
+        most recent activity), activity_count and shipment_date (YYYYMMDD date
+        of the most recent activity, i.e. the label creation date for label-only
+        packages)
+    """
+    summary = {
+        "status_description": "Unknown",
+        "status_code": "Unknown",
+        "status_type": "Unknown",
+        "activity_count": get_activity_count(ups_response),
+        "shipment_date": None,
+    }
+    try:
+        activity = (
+            ups_response.get("trackResponse", {})
+            .get("shipment", [{}])[0]
+            .get("package", [{}])[0]
+            .get("activity", [])
+        )
+    except (AttributeError, IndexError, TypeError):
+        return summary
+
+    if activity:
+        status = activity[0].get("status", {})
+        summary["status_description"] = status.get("description", "").strip()
+        summary["status_code"] = status.get("code", "")
+        summary["status_type"] = status.get("type", "")
+        summary["shipment_date"] = activity[0].get("date")
+    return summary
+
+
+class RawResponseWriter:
+    """
+    Thread-safe gzip JSONL writer for raw UPS tracking responses
+
+    Each line is {"tracking_number": ..., "account_number": ..., "ups_response": {...}},
+    so payloads can be inspected (or re-classified with batch_classifier.py)
+    later without holding them in the results dictionary.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, tracking_number: str, account_number: str, ups_response: Dict):
+        line = json.dumps(
+            {
+                "tracking_number": tracking_number,
+                "account_number": account_number,
+                "ups_response": ups_response,
+            },
+            ensure_ascii=False,
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def query_with_credentials(
+    tracking_number: str,
+    state: CredentialState,
+    credential_manager: CredentialManager,
+) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """
+    Query the UPS Tracking API with a specific credential pair
+
+    Feeds the outcome back into the credential's rate limiter and cooldown.
+
+    Returns:
+        Tuple of (response_data, error_info) as returned by query_ups_tracking,
+        with error_type "token_error" if the credential has no usable token
+    """
+    access_token = credential_manager.get_token(state)
+    if not access_token:
+        return None, {
+            "status_code": None,
+            "error_type": "token_error",
+            "error_message": f"Failed to get access token ({state.name})",
+        }
+
+    credential_manager.record_api_call(state)
+    ups_response, error_info = query_ups_tracking(tracking_number, access_token)
+
+    if error_info and error_info.get("error_type") == "rate_limit":
+        credential_manager.record_rate_limited(state, error_info.get("retry_after"))
+    elif ups_response is not None:
+        credential_manager.record_success(state)
+
+    return ups_response, error_info
+
+
+def is_credential_error(error_info: Dict) -> bool:
+    """
+    Check if a failed lookup may succeed with another credential pair
+
+    Rate limits, token failures, HTTP 401/403 and server errors depend on the
+    credential or its quota; other client errors (e.g. HTTP 404 for an unknown
+    tracking number) would get the same answer from every credential.
+    """
+    error_type = error_info.get("error_type")
+    if error_type in ("rate_limit", "token_error"):
+        return True
+    if error_type != "http_error":
+        return False
+    status_code = error_info.get("status_code") or 0
+    return status_code in CREDENTIAL_ERROR_STATUS_CODES or status_code >= 500
+
+
+def classify_tracking_item(
+    tracking_item: Dict[str, str],
+    position: int,
+    total: int,
+    credential_manager: CredentialManager,
+) -> Tuple[str, Dict, Optional[Dict]]:
+    """
+    Query and classify a single tracking number
+
+    Shared by every processing engine so that label-only / excluded / api_errors
+    semantics are identical regardless of how the work is scheduled.
+
+    Args:
+        tracking_item: Dictionary containing tracking_number and account_number
+        position: 1-based position of the item in the input (for logging)
+        total: Total number of items being processed (for logging)
+        credential_manager: Load-balancing credential manager
+
+    Returns:
+        Tuple of (outcome, record, ups_response) where outcome is one of
+        "label_only", "excluded" or "error". The record is the compact result
+        entry; the raw response (None for errors) is returned separately for
+        the cache and the optional raw response file.
+    """
+    tracking_number = tracking_item["tracking_number"]
+    account_number = tracking_item["account_number"]
+
+    # Start timing for this tracking number
+    tracking_start_time = time.time()
+
+    logger.info(
+        f"📦 Processing {position}/{total}: {tracking_number} (Account: {account_number})"
+    )
+
+    # Pick the healthiest credential; its token is refreshed if needed
+    state = credential_manager.acquire()
+    ups_response, error_info = query_with_credentials(
+        tracking_number, state, credential_manager
+    )
+
+    # Handle API errors by retrying on another credential pair
+    if ups_response is None and error_info is not None:
+        error_type = error_info.get("error_type", "unknown")
+        error_message = error_info.get("error_message", "Unknown error")
+
+        if is_credential_error(error_info):
+            logger.warning(f"⚠️ API error detected ({error_type}): {error_message}")
+
+            if error_type == "http_error" and not credential_manager.has_alternative():
+                logger.error(
+                    "❌ No other credentials available for retry - continuing with current credentials"
+                )
+                tracking_elapsed = time.time() - tracking_start_time
+                logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
+                return "error", {
+                    "tracking_number": tracking_number,
+                    "account_number": account_number,
+                    "error": error_message,
+                    "error_type": error_type,
+                    "status_code": error_info.get("status_code"),
+                    "processing_time_seconds": tracking_elapsed,
+                }, None
+
+            # Rate limits and token failures may be retried on every credential
+            # (after its cooldown); other HTTP errors get one retry elsewhere
+            retries = (
+                len(credential_manager.states) if error_type != "http_error" else 1
+            )
+            failed_state = state
+            for _ in range(retries):
+                retry_state = credential_manager.acquire(exclude=failed_state)
+                credential_manager.record_switch(failed_state, retry_state)
+
+                logger.info(
+                    f"🔄 Retrying {tracking_number} with {retry_state.name} credentials..."
+                )
+                ups_response, error_info = query_with_credentials(
+                    tracking_number, retry_state, credential_manager
+                )
+                if ups_response is not None or error_info.get("error_type") not in (
+                    "rate_limit",
+                    "token_error",
+                ):
+                    break
+                failed_state = retry_state
+
+            # If still failed, log and continue
+            if ups_response is None:
+                tracking_elapsed = time.time() - tracking_start_time
+                logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
+                return "error", {
+                    "tracking_number": tracking_number,
+                    "account_number": account_number,
+                    "error": f"Failed even after credential switch: {error_info.get('error_message', 'Unknown')}",
+                    "error_type": error_info.get("error_type"),
+                    "status_code": error_info.get("status_code"),
+                    "processing_time_seconds": tracking_elapsed,
+                }, None
+        else:
+            # Not a credential or quota problem (e.g. HTTP 404 for an unknown
+            # tracking number) - another credential would get the same answer
+            tracking_elapsed = time.time() - tracking_start_time
+            logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
+            return "error", {
+                "tracking_number": tracking_number,
+                "account_number": account_number,
+                "error": error_message,
+                "error_type": error_type,
+                "status_code": error_info.get("status_code"),
+                "processing_time_seconds": tracking_elapsed,
+            }, None
+
+    # Calculate elapsed time for this tracking number (including retries)
+    tracking_elapsed = time.time() - tracking_start_time
+
+    # Check if it matches label-only criteria
+    is_label_only, reason = check_label_only_status(ups_response)
+
+    record = {
+        "tracking_number": tracking_number,
+        "account_number": account_number,
+        "reason": reason,
+        **summarize_ups_response(ups_response),
+        "processing_time_seconds": tracking_elapsed,
+    }
+
+    if is_label_only:
+        logger.info(f"   ✅ MATCH: {reason}")
+    else:
+        logger.info(f"   ❌ EXCLUDED: {reason}")
+    logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
+
+    return ("label_only" if is_label_only else "excluded"), record, ups_response
+
+
+def classify_cached_item(
+    tracking_item: Dict[str, str],
+    position: int,
+    total: int,
+    cached: CachedTracking,
+    classified: Dict,
+) -> Tuple[str, Dict]:
+    """
+    Build the result for a tracking number served from the cache (no API call)
+
+    Args:
+        classified: Row for this tracking number from classify_responses(); all
+                    cache hits are classified up front in one vectorized pass,
+                    re-applying the current label-only criteria
+    """
+    tracking_number = tracking_item["tracking_number"]
+    outcome = classified["classification"]
+    reason = classified["reason"]
+
+    logger.info(
+        f"🗄️  Cached {position}/{total}: {tracking_number} "
+        f"({'MATCH' if outcome == 'label_only' else 'EXCLUDED'}: {reason}, checked {cached.checked_at:%Y-%m-%d %H:%M})"
+    )
+
+    return outcome, {
+        "tracking_number": tracking_number,
+        "account_number": tracking_item["account_number"],
+        "reason": reason,
+        "status_description": classified["status_description"],
+        "status_code": classified["status_code"],
+        "status_type": classified["status_type"],
+        "activity_count": classified["activity_count"],
+        "shipment_date": classified["shipment_date"],
+        "cached": True,
+        "cached_at": cached.checked_at.isoformat(),
+    }
+
+
 def process_tracking_numbers(
     tracking_numbers: List[Dict[str, str]],
-    access_token: str,
-    token_timestamp: datetime,
     credential_manager: CredentialManager,
+    engine: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    cache: Optional[TrackingCache] = None,
+    raw_writer: Optional[RawResponseWriter] = None,
+    checkpoint: Optional[ResultCheckpoint] = None,
 ) -> Dict:
     """
-    Process tracking numbers and filter for label-only status with automatic token refresh
-    and credential rotation on rate limit errors
+    Process tracking numbers and filter for label-only status, spreading requests
+    across all healthy credential pairs with automatic token refresh
 
     Args:
         tracking_numbers: List of dictionaries containing tracking_number and account_number
-        access_token: UPS API access token
-        token_timestamp: Timestamp when the token was obtained
-        credential_manager: CredentialManager instance for credential rotation
+        credential_manager: CredentialManager that owns tokens, rate limiters and cooldowns
+        engine: "sequential" or "concurrent" (default: UPS_FILTER_ENGINE)
+        max_workers: Concurrency limit for the concurrent engine
+                     (default: UPS_FILTER_CONCURRENCY)
+        cache: Optional TrackingCache; fresh entries skip the API call and new
+               successful responses are stored
+        raw_writer: Optional RawResponseWriter receiving the raw response of
+                    every live lookup (records themselves stay compact)
+        checkpoint: Optional ResultCheckpoint; already classified numbers are
+                    skipped and every new result is streamed to it. Excluded
+                    records then live only in the checkpoint file, not in memory.
 
     Returns:
         Dictionary with results and statistics
     """
+    engine = (engine or PROCESSING_ENGINE).lower()
+    if engine not in PROCESSING_ENGINES:
+        raise ValueError(
+            f"Unknown processing engine '{engine}' (expected one of: {', '.join(PROCESSING_ENGINES)})"
+        )
+    max_workers = max(1, max_workers or MAX_CONCURRENCY)
+
     results = {
         "label_only_tracking_numbers": [],
         "excluded_tracking_numbers": [],
@@ -585,184 +1162,229 @@ def process_tracking_numbers(
         "total_errors": 0,
         "token_refreshes": 0,
         "credential_switches": 0,
+        "cache_hits": 0,
+        "api_calls": 0,
+        "resumed": 0,
+        "processing_time": {
+            "samples": 0,
+            "total_seconds": 0.0,
+            "min_seconds": None,
+            "max_seconds": None,
+        },
+        "engine": engine,
     }
 
-    logger.info(f"🔄 Processing {len(tracking_numbers)} tracking numbers...")
+    if checkpoint:
+        pending = []
+        for tracking_item in tracking_numbers:
+            outcome = checkpoint.get_outcome(tracking_item["tracking_number"])
+            if outcome is None:
+                pending.append(tracking_item)
+                continue
+            _record_outcome(
+                results,
+                outcome,
+                checkpoint.label_only_records.get(tracking_item["tracking_number"]),
+                keep_record=outcome == "label_only",
+                resumed=True,
+            )
+        if results["resumed"]:
+            logger.info(
+                f"♻️  Resuming from checkpoint: {results['resumed']} already classified, "
+                f"{len(pending)} remaining"
+            )
+        tracking_numbers = pending
+
+    total = len(tracking_numbers)
+    logger.info(f"🔄 Processing {total} tracking numbers...")
     logger.info(
-        f"🔑 Starting with {credential_manager.get_credential_name()} credentials"
+        f"🔑 Balancing across {len(credential_manager.states)} credential pair(s): "
+        f"{', '.join(credential_manager.get_credential_names())}"
+    )
+    logger.info(
+        f"🚦 Rate limit: {RATE_LIMIT_RPS:.2f} req/s per credential (adaptive, max {RATE_LIMIT_MAX_RPS:.2f} req/s)"
     )
 
-    # Track current token and timestamp
-    current_token = access_token
-    current_token_timestamp = token_timestamp
-    current_credentials = credential_manager.get_current_credentials()
-
-    for i, tracking_item in enumerate(tracking_numbers, 1):
-        tracking_number = tracking_item["tracking_number"]
-        account_number = tracking_item["account_number"]
+    cached_items: Dict[str, CachedTracking] = {}
+    cached_rows: Dict[str, Dict] = {}
+    if cache:
+        cached_items = cache.get_many(
+            item["tracking_number"] for item in tracking_numbers
+        )
+        logger.info(
+            f"🗄️  Cache: {len(cached_items)} of {total} tracking numbers are fresh - "
+            f"{total - len(cached_items)} need an API call"
+        )
+    if cached_items:
+        # The stored JSON text goes to DuckDB as is (no per-hit json round trip)
+        classified = classify_responses(
+            list(cached_items),
+            [cached.ups_response_json for cached in cached_items.values()],
+        )
+        cached_rows = {
+            row["tracking_number"]: row for row in classified.iter_rows(named=True)
+        }
 
-        # Start timing for this tracking number
-        tracking_start_time = time.time()
+    def worker(indexed_item: Tuple[int, Dict[str, str]]) -> Tuple[str, Dict]:
+        position, tracking_item = indexed_item
+
+        cached = cached_items.get(tracking_item["tracking_number"])
+        if cached:
+            return classify_cached_item(
+                tracking_item,
+                position,
+                total,
+                cached,
+                cached_rows[tracking_item["tracking_number"]],
+            )
 
-        logger.info(
-            f"📦 Processing {i}/{len(tracking_numbers)}: {tracking_number} (Account: {account_number})"
+        outcome, record, ups_response = classify_tracking_item(
+            tracking_item, position, total, credential_manager
         )
+        if ups_response is not None:
+            if cache:
+                cache.put(
+                    record["tracking_number"],
+                    outcome == "label_only",
+                    record["activity_count"],
+                    ups_response,
+                )
+            if raw_writer:
+                raw_writer.write(
+                    record["tracking_number"], record["account_number"], ups_response
+                )
+        return outcome, record
+
+    indexed_items = enumerate(tracking_numbers, 1)
+
+    if engine == "concurrent":
+        logger.info(f"⚡ Concurrent engine: up to {max_workers} requests in flight")
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ups-tracking"
+        ) as executor:
+            # A bounded window of futures, recorded in input order, so result
+            # lists are ordered exactly as with the sequential engine and only
+            # the window is held in memory (or lost on a crash)
+            window = max_workers * IN_FLIGHT_PER_WORKER
+            in_flight = deque()
+            try:
+                for indexed_item in indexed_items:
+                    in_flight.append(executor.submit(worker, indexed_item))
+                    if len(in_flight) >= window:
+                        _record_result(results, *in_flight.popleft().result(), checkpoint)
+                while in_flight:
+                    _record_result(results, *in_flight.popleft().result(), checkpoint)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+    else:
+        for indexed_item in indexed_items:
+            outcome, record = worker(indexed_item)
+            _record_result(results, outcome, record, checkpoint)
+
+    credential_stats = credential_manager.stats()
+    results["api_calls"] = sum(item["api_calls"] for item in credential_stats)
+    results["token_refreshes"] = sum(item["token_refreshes"] for item in credential_stats)
+    results["credential_switches"] = credential_manager.credential_switches
+    results["credentials"] = credential_stats
+    if raw_writer:
+        results["raw_responses_file"] = raw_writer.path
+    if checkpoint:
+        results["checkpoint_file"] = checkpoint.path
+        # excluded_tracking_numbers stays empty: the records are in the checkpoint
+        results["excluded_tracking_numbers_file"] = checkpoint.path
 
-        # Check and refresh token if needed before each API call
-        current_token, current_token_timestamp = refresh_token_if_needed(
-            current_token, current_token_timestamp, current_credentials
+    return results
+
+
+def _record_result(
+    results: Dict,
+    outcome: str,
+    record: Dict,
+    checkpoint: Optional[ResultCheckpoint],
+):
+    """Stream a new result to the checkpoint (if any) and add it to the results"""
+    if checkpoint:
+        checkpoint.append(outcome, record)
+    _record_outcome(
+        results,
+        outcome,
+        record,
+        keep_record=not (checkpoint and outcome == "excluded"),
+    )
+
+
+def _record_outcome(
+    results: Dict,
+    outcome: str,
+    record: Optional[Dict],
+    keep_record: bool = True,
+    resumed: bool = False,
+):
+    """Add a classified tracking number to the results dictionary
+
+    With keep_record=False only the counters are updated (the record is
+    already persisted in the checkpoint file). Resumed records count as
+    resumed only, not as cache hits of this run.
+    """
+    results["total_processed"] += 1
+    if resumed:
+        results["resumed"] += 1
+    elif record and record.get("cached"):
+        results["cache_hits"] += 1
+
+    # Timed while processing, so excluded records streamed to the checkpoint
+    # still count
+    if not resumed and record and "processing_time_seconds" in record:
+        seconds = record["processing_time_seconds"]
+        timing = results["processing_time"]
+        timing["samples"] += 1
+        timing["total_seconds"] += seconds
+        timing["min_seconds"] = (
+            seconds
+            if timing["min_seconds"] is None
+            else min(seconds, timing["min_seconds"])
         )
+        timing["max_seconds"] = max(seconds, timing["max_seconds"] or 0.0)
 
-        # Track if token was refreshed
-        if current_token != access_token or current_token_timestamp != token_timestamp:
-            results["token_refreshes"] += 1
-
-        # Query UPS API with current (possibly refreshed) token
-        ups_response, error_info = query_ups_tracking(tracking_number, current_token)
-        results["total_processed"] += 1
-
-        # Calculate elapsed time for this tracking number
-        tracking_elapsed = time.time() - tracking_start_time
-
-        # Handle API errors and credential rotation
-        if ups_response is None and error_info is not None:
-            error_type = error_info.get("error_type", "unknown")
-            error_message = error_info.get("error_message", "Unknown error")
-
-            # Check if this is a rate limit error or any API error that should trigger rotation
-            if error_type in ["rate_limit", "http_error"]:
-                logger.warning(f"⚠️ API error detected ({error_type}): {error_message}")
-
-                # Try to switch to next credential pair
-                if credential_manager.has_more_credentials():
-                    next_credentials = credential_manager.switch_to_next_credentials()
-                    if next_credentials:
-                        results["credential_switches"] += 1
-                        logger.info(
-                            f"🔄 Switched to {next_credentials.name} credentials"
-                        )
-
-                        # Get new token with new credentials
-                        logger.info(
-                            "🔑 Obtaining new access token with new credentials..."
-                        )
-                        token_result = get_ups_access_token(next_credentials)
-
-                        if token_result:
-                            current_token, current_token_timestamp = token_result
-                            current_credentials = next_credentials
-                            logger.info(
-                                "✅ Successfully obtained token with new credentials"
-                            )
-
-                            # Retry the current tracking number with new credentials
-                            logger.info(
-                                f"🔄 Retrying {tracking_number} with new credentials..."
-                            )
-                            ups_response, error_info = query_ups_tracking(
-                                tracking_number, current_token
-                            )
-
-                            # If still failed, log and continue
-                            if ups_response is None:
-                                results["api_errors"].append(
-                                    {
-                                        "tracking_number": tracking_number,
-                                        "account_number": account_number,
-                                        "error": f"Failed even after credential switch: {error_info.get('error_message', 'Unknown')}",
-                                        "error_type": error_info.get("error_type"),
-                                        "status_code": error_info.get("status_code"),
-                                        "processing_time_seconds": tracking_elapsed,
-                                    }
-                                )
-                                results["total_errors"] += 1
-                                logger.info(
-                                    f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds"
-                                )
-                                continue
-                        else:
-                            logger.error("❌ Failed to get token with new credentials")
-                            results["api_errors"].append(
-                                {
-                                    "tracking_number": tracking_number,
-                                    "account_number": account_number,
-                                    "error": "Failed to get token after credential switch",
-                                    "processing_time_seconds": tracking_elapsed,
-                                }
-                            )
-                            results["total_errors"] += 1
-                            logger.info(
-                                f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds"
-                            )
-                            continue
-                else:
-                    logger.error(
-                        "❌ No more credentials available for rotation - continuing with current credentials"
-                    )
-                    results["api_errors"].append(
-                        {
-                            "tracking_number": tracking_number,
-                            "account_number": account_number,
-                            "error": error_message,
-                            "error_type": error_type,
-                            "status_code": error_info.get("status_code"),
-                            "processing_time_seconds": tracking_elapsed,
-                        }
-                    )
-                    results["total_errors"] += 1
-                    logger.info(
-                        f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds"
-                    )
-                    continue
-            else:
-                # Non-rate-limit error - just log and continue
-                results["api_errors"].append(
-                    {
-                        "tracking_number": tracking_number,
-                        "account_number": account_number,
-                        "error": error_message,
-                        "error_type": error_type,
-                        "processing_time_seconds": tracking_elapsed,
-                    }
-                )
-                results["total_errors"] += 1
-                logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
-                continue
+    if outcome == "label_only":
+        key, total_key = "label_only_tracking_numbers", "total_label_only"
+    elif outcome == "excluded":
+        key, total_key = "excluded_tracking_numbers", "total_excluded"
+    else:
+        key, total_key = "api_errors", "total_errors"
 
-        # Check if it matches label-only criteria
-        is_label_only, reason = check_label_only_status(ups_response)
+    results[total_key] += 1
+    if keep_record:
+        results[key].append(record)
 
-        if is_label_only:
-            results["label_only_tracking_numbers"].append(
-                {
-                    "tracking_number": tracking_number,
-                    "account_number": account_number,
-                    "reason": reason,
-                    "ups_response": ups_response,
-                    "processing_time_seconds": tracking_elapsed,
-                }
-            )
-            results["total_label_only"] += 1
-            logger.info(f"   ✅ MATCH: {reason}")
-            logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
-        else:
-            results["excluded_tracking_numbers"].append(
-                {
-                    "tracking_number": tracking_number,
-                    "account_number": account_number,
-                    "reason": reason,
-                    "ups_response": ups_response,
-                    "processing_time_seconds": tracking_elapsed,
-                }
-            )
-            results["total_excluded"] += 1
-            logger.info(f"   ❌ EXCLUDED: {reason}")
-            logger.info(f"   ⏱️  Processing time: {tracking_elapsed:.2f} seconds")
 
-        # Add small delay to avoid rate limiting
-        time.sleep(0.5)
+def get_output_date_range() -> Tuple[str, str]:
+    """Start/end date (YYYYMMDD) of the configured window, used in output filenames"""
+    start_date = (
+        datetime.utcnow() - timedelta(days=TRANSACTION_DATE_START_DAYS_AGO)
+    ).strftime("%Y%m%d")
+    end_date = (
+        datetime.utcnow() - timedelta(days=TRANSACTION_DATE_END_DAYS_AGO)
+    ).strftime("%Y%m%d")
+    return start_date, end_date
 
-    return results
+
+def get_raw_responses_path(timestamp: str) -> str:
+    """Path of the optional gzip JSONL file holding raw UPS responses"""
+    start_date, end_date = get_output_date_range()
+    return os.path.join(
+        OUTPUT_DIR,
+        f"ups_label_only_raw_responses_range_{start_date}_to_{end_date}_{timestamp}.jsonl.gz",
+    )
+
+
+def get_checkpoint_path() -> str:
+    """Checkpoint path for the configured window (no timestamp, so re-runs resume it)"""
+    start_date, end_date = get_output_date_range()
+    return os.path.join(
+        OUTPUT_DIR, f"ups_label_only_checkpoint_range_{start_date}_to_{end_date}.jsonl"
+    )
 
 
 def save_results(results: Dict, timestamp: str) -> Tuple[str, str]:
@@ -776,13 +1398,7 @@ def save_results(results: Dict, timestamp: str) -> Tuple[str, str]:
     Returns:
         Tuple of (json_filepath, csv_filepath)
     """
-    # Calculate date range for filename using centralized configuration
-    start_date = (
-        datetime.utcnow() - timedelta(days=TRANSACTION_DATE_START_DAYS_AGO)
-    ).strftime("%Y%m%d")
-    end_date = (
-        datetime.utcnow() - timedelta(days=TRANSACTION_DATE_END_DAYS_AGO)
-    ).strftime("%Y%m%d")
+    start_date, end_date = get_output_date_range()
 
     # Save complete results to JSON
     json_filename = (
@@ -799,40 +1415,11 @@ def save_results(results: Dict, timestamp: str) -> Tuple[str, str]:
     )
     csv_filepath = os.path.join(OUTPUT_DIR, csv_filename)
 
-    with open(csv_filepath, "w", encoding="utf-8") as f:
-        f.write(
-            "tracking_number,account_number,status_description,status_code,status_type,date_processed\n"
-        )
-        for item in results["label_only_tracking_numbers"]:
-            # Extract status information from the UPS response
-            try:
-                ups_response = item.get("ups_response", {})
-                activity = (
-                    ups_response.get("trackResponse", {})
-                    .get("shipment", [{}])[0]
-                    .get("package", [{}])[0]
-                    .get("activity", [{}])
-                )
-                if activity:
-                    status = activity[0].get("status", {})
-                    status_description = status.get("description", "").strip()
-                    status_code = status.get("code", "")
-                    status_type = status.get("type", "")
-                else:
-                    status_description = "Unknown"
-                    status_code = "Unknown"
-                    status_type = "Unknown"
-            except (KeyError, IndexError, AttributeError):
-                status_description = "Unknown"
-                status_code = "Unknown"
-                status_type = "Unknown"
-
-            # Escape commas in status description for CSV
-            status_description_escaped = status_description.replace(",", ";")
-
-            f.write(
-                f"{item['tracking_number']},{item['account_number']},{status_description_escaped},{status_code},{status_type},{timestamp}\n"
-            )
+    write_label_only_csv(
+        label_only_frame(results["label_only_tracking_numbers"]),
+        csv_filepath,
+        timestamp,
+    )
 
     return json_filepath, csv_filepath
 
@@ -842,42 +1429,45 @@ def print_summary(results: Dict):
     logger.info("\n" + "=" * 60)
     logger.info("🎯 UPS LABEL-ONLY FILTER SUMMARY")
     logger.info("=" * 60)
+    logger.info(f"⚙️  Engine: {results.get('engine', 'sequential')}")
     logger.info(f"📊 Total Processed: {results['total_processed']}")
     logger.info(f"✅ Label-Only Found: {results['total_label_only']}")
     logger.info(f"❌ Excluded: {results['total_excluded']}")
     logger.info(f"🚫 API Errors: {results['total_errors']}")
     logger.info(f"🔄 Token Refreshes: {results.get('token_refreshes', 0)}")
     logger.info(f"🔑 Credential Switches: {results.get('credential_switches', 0)}")
+    logger.info(
+        f"🗄️  Cache Hits: {results.get('cache_hits', 0)} "
+        f"(API calls: {results.get('api_calls', 0)})"
+    )
+    if results.get("resumed"):
+        logger.info(f"♻️  Resumed From Checkpoint: {results['resumed']}")
+
+    if results.get("credentials"):
+        logger.info("\n🔑 CREDENTIAL USAGE:")
+        for credential in results["credentials"]:
+            logger.info(
+                f"   {credential['name']}: {credential['requests']} requests, "
+                f"{credential.get('api_calls', 0)} API calls, "
+                f"{credential['rate_limit_hits']} HTTP 429 hits, "
+                f"final rate {credential['current_rate']:.2f} req/s"
+            )
 
     if results["total_processed"] > 0:
         success_rate = (results["total_label_only"] / results["total_processed"]) * 100
         logger.info(f"📈 Label-Only Rate: {success_rate:.1f}%")
 
-    # Calculate and display average processing time
-    all_processing_times = []
-
-    # Collect processing times from all tracking numbers
-    for item in results["label_only_tracking_numbers"]:
-        if "processing_time_seconds" in item:
-            all_processing_times.append(item["processing_time_seconds"])
-
-    for item in results["excluded_tracking_numbers"]:
-        if "processing_time_seconds" in item:
-            all_processing_times.append(item["processing_time_seconds"])
-
-    for error in results["api_errors"]:
-        if "processing_time_seconds" in error:
-            all_processing_times.append(error["processing_time_seconds"])
-
-    if all_processing_times:
-        avg_time = sum(all_processing_times) / len(all_processing_times)
-        min_time = min(all_processing_times)
-        max_time = max(all_processing_times)
+    # Average processing time of this run's lookups (counted while processing,
+    # so records streamed only to the checkpoint are included)
+    timing = results.get("processing_time") or {}
+    if timing.get("samples"):
         logger.info("\n⏱️  PROCESSING TIME STATISTICS:")
-        logger.info(f"   Average: {avg_time:.2f} seconds per tracking number")
-        logger.info(f"   Minimum: {min_time:.2f} seconds")
-        logger.info(f"   Maximum: {max_time:.2f} seconds")
-        logger.info(f"   Total samples: {len(all_processing_times)}")
+        logger.info(
+            f"   Average: {timing['total_seconds'] / timing['samples']:.2f} seconds per tracking number"
+        )
+        logger.info(f"   Minimum: {timing['min_seconds']:.2f} seconds")
+        logger.info(f"   Maximum: {timing['max_seconds']:.2f} seconds")
+        logger.info(f"   Total samples: {timing['samples']}")
 
     if results["label_only_tracking_numbers"]:
         logger.info("\n🎯 LABEL-ONLY TRACKING NUMBERS:")
@@ -893,7 +1483,7 @@ def print_summary(results: Dict):
 
 
 def main():
-    """Main function to run the label-only filter with automatic token refresh and credential rotation"""
+    """Main function to run the label-only filter with automatic token refresh and credential load balancing"""
     logger.info("🚀 Starting UPS Label-Only Tracking Filter")
     logger.info("=" * 60)
 
@@ -943,26 +1533,59 @@ def main():
         logger.info("✅ Exiting gracefully - no action needed.")
         return
 
-    # Get UPS access token with timestamp using primary credentials
-    logger.info("🔑 Step 3: Getting UPS API access token...")
-    current_credentials = credential_manager.get_current_credentials()
-    token_result = get_ups_access_token(current_credentials)
+    # Get UPS access tokens for every credential pair
+    logger.info("🔑 Step 3: Getting UPS API access tokens...")
+    healthy_credentials = credential_manager.initialize_tokens()
 
-    if not token_result:
-        logger.error("❌ Failed to get UPS access token. Exiting.")
+    if not healthy_credentials:
+        logger.error("❌ Failed to get a UPS access token for any credentials. Exiting.")
+        credential_manager.close()
         return
 
-    access_token, token_timestamp = token_result
-    logger.info(f"🔑 Token will auto-refresh every 55 minutes to prevent expiration")
     logger.info(
-        f"🔄 Credential rotation enabled - will switch on rate limit or API errors"
+        f"🔑 {healthy_credentials}/{len(credential_manager.states)} credential pair(s) ready"
+    )
+    logger.info(
+        f"🔑 Tokens refresh in the background after {TOKEN_REFRESH_MINUTES:.0f} minutes "
+        f"(before the {TOKEN_EXPIRY_MINUTES:.0f}-minute mark)"
+    )
+    logger.info(
+        "⚖️  Load balancing enabled - credentials cool down on rate limit errors"
     )
 
     # Process tracking numbers with automatic token refresh and credential rotation
     logger.info("🔄 Step 4: Processing tracking numbers...")
-    results = process_tracking_numbers(
-        tracking_numbers, access_token, token_timestamp, credential_manager
+    logger.info(
+        f"⚙️  Processing engine: {PROCESSING_ENGINE}"
+        + (
+            f" (concurrency: {MAX_CONCURRENCY})"
+            if PROCESSING_ENGINE == "concurrent"
+            else ""
+        )
     )
+    cache = TrackingCache() if CACHE_ENABLED else None
+    raw_writer = (
+        RawResponseWriter(get_raw_responses_path(timestamp))
+        if SAVE_RAW_RESPONSES
+        else None
+    )
+    checkpoint = ResultCheckpoint(get_checkpoint_path()) if CHECKPOINT_ENABLED else None
+    try:
+        results = process_tracking_numbers(
+            tracking_numbers,
+            credential_manager,
+            cache=cache,
+            raw_writer=raw_writer,
+            checkpoint=checkpoint,
+        )
+    finally:
+        credential_manager.close()
+        if cache:
+            cache.close()
+        if raw_writer:
+            raw_writer.close()
+        if checkpoint:
+            checkpoint.close()
 
     # Save results
     logger.info("💾 Step 5: Saving results...")
@@ -974,6 +1597,10 @@ def main():
     logger.info(f"\n📁 Results saved to:")
     logger.info(f"   JSON: {json_filepath}")
     logger.info(f"   CSV:  {csv_filepath}")
+    if raw_writer:
+        logger.info(f"   Raw:  {raw_writer.path} ({raw_writer.count} responses)")
+    if checkpoint:
+        logger.info(f"   Checkpoint: {checkpoint.path}")
     logger.info("\n✅ UPS Label-Only Filter completed successfully!")
 
 
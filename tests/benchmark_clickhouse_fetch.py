@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark ClickHouse Fetch Formats (rows vs. Arrow)
+===================================================
+
+Runs create_carrier_invoice_resource with DLT_CLICKHOUSE_FETCH_FORMAT=rows and
+=arrow and reports rows/sec and peak RSS for:
+
+- extract: iterating the resource (row tuples -> dicts vs. Arrow tables)
+- pipeline: a full dlt run (extract, normalize, load) into a temporary DuckDB
+
+Every format runs in its own subprocess so peak RSS is not shared. By default
+the source is an in-memory stand-in for ClickHouseConnection serving synthetic
+invoice rows (tuples for "rows", a pyarrow Table for "arrow"), so the numbers
+isolate the Python side of the pipeline; with --live the configured ClickHouse
+(.env) and date window are used instead.
+
+Usage:
+    poetry run python tests/benchmark_clickhouse_fetch.py
+    poetry run python tests/benchmark_clickhouse_fetch.py --rows 500000 --columns 60 --batch-size 50000
+    poetry run python tests/benchmark_clickhouse_fetch.py --live --stage extract
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import argparse
+import bisect
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+FORMATS = ("rows", "arrow")
+STAGES = ("extract", "pipeline")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class SyntheticClickHouse:
+    """Serves synthetic invoice rows to the extraction loop (one window)"""
+
+    def __init__(self, num_rows: int, num_columns: int, fetch_format: str):
+        self.connected = True
+        self.start_time = (datetime.utcnow() - timedelta(days=85)).replace(microsecond=0)
+
+        self.column_names = [
+            "invoice_number",
+            "import_time",
+            "transaction_date",
+            "invoice_date",
+            "tracking_number",
+            "net_amount",
+        ] + [f"extra_{i}" for i in range(max(0, num_columns - 6))]
+        columns = {
+            "invoice_number": [f"INV{i:010d}" for i in range(num_rows)],
+            "import_time": [self.start_time + timedelta(seconds=i % 3000) for i in range(num_rows)],
+            "transaction_date": [
+                f"{1 + i % 12}/{1 + i % 28}/2025" if i % 2 else f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}"
+                for i in range(num_rows)
+            ],
+            "invoice_date": [f"2025-{1 + i % 12:02d}-15" for i in range(num_rows)],
+            "tracking_number": [f"1Z{i:016d}" for i in range(num_rows)],
+            "net_amount": [float(i % 1000) / 10 for i in range(num_rows)],
+        }
+        for name in self.column_names[6:]:
+            columns[name] = [f"{name}-value-{i % 500}" for i in range(num_rows)]
+        self.keys = columns["invoice_number"]
+        self.import_times = columns["import_time"]
+
+        if fetch_format == "arrow":
+            import pyarrow as pa
+
+            self.table = pa.table(columns)
+            self.rows = None
+        else:
+            self.table = None
+            self.rows = list(zip(*(columns[name] for name in self.column_names)))
+        del columns
+
+    def get_table_schema(self, table_name):
+        return [(name, "String", "", "") for name in self.column_names]
+
+    def clone(self):
+        return self
+
+    def close(self):
+        pass
+
+    def _slice(self, query, parameters):
+        limit = int(query.rsplit("LIMIT", 1)[1])
+        cursor_id = parameters["cursor_id"]
+        start = bisect.bisect_right(self.keys, cursor_id) if cursor_id else 0
+        return start, limit
+
+    def execute_query(self, query, parameters=None):
+        if "toStartOfInterval" in query:
+            # Planning query: one bucket (DLT_CLICKHOUSE_WINDOW_SECONDS covers the data)
+            times = self.import_times
+            return [(min(times), len(times), min(times), max(times))]
+        start, limit = self._slice(query, parameters)
+        return self.rows[start : start + limit]
+
+    def execute_query_arrow(self, query, parameters=None):
+        start, limit = self._slice(query, parameters)
+        return self.table.slice(start, limit)
+
+
+def run_worker(args: argparse.Namespace) -> dict:
+    """Run one format in this process and return its measurements"""
+    os.environ["DLT_CLICKHOUSE_FETCH_FORMAT"] = args.worker
+    os.environ["DLT_CLICKHOUSE_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["DLT_FORCE_FULL_LOAD"] = "true"
+    if not args.live:
+        # The synthetic source ignores window bounds: plan a single window
+        os.environ["DLT_CLICKHOUSE_WINDOW_TARGET_ROWS"] = str(args.rows)
+
+    import contextlib
+    import io
+
+    import dlt
+    import dlt_pipeline_examples
+
+    if args.live:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        conn = dlt_pipeline_examples.ClickHouseConnection(
+            host=os.getenv("CLICKHOUSE_HOST"),
+            port=int(os.getenv("CLICKHOUSE_PORT", "8443")),
+            username=os.getenv("CLICKHOUSE_USERNAME"),
+            password=os.getenv("CLICKHOUSE_PASSWORD"),
+            database=os.getenv("CLICKHOUSE_DATABASE"),
+            secure=os.getenv("CLICKHOUSE_SECURE", "true").lower() == "true",
+        )
+        if not conn.connect():
+            raise ConnectionError("Failed to connect to ClickHouse")
+    else:
+        # One window covers the synthetic data
+        os.environ["DLT_CLICKHOUSE_WINDOW_SECONDS"] = "86400"
+        conn = SyntheticClickHouse(args.rows, args.columns, args.worker)
+
+    baseline_mb = peak_rss_mb()
+    resource_ = dlt_pipeline_examples.create_carrier_invoice_resource(
+        conn, "carrier_carrier_invoice_original_flat_ups"
+    )
+
+    rows = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.stage == "extract":
+            for item in resource_:
+                rows += item.num_rows if hasattr(item, "num_rows") else 1
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                pipeline = dlt.pipeline(
+                    pipeline_name=f"benchmark_fetch_{args.worker}",
+                    pipelines_dir=os.path.join(tmp, "pipelines"),
+                    destination=dlt.destinations.duckdb(os.path.join(tmp, "bench.duckdb")),
+                    dataset_name="benchmark",
+                )
+                pipeline.run(resource_)
+                with pipeline.sql_client() as client:
+                    rows = client.execute_sql("SELECT COUNT(*) FROM carrier_invoice_data")[0][0]
+    elapsed = time.perf_counter() - start
+
+    return {
+        "format": args.worker,
+        "rows": rows,
+        "elapsed": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "extra_rss_mb": peak_rss_mb() - baseline_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ClickHouse fetch formats")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--columns", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--stage", choices=STAGES, default="pipeline")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--live", action="store_true", help="Use the configured ClickHouse")
+    parser.add_argument("--worker", choices=FORMATS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    source = "live ClickHouse" if args.live else f"synthetic, {args.rows:,} rows x {args.columns} columns"
+    print("🚀 ClickHouse Fetch Format Benchmark")
+    print(f"   source: {source}, batch size: {args.batch_size:,}, stage: {args.stage}")
+
+    results = []
+    for fetch_format in args.formats:
+        print(f"⏳ {fetch_format} format...")
+        command = [sys.executable, __file__, "--worker", fetch_format] + [
+            arg for arg in sys.argv[1:] if arg != "--worker"
+        ]
+        output = subprocess.run(command, capture_output=True, text=True)
+        if output.returncode != 0:
+            print(output.stderr)
+            raise SystemExit(f"❌ {fetch_format} run failed")
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print("\n" + "=" * 78)
+    print("🎯 FETCH FORMAT BENCHMARK")
+    print("=" * 78)
+    print(f"{'format':<8} {'rows':>10} {'wall s':>9} {'rows/s':>12} {'peak RSS MB':>12} {'extra RSS MB':>13}")
+    for row in results:
+        print(
+            f"{row['format']:<8} {row['rows']:>10,} {row['elapsed']:>9.2f} "
+            f"{row['rows_per_second']:>12,.0f} {row['peak_rss_mb']:>12.1f} {row['extra_rss_mb']:>13.1f}"
+        )
+    if len(results) == 2 and results[0]["rows_per_second"]:
+        print(
+            f"\n⚡ arrow vs rows: {results[1]['rows_per_second'] / results[0]['rows_per_second']:.1f}x rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
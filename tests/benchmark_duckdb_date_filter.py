@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark DuckDB transaction_date Filtering (string parsing vs. typed column)
+============================================================================
+
+Builds a synthetic carrier_invoice_data table in a temporary DuckDB file in two
+layouts and times, against each, a COUNT(*) of the date window (the filter
+alone) and the label filter's full tracking number query:
+
+- string: VARCHAR transaction_date in mixed formats, filtered with the
+  COALESCE(TRY_STRPTIME(...)) expression (files exported before the typed column)
+- typed: the export layout - transaction_date_parsed DATE, rows sorted by
+  (transaction_date_parsed, tracking_number), so row groups outside the window
+  are skipped by their zone maps
+
+Usage:
+    poetry run python tests/benchmark_duckdb_date_filter.py
+    poetry run python tests/benchmark_duckdb_date_filter.py --rows 5000000 --days 365 --window 10
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import duckdb
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from duckdb_export import SORT_ORDER, TRANSACTION_DATE_SQL, date_filter_sql  # noqa: E402
+
+LAYOUTS = ("string", "typed")
+
+
+def build_table(conn, layout: str, num_rows: int, num_days: int):
+    """Synthetic invoice rows spread over num_days, a third of them in US format"""
+    conn.execute(
+        f"""
+        CREATE TABLE raw AS
+        SELECT
+            '1Z' || lpad((hash(i) % 10000000000000000)::VARCHAR, 16, '0') AS tracking_number,
+            'ACCT' || (i % 500)::VARCHAR AS account_number,
+            DATE '2025-01-01' + (i % {num_days})::INTEGER AS day,
+            (i % 1000) / 10.0 AS net_amount
+        FROM range({num_rows}) t(i)
+        """
+    )
+    string_date = """CASE WHEN hash(tracking_number) % 3 = 0
+        THEN strftime(day, '%-m/%-d/%Y') ELSE strftime(day, '%Y-%m-%d') END"""
+    if layout == "string":
+        conn.execute(
+            f"""
+            CREATE TABLE carrier_invoice_data AS
+            SELECT tracking_number, account_number, {string_date} AS transaction_date, net_amount
+            FROM raw ORDER BY hash(tracking_number)
+            """
+        )
+    else:
+        conn.execute(
+            f"""
+            CREATE TABLE carrier_invoice_data AS
+            SELECT *, {TRANSACTION_DATE_SQL} AS transaction_date_parsed
+            FROM (
+                SELECT tracking_number, account_number, {string_date} AS transaction_date, net_amount
+                FROM raw
+            )
+            ORDER BY {SORT_ORDER}
+            """
+        )
+    conn.execute("DROP TABLE raw")
+    conn.execute("CHECKPOINT")
+
+
+def window_query(conn, start_date: str, end_date: str) -> str:
+    """The date window query of ups_label_only_filter.extract_tracking_numbers_from_duckdb"""
+    return f"""
+        SELECT DISTINCT tracking_number, account_number
+        FROM carrier_invoice_data
+        WHERE tracking_number IS NOT NULL
+        AND tracking_number != ''
+        AND LENGTH(TRIM(tracking_number)) > 0
+        AND tracking_number LIKE '1Z%'
+        AND {date_filter_sql(conn)} BETWEEN CAST('{start_date}' AS DATE) AND CAST('{end_date}' AS DATE)
+        ORDER BY tracking_number
+    """
+
+
+def count_query(conn, start_date: str, end_date: str) -> str:
+    """The date window predicate alone"""
+    return f"""
+        SELECT COUNT(*) FROM carrier_invoice_data
+        WHERE {date_filter_sql(conn)} BETWEEN CAST('{start_date}' AS DATE) AND CAST('{end_date}' AS DATE)
+    """
+
+
+def median_seconds(conn, query: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = conn.execute(query).fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), rows
+
+
+def run_layout(path: str, layout: str, args: argparse.Namespace) -> dict:
+    conn = duckdb.connect(path)
+    started = time.perf_counter()
+    build_table(conn, layout, args.rows, args.days)
+    build_seconds = time.perf_counter() - started
+    conn.close()
+
+    start_date = "2025-03-01"
+    end_date = (
+        duckdb.sql(f"SELECT (DATE '{start_date}' + {args.window - 1})::VARCHAR").fetchone()[0]
+    )
+
+    conn = duckdb.connect(path, read_only=True)
+    count_seconds, _ = median_seconds(conn, count_query(conn, start_date, end_date), args.repeat)
+    query_seconds, rows = median_seconds(
+        conn, window_query(conn, start_date, end_date), args.repeat
+    )
+    conn.close()
+
+    return {
+        "layout": layout,
+        "build_seconds": build_seconds,
+        "count_seconds": count_seconds,
+        "query_seconds": query_seconds,
+        "matches": len(rows),
+        "file_mb": os.path.getsize(path) / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DuckDB transaction_date filtering")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=180, help="Days of data in the table")
+    parser.add_argument("--window", type=int, default=10, help="Days in the queried window")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print("🚀 DuckDB transaction_date Filter Benchmark")
+    print(f"   {args.rows:,} rows over {args.days} days, {args.window}-day window, median of {args.repeat}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout in LAYOUTS:
+            print(f"⏳ {layout} layout...")
+            results.append(run_layout(os.path.join(tmp, f"{layout}.duckdb"), layout, args))
+
+    print("\n" + "=" * 70)
+    print("🎯 DATE FILTER BENCHMARK")
+    print("=" * 70)
+    print(
+        f"{'layout':<8} {'build s':>9} {'filter ms':>10} {'query ms':>10} {'matches':>10} {'file MB':>9}"
+    )
+    for row in results:
+        print(
+            f"{row['layout']:<8} {row['build_seconds']:>9.2f} {row['count_seconds'] * 1000:>10.1f} "
+            f"{row['query_seconds'] * 1000:>10.1f} "
+            f"{row['matches']:>10,} {row['file_mb']:>9.1f}"
+        )
+    if results[0]["matches"] != results[1]["matches"]:
+        raise SystemExit("❌ Layouts returned different results")
+    string, typed = results
+    print(
+        f"\n⚡ typed vs string: filter {string['count_seconds'] / typed['count_seconds']:.1f}x, "
+        f"label filter query {string['query_seconds'] / typed['query_seconds']:.1f}x faster"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTTP Connection Pooling
+=================================
+
+Compares per-request latency of one-off ``requests.get`` calls (new TCP
+connection per call, as the UPS filter used to do) against the pooled
+session from http_client.py, using a local stub server so no credentials
+or network access are needed.
+
+The stub adds a fixed connection setup delay to emulate the TCP+TLS handshake
+cost of a remote API; pooled sessions pay it once per connection.
+
+Usage:
+    poetry run python tests/benchmark_http_pooling.py
+    poetry run python tests/benchmark_http_pooling.py --requests 500 --workers 4 --handshake-ms 30
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from http_client import create_session  # noqa: E402
+
+
+class TrackingStubHandler(BaseHTTPRequestHandler):
+    """Keep-alive stub returning a small tracking-like JSON body"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    body = b'{"trackResponse": {"shipment": [{"package": [{"activity": []}]}]}}'
+
+    def setup(self):
+        # Emulated handshake cost, paid once per new connection
+        time.sleep(self.server.handshake_seconds)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(handshake_ms: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TrackingStubHandler)
+    server.handshake_seconds = handshake_ms / 1000.0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(label, get, url, total, workers):
+    """Issue `total` GETs with `workers` threads and print latency statistics"""
+
+    def timed(i):
+        start = time.perf_counter()
+        response = get(f"{url}/track/{i}")
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = list(executor.map(timed, range(total)))
+    elapsed = time.perf_counter() - start
+
+    ms = [latency * 1000 for latency in latencies]
+    print(
+        f"   {label:<12} mean {statistics.mean(ms):7.2f} ms | "
+        f"p50 {percentile(ms, 50):7.2f} ms | p95 {percentile(ms, 95):7.2f} ms | "
+        f"{total / elapsed:8.1f} req/s"
+    )
+    return statistics.mean(ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTTP connection pooling")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--handshake-ms",
+        type=float,
+        default=20.0,
+        help="Emulated connection setup cost per new connection",
+    )
+    args = parser.parse_args()
+
+    server = start_server(args.handshake_ms)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print("🚀 HTTP Connection Pooling Benchmark")
+    print("=" * 60)
+    print(
+        f"   {args.requests} requests, {args.workers} workers, "
+        f"{args.handshake_ms:.0f} ms emulated handshake"
+    )
+
+    unpooled = run(
+        "unpooled",
+        lambda u: requests.get(u, timeout=10),
+        url,
+        args.requests,
+        args.workers,
+    )
+
+    session = create_session(pool_size=args.workers)
+    pooled = run("pooled", session.get, url, args.requests, args.workers)
+    session.close()
+
+    print(f"\n✅ Pooled session is {unpooled / pooled:.1f}x faster per request")
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
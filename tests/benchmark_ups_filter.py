@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark UPS Label-Only Filter Engines
+=======================================
+
+Runs process_tracking_numbers end-to-end (real HTTP, token requests, rate
+limiting, retries and credential switching) against the local UPS stub server
+(tests/ups_stub_server.py) and reports for every engine and input size:
+
+- wall time and throughput (tracking numbers per second)
+- p50 / p95 / p99 latency per tracking number (including limiter waits and retries)
+- error-handling correctness: outcome per tracking number vs. the stub's canned answer
+- HTTP 429 hits seen by the stub, credential switches and per-credential request split
+
+Usage:
+    poetry run python tests/benchmark_ups_filter.py
+    poetry run python tests/benchmark_ups_filter.py --sizes 1000 10000 100000 \\
+        --engines sequential concurrent --credentials 3 --concurrency 16 \\
+        --latency-ms 20 --jitter-ms 20 --quota-rps 40
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# The filter validates these at import time; the stub URLs are set per run
+os.environ.setdefault("UPS_TOKEN_URL", "http://127.0.0.1/token")
+os.environ.setdefault("UPS_TRACKING_URL", "http://127.0.0.1/track/")
+
+# Add src directory and tests directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import ups_label_only_filter as label_filter  # noqa: E402
+from http_client import close_sessions  # noqa: E402
+from ups_stub_server import (  # noqa: E402
+    UPSStubServer,
+    expected_outcome,
+    make_tracking_numbers,
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def configure_credentials(count: int):
+    """Expose `count` stub credential pairs through the filter's env variables"""
+    os.environ["UPS_USERNAME"] = "stub-primary"
+    os.environ["UPS_PASSWORD"] = "stub"
+    for suffix in range(1, 100):
+        os.environ.pop(f"UPS_USERNAME_{suffix}", None)
+        os.environ.pop(f"UPS_PASSWORD_{suffix}", None)
+    for suffix in range(1, count):
+        os.environ[f"UPS_USERNAME_{suffix}"] = f"stub-credential-{suffix}"
+        os.environ[f"UPS_PASSWORD_{suffix}"] = "stub"
+
+
+def run_benchmark(
+    size: int, engine: str, args: argparse.Namespace
+) -> Dict[str, object]:
+    """Run one engine on `size` stub tracking numbers against a fresh stub server"""
+    tracking_numbers = make_tracking_numbers(size)
+    latencies: List[float] = []
+    classify = label_filter.classify_tracking_item
+
+    def timed_classify(*classify_args, **classify_kwargs):
+        start = time.perf_counter()
+        try:
+            return classify(*classify_args, **classify_kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    with UPSStubServer(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        quota_rps=args.quota_rps,
+        quota_burst=args.quota_burst,
+    ) as stub:
+        label_filter.UPS_TOKEN_URL = stub.token_url
+        label_filter.UPS_TRACKING_URL = stub.tracking_url
+        label_filter.MAX_CONCURRENCY = args.concurrency
+        label_filter.RATE_LIMIT_RPS = args.rate_limit_rps
+        label_filter.RATE_LIMIT_MAX_RPS = max(args.rate_limit_rps, args.rate_limit_max_rps)
+        label_filter.classify_tracking_item = timed_classify
+        close_sessions()  # pool is sized from MAX_CONCURRENCY on first use
+
+        credential_manager = label_filter.CredentialManager()
+        try:
+            credential_manager.initialize_tokens()
+            start = time.perf_counter()
+            results = label_filter.process_tracking_numbers(
+                tracking_numbers,
+                credential_manager,
+                engine=engine,
+                max_workers=args.concurrency,
+            )
+            elapsed = time.perf_counter() - start
+        finally:
+            credential_manager.close()
+            label_filter.classify_tracking_item = classify
+        stub_stats = stub.summary()
+
+    actual = {}
+    for key, outcome in (
+        ("label_only_tracking_numbers", "label_only"),
+        ("excluded_tracking_numbers", "excluded"),
+        ("api_errors", "error"),
+    ):
+        for record in results[key]:
+            actual[record["tracking_number"]] = outcome
+
+    mismatches = [
+        item["tracking_number"]
+        for item in tracking_numbers
+        if actual.get(item["tracking_number"]) != expected_outcome(item["tracking_number"])
+    ]
+    unexpected_errors = [
+        record
+        for record in results["api_errors"]
+        if expected_outcome(record["tracking_number"]) != "error"
+    ]
+
+    return {
+        "engine": engine,
+        "size": size,
+        "elapsed": elapsed,
+        "throughput": size / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "mismatches": len(mismatches),
+        "unexpected_errors": unexpected_errors[:3],
+        "rate_limited": sum(stub_stats["rate_limited"].values()),
+        "switches": results["credential_switches"],
+        "requests": {item["name"]: item["requests"] for item in results["credentials"]},
+    }
+
+
+def print_report(rows: List[Dict[str, object]]):
+    print("\n" + "=" * 110)
+    print("🎯 UPS LABEL-ONLY FILTER BENCHMARK")
+    print("=" * 110)
+    print(
+        f"{'engine':<11} {'numbers':>8} {'wall s':>8} {'num/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'429s':>6} {'switches':>8} {'wrong':>6}  requests per credential"
+    )
+    for row in rows:
+        split = ", ".join(f"{name}: {count}" for name, count in row["requests"].items())
+        print(
+            f"{row['engine']:<11} {row['size']:>8} {row['elapsed']:>8.2f} {row['throughput']:>8.1f} "
+            f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {row['rate_limited']:>6} "
+            f"{row['switches']:>8} {row['mismatches']:>6}  {split}"
+        )
+
+    for row in rows:
+        for record in row["unexpected_errors"]:
+            print(
+                f"   ⚠️ {row['engine']}/{row['size']}: {record['tracking_number']} - {record.get('error')}"
+            )
+
+    correct = all(row["mismatches"] == 0 for row in rows)
+    print(
+        "\n✅ Every tracking number classified as expected"
+        if correct
+        else "\n❌ Some tracking numbers were misclassified (see 'wrong')"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the UPS label-only filter")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000])
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=list(label_filter.PROCESSING_ENGINES),
+        choices=label_filter.PROCESSING_ENGINES,
+    )
+    parser.add_argument("--credentials", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument(
+        "--quota-rps",
+        type=float,
+        default=0.0,
+        help="Stub quota per credential (0 = unlimited)",
+    )
+    parser.add_argument("--quota-burst", type=float, default=10.0)
+    parser.add_argument(
+        "--rate-limit-rps",
+        type=float,
+        default=1000.0,
+        help="Filter's starting rate per credential (UPS_RATE_LIMIT_RPS)",
+    )
+    parser.add_argument("--rate-limit-max-rps", type=float, default=1000.0)
+    parser.add_argument("--verbose", action="store_true", help="Keep per-number logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        for name in ("ups_label_only_filter", "rate_limiter", "token_provider"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    configure_credentials(args.credentials)
+
+    print("🚀 UPS Label-Only Filter Benchmark (stub server)")
+    print(
+        f"   credentials: {args.credentials}, concurrency: {args.concurrency}, "
+        f"latency: {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, "
+        f"quota: {args.quota_rps or 'unlimited'} req/s per credential"
+    )
+
+    rows = []
+    for size in args.sizes:
+        for engine in args.engines:
+            print(f"⏳ {engine} engine, {size:,} tracking numbers...")
+            rows.append(run_benchmark(size, engine, args))
+
+    print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test Vectorized Label-Only Classification
+=========================================
+
+Checks that the DuckDB batch classifier agrees with the per-response
+check_label_only_status() / summarize_ups_response() of the label filter on
+every response shape, and that raw response files re-classify to the
+filter's CSV format.
+"""
+
+import gzip
+import json
+import os
+import sys
+from pathlib import Path
+
+# The filter validates these at import time
+os.environ.setdefault("UPS_TOKEN_URL", "http://localhost/token")
+os.environ.setdefault("UPS_TRACKING_URL", "http://localhost/track/")
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+import ups_label_only_filter as label_filter  # noqa: E402
+from batch_classifier import (  # noqa: E402
+    TARGET_STATUS_CODE,
+    TARGET_STATUS_DESCRIPTION,
+    TARGET_STATUS_TYPE,
+    classify_raw_responses_file,
+    classify_responses,
+    write_label_only_csv,
+)
+
+LABEL_ONLY = {
+    "description": TARGET_STATUS_DESCRIPTION,
+    "code": TARGET_STATUS_CODE,
+    "type": TARGET_STATUS_TYPE,
+}
+
+
+def package_response(activity):
+    return {"trackResponse": {"shipment": [{"package": [{"activity": activity}]}]}}
+
+
+RESPONSES = {
+    "1ZLABEL": package_response([{"status": LABEL_ONLY, "date": "20250101"}]),
+    "1ZLABELEXTRA": {
+        "trackResponse": {
+            "shipment": [
+                {
+                    "inquiryNumber": "1ZLABELEXTRA",
+                    "package": [
+                        {
+                            "trackingNumber": "1ZLABELEXTRA",
+                            "activity": [
+                                {
+                                    "location": {"address": {"city": "X"}},
+                                    "status": {**LABEL_ONLY, "statusCode": "003"},
+                                    "date": "20250102",
+                                    "time": "101500",
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+    },
+    "1ZDELIVERED": package_response(
+        [
+            {"status": {"description": "Delivered", "code": "KB", "type": "D"}},
+            {"status": LABEL_ONLY, "date": "20250101"},
+        ]
+    ),
+    "1ZOTHERSTATUS": package_response(
+        [{"status": {"description": "Origin Scan", "code": "OR", "type": "I"}}]
+    ),
+    "1ZCODEDIFFERS": package_response(
+        [{"status": {**LABEL_ONLY, "code": "XX"}, "date": "20250101"}]
+    ),
+    "1ZNOSTATUS": package_response([{"date": "20250101"}]),
+    "1ZNOACTIVITY": package_response([]),
+    "1ZNOPACKAGE": {"trackResponse": {"shipment": [{"package": []}]}},
+    "1ZNOSHIPMENT": {"trackResponse": {"shipment": []}},
+    "1ZEMPTY": {},
+}
+
+
+def test_batch_matches_per_response_classification():
+    frame = classify_responses(list(RESPONSES), list(RESPONSES.values()))
+    rows = {row["tracking_number"]: row for row in frame.iter_rows(named=True)}
+
+    assert frame.height == len(RESPONSES)
+    for tracking_number, response in RESPONSES.items():
+        is_label_only, reason = label_filter.check_label_only_status(response)
+        row = rows[tracking_number]
+
+        assert row["classification"] == (
+            "label_only" if is_label_only else "excluded"
+        ), tracking_number
+        assert row["reason"] == reason, tracking_number
+        for key, value in label_filter.summarize_ups_response(response).items():
+            assert row[key] == value, (tracking_number, key)
+
+    assert sorted(
+        frame.filter(frame["classification"] == "label_only")["tracking_number"]
+    ) == ["1ZLABEL", "1ZLABELEXTRA"]
+
+
+def test_json_strings_are_accepted():
+    frame = classify_responses(["1ZLABEL"], [json.dumps(RESPONSES["1ZLABEL"])])
+    assert frame["classification"].to_list() == ["label_only"]
+
+
+def test_raw_file_reclassifies_to_filter_csv(tmp_path):
+    raw_path = tmp_path / "raw.jsonl.gz"
+    with gzip.open(raw_path, "wt", encoding="utf-8") as f:
+        for i, (tracking_number, response) in enumerate(RESPONSES.items()):
+            line = {
+                "tracking_number": tracking_number,
+                "account_number": f"ACC{i}",
+                "ups_response": response,
+            }
+            f.write(json.dumps(line) + "\n")
+
+    frame = classify_raw_responses_file(str(raw_path))
+    csv_path = tmp_path / "label_only.csv"
+    rows = write_label_only_csv(frame, str(csv_path), "20250101_000000")
+
+    assert rows == 2
+    assert csv_path.read_text().splitlines() == [
+        "tracking_number,account_number,status_description,status_code,status_type,date_processed",
+        "1ZLABEL,ACC0,Shipper created a label; UPS has not received the package yet.,MP,M,20250101_000000",
+        "1ZLABELEXTRA,ACC1,Shipper created a label; UPS has not received the package yet.,MP,M,20250101_000000",
+    ]
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Test Shared ClickHouse Client Factory
+=====================================
+
+Checks client reuse, the bound on open clients, cached health checks and the
+client settings of clickhouse_client.py with fake clients (no server needed).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from clickhouse_connect.driver.exceptions import DatabaseError, OperationalError
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from clickhouse_client import (  # noqa: E402
+    ClickHouseClientFactory,
+    ClickHouseClientPool,
+    ClickHouseConnection,
+    ClickHouseSettings,
+    parse_query_settings,
+    resolve_compression,
+)
+from peerdb_extraction import PeerDBConnection  # noqa: E402
+
+
+class FakeClient:
+    def __init__(self, settings):
+        self.settings = settings
+        self.healthy = True
+        self.closed = False
+        self.error = None
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        return self.healthy
+
+    def query(self, sql, parameters=None):
+        if self.error:
+            raise self.error
+        return type("Result", (), {"result_rows": [(1,)], "summary": {"read_rows": "1"}})()
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def factory(clock):
+    clients = []
+
+    def create(settings, pool_manager):
+        client = FakeClient(settings)
+        clients.append(client)
+        return client
+
+    factory = ClickHouseClientFactory(
+        max_clients=3, health_check_seconds=60, client_factory=create, clock=clock
+    )
+    factory.clients = clients
+    return factory
+
+
+def connection(factory, host="ch", **options):
+    return ClickHouseConnection(host, 8443, "user", "secret", "db", factory=factory, **options)
+
+
+def test_client_settings():
+    assert parse_query_settings(" max_threads=8, max_execution_time = 900,") == (
+        ("max_execution_time", "900"),
+        ("max_threads", "8"),
+    )
+    with pytest.raises(ValueError):
+        parse_query_settings("max_threads")
+    assert resolve_compression("ZSTD") == "zstd"
+    assert resolve_compression("none") is False
+    with pytest.raises(ValueError):
+        resolve_compression("snappy")
+
+    settings = ClickHouseSettings(
+        "ch", 8443, "user", "secret", "db", compression="zstd", query_settings=(("max_threads", "8"),)
+    )
+    kwargs = settings.client_kwargs()
+    assert kwargs["compress"] == "zstd"
+    assert kwargs["settings"] == {"max_threads": "8"}
+    assert "secret" not in repr(settings)
+
+
+def test_closed_connections_hand_their_client_to_the_next(factory):
+    first = connection(factory)
+    assert first.connect()
+    assert first.execute_query("SELECT 1") == [(1,)]
+    first.close()
+
+    second = first.clone()
+    assert second.connect()
+    assert second.client is factory.clients[0]
+    # Different settings never share a client
+    other = connection(factory, compression="zstd")
+    assert other.connect()
+    assert other.client is not second.client
+    assert factory.stats["created"] == 2 and factory.stats["reused"] == 1
+
+
+def test_health_checks_are_cached(factory, clock):
+    conn = connection(factory)
+    conn.connect()
+    conn.close()
+
+    # Used recently: reused without a ping
+    clock.now = 30
+    conn.connect()
+    conn.close()
+    assert factory.clients[0].pings == 0
+
+    # Idle past the interval: one ping, then reused
+    clock.now = 200
+    conn.connect()
+    conn.close()
+    assert factory.clients[0].pings == 1 and factory.stats["created"] == 1
+
+    # A failed ping discards the client
+    clock.now = 400
+    factory.clients[0].healthy = False
+    conn.connect()
+    assert factory.clients[0].closed
+    assert conn.client is factory.clients[1]
+    assert factory.stats["discarded"] == 1 and factory.open_clients == 1
+
+
+def test_connection_errors_discard_the_client(factory):
+    conn = connection(factory)
+    conn.connect()
+    conn.client.error = DatabaseError("Unknown table")
+    with pytest.raises(DatabaseError):
+        conn.execute_query("SELECT * FROM missing")
+    conn.close()
+    assert not factory.clients[0].closed
+
+    conn.connect()
+    conn.client.error = OperationalError("connection reset")
+    with pytest.raises(OperationalError):
+        conn.execute_query("SELECT 1")
+    conn.close()
+    assert factory.clients[0].closed and factory.open_clients == 0
+
+
+def test_open_clients_are_bounded(factory):
+    conns = [connection(factory, connect_timeout=0) for _ in range(4)]
+    assert all(conn.connect() for conn in conns[:3])
+    assert not conns[3].connect()
+
+    conns[0].close()
+    assert conns[3].connect()
+    assert factory.stats["created"] == 3
+
+    # Idle clients of other settings are closed to make room
+    for conn in conns[1:]:
+        conn.close()
+    other = connection(factory, host="other", connect_timeout=0)
+    assert other.connect()
+    assert factory.open_clients == 3
+    assert sum(client.closed for client in factory.clients) == 1
+
+
+def test_extraction_pools_reuse_clients(factory):
+    primary = connection(factory)
+    primary.connect()
+    for _ in range(3):
+        with ClickHouseClientPool(primary.clone, size=3, primary=primary) as pool:
+            with pool.connection(), pool.connection(), pool.connection():
+                pass
+    assert factory.stats["created"] == 3
+    assert factory.open_clients == 3
+
+
+def test_peerdb_query_returns_none_on_failure(factory):
+    conn = PeerDBConnection("peerdb", 8443, "user", "secret", "peerdb", factory=factory)
+    assert conn.query("SELECT 1") is None
+    assert conn.connect()
+    assert conn.query("SELECT 1").result_rows == [(1,)]
+    conn.client.error = DatabaseError("Syntax error")
+    assert conn.query("SELEC 1") is None
+    assert conn.clone().label == "PeerDB"
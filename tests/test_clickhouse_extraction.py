@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+Test ClickHouse Time-Window Extraction
+======================================
+
+Runs the window extractor and the carrier invoice dlt resource against an
+in-memory fake of ClickHouseConnection and checks that parallel extraction
+yields exactly the same batches, in the same order, as sequential extraction
+while keeping the number of concurrent connections bounded.
+"""
+
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+import clickhouse_extraction  # noqa: E402
+import dlt_pipeline_examples  # noqa: E402
+from clickhouse_client import ClickHouseClientPool  # noqa: E402
+from clickhouse_extraction import (  # noqa: E402
+    NORMALIZED_DATE_COLUMN,
+    NORMALIZED_DATE_EXPRESSION,
+    PARSE_DATE_FILTER_SQL,
+    BatchPrefetcher,
+    BatchSizer,
+    DateFilter,
+    WindowExtractor,
+    build_adaptive_windows,
+    build_windows,
+    compare_date_filters,
+    detect_date_filter,
+    plan_windows,
+    select_star_columns,
+)
+
+COLUMNS = ["invoice_number", "import_time", "transaction_date", "invoice_date"]
+SCHEMA = [
+    ("invoice_number", "String", "", ""),
+    ("import_time", "DateTime", "", ""),
+    ("transaction_date", "String", "", ""),
+    ("invoice_date", "String", "", ""),
+]
+ARROW_SCHEMA = pa.schema(
+    [
+        ("invoice_number", pa.string()),
+        ("import_time", pa.timestamp("s")),
+        ("transaction_date", pa.string()),
+        ("invoice_date", pa.string()),
+    ]
+)
+
+
+class FakeClickHouse:
+    """Answers the extractor's queries from an in-memory list of rows"""
+
+    def __init__(self, rows, latency=0.0, tracker=None):
+        self.rows = rows
+        self.latency = latency
+        self.tracker = tracker if tracker is not None else {"active": 0, "peak": 0, "opened": 0}
+        self.lock = threading.Lock()
+        self.connected = False
+        self.closed = False
+        self.index_expressions = []
+        self.create_query = "CREATE TABLE invoices (...) ORDER BY import_time"
+        self.last_query_summary = {}
+
+    def clone(self):
+        return FakeClickHouse(self.rows, self.latency, self.tracker)
+
+    def connect(self):
+        self.connected = True
+        self.tracker["opened"] += 1
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def get_table_schema(self, table_name):
+        return SCHEMA
+
+    def execute_query(self, query, parameters=None):
+        assert self.connected and not self.closed
+        with self.lock:  # one query at a time per client, like clickhouse-connect
+            self.tracker["active"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["active"])
+            try:
+                time.sleep(self.latency)
+                return self._answer(query, parameters)
+            finally:
+                self.tracker["active"] -= 1
+
+    def execute_query_arrow(self, query, parameters=None):
+        rows = self.execute_query(query, parameters)
+        return pa.Table.from_pylist(
+            [dict(zip(COLUMNS, row)) for row in rows], schema=ARROW_SCHEMA
+        )
+
+    def _answer(self, query, parameters):
+        # Every query "scans" the whole table
+        self.last_query_summary = {"read_rows": str(len(self.rows))}
+        if "system.data_skipping_indices" in query:
+            return [(self.index_expressions, self.create_query)]
+        if "SELECT count()" in query:
+            return [(len(self.rows),)]
+
+        interval = re.search(r"INTERVAL (\d+) SECOND", query)
+        if interval:
+            # Planning query: bucket, count(), min(), max() per interval
+            seconds = int(interval.group(1))
+            buckets = {}
+            for row in self.rows:
+                if "plan_start_time" in parameters and row[1] < parameters["plan_start_time"]:
+                    continue
+                offset = int((row[1] - datetime(1970, 1, 1)).total_seconds()) // seconds
+                bucket = datetime(1970, 1, 1) + timedelta(seconds=offset * seconds)
+                buckets.setdefault(bucket, []).append(row[1])
+            return [
+                (bucket, len(times), min(times), max(times))
+                for bucket, times in sorted(buckets.items())
+            ]
+
+        in_window = [
+            row for row in self.rows if parameters["start_time"] <= row[1] < parameters["end_time"]
+        ]
+        if "LIMIT" not in query:
+            # Key group query: every line of one invoice, no LIMIT
+            if "IS NULL" in query:
+                return [row for row in in_window if row[0] is None]
+            return [row for row in in_window if row[0] == parameters["cursor_id"]]
+        limit = int(re.search(r"LIMIT (\d+)", query).group(1))
+        selected = sorted(
+            (
+                row
+                for row in in_window
+                if not parameters["has_cursor"]
+                or row[0] is None
+                or row[0] > parameters["cursor_id"]
+            ),
+            # NULLS LAST
+            key=lambda row: (row[0] is None, row[0] or ""),
+        )
+        return selected[:limit]
+
+
+@pytest.fixture
+def rows():
+    """Rows spread unevenly over ~12 hours, some hours empty"""
+    base = (datetime.utcnow() - timedelta(days=85)).replace(minute=0, second=0, microsecond=0)
+    result = []
+    for i in range(120):
+        hour = (i * 7) % 12
+        if hour in (3, 4):
+            continue
+        result.append(
+            (
+                f"INV{i:05d}",
+                base + timedelta(hours=hour, minutes=i % 60),
+                "1/15/2025" if i % 2 else "2025-01-15",
+                "2025-01-20",
+            )
+        )
+    return result
+
+
+def make_extractor(batch_size=7):
+    return WindowExtractor("invoices", COLUMNS, "1 = 1", {}, batch_size)
+
+
+def test_build_windows_covers_max_time():
+    start = datetime(2025, 1, 1)
+    windows = build_windows(start, start + timedelta(hours=2), 3600)
+    assert windows == [
+        (start, start + timedelta(hours=1)),
+        (start + timedelta(hours=1), start + timedelta(hours=2)),
+        (start + timedelta(hours=2), start + timedelta(hours=3)),
+    ]
+
+
+def test_adaptive_windows_skip_merge_and_split():
+    start = datetime(2025, 1, 1)
+    hour = timedelta(hours=1)
+    histogram = [(start, 2), (start + 2 * hour, 3), (start + 3 * hour, 25), (start + 5 * hour, 4)]
+
+    windows = build_adaptive_windows(histogram, 3600, target_rows=10)
+
+    assert windows == [
+        # sparse hours 0 and 2 merged (the empty hour 1 in between costs nothing)
+        (start, start + 3 * hour),
+        # dense hour 3 split into whole-second slices
+        (start + 3 * hour, start + 3 * hour + timedelta(seconds=1200)),
+        (start + 3 * hour + timedelta(seconds=1200), start + 3 * hour + timedelta(seconds=2400)),
+        (start + 3 * hour + timedelta(seconds=2400), start + 4 * hour),
+        # empty hour 4 skipped
+        (start + 5 * hour, start + 6 * hour),
+    ]
+
+    # Incremental runs start at the cursor, not at the bucket start
+    later = start + timedelta(minutes=30)
+    assert build_adaptive_windows(histogram[:1], 3600, 10, start_time=later) == [
+        (later, start + hour)
+    ]
+
+
+def test_plan_covers_every_row_with_one_query(rows):
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    date_filter = DateFilter("parse", "1 = 1")
+
+    plan = plan_windows(conn, "invoices", date_filter, {}, 3600, target_rows=25)
+
+    assert plan.total_rows == len(rows)
+    assert (plan.min_time, plan.max_time) == (min(r[1] for r in rows), max(r[1] for r in rows))
+    assert plan.rows_read == len(rows)
+    # 10 non-empty hours, about 25 rows per window
+    assert len(plan.histogram) == 10
+    assert len(plan.windows) < len(plan.histogram)
+
+    extractor = make_extractor(batch_size=25)
+    batches = list(extractor.iter_batches(conn, plan.windows))
+    assert sorted(row for batch in batches for row in batch) == sorted(rows)
+    # Every window fits in one batch: one query per window, none for empty hours
+    assert extractor.queries == len(plan.windows)
+
+    # Incremental: only rows at or after the start time are planned
+    start_time = plan.min_time + timedelta(hours=6)
+    incremental = plan_windows(conn, "invoices", date_filter, {}, 3600, 25, start_time=start_time)
+    assert incremental.total_rows == sum(1 for r in rows if r[1] >= start_time)
+    assert incremental.windows[0][0] == start_time
+
+
+def test_parallel_matches_sequential(rows):
+    conn = FakeClickHouse(rows, latency=0.002)
+    conn.connect()
+    times = [row[1] for row in rows]
+    windows = build_windows(min(times), max(times), 3600)
+
+    sequential = list(make_extractor().iter_batches(conn, windows, mode="sequential"))
+    with ClickHouseClientPool(conn.clone, size=3, primary=conn) as pool:
+        extractor = make_extractor()
+        parallel = list(
+            extractor.iter_batches(conn, windows, mode="parallel", pool=pool, parallelism=3)
+        )
+        created = list(pool.created)
+
+    assert parallel == sequential
+    assert sorted(row for batch in parallel for row in batch) == sorted(rows)
+    assert all(len(batch) <= 7 for batch in parallel)
+    # Pool connections are bounded, reused and closed; the primary stays open
+    assert conn.tracker["peak"] <= 3
+    assert len(created) <= 2
+    assert all(c.closed for c in created) and not conn.closed
+
+
+def test_batch_sizer_targets_latency_and_memory():
+    messages = []
+    sizer = BatchSizer(
+        1000, target_seconds=1.0, memory_budget_mb=1, min_size=100, max_size=100_000, log=messages.append
+    )
+
+    # Fast narrow rows: grows, but at most 2x per decision
+    assert sizer.observe(1000, 1000, 0.01, 100_000) == 2000
+    # Slow queries: shrinks toward 1 second per batch
+    sizer = BatchSizer(8000, target_seconds=1.0, min_size=100, max_size=100_000, log=messages.append)
+    assert sizer.observe(8000, 8000, 4.0, 800_000) == 2000
+    # Wide rows: capped by the memory budget (1 MB / 2 KB per row)
+    sizer = BatchSizer(1000, target_seconds=1.0, memory_budget_mb=1, min_size=100, log=messages.append)
+    assert sizer.observe(1000, 1000, 0.5, 2048 * 1000) == 512
+    # Short batches (end of window) are not a throughput signal
+    assert sizer.observe(512, 10, 5.0, 20480) == 512
+    # Never below the minimum
+    sizer = BatchSizer(512, target_seconds=1.0, min_size=100, log=messages.append)
+    assert sizer.observe(512, 512, 1000.0, 512) == 100
+
+    assert len(messages) == 4 and all(m.startswith("📏 Batch size") for m in messages)
+
+
+def test_adaptive_batches_extract_the_same_rows(rows):
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    times = [row[1] for row in rows]
+    windows = build_windows(min(times), max(times), 3600)
+    fixed = [row for batch in make_extractor().iter_batches(conn, windows) for row in batch]
+
+    sizer = BatchSizer(2, target_seconds=10.0, min_size=1, max_size=6, log=lambda _: None)
+    extractor = WindowExtractor("invoices", COLUMNS, "1 = 1", {}, 2, batch_sizer=sizer)
+    adaptive = [row for batch in extractor.iter_batches(conn, windows) for row in batch]
+
+    assert adaptive == fixed
+    assert sizer.decisions > 0 and max(sizer.sizes_used) == 6
+
+
+def test_repeated_invoice_numbers_survive_page_boundaries(rows):
+    # Invoice lines share their invoice_number, so pages end inside invoices
+    base = rows[0][1]
+    lines = [
+        (f"INV{i // 4:05d}", base + timedelta(minutes=i), "2025-01-15", "2025-01-20")
+        for i in range(22)
+    ]
+    conn = FakeClickHouse(lines)
+    conn.connect()
+    windows = [(base, base + timedelta(hours=1))]
+
+    for batch_size in (1, 3, 5):
+        extracted = [
+            row for batch in make_extractor(batch_size).iter_batches(conn, windows) for row in batch
+        ]
+        assert sorted(extracted) == lines, batch_size
+
+    arrow = WindowExtractor("invoices", COLUMNS, "1 = 1", {}, 3, fetch_format="arrow")
+    extracted = [
+        tuple(row.values())
+        for batch in arrow.iter_batches(conn, windows)
+        for row in batch.to_pylist()
+    ]
+    assert sorted(extracted) == lines
+
+    sizer = BatchSizer(1, target_seconds=10.0, min_size=1, max_size=6, log=lambda _: None)
+    adaptive = WindowExtractor("invoices", COLUMNS, "1 = 1", {}, 1, batch_sizer=sizer)
+    extracted = [row for batch in adaptive.iter_batches(conn, windows) for row in batch]
+    assert sorted(extracted) == lines
+
+    # Parallel windows read each window the same way
+    windows = build_windows(base, base + timedelta(minutes=40), 600)
+    with ClickHouseClientPool(conn.clone, size=3, primary=conn) as pool:
+        extracted = [
+            row
+            for batch in make_extractor(2).iter_batches(conn, windows, mode="parallel", pool=pool)
+            for row in batch
+        ]
+    assert sorted(extracted) == lines
+
+
+def test_null_and_empty_invoice_numbers_span_pages(rows):
+    # NULL never compares greater than the cursor and '' is the smallest key
+    base = rows[0][1]
+    numbers = [None] * 5 + [""] * 4 + ["INV00001"] * 3 + ["INV00002"] * 2
+    lines = [
+        (number, base + timedelta(minutes=i), "2025-01-15", "2025-01-20")
+        for i, number in enumerate(numbers)
+    ]
+    conn = FakeClickHouse(lines)
+    conn.connect()
+    windows = [(base, base + timedelta(hours=1))]
+
+    def key(row):
+        return (row[0] is None, row[0] or "", row[1])
+
+    for batch_size in (1, 2, 3, 4, 6, 20):
+        extracted = [
+            row for batch in make_extractor(batch_size).iter_batches(conn, windows) for row in batch
+        ]
+        assert sorted(extracted, key=key) == sorted(lines, key=key), batch_size
+
+
+def test_prefetcher_keeps_order_and_bounds_the_queue():
+    produced = []
+
+    def source():
+        for i in range(20):
+            produced.append(i)
+            yield i
+
+    prefetcher = BatchPrefetcher(source(), depth=3)
+    consumed = []
+    with prefetcher:
+        for item in prefetcher:
+            time.sleep(0.005)  # slow consumer: producer runs ahead until the queue is full
+            # at most depth queued + one being put + the one consumed
+            assert len(produced) - len(consumed) <= 5
+            consumed.append(item)
+
+    assert consumed == list(range(20))
+    assert prefetcher.batches == 20
+    assert 1 <= prefetcher.max_depth <= 3
+    assert prefetcher.producer_wait > 0
+    assert "queue depth" in prefetcher.summary()
+
+
+def test_prefetcher_propagates_errors_and_stops_early():
+    def failing():
+        yield 1
+        raise RuntimeError("query failed")
+
+    with pytest.raises(RuntimeError, match="query failed"):
+        with BatchPrefetcher(failing(), depth=2) as prefetcher:
+            list(prefetcher)
+
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield "batch"
+        finally:
+            closed.set()
+
+    with BatchPrefetcher(endless(), depth=2) as prefetcher:
+        assert next(iter(prefetcher)) == "batch"
+    assert closed.is_set() and not prefetcher._thread.is_alive()
+
+
+def test_resource_output_is_identical_with_prefetch(monkeypatch, rows):
+    monkeypatch.setenv("DLT_CLICKHOUSE_BATCH_SIZE", "9")
+    direct = extract_resource(monkeypatch, rows, "sequential")
+
+    monkeypatch.setattr(clickhouse_extraction, "PREFETCH_BATCHES", 2)
+    assert extract_resource(monkeypatch, rows, "sequential") == direct
+    assert extract_resource(monkeypatch, rows, "sequential", fetch_format="arrow") == direct
+
+
+def test_unknown_mode_is_rejected(rows):
+    with pytest.raises(ValueError):
+        list(make_extractor().iter_batches(FakeClickHouse(rows), [], mode="turbo"))
+
+
+def test_missing_keyset_column_is_rejected():
+    with pytest.raises(ValueError):
+        WindowExtractor("invoices", ["import_time"], "1 = 1", {}, 10)
+
+
+def extract_resource(monkeypatch, rows, mode, fetch_format="rows"):
+    monkeypatch.setattr(dlt_pipeline_examples, "EXTRACTION_MODE", mode)
+    monkeypatch.setattr(clickhouse_extraction, "EXTRACTION_MODE", mode)
+    monkeypatch.setattr(clickhouse_extraction, "FETCH_FORMAT", fetch_format)
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    resource = dlt_pipeline_examples.create_carrier_invoice_resource(conn, "invoices")
+    records = []
+    for item in resource:
+        if isinstance(item, pa.Table):
+            assert item.column_names[-2:] == ["_extracted_at", "_source_table"]
+            records.extend(item.to_pylist())
+        else:
+            records.append(item)
+    return [
+        {k: v for k, v in record.items() if k != "_extracted_at"} for record in records
+    ]
+
+
+def test_resource_output_is_identical_across_modes(monkeypatch, rows):
+    monkeypatch.setenv("DLT_CLICKHOUSE_BATCH_SIZE", "9")
+    monkeypatch.setattr(dlt_pipeline_examples, "PARALLEL_WINDOWS", 3)
+    monkeypatch.setattr(clickhouse_extraction, "PARALLEL_WINDOWS", 3)
+
+    sequential = extract_resource(monkeypatch, rows, "sequential")
+    parallel = extract_resource(monkeypatch, rows, "parallel")
+
+    assert parallel == sequential
+    assert sorted(r["invoice_number"] for r in parallel) == sorted(row[0] for row in rows)
+    assert {r["transaction_date"] for r in parallel} == {"2025-01-15"}
+    assert all(r["_source_table"] == "invoices" for r in parallel)
+
+
+def test_arrow_fetch_matches_row_fetch(monkeypatch, rows):
+    monkeypatch.setenv("DLT_CLICKHOUSE_BATCH_SIZE", "9")
+    monkeypatch.setattr(dlt_pipeline_examples, "PARALLEL_WINDOWS", 3)
+    monkeypatch.setattr(clickhouse_extraction, "PARALLEL_WINDOWS", 3)
+
+    dict_records = extract_resource(monkeypatch, rows, "sequential")
+    arrow_records = extract_resource(monkeypatch, rows, "parallel", fetch_format="arrow")
+
+    assert arrow_records == dict_records
+
+
+def test_standardize_date_column_matches_row_path():
+    values = ["1/5/2025", "2025-01-05", None, "", "12/31/2024", "not a date", "1/5/2025"]
+    table = pa.table({"transaction_date": pa.array(values, pa.string())})
+
+    converted = dlt_pipeline_examples.standardize_date_column(table, "transaction_date")
+
+    expected = []
+    for value in values:
+        record = {"transaction_date": value}
+        dlt_pipeline_examples.standardize_date_format(record, "transaction_date")
+        expected.append(record["transaction_date"])
+    assert converted.column("transaction_date").to_pylist() == expected
+
+
+def test_date_filter_prefers_normalized_column(rows):
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    schema = SCHEMA + [(NORMALIZED_DATE_COLUMN, "Nullable(Date)", "MATERIALIZED", "...")]
+
+    date_filter = detect_date_filter(conn, "invoices", schema)
+
+    assert date_filter.strategy == "column"
+    assert date_filter.sql.startswith(f"{NORMALIZED_DATE_COLUMN} >= toDate(")
+    # MATERIALIZED columns are not part of SELECT *
+    assert select_star_columns(schema) == COLUMNS
+
+
+def test_date_filter_uses_indexed_expression(rows):
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    assert detect_date_filter(conn, "invoices", SCHEMA).strategy == "parse"
+
+    conn.index_expressions = [NORMALIZED_DATE_EXPRESSION.replace("(", "( ")]
+    assert detect_date_filter(conn, "invoices", SCHEMA).strategy == "expression"
+
+    conn.index_expressions = []
+    conn.create_query = (
+        "CREATE TABLE invoices (...) PROJECTION by_date (SELECT * ORDER BY "
+        + NORMALIZED_DATE_EXPRESSION
+        + ") ORDER BY import_time"
+    )
+    assert detect_date_filter(conn, "invoices", SCHEMA).strategy == "expression"
+
+
+def test_date_filter_strategy_can_be_forced(rows):
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    assert detect_date_filter(conn, "invoices", SCHEMA, "parse").sql == PARSE_DATE_FILTER_SQL
+    with pytest.raises(ValueError):
+        detect_date_filter(conn, "invoices", SCHEMA, "column")
+    with pytest.raises(ValueError):
+        detect_date_filter(conn, "invoices", SCHEMA, "fastest")
+
+
+def test_rows_scanned_are_reported(rows):
+    conn = FakeClickHouse(rows)
+    conn.connect()
+    times = [row[1] for row in rows]
+    extractor = make_extractor(batch_size=1000)
+    list(extractor.iter_batches(conn, build_windows(min(times), max(times), 3600)))
+
+    assert extractor.rows_read == extractor.queries * len(rows)
+
+    stats = compare_date_filters(conn, "invoices", SCHEMA, "2025-01-01", "2025-01-31")
+    assert [s["strategy"] for s in stats] == ["parse", "expression"]
+    assert all(s["read_rows"] == len(rows) for s in stats)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test Columnar Date Normalization
+================================
+
+Checks that the fast-path / memoized date normalizer produces exactly what
+the previous per-row dateutil conversion produced, for plain values, columns
+and pyarrow arrays, and that normalized values convert to the same typed dates.
+"""
+
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pyarrow as pa
+from dateutil import parser
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from date_normalization import (  # noqa: E402
+    normalize_date_array,
+    normalize_date_column,
+    normalize_date_value,
+    to_date_array,
+    to_date_column,
+)
+
+VALUES = [
+    "2025-01-05",
+    "2025-1-5",
+    "1/5/2025",
+    "01/05/2025",
+    "12/31/2024",
+    "2/29/2024",
+    "2/29/2025",  # not a calendar date
+    "2025-02-30",  # not a calendar date
+    "13/5/2025",  # dateutil falls back to day-first
+    "1/5/25",
+    "Jan 5, 2025",
+    "2025-01-05 10:15:00",
+    " 1/5/2025 ",
+    "not a date",
+    "",
+    None,
+]
+
+
+def reference(value):
+    """The previous per-row standardize_date_format conversion"""
+    if not value:
+        return value
+    try:
+        return parser.parse(value).strftime("%Y-%m-%d")
+    except Exception:
+        return value
+
+
+def test_values_match_dateutil():
+    for value in VALUES:
+        assert normalize_date_value(value) == reference(value), value
+
+
+def test_date_objects_are_formatted():
+    assert normalize_date_value(date(2025, 1, 5)) == "2025-01-05"
+    assert normalize_date_value(datetime(2025, 1, 5, 10, 15)) == "2025-01-05"
+
+
+def test_column_matches_dateutil():
+    column = VALUES * 3
+    assert normalize_date_column(column) == [reference(value) for value in column]
+
+
+def test_arrow_array_matches_dateutil():
+    column = pa.chunked_array([pa.array(VALUES[:8]), pa.array(VALUES[8:] + VALUES)])
+    expected = [reference(value) for value in VALUES[:8] + VALUES[8:] + VALUES]
+    assert normalize_date_array(column).to_pylist() == expected
+
+
+def test_arrow_temporal_column_is_formatted():
+    column = pa.array([date(2025, 1, 5), None], pa.date32())
+    assert normalize_date_array(column).to_pylist() == ["2025-01-05", None]
+
+
+def test_normalized_values_become_dates():
+    normalized = normalize_date_column(VALUES)
+    expected = []
+    for value in normalized:
+        try:
+            expected.append(datetime.strptime(value, "%Y-%m-%d").date())
+        except (TypeError, ValueError):
+            expected.append(None)
+    assert to_date_column(normalized) == expected
+    assert to_date_array(pa.chunked_array([pa.array(normalized)])).to_pylist() == expected
+    assert to_date_column(["2025-02-30", "2025-1-5", None]) == [None, None, None]
+    assert to_date_array(pa.array(["2025-02-30", None])).to_pylist() == [None, None]
+    assert to_date_array(pa.array([1, 2])).type == pa.date32()
+
+
+def test_unparseable_value_warns_once(capsys):
+    normalize_date_column(["still not a date"] * 5)
+    normalize_date_value("still not a date")
+    assert capsys.readouterr().out.count("Date formatting warning") == 1
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Test Incremental DuckDB Export
+==============================
+
+Loads carrier invoice rows into a dlt DuckDB store over several runs and checks
+that the incremental export applies only the new loads and the window shift
+(append, replace and merge loads), always ends with the same rows as a full
+rebuild, and rewrites only the changed partitions of the Parquet lake.
+"""
+
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+import dlt
+import duckdb
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from duckdb_export import (  # noqa: E402
+    TRANSACTION_DATE_SQL,
+    date_filter_sql,
+    export_window,
+    read_export_state,
+    read_lake_sql,
+    write_partitions,
+    write_store_partitions,
+)
+
+
+def invoice_rows(prefix, dates):
+    return [
+        {
+            "tracking_number": f"1Z{prefix}{i:04d}",
+            "transaction_date": transaction_date,
+            "net_amount": float(i),
+        }
+        for i, transaction_date in enumerate(dates)
+    ]
+
+
+def counts(result):
+    return {key: result[key] for key in ("mode", "inserted", "deleted")}
+
+
+def exported(conn):
+    return sorted(
+        conn.execute(
+            "SELECT tracking_number, transaction_date FROM carrier_invoice_data"
+        ).fetchall()
+    )
+
+
+def test_incremental_export_matches_full_rebuild(tmp_path):
+    source_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    pipeline = dlt.pipeline(
+        pipeline_name="test_duckdb_export",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(source_path),
+        dataset_name="carrier_invoice_data",
+    )
+
+    def load(rows, write_disposition="append"):
+        pipeline.run(
+            rows, table_name="carrier_invoice_data", write_disposition=write_disposition
+        )
+
+    incremental = duckdb.connect(str(tmp_path / "incremental.duckdb"))
+    full = duckdb.connect(str(tmp_path / "full.duckdb"))
+
+    def export(start_date, end_date):
+        result = export_window(incremental, source_path, start_date, end_date, "incremental")
+        export_window(full, source_path, start_date, end_date, "full")
+        assert exported(incremental) == exported(full)
+        return counts(result)
+
+    # First run: no previous state, so the table is built in full
+    load(invoice_rows("A", ["2025-01-01", "2025-01-02", "2025-01-05", "1/3/2025"]))
+    result = export("2025-01-01", "2025-01-03")
+    assert result == {"mode": "full", "inserted": 3, "deleted": 0}
+
+    # A new load: only its rows inside the window are inserted
+    load(invoice_rows("B", ["2025-01-02", "2025-01-04"]))
+    result = export("2025-01-01", "2025-01-03")
+    assert result == {"mode": "incremental", "inserted": 1, "deleted": 0}
+
+    # Nothing new: no rows touched
+    assert export("2025-01-01", "2025-01-03") == {
+        "mode": "incremental",
+        "inserted": 0,
+        "deleted": 0,
+    }
+
+    # The window moves forward: old dates leave, newly covered dates of earlier loads join
+    result = export("2025-01-02", "2025-01-05")
+    assert result == {"mode": "incremental", "inserted": 2, "deleted": 1}
+    assert read_export_state(incremental)["end_date"].isoformat() == "2025-01-05"
+
+    # A replace run drops every earlier load from the dlt store
+    load(invoice_rows("C", ["2025-01-04"]), write_disposition="replace")
+    assert export("2025-01-02", "2025-01-05")["mode"] == "incremental"
+    assert exported(incremental) == [("1ZC0000", "2025-01-04")]
+
+    incremental.close()
+    full.close()
+
+
+def test_incremental_export_replaces_merged_rows(tmp_path):
+    source_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    pipeline = dlt.pipeline(
+        pipeline_name="test_duckdb_export_merge",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(source_path),
+        dataset_name="carrier_invoice_data",
+    )
+    incremental = duckdb.connect(str(tmp_path / "incremental.duckdb"))
+    full = duckdb.connect(str(tmp_path / "full.duckdb"))
+
+    def load(rows, **hints):
+        pipeline.run(
+            [
+                {"invoice_number": invoice, "tracking_number": tracking, "transaction_date": day}
+                for invoice, tracking, day in rows
+            ],
+            table_name="carrier_invoice_data",
+            write_disposition=hints.pop("write_disposition", "merge"),
+            primary_key="invoice_number",
+            **hints,
+        )
+
+    def export():
+        result = export_window(incremental, source_path, "2025-01-01", "2025-01-31", "incremental")
+        export_window(full, source_path, "2025-01-01", "2025-01-31", "full")
+        assert exported(incremental) == exported(full)
+        return counts(result)
+
+    load([("A", "1Z1", "2025-01-01"), ("B", "1Z2", "2025-01-02")])
+    assert export()["mode"] == "full"
+
+    # The merge replaces invoice A in the dlt store; its old row must go too
+    load([("A", "1Z1-updated", "2025-01-01"), ("C", "1Z3", "2025-01-03")])
+    assert export() == {"mode": "incremental", "inserted": 2, "deleted": 1}
+    assert exported(incremental) == [
+        ("1Z1-updated", "2025-01-01"),
+        ("1Z2", "2025-01-02"),
+        ("1Z3", "2025-01-03"),
+    ]
+
+    # An invoice moving out of the window only leaves the export
+    load([("B", "1Z2", "2025-02-15")])
+    assert export() == {"mode": "incremental", "inserted": 0, "deleted": 1}
+
+    # scd2 history cannot be applied row by row: always rebuilt
+    load([("A", "1Z1", "2025-01-04")], write_disposition={"disposition": "merge", "strategy": "scd2"})
+    assert export()["mode"] == "full"
+
+    incremental.close()
+    full.close()
+
+
+def test_incremental_export_rebuilds_on_new_columns(tmp_path):
+    source_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    pipeline = dlt.pipeline(
+        pipeline_name="test_duckdb_export_schema",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(source_path),
+        dataset_name="carrier_invoice_data",
+    )
+    conn = duckdb.connect(str(tmp_path / "incremental.duckdb"))
+
+    pipeline.run(invoice_rows("A", ["2025-01-01"]), table_name="carrier_invoice_data")
+    export_window(conn, source_path, "2025-01-01", "2025-01-31", "incremental")
+
+    rows = invoice_rows("B", ["2025-01-02"])
+    rows[0]["service_level"] = "GROUND"
+    pipeline.run(rows, table_name="carrier_invoice_data")
+    result = export_window(conn, source_path, "2025-01-01", "2025-01-31", "incremental")
+
+    assert counts(result) == {"mode": "full", "inserted": 2, "deleted": 0}
+    assert conn.execute(
+        "SELECT service_level FROM carrier_invoice_data WHERE tracking_number = '1ZB0000'"
+    ).fetchone() == ("GROUND",)
+    conn.close()
+
+
+def test_export_keeps_a_typed_sorted_date_column(tmp_path):
+    source_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    pipeline = dlt.pipeline(
+        pipeline_name="test_duckdb_export_typed",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(source_path),
+        dataset_name="carrier_invoice_data",
+    )
+    pipeline.run(
+        invoice_rows("A", ["2025-01-03", "1/2/2025", "01/01/2025", "2025-01-02"]),
+        table_name="carrier_invoice_data",
+    )
+    conn = duckdb.connect(str(tmp_path / "export.duckdb"))
+    export_window(conn, source_path, "2025-01-01", "2025-01-31", "full")
+
+    assert date_filter_sql(conn) == "transaction_date_parsed"
+    assert conn.execute(
+        "SELECT data_type FROM duckdb_columns() "
+        "WHERE table_name = 'carrier_invoice_data' AND column_name = 'transaction_date_parsed'"
+    ).fetchone() == ("DATE",)
+    # Rows are stored in (transaction_date_parsed, tracking_number) order
+    rows = conn.execute(
+        "SELECT transaction_date_parsed::VARCHAR, tracking_number FROM carrier_invoice_data"
+    ).fetchall()
+    assert rows == sorted(rows)
+    assert [row[0] for row in rows] == ["2025-01-01", "2025-01-02", "2025-01-02", "2025-01-03"]
+
+    # Files exported before the column existed keep the string parsing
+    conn.execute("ALTER TABLE carrier_invoice_data DROP COLUMN transaction_date_parsed")
+    assert date_filter_sql(conn) == TRANSACTION_DATE_SQL
+    conn.close()
+
+
+def test_export_copies_the_date_typed_on_extraction(tmp_path):
+    source_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    pipeline = dlt.pipeline(
+        pipeline_name="test_duckdb_export_loaded_date",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(source_path),
+        dataset_name="carrier_invoice_data",
+    )
+    # Loaded before the pipeline filled transaction_date_parsed
+    pipeline.run(invoice_rows("A", ["1/2/2025"]), table_name="carrier_invoice_data")
+    conn = duckdb.connect(str(tmp_path / "export.duckdb"))
+    export_window(conn, source_path, "2025-01-01", "2025-01-31", "incremental")
+
+    rows = invoice_rows("B", ["2025-01-03", "2025-01-04"])
+    rows[0]["transaction_date_parsed"] = date(2025, 1, 3)
+    # The loaded date wins over the string, which is not parsed again
+    rows[1]["transaction_date_parsed"] = date(2025, 1, 5)
+    pipeline.run(rows, table_name="carrier_invoice_data")
+    for mode in ("incremental", "full"):
+        export_window(conn, source_path, "2025-01-01", "2025-01-31", mode)
+        assert conn.execute(
+            "SELECT tracking_number, transaction_date_parsed FROM carrier_invoice_data "
+            "ORDER BY ALL"
+        ).fetchall() == [
+            ("1ZA0000", date(2025, 1, 2)),
+            ("1ZB0000", date(2025, 1, 3)),
+            ("1ZB0001", date(2025, 1, 5)),
+        ]
+    conn.close()
+
+
+def test_parquet_lake_rewrites_only_changed_partitions(tmp_path):
+    source_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    lake_dir = str(tmp_path / "lake")
+    pipeline = dlt.pipeline(
+        pipeline_name="test_duckdb_export_lake",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(source_path),
+        dataset_name="carrier_invoice_data",
+    )
+    conn = duckdb.connect(str(tmp_path / "export.duckdb"))
+
+    def export(start_date, end_date):
+        result = export_window(conn, source_path, start_date, end_date, "incremental")
+        return result["dates"], write_partitions(
+            conn, "carrier_invoice_data", lake_dir, result["dates"]
+        )
+
+    def partition_files():
+        return {
+            name: os.stat(os.path.join(lake_dir, name, "data_0.parquet")).st_ino
+            for name in os.listdir(lake_dir)
+        }
+
+    pipeline.run(
+        invoice_rows("A", ["2025-01-01", "1/2/2025", "2025-01-02", "2025-01-03"]),
+        table_name="carrier_invoice_data",
+    )
+    dates, lake = export("2025-01-01", "2025-01-04")
+    assert len(dates) == 4
+    assert lake == {"written": 3, "removed": 0}
+    before = partition_files()
+    assert sorted(before) == [
+        "transaction_date_parsed=2025-01-01",
+        "transaction_date_parsed=2025-01-02",
+        "transaction_date_parsed=2025-01-03",
+    ]
+
+    # A new day only touches its own partition
+    pipeline.run(invoice_rows("B", ["2025-01-04"]), table_name="carrier_invoice_data")
+    dates, lake = export("2025-01-01", "2025-01-04")
+    assert dates == [date(2025, 1, 4)]
+    assert lake == {"written": 1, "removed": 0}
+    after = partition_files()
+    assert {name: after[name] for name in before} == before
+
+    # Partitions leaving the window are kept as history
+    dates, lake = export("2025-01-02", "2025-01-04")
+    assert dates == []
+    assert len(partition_files()) == 4
+
+    lake_rows = conn.execute(
+        f"SELECT tracking_number, transaction_date_parsed FROM {read_lake_sql(lake_dir)} "
+        "WHERE transaction_date_parsed BETWEEN DATE '2025-01-02' AND DATE '2025-01-04' "
+        "ORDER BY ALL"
+    ).fetchall()
+    assert lake_rows == conn.execute(
+        "SELECT tracking_number, transaction_date_parsed FROM carrier_invoice_data ORDER BY ALL"
+    ).fetchall()
+    assert conn.execute(
+        f"SELECT DISTINCT compression FROM parquet_metadata('{lake_dir}/*/*.parquet')"
+    ).fetchall() == [("ZSTD",)]
+
+    # The full extract writes its dlt table straight to a lake
+    full_lake = str(tmp_path / "full_lake")
+    memory = duckdb.connect()
+    assert write_store_partitions(
+        memory,
+        source_path,
+        "carrier_invoice_data.carrier_invoice_data",
+        full_lake,
+        "2025-01-01",
+        "2025-01-31",
+    ) == {"written": 4, "removed": 0}
+    assert memory.execute(
+        f"SELECT COUNT(*) FROM {read_lake_sql(full_lake)}"
+    ).fetchone() == (5,)
+    memory.close()
+    conn.close()
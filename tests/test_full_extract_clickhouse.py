@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Test Resumable Full ClickHouse Extraction
+=========================================
+
+Runs the resumable full extract window by window against an in-memory fake of
+ClickHouseConnection and checks that an interrupted run resumes with the
+windows it had not committed, that resyncing windows never duplicates rows
+that a replace run leaves no window marked as completed and that the Parquet
+lake is rewritten only for the windows a run extracted.
+"""
+
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import dlt
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+import full_extract_clickhouse  # noqa: E402
+from full_extract_clickhouse import (  # noqa: E402
+    build_date_chunks,
+    chunk_id,
+    clickhouse_full_source,
+    completed_chunks,
+    export_parquet_lake,
+    run_resumable_extraction,
+)
+from tests.test_clickhouse_extraction import FakeClickHouse  # noqa: E402
+
+
+class DateRangeClickHouse(FakeClickHouse):
+    """Applies the transaction_date range; optionally fails on one window"""
+
+    def __init__(self, rows, fail_on=None):
+        super().__init__(rows)
+        self.fail_on = fail_on
+        self.extracted_ranges = []
+
+    def execute_query(self, query, parameters=None):
+        parameters = parameters or {}
+        if "start_date_str" not in parameters:
+            return super().execute_query(query, parameters)
+        start, end = parameters["start_date_str"], parameters["end_date_str"]
+        if start == self.fail_on:
+            raise ConnectionError("ClickHouse went away")
+        if (start, end) not in self.extracted_ranges:
+            self.extracted_ranges.append((start, end))
+        all_rows = self.rows
+        self.rows = [row for row in all_rows if start <= row[2] <= end]
+        try:
+            return super().execute_query(query, parameters)
+        finally:
+            self.rows = all_rows
+
+
+@pytest.fixture
+def rows():
+    """Two lines per invoice on each day of January 2025"""
+    base = datetime(2025, 2, 1)
+    result = []
+    for day in range(31):
+        transaction_date = (date(2025, 1, 1) + timedelta(days=day)).isoformat()
+        for line in range(2):
+            result.append(
+                (
+                    f"INV{day % 5:03d}",
+                    base + timedelta(minutes=day * 10 + line),
+                    transaction_date,
+                    "2025-02-01",
+                )
+            )
+    return result
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return dlt.pipeline(
+        pipeline_name="test_full_extract",
+        pipelines_dir=str(tmp_path / "pipelines"),
+        destination=dlt.destinations.duckdb(str(tmp_path / "full.duckdb")),
+        dataset_name="full_carrier_invoice_data",
+    )
+
+
+def extracted_rows(pipeline):
+    with pipeline.sql_client() as client:
+        return sorted(
+            client.execute_sql(
+                "SELECT invoice_number, transaction_date FROM full_carrier_invoice_data"
+            )
+        )
+
+
+def expected_rows(rows):
+    return sorted((row[0], row[2]) for row in rows)
+
+
+def connect(conn):
+    conn.connect()
+    return conn
+
+
+def test_build_date_chunks_cover_the_range():
+    assert build_date_chunks("2025-01-01", "2025-01-17", 7) == [
+        ("2025-01-01", "2025-01-07"),
+        ("2025-01-08", "2025-01-14"),
+        ("2025-01-15", "2025-01-17"),
+    ]
+    assert build_date_chunks("2025-01-01", "2025-01-01", 7) == [("2025-01-01", "2025-01-01")]
+    with pytest.raises(ValueError):
+        build_date_chunks("2025-01-02", "2025-01-01")
+
+
+def test_interrupted_extraction_resumes(pipeline, rows):
+    failing = connect(DateRangeClickHouse(rows, fail_on="2025-01-15"))
+    with pytest.raises(Exception):
+        run_resumable_extraction(
+            pipeline, "2025-01-01", "2025-01-31", ch_conn=failing, chunk_days=7
+        )
+    # The two windows loaded before the failure are committed with their rows
+    assert sorted(completed_chunks(pipeline)) == [
+        "2025-01-01..2025-01-07",
+        "2025-01-08..2025-01-14",
+    ]
+    assert len(extracted_rows(pipeline)) == 28
+
+    conn = connect(DateRangeClickHouse(rows))
+    assert run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7
+    ) == [
+        ("2025-01-15", "2025-01-21"),
+        ("2025-01-22", "2025-01-28"),
+        ("2025-01-29", "2025-01-31"),
+    ]
+    assert conn.extracted_ranges == [
+        ("2025-01-15", "2025-01-21"),
+        ("2025-01-22", "2025-01-28"),
+        ("2025-01-29", "2025-01-31"),
+    ]
+    assert extracted_rows(pipeline) == expected_rows(rows)
+    assert completed_chunks(pipeline)[chunk_id("2025-01-29", "2025-01-31")]["rows"] == 6
+
+    # Everything is completed: nothing left to extract
+    assert run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7
+    ) == []
+
+
+def test_resync_replaces_windows_without_duplicates(pipeline, rows):
+    conn = connect(DateRangeClickHouse(rows))
+    run_resumable_extraction(pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7)
+
+    # Lines change upstream in one window, which is then resynced
+    changed = [row for row in rows if row[2] != "2025-01-10" or row[1].minute % 2 == 0]
+    conn = connect(DateRangeClickHouse(changed))
+    assert run_resumable_extraction(
+        pipeline, "2025-01-08", "2025-01-14", ch_conn=conn, resync=True, chunk_days=7
+    ) == [("2025-01-08", "2025-01-14")]
+    assert conn.extracted_ranges == [("2025-01-08", "2025-01-14")]
+    assert extracted_rows(pipeline) == expected_rows(changed)
+
+    # Resyncing the whole range reproduces the source exactly
+    run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, resync=True, chunk_days=7
+    )
+    assert extracted_rows(pipeline) == expected_rows(changed)
+
+
+def test_replace_run_resets_completed_windows(pipeline, rows):
+    conn = connect(DateRangeClickHouse(rows))
+    run_resumable_extraction(pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7)
+    assert len(completed_chunks(pipeline)) == 5
+
+    # A replace run truncates the table to its own range
+    pipeline.run(clickhouse_full_source("2025-01-01", "2025-01-14", ch_conn=conn))
+    assert completed_chunks(pipeline) == {}
+    assert len(extracted_rows(pipeline)) == 28
+
+    # The next resumable run extracts every window again instead of skipping them
+    conn = connect(DateRangeClickHouse(rows))
+    assert len(run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7
+    )) == 5
+    assert extracted_rows(pipeline) == expected_rows(rows)
+
+
+def test_parquet_lake_gets_only_extracted_windows(pipeline, monkeypatch, rows):
+    written = []
+
+    def write_store_partitions(conn, source_path, source_table, lake_dir, start, end):
+        written.append((start, end))
+        return {"written": 1, "removed": 0}
+
+    monkeypatch.setattr(full_extract_clickhouse, "write_store_partitions", write_store_partitions)
+    conn = connect(DateRangeClickHouse(rows))
+    windows = run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-14", ch_conn=conn, chunk_days=7
+    )
+    export_parquet_lake(pipeline, windows)
+    assert written == [("2025-01-01", "2025-01-07"), ("2025-01-08", "2025-01-14")]
+
+    # Only the new windows of the range are rewritten, then nothing at all
+    del written[:]
+    windows = run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7
+    )
+    export_parquet_lake(pipeline, windows)
+    assert written == [
+        ("2025-01-15", "2025-01-21"),
+        ("2025-01-22", "2025-01-28"),
+        ("2025-01-29", "2025-01-31"),
+    ]
+    del written[:]
+    windows = run_resumable_extraction(
+        pipeline, "2025-01-01", "2025-01-31", ch_conn=conn, chunk_days=7
+    )
+    export_parquet_lake(pipeline, windows)
+    assert written == []
+
+
+def test_unknown_full_extract_mode_is_rejected():
+    with pytest.raises(ValueError):
+        full_extract_clickhouse.resolve_full_extract_mode("append")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test Pooled HTTP Client
+=======================
+
+Checks connection reuse, default timeouts and the retry policy of
+http_client.create_session against a local HTTP server (no network).
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import requests
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from http_client import create_session, get_session, close_sessions  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers 503 for the first `fail_first` requests of a path, then 200"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+    fail_first = 0
+    hits = {}
+    connections = set()
+
+    def _respond(self):
+        self.connections.add(self.client_address)
+        count = self.hits.get(self.path, 0) + 1
+        self.hits[self.path] = count
+
+        status = 503 if count <= self.fail_first else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self._respond()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StubHandler.fail_first = 0
+    StubHandler.hits = {}
+    StubHandler.connections = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connections_are_reused(server):
+    session = create_session(backoff_factor=0)
+    for _ in range(5):
+        assert session.get(f"{server}/track").status_code == 200
+    session.close()
+
+    assert StubHandler.hits["/track"] == 5
+    assert len(StubHandler.connections) == 1
+
+
+def test_get_is_retried_on_503(server):
+    StubHandler.fail_first = 2
+    session = create_session(max_retries=3, backoff_factor=0)
+
+    response = session.get(f"{server}/flaky")
+    session.close()
+
+    assert response.status_code == 200
+    assert StubHandler.hits["/flaky"] == 3
+
+
+def test_post_is_not_retried_unless_allowed(server):
+    StubHandler.fail_first = 1
+
+    session = create_session(max_retries=3, backoff_factor=0)
+    assert session.post(f"{server}/message", json={}).status_code == 503
+    session.close()
+
+    session = create_session(
+        max_retries=3, backoff_factor=0, retry_methods=("GET", "POST")
+    )
+    assert session.post(f"{server}/token", data={}).status_code == 200
+    session.close()
+
+    assert StubHandler.hits == {"/message": 1, "/token": 2}
+
+
+def test_default_timeout_is_applied():
+    adapter = create_session(timeout=(1.5, 2.5)).get_adapter("https://example.com")
+    assert adapter.timeout == (1.5, 2.5)
+
+
+def test_named_sessions_are_shared():
+    try:
+        assert get_session("ups") is get_session("ups")
+        assert get_session("ups") is not get_session("slack")
+        assert isinstance(get_session("ups"), requests.Session)
+    finally:
+        close_sessions()
+
+
+def test_rate_limit_is_left_to_the_caller(server):
+    StubHandler.fail_first = 0
+    session = create_session(max_retries=3, backoff_factor=0)
+
+    class RateLimitedHandler(StubHandler):
+        def _respond(self):
+            StubHandler.hits[self.path] = StubHandler.hits.get(self.path, 0) + 1
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        response = session.get(f"http://127.0.0.1:{httpd.server_address[1]}/quota")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        session.close()
+
+    assert response.status_code == 429
+    assert StubHandler.hits["/quota"] == 1
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Test PeerDB Keyset Extraction
+=============================
+
+Runs KeysetPaginator and key detection against an in-memory fake of
+PeerDBConnection and checks that keyset pages return every row exactly once
+(single, composite and non-unique keys, limits, NULL keys) without COUNT(*)
+or OFFSET, and that the incremental PeerDB sync merges only changed rows into
+DuckDB, on a unique key only.
+"""
+
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import dlt
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+import peerdb_flexible_pipeline  # noqa: E402
+import peerdb_pipeline  # noqa: E402
+from peerdb_extraction import (  # noqa: E402
+    KeysetPaginator,
+    detect_key_columns,
+    is_unique_key,
+    nullable_columns,
+)
+
+COLUMNS = ["account_id", "event_time", "login", "_peerdb_version"]
+SCHEMA = [
+    ("account_id", "Int64"),
+    ("event_time", "DateTime64(6)"),
+    ("login", "Nullable(String)"),
+    ("_peerdb_version", "Int64"),
+]
+
+
+def _sql_value(literal):
+    literal = literal.strip()
+    if literal.startswith("'"):
+        value = literal[1:-1]
+        for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                pass
+        return value
+    return int(literal)
+
+
+class FakePeerDB:
+    """Answers the paginator's queries from an in-memory list of rows"""
+
+    def __init__(
+        self,
+        rows,
+        sorting_key="account_id, event_time",
+        columns=COLUMNS,
+        schema=SCHEMA,
+        tables=None,
+        latency=0.0,
+        tracker=None,
+    ):
+        self.rows = rows
+        self.sorting_key = sorting_key
+        self.columns = columns
+        self.schema = schema
+        self.tables = tables  # table name -> rows, for multi-table tests
+        self.latency = latency
+        self.tracker = tracker if tracker is not None else {"active": 0, "peak": 0}
+        self.lock = threading.Lock()
+        self.connected = True
+        self.closed = False
+        self.queries = []
+        self.engine = "ReplacingMergeTree"
+
+    def clone(self):
+        clone = FakePeerDB(
+            self.rows, self.sorting_key, self.columns, self.schema, self.tables, self.latency, self.tracker
+        )
+        clone.engine = self.engine
+        clone.connected = False
+        return clone
+
+    def connect(self):
+        self.connected = True
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def query(self, sql, parameters=None):
+        assert self.connected and not self.closed
+        with self.lock:  # one query at a time per client, like clickhouse-connect
+            self.tracker["active"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["active"])
+            try:
+                time.sleep(self.latency)
+                return self._answer(sql, parameters)
+            finally:
+                self.tracker["active"] -= 1
+
+    def _answer(self, sql, parameters):
+        from clickhouse_connect.driver.binding import finalize_query
+
+        sql = finalize_query(sql, parameters) if parameters else sql
+        self.queries.append(sql)
+        if "SELECT name FROM system.tables" in sql:
+            return SimpleNamespace(result_rows=[(name,) for name in sorted(self.tables)])
+        if "system.tables" in sql:
+            return SimpleNamespace(
+                result_rows=[(self.sorting_key, self.engine)], column_names=["sorting_key", "engine"]
+            )
+        if sql.startswith("DESCRIBE"):
+            return SimpleNamespace(result_rows=self.schema, column_names=["name", "type"])
+
+        rows = list(self.rows)
+        if self.tables is not None:
+            rows = list(self.tables[re.search(r"FROM (\w+)", sql).group(1)])
+        since = re.search(r"\((\w+) >= (\S+)\)", sql)
+        if since:
+            index = self.columns.index(since.group(1))
+            rows = [r for r in rows if r[index] >= _sql_value(since.group(2))]
+        order = re.search(r"ORDER BY ([\w, ]+?)\s*(?:LIMIT|$)", sql)
+        keys = [k.strip() for k in order.group(1).split(",")] if order else []
+        indexes = [self.columns.index(k) for k in keys]
+        nullable = [self.columns.index(c) for c in re.findall(r"(\w+) IS NOT NULL", sql)]
+        if "NOT (" in sql:
+            # Final query for the rows with NULL keys
+            rows = [r for r in rows if any(r[i] is None for i in nullable)]
+        elif nullable:
+            rows = [r for r in rows if all(r[i] is not None for i in nullable)]
+        cursor = re.search(r"\) ([>=]) \((.+)\)\s+ORDER BY", sql, re.S)
+        if cursor:
+            literals = re.split(r",\s*(?=(?:[^']*'[^']*')*[^']*$)", cursor.group(2))
+            values = tuple(_sql_value(v) for v in literals)
+            if cursor.group(1) == "=":
+                rows = [r for r in rows if tuple(r[i] for i in indexes) == values]
+            else:
+                rows = [r for r in rows if tuple(r[i] for i in indexes) > values]
+        if keys:
+            rows.sort(key=lambda r: tuple(r[i] for i in indexes))
+        limit = re.search(r"LIMIT (\d+)", sql)
+        if limit:
+            rows = rows[: int(limit.group(1))]
+        return SimpleNamespace(result_rows=rows, column_names=self.columns)
+
+
+@pytest.fixture
+def rows():
+    """Accounts with several events each, some with sub-second timestamps"""
+    base = datetime(2025, 1, 1)
+    return [
+        (account, base + timedelta(seconds=i, microseconds=(i % 3) * 250), f"user{account}-{i}", 1)
+        for account in range(7)
+        for i in range(account, account + 9)
+    ]
+
+
+def test_composite_keyset_reads_every_row_once(rows):
+    conn = FakePeerDB(list(reversed(rows)))
+    key_columns = detect_key_columns(conn, "logins", SCHEMA)
+    assert key_columns == ["account_id", "event_time", "_peerdb_version"]
+
+    paginator = KeysetPaginator("logins", key_columns, batch_size=4)
+    pages = [page_rows for _, page_rows in paginator.iter_pages(conn)]
+
+    extracted = [row for page in pages for row in page]
+    assert extracted == sorted(rows)
+    assert all(len(page) <= 4 for page in pages)
+    assert paginator.rows == len(rows)
+    assert not any("COUNT(" in q or "OFFSET" in q for q in conn.queries)
+
+
+def test_limit_and_preferred_key(rows):
+    conn = FakePeerDB(rows, sorting_key="toDate(event_time)")
+    assert detect_key_columns(conn, "logins", SCHEMA, preferred=["event_time"]) == [
+        "event_time",
+        "_peerdb_version",
+    ]
+    # Expression sorting key: fall back to the first id/key/number column
+    assert detect_key_columns(conn, "logins", SCHEMA)[0] == "account_id"
+
+    paginator = KeysetPaginator("logins", ["account_id", "event_time"], batch_size=5, limit=12)
+    extracted = [row for _, page in paginator.iter_pages(conn) for row in page]
+    assert extracted == sorted(rows)[:12]
+
+
+def test_non_unique_key_reads_every_row_once():
+    # Four charge lines per invoice share the paging key
+    base = datetime(2025, 1, 1)
+    lines = [
+        (invoice, base + timedelta(minutes=line), f"line{invoice}-{line}", 1)
+        for invoice in range(5)
+        for line in range(4)
+    ]
+    conn = FakePeerDB(lines)
+    conn.engine = "MergeTree"
+    assert not is_unique_key(conn, "charges", ["account_id"])
+    assert not is_unique_key(conn, "charges", ["account_id", "event_time", "_peerdb_version"])
+
+    paginator = KeysetPaginator("charges", ["account_id"], batch_size=3)
+    extracted = [row for _, page in paginator.iter_pages(conn) for row in page]
+    assert sorted(extracted) == sorted(lines)
+    assert paginator.rows == len(lines)
+
+    limited = KeysetPaginator("charges", ["account_id"], batch_size=3, limit=10)
+    extracted = [row for _, page in limited.iter_pages(conn) for row in page]
+    assert len(extracted) == 10 and len(set(extracted)) == 10
+
+    # Plain keyset paging on the same key loses the rows cut at page boundaries
+    unsafe = KeysetPaginator("charges", ["account_id"], batch_size=3, unique_key=True)
+    assert len([row for _, page in unsafe.iter_pages(conn) for row in page]) < len(lines)
+
+    # ReplacingMergeTree sorting key + version identifies a row
+    conn.engine = "ReplacingMergeTree"
+    assert is_unique_key(conn, "charges", ["account_id", "event_time", "_peerdb_version"])
+    assert not is_unique_key(conn, "charges", ["account_id"])
+
+
+def test_null_keys_are_read_separately(rows):
+    rows = [(a, t, login if i % 4 else None, v) for i, (a, t, login, v) in enumerate(rows)]
+    conn = FakePeerDB(rows)
+    paginator = KeysetPaginator(
+        "logins", ["login"], batch_size=6, nullable_keys=nullable_columns(SCHEMA)
+    )
+
+    extracted = [row for _, page in paginator.iter_pages(conn) for row in page]
+
+    assert sorted(extracted, key=repr) == sorted(rows, key=repr)
+    assert len(extracted) == len(rows)
+
+
+def test_failed_page_stops_extraction(rows):
+    conn = FakePeerDB(rows)
+    conn.query = lambda sql, parameters=None: None
+    with pytest.raises(RuntimeError):
+        list(KeysetPaginator("logins", ["account_id"], 5).iter_pages(conn))
+
+
+LOGIN_COLUMNS = [
+    "primary_key_for_updating",
+    "logins",
+    "_peerdb_synced_at",
+    "_peerdb_is_deleted",
+    "_peerdb_version",
+]
+LOGIN_SCHEMA = [
+    ("primary_key_for_updating", "String"),
+    ("logins", "Int64"),
+    ("_peerdb_synced_at", "DateTime64(9)"),
+    ("_peerdb_is_deleted", "Int8"),
+    ("_peerdb_version", "Int64"),
+]
+
+
+def test_incremental_sync_merges_only_changed_rows(monkeypatch):
+    monkeypatch.setenv("DLT_CLICKHOUSE_BATCH_SIZE", "3")
+    synced = datetime(2025, 3, 1, 12, 0, 0, 123456)
+    table = [(f"user-{i:02d}", i, synced, 0, 1) for i in range(10)]
+    conn = FakePeerDB(table, columns=LOGIN_COLUMNS, schema=LOGIN_SCHEMA)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = dlt.pipeline(
+            pipeline_name="test_peerdb_incremental",
+            pipelines_dir=tmp,
+            destination=dlt.destinations.duckdb(f"{tmp}/peerdb.duckdb"),
+            dataset_name="peerdb_data",
+        )
+
+        def sync():
+            conn.queries.clear()
+            resource = peerdb_pipeline.create_peerdb_table_resource(
+                conn, "industry_index_logins", sync_mode="incremental"
+            )
+            pipeline.run(resource)
+            with pipeline.sql_client() as client:
+                return dict(
+                    client.execute_sql(
+                        "SELECT primary_key_for_updating, logins FROM industry_index_logins"
+                    )
+                )
+
+        assert sync() == {f"user-{i:02d}": i for i in range(10)}
+
+        # ReplacingMergeTree keeps the old versions until it merges; one row
+        # changes twice, one row is new
+        later = synced + timedelta(minutes=5)
+        table += [
+            ("user-03", 300, later, 0, 2),
+            ("user-03", 301, later, 0, 3),
+            ("user-07", 700, later, 0, 2),
+            ("user-10", 10, later, 0, 1),
+        ]
+        loaded = sync()
+        assert len(loaded) == 11
+        assert (loaded["user-03"], loaded["user-07"], loaded["user-10"]) == (301, 700, 10)
+        # Only the rows synced since the last run were read
+        assert all(">= '2025-03-01 12:00:00.123456'" in q for q in conn.queries if "SELECT *" in q)
+
+        # Nothing new: the boundary rows are re-read and dropped by the cursor
+        assert sync() == loaded
+        assert pipeline.last_trace.last_normalize_info.row_counts.get(
+            "industry_index_logins", 0
+        ) == 0
+
+
+def test_incremental_sync_merges_only_on_a_unique_key(monkeypatch, rows):
+    monkeypatch.delenv("DLT_WRITE_DISPOSITION", raising=False)
+    conn = FakePeerDB(rows)
+
+    # ReplacingMergeTree sorting key + version: merged on the sorting key
+    resource = peerdb_pipeline.create_peerdb_table_resource(conn, "logins", sync_mode="incremental")
+    assert resource.write_disposition == "merge"
+
+    # Same key on a plain MergeTree may repeat: full replace instead
+    conn.engine = "MergeTree"
+    resource = peerdb_pipeline.create_peerdb_table_resource(conn, "logins", sync_mode="incremental")
+    assert resource.write_disposition == "replace"
+
+
+def test_industry_index_source_connects_from_env(monkeypatch):
+    conn = FakePeerDB([], columns=LOGIN_COLUMNS, schema=LOGIN_SCHEMA)
+    monkeypatch.setattr(peerdb_pipeline.PeerDBConnection, "from_env", lambda *args, **kwargs: conn)
+
+    monkeypatch.delenv("CLICKHOUSE_PASSWORD", raising=False)
+    assert peerdb_pipeline.peerdb_industry_index_source() is None
+
+    for var in ("CLICKHOUSE_HOST", "CLICKHOUSE_USERNAME", "CLICKHOUSE_PASSWORD", "CLICKHOUSE_DATABASE"):
+        monkeypatch.setenv(var, "peerdb")
+    assert peerdb_pipeline.peerdb_industry_index_source().name == "industry_index_logins"
+
+
+def test_tables_are_extracted_concurrently_over_a_shared_pool(monkeypatch, rows):
+    monkeypatch.setattr(peerdb_flexible_pipeline, "PARALLEL_TABLES", 3)
+    tables = {
+        "carrier_dhl": rows[:20],
+        "carrier_fedex": rows[20:45],
+        "carrier_ups": rows[45:],
+        "industry_index_logins": rows[:5],
+    }
+    conn = FakePeerDB(rows, tables=tables, latency=0.03)
+    monkeypatch.setattr(peerdb_flexible_pipeline.PeerDBConnection, "from_env", lambda *args, **kwargs: conn)
+    created = []
+    clone = conn.clone
+    conn.clone = lambda: created.append(clone()) or created[-1]
+
+    progress = peerdb_flexible_pipeline.TableProgress()
+    resources = peerdb_flexible_pipeline.peerdb_table_source(["carrier_*"], batch_size=5, progress=progress)
+    assert [r.name for r in resources] == ["carrier_dhl", "carrier_fedex", "carrier_ups"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pipeline = dlt.pipeline(
+            pipeline_name="test_peerdb_multi_table",
+            pipelines_dir=tmp,
+            destination=dlt.destinations.duckdb(f"{tmp}/peerdb.duckdb"),
+            dataset_name="peerdb_data",
+        )
+        started = time.perf_counter()
+        pipeline.run(resources)
+        wall = time.perf_counter() - started
+        with pipeline.sql_client() as client:
+            for name, table_rows in list(tables.items())[:3]:
+                assert client.execute_sql(f"SELECT COUNT(*) FROM {name}")[0][0] == len(table_rows)
+
+    assert {name: stats["rows"] for name, stats in progress.tables.items()} == {
+        name: len(table_rows) for name, table_rows in tables.items() if name.startswith("carrier_")
+    }
+    assert all(stats["status"] == "done" for stats in progress.tables.values())
+    # Bounded, reused connections; closed once the last table finished
+    assert 1 < conn.tracker["peak"] <= 3
+    assert len(created) <= 2 and all(c.closed for c in created)
+    # Tables overlap: the extraction span is below the sum of the table times
+    stats = progress.tables.values()
+    span = max(s["started"] + s["seconds"] for s in stats) - min(s["started"] for s in stats)
+    assert span < 0.9 * sum(s["seconds"] for s in stats)
+    assert "3 tables" in progress.report(wall)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test Adaptive Rate Limiter
+==========================
+
+Checks the token-bucket pacing, HTTP 429 backoff (with and without
+Retry-After) and the ramp-up after sustained success.
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after  # noqa: E402
+
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    parsed = parse_retry_after(format_datetime(retry_at, usegmt=True))
+    assert 25 <= parsed <= 31
+
+
+def test_acquire_paces_requests_to_rate():
+    limiter = AdaptiveRateLimiter(rate=50.0)
+
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    elapsed = time.monotonic() - start
+
+    # First token is available immediately, the next five are spaced 20ms apart
+    assert elapsed == pytest.approx(0.1, abs=0.05)
+
+
+def test_rate_limited_backs_off_and_honours_retry_after():
+    limiter = AdaptiveRateLimiter(rate=100.0, min_rate=10.0)
+    limiter.acquire()
+
+    limiter.on_rate_limited(retry_after=0.2)
+    assert limiter.rate == 50.0
+    assert limiter.rate_limit_hits == 1
+
+    waited = limiter.acquire()
+    assert waited >= 0.19
+
+    for _ in range(5):
+        limiter.on_rate_limited(retry_after=0)
+    assert limiter.rate == 10.0
+
+
+def test_ramps_up_after_sustained_success():
+    limiter = AdaptiveRateLimiter(
+        rate=4.0, max_rate=5.0, increase_step=0.5, ramp_up_after=3
+    )
+
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.rate == 4.5
+
+    for _ in range(9):
+        limiter.on_success()
+    assert limiter.rate == 5.0
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test UPS Label-Only Filter Result Checkpoint
+============================================
+
+Checks the resume rules of the JSONL checkpoint: completed outcomes are
+skipped, errors are retried, the last line wins and a partially written
+trailing line is discarded.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from result_checkpoint import ResultCheckpoint  # noqa: E402
+
+
+def test_resume_rules(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+
+    checkpoint = ResultCheckpoint(path)
+    checkpoint.append("label_only", {"tracking_number": "1ZLABEL", "status_code": "MP"})
+    checkpoint.append("excluded", {"tracking_number": "1ZEXCLUDED"})
+    checkpoint.append("error", {"tracking_number": "1ZERROR", "error": "HTTP 500"})
+    checkpoint.append("label_only", {"tracking_number": "1ZCHANGED"})
+    checkpoint.append("excluded", {"tracking_number": "1ZCHANGED"})
+    checkpoint.close()
+
+    checkpoint = ResultCheckpoint(path)
+    checkpoint.close()
+
+    assert checkpoint.get_outcome("1ZLABEL") == "label_only"
+    assert checkpoint.get_outcome("1ZEXCLUDED") == "excluded"
+    assert checkpoint.get_outcome("1ZERROR") is None
+    assert checkpoint.get_outcome("1ZCHANGED") == "excluded"
+    assert checkpoint.label_only_records == {
+        "1ZLABEL": {"tracking_number": "1ZLABEL", "status_code": "MP"}
+    }
+    assert checkpoint.completed_count == 3
+
+
+def test_partial_trailing_line_is_discarded(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    complete = json.dumps({"outcome": "excluded", "tracking_number": "1ZDONE"})
+    path.write_text(complete + "\n" + '{"outcome": "label_only", "tracking_nu')
+
+    checkpoint = ResultCheckpoint(str(path))
+    checkpoint.append("excluded", {"tracking_number": "1ZNEXT"})
+    checkpoint.close()
+
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["tracking_number"] for line in lines] == [
+        "1ZDONE",
+        "1ZNEXT",
+    ]
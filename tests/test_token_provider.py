@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test Background Token Provider
+==============================
+
+Checks that tokens are refreshed in the background before they expire, that
+get_token() does not wait on a slow token endpoint, and that a failed refresh
+keeps handing out the current token until its expiry age.
+"""
+
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from token_provider import TokenProvider  # noqa: E402
+
+# Minutes expressed in seconds for fast tests
+SECONDS = 1 / 60
+
+
+class FakeTokenEndpoint:
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.release.wait()
+        self.calls += 1
+        if self.fail:
+            return None
+        return f"token-{self.calls}", datetime.now()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_token_is_refreshed_in_background():
+    endpoint = FakeTokenEndpoint()
+    provider = TokenProvider(
+        "Primary", endpoint, refresh_after_minutes=0.1 * SECONDS, expiry_minutes=10
+    )
+    try:
+        assert provider.start()
+        assert provider.get_token() == "token-1"
+        assert wait_until(lambda: provider.refreshes >= 2)
+        assert provider.get_token() != "token-1"
+    finally:
+        provider.stop()
+
+
+def test_get_token_does_not_block_on_slow_refresh():
+    endpoint = FakeTokenEndpoint()
+    provider = TokenProvider(
+        "Primary", endpoint, refresh_after_minutes=0.05 * SECONDS, expiry_minutes=10
+    )
+    try:
+        provider.start()
+        endpoint.release.clear()  # the next token request hangs
+        assert wait_until(lambda: provider.stats()["token_age_seconds"] > 0.1)
+
+        start = time.monotonic()
+        assert provider.get_token() == "token-1"
+        assert time.monotonic() - start < 0.05
+    finally:
+        endpoint.release.set()
+        provider.stop()
+
+
+def test_failed_refresh_keeps_token_until_expiry():
+    endpoint = FakeTokenEndpoint()
+    provider = TokenProvider(
+        "Primary",
+        endpoint,
+        refresh_after_minutes=0.05 * SECONDS,
+        expiry_minutes=0.5 * SECONDS,
+        retry_seconds=0.02,
+    )
+    try:
+        provider.start()
+        endpoint.fail = True
+        assert wait_until(lambda: provider.failed_refreshes >= 1)
+        assert provider.get_token() == "token-1"
+
+        # Past the expiry age the token is no longer handed out
+        assert wait_until(lambda: provider.get_token() is None)
+
+        # ...until the endpoint recovers and the retry loop succeeds
+        endpoint.fail = False
+        assert wait_until(lambda: provider.get_token() is not None)
+    finally:
+        provider.stop()
+
+
+def test_start_without_token():
+    endpoint = FakeTokenEndpoint()
+    endpoint.fail = True
+    provider = TokenProvider("Primary", endpoint, retry_seconds=10)
+    try:
+        assert not provider.start()
+        assert provider.get_token() is None
+    finally:
+        provider.stop()
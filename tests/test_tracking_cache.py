@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test UPS Tracking Response Cache
+================================
+
+Checks the TTL policy of the DuckDB tracking cache: terminal responses never
+expire, label-only and other responses expire after their TTL, and entries
+survive a reopen of the cache file.
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+from tracking_cache import TrackingCache, classify_for_cache  # noqa: E402
+
+
+def test_classify_for_cache():
+    assert classify_for_cache(False, 4) == "terminal"
+    assert classify_for_cache(True, 1) == "label_only"
+    assert classify_for_cache(False, 1) == "other"
+    assert classify_for_cache(False, 0) == "other"
+
+
+def test_entries_persist_and_expire(tmp_path):
+    cache_path = str(tmp_path / "cache.duckdb")
+
+    cache = TrackingCache(cache_path, label_only_ttl_hours=24, other_ttl_hours=1)
+    cache.put("1ZTERMINAL", False, 3, {"trackResponse": {"shipment": []}})
+    cache.put("1ZLABEL", True, 1, {"label": True})
+    cache.put("1ZOTHER", False, 1, {"other": True})
+    # A later response for the same number replaces the earlier one
+    cache.put("1ZOTHER", False, 2, {"other": "delivered"})
+    cache.close()
+
+    cache = TrackingCache(cache_path, label_only_ttl_hours=24, other_ttl_hours=1)
+    hits = cache.get_many(["1ZTERMINAL", "1ZLABEL", "1ZOTHER", "1ZMISSING"])
+    assert set(hits) == {"1ZTERMINAL", "1ZLABEL", "1ZOTHER"}
+    assert hits["1ZOTHER"].classification == "terminal"
+    assert json.loads(hits["1ZLABEL"].ups_response_json) == {"label": True}
+
+    # Age every entry by two days: only the terminal ones stay fresh
+    cache.conn.execute(
+        "UPDATE tracking_cache SET checked_at = ?",
+        [datetime.now() - timedelta(days=2)],
+    )
+    cache.put("1ZLABEL2", True, 1, {})
+    hits = cache.get_many(["1ZTERMINAL", "1ZLABEL", "1ZOTHER", "1ZLABEL2"])
+    assert set(hits) == {"1ZTERMINAL", "1ZOTHER", "1ZLABEL2"}
+    assert cache.stats() == {"terminal": 2, "label_only": 2}
+    cache.close()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Test UPS Label-Only Filter Processing Engines
+==============================================
+
+Runs process_tracking_numbers against a faked UPS Tracking API (no network,
+no credentials) and checks that the sequential and concurrent engines
+classify the same input identically (the concurrent one through a bounded
+window of lookups), that requests are balanced across credential pairs with a
+cooldown after HTTP 429, and that only requests sent count as API calls.
+"""
+
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# The filter validates these at import time
+os.environ.setdefault("UPS_TOKEN_URL", "http://localhost/token")
+os.environ.setdefault("UPS_TRACKING_URL", "http://localhost/track/")
+os.environ.setdefault("UPS_USERNAME", "test-user")
+os.environ.setdefault("UPS_PASSWORD", "test-pass")
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+
+import ups_label_only_filter as label_filter  # noqa: E402
+
+
+def make_response(activities):
+    """Build a minimal UPS tracking response with the given activity statuses"""
+    return {
+        "trackResponse": {
+            "shipment": [
+                {
+                    "package": [
+                        {
+                            "activity": [
+                                {"status": status, "date": "20250101"}
+                                for status in activities
+                            ]
+                        }
+                    ]
+                }
+            ]
+        }
+    }
+
+
+LABEL_ONLY_STATUS = {
+    "description": label_filter.TARGET_STATUS_DESCRIPTION,
+    "code": label_filter.TARGET_STATUS_CODE,
+    "type": label_filter.TARGET_STATUS_TYPE,
+}
+DELIVERED_STATUS = {"description": "Delivered", "code": "KB", "type": "D"}
+
+
+def fake_tracking_api(tracking_number, access_token):
+    """Deterministic stand-in for query_ups_tracking keyed on the last digit"""
+    last_digit = int(tracking_number[-1])
+    if last_digit % 4 == 0:
+        return make_response([LABEL_ONLY_STATUS]), None
+    if last_digit % 4 == 1:
+        return make_response([DELIVERED_STATUS, LABEL_ONLY_STATUS]), None
+    if last_digit % 4 == 2:
+        return None, {
+            "status_code": None,
+            "error_type": "request_exception",
+            "error_message": "Connection reset",
+        }
+    return make_response([DELIVERED_STATUS]), None
+
+
+@pytest.fixture
+def tracking_numbers():
+    return [
+        {"tracking_number": f"1Z999AA1{i:010d}", "account_number": f"ACC{i % 3}"}
+        for i in range(40)
+    ]
+
+
+def fake_access_token(credentials):
+    return f"token-{credentials.username}", datetime.now()
+
+
+@pytest.fixture(autouse=True)
+def fake_api(monkeypatch):
+    monkeypatch.setattr(label_filter, "query_ups_tracking", fake_tracking_api)
+    monkeypatch.setattr(label_filter, "get_ups_access_token", fake_access_token)
+    monkeypatch.setattr(label_filter, "RATE_LIMIT_RPS", 10000.0)
+    monkeypatch.setattr(label_filter, "RATE_LIMIT_MAX_RPS", 10000.0)
+
+
+def run_engine(tracking_numbers, engine, max_workers=None):
+    credential_manager = label_filter.CredentialManager()
+    return label_filter.process_tracking_numbers(
+        tracking_numbers,
+        credential_manager,
+        engine=engine,
+        max_workers=max_workers,
+    )
+
+
+def summarize(results):
+    return (
+        [item["tracking_number"] for item in results["label_only_tracking_numbers"]],
+        [item["tracking_number"] for item in results["excluded_tracking_numbers"]],
+        [item["tracking_number"] for item in results["api_errors"]],
+        results["total_processed"],
+        results["total_label_only"],
+        results["total_excluded"],
+        results["total_errors"],
+    )
+
+
+def test_engines_classify_identically(tracking_numbers):
+    sequential = run_engine(tracking_numbers, "sequential")
+    concurrent = run_engine(tracking_numbers, "concurrent", max_workers=8)
+
+    assert summarize(sequential) == summarize(concurrent)
+    assert sequential["total_processed"] == len(tracking_numbers)
+    assert sequential["total_label_only"] == 12
+    assert sequential["total_errors"] == 8
+
+
+def test_unknown_engine_is_rejected(tracking_numbers):
+    with pytest.raises(ValueError):
+        run_engine(tracking_numbers, "turbo")
+
+
+def test_numbered_credentials_are_loaded(monkeypatch):
+    monkeypatch.setenv("UPS_USERNAME_1", "second-user")
+    monkeypatch.setenv("UPS_PASSWORD_1", "second-pass")
+    monkeypatch.setenv("UPS_USERNAME_3", "third-user")
+    monkeypatch.setenv("UPS_PASSWORD_3", "third-pass")
+
+    credential_manager = label_filter.CredentialManager()
+
+    assert credential_manager.get_credential_names() == [
+        "Primary",
+        "Secondary",
+        "Credential 3",
+    ]
+
+
+def test_requests_spread_across_credentials_with_cooldown(
+    monkeypatch, tracking_numbers
+):
+    monkeypatch.setenv("UPS_USERNAME_1", "second-user")
+    monkeypatch.setenv("UPS_PASSWORD_1", "second-pass")
+
+    calls = Counter()
+    rate_limited_once = []
+
+    def api_with_quota(tracking_number, access_token):
+        calls[access_token] += 1
+        # The primary credential exhausts its quota on its third request
+        if access_token == "token-test-user" and calls[access_token] == 3:
+            rate_limited_once.append(tracking_number)
+            return None, {
+                "status_code": 429,
+                "error_type": "rate_limit",
+                "error_message": "Rate limit exceeded (HTTP 429)",
+                "retry_after": 60.0,
+            }
+        return fake_tracking_api(tracking_number, access_token)
+
+    monkeypatch.setattr(label_filter, "query_ups_tracking", api_with_quota)
+
+    credential_manager = label_filter.CredentialManager()
+    results = label_filter.process_tracking_numbers(
+        tracking_numbers, credential_manager, engine="sequential"
+    )
+
+    # The rate-limited number was retried on the other credential
+    assert results["credential_switches"] == 1
+    assert results["total_processed"] == len(tracking_numbers)
+    assert results["total_label_only"] == 12
+
+    # Primary served two requests before cooling down; the rest went to Secondary
+    usage = {item["name"]: item for item in results["credentials"]}
+    assert usage["Primary"]["rate_limit_hits"] == 1
+    assert calls["token-test-user"] == 3
+    assert calls["token-second-user"] == len(tracking_numbers) - 2
+    # The retry is an API call of its own
+    assert results["api_calls"] == sum(calls.values()) == len(tracking_numbers) + 1
+
+
+def test_lookups_without_a_token_are_not_api_calls(monkeypatch, tracking_numbers):
+    monkeypatch.setattr(label_filter.CredentialManager, "get_token", lambda self, state: None)
+    results = run_engine(tracking_numbers, "sequential")
+
+    assert results["total_errors"] == len(tracking_numbers)
+    assert results["api_errors"][0]["error_type"] == "token_error"
+    assert results["api_calls"] == 0
+
+
+def test_only_credential_errors_switch_credentials(monkeypatch, tracking_numbers):
+    monkeypatch.setenv("UPS_USERNAME_1", "second-user")
+    monkeypatch.setenv("UPS_PASSWORD_1", "second-pass")
+
+    calls = Counter()
+
+    def api_with_errors(tracking_number, access_token):
+        calls[tracking_number] += 1
+        last_digit = int(tracking_number[-1])
+        # Unknown tracking numbers: the same answer for every credential
+        if last_digit == 9:
+            return None, {
+                "status_code": 404,
+                "error_type": "http_error",
+                "error_message": "HTTP 404 error",
+            }
+        # A server error on the first attempt only; the retry is slow
+        if last_digit == 3 and calls[tracking_number] == 1:
+            return None, {
+                "status_code": 503,
+                "error_type": "http_error",
+                "error_message": "HTTP 503 error",
+            }
+        if last_digit == 3:
+            time.sleep(0.05)
+        return fake_tracking_api(tracking_number, access_token)
+
+    monkeypatch.setattr(label_filter, "query_ups_tracking", api_with_errors)
+    results = run_engine(tracking_numbers, "sequential")
+
+    not_found = [item for item in results["api_errors"] if item["status_code"] == 404]
+    assert len(not_found) == 4
+    assert all(calls[item["tracking_number"]] == 1 for item in not_found)
+    # Only the 503s were retried, each on the other credential
+    assert results["credential_switches"] == 4
+    assert results["api_calls"] == len(tracking_numbers) + 4
+    # The elapsed time covers the retry, not just the first attempt
+    retried = [
+        item
+        for item in results["excluded_tracking_numbers"]
+        if item["tracking_number"].endswith("3")
+    ]
+    assert retried and all(item["processing_time_seconds"] >= 0.05 for item in retried)
+
+
+def test_concurrent_engine_keeps_a_bounded_window(monkeypatch, tracking_numbers):
+    started = []
+    recorded = []
+    classify = label_filter.classify_tracking_item
+    record_result = label_filter._record_result
+
+    def tracked_classify(tracking_item, *args):
+        started.append(tracking_item["tracking_number"])
+        return classify(tracking_item, *args)
+
+    def tracked_record(results, *args):
+        recorded.append(args[1]["tracking_number"])
+        # Lookups run ahead of the recorded results by at most the window
+        assert len(started) - len(recorded) < 2 * label_filter.IN_FLIGHT_PER_WORKER
+        record_result(results, *args)
+
+    monkeypatch.setattr(label_filter, "classify_tracking_item", tracked_classify)
+    monkeypatch.setattr(label_filter, "_record_result", tracked_record)
+    results = run_engine(tracking_numbers, "concurrent", max_workers=2)
+
+    # Recorded in input order
+    assert recorded == [item["tracking_number"] for item in tracking_numbers]
+    assert summarize(results) == summarize(run_engine(tracking_numbers, "sequential"))
+
+
+def test_cache_skips_api_calls_on_overlapping_window(
+    monkeypatch, tmp_path, tracking_numbers
+):
+    calls = Counter()
+
+    def counting_api(tracking_number, access_token):
+        calls[tracking_number] += 1
+        return fake_tracking_api(tracking_number, access_token)
+
+    monkeypatch.setattr(label_filter, "query_ups_tracking", counting_api)
+
+    cache = label_filter.TrackingCache(str(tmp_path / "cache.duckdb"))
+    first = label_filter.process_tracking_numbers(
+        tracking_numbers[:30], label_filter.CredentialManager(), cache=cache
+    )
+    second = label_filter.process_tracking_numbers(
+        tracking_numbers, label_filter.CredentialManager(), cache=cache
+    )
+    cache.close()
+
+    assert first["cache_hits"] == 0
+    # Errors are never cached, so only the 24 successful lookups are reused
+    assert second["cache_hits"] == 24
+    assert second["api_calls"] == len(tracking_numbers) - 24
+    assert all(
+        count == 1
+        for tracking_number, count in calls.items()
+        if int(tracking_number[-1]) % 4 != 2
+    )
+    assert summarize(second) == summarize(run_engine(tracking_numbers, "sequential"))
+
+
+def test_records_are_compact(tracking_numbers):
+    results = run_engine(tracking_numbers, "sequential")
+
+    label_only = results["label_only_tracking_numbers"][0]
+    assert "ups_response" not in label_only
+    assert (
+        label_only["status_description"]
+        == label_filter.TARGET_STATUS_DESCRIPTION.strip()
+    )
+    assert label_only["status_code"] == label_filter.TARGET_STATUS_CODE
+    assert label_only["status_type"] == label_filter.TARGET_STATUS_TYPE
+    assert label_only["activity_count"] == 1
+    assert label_only["shipment_date"] == "20250101"
+
+    excluded = results["excluded_tracking_numbers"][0]
+    assert "ups_response" not in excluded
+    assert excluded["activity_count"] == 2
+    assert excluded["status_code"] == "KB"
+
+
+def test_raw_responses_spill_to_gzip_file(tmp_path, tracking_numbers):
+    raw_writer = label_filter.RawResponseWriter(str(tmp_path / "raw.jsonl.gz"))
+    results = label_filter.process_tracking_numbers(
+        tracking_numbers,
+        label_filter.CredentialManager(),
+        engine="concurrent",
+        raw_writer=raw_writer,
+    )
+    raw_writer.close()
+
+    with gzip.open(raw_writer.path, "rt", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+
+    # Every successful live lookup is written, errors are not
+    assert results["raw_responses_file"] == raw_writer.path
+    assert len(lines) == raw_writer.count == 32
+    raw = {line["tracking_number"]: line["ups_response"] for line in lines}
+    label_only_number = results["label_only_tracking_numbers"][0]["tracking_number"]
+    assert raw[label_only_number] == make_response([LABEL_ONLY_STATUS])
+
+
+def test_save_results_writes_status_columns(monkeypatch, tmp_path, tracking_numbers):
+    monkeypatch.setattr(label_filter, "OUTPUT_DIR", str(tmp_path))
+    results = run_engine(tracking_numbers, "sequential")
+
+    json_filepath, csv_filepath = label_filter.save_results(results, "20250101_000000")
+
+    with open(csv_filepath, encoding="utf-8") as f:
+        rows = f.read().splitlines()
+    assert len(rows) == 1 + results["total_label_only"]
+    assert rows[1].endswith(",MP,M,20250101_000000")
+    with open(json_filepath, encoding="utf-8") as f:
+        assert json.load(f)["total_label_only"] == 12
+
+
+def test_checkpoint_resumes_after_crash(monkeypatch, tmp_path, tracking_numbers):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    calls = Counter()
+
+    def crashing_api(tracking_number, access_token):
+        calls[tracking_number] += 1
+        if sum(calls.values()) == 15:
+            raise RuntimeError("process killed")
+        return fake_tracking_api(tracking_number, access_token)
+
+    monkeypatch.setattr(label_filter, "query_ups_tracking", crashing_api)
+
+    checkpoint = label_filter.ResultCheckpoint(checkpoint_path)
+    with pytest.raises(RuntimeError):
+        label_filter.process_tracking_numbers(
+            tracking_numbers, label_filter.CredentialManager(), checkpoint=checkpoint
+        )
+    checkpoint.close()
+
+    checkpoint = label_filter.ResultCheckpoint(checkpoint_path)
+    resumed = label_filter.process_tracking_numbers(
+        tracking_numbers, label_filter.CredentialManager(), checkpoint=checkpoint
+    )
+    checkpoint.close()
+
+    # 14 numbers were classified before the crash, 3 of them were errors
+    assert resumed["resumed"] == 11
+    assert max(calls.values()) == 2
+    assert sum(calls.values()) == 15 + len(tracking_numbers) - 11
+
+    full = run_engine(tracking_numbers, "sequential")
+    for key in ("total_processed", "total_label_only", "total_excluded"):
+        assert resumed[key] == full[key]
+    assert resumed["total_errors"] == full["total_errors"]
+    assert sorted(
+        item["tracking_number"] for item in resumed["label_only_tracking_numbers"]
+    ) == sorted(item["tracking_number"] for item in full["label_only_tracking_numbers"])
+    assert resumed["api_calls"] == len(tracking_numbers) - 11
+    # Excluded records are streamed to the checkpoint only
+    assert resumed["excluded_tracking_numbers"] == []
+    assert resumed["excluded_tracking_numbers_file"] == checkpoint_path
+    # ...but every lookup of the run is still timed
+    assert resumed["processing_time"]["samples"] == len(tracking_numbers) - 11
+    assert full["processing_time"]["samples"] == full["total_processed"]
+
+
+def test_resumed_cache_hits_are_not_counted_twice(monkeypatch, tmp_path, tracking_numbers):
+    monkeypatch.setattr(label_filter, "query_ups_tracking", fake_tracking_api)
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+
+    def run(cache):
+        checkpoint = label_filter.ResultCheckpoint(checkpoint_path)
+        try:
+            return label_filter.process_tracking_numbers(
+                tracking_numbers, label_filter.CredentialManager(), cache=cache, checkpoint=checkpoint
+            )
+        finally:
+            checkpoint.close()
+
+    cache = label_filter.TrackingCache(str(tmp_path / "cache.duckdb"))
+    label_filter.process_tracking_numbers(
+        tracking_numbers, label_filter.CredentialManager(), cache=cache
+    )
+    first = run(cache)
+    second = run(cache)
+    cache.close()
+
+    # Cache hits of the first run are resumed (not cache hits) in the second
+    completed = first["total_label_only"] + first["total_excluded"]
+    assert first["cache_hits"] == completed and first["resumed"] == 0
+    assert second["cache_hits"] == 0
+    assert second["resumed"] == completed
+    # Errors are retried: the only API calls of the resumed run
+    assert second["api_calls"] == len(tracking_numbers) - completed
+
+
+def test_tracking_numbers_filtered_on_typed_string_or_lake_dates(tmp_path, monkeypatch):
+    import duckdb
+    from duckdb_export import TRANSACTION_DATE_SQL, write_partitions
+
+    # TABLE_NAME is qualified with the database name of the export file
+    duckdb_path = str(tmp_path / "carrier_invoice_extraction.duckdb")
+    monkeypatch.setattr(label_filter, "DUCKDB_PATH", duckdb_path)
+    monkeypatch.setattr(label_filter, "TRANSACTION_DATE_START_DAYS_AGO", 10)
+    monkeypatch.setattr(label_filter, "TRANSACTION_DATE_END_DAYS_AGO", 5)
+
+    today = datetime.utcnow().date()
+    conn = duckdb.connect(duckdb_path)
+    conn.execute(
+        "CREATE TABLE carrier_invoice_data "
+        "(tracking_number VARCHAR, account_number VARCHAR, transaction_date VARCHAR)"
+    )
+    for days_ago in range(15):
+        day = today - label_filter.timedelta(days=days_ago)
+        transaction_date = day.isoformat() if days_ago % 2 else f"{day.month}/{day.day}/{day.year}"
+        conn.execute(
+            "INSERT INTO carrier_invoice_data VALUES (?, 'ACCT', ?)",
+            [f"1ZDATE{days_ago:04d}", transaction_date],
+        )
+    conn.close()
+
+    expected = [f"1ZDATE{days_ago:04d}" for days_ago in range(5, 11)]
+    parsed = label_filter.extract_tracking_numbers_from_duckdb()
+    assert [item["tracking_number"] for item in parsed] == expected
+
+    conn = duckdb.connect(duckdb_path)
+    conn.execute(
+        "ALTER TABLE carrier_invoice_data ADD COLUMN transaction_date_parsed DATE"
+    )
+    conn.execute(
+        f"UPDATE carrier_invoice_data SET transaction_date_parsed = {TRANSACTION_DATE_SQL}"
+    )
+    # Only the typed column is consulted once it exists
+    conn.execute("UPDATE carrier_invoice_data SET transaction_date = 'not a date'")
+    conn.close()
+
+    typed = label_filter.extract_tracking_numbers_from_duckdb()
+    assert typed == parsed
+
+    # The same window read from the Parquet lake
+    lake_dir = str(tmp_path / "lake")
+    conn = duckdb.connect(duckdb_path)
+    write_partitions(
+        conn,
+        "carrier_invoice_data",
+        lake_dir,
+        [today - label_filter.timedelta(days=days_ago) for days_ago in range(15)],
+    )
+    conn.close()
+    monkeypatch.setattr(label_filter, "FILTER_INPUT", "parquet")
+    monkeypatch.setattr(label_filter, "PARQUET_LAKE_DIR", lake_dir)
+    assert label_filter.extract_tracking_numbers_from_duckdb() == parsed
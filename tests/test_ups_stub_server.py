@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test UPS Label-Only Filter Against the UPS API Stub Server
+==========================================================
+
+Runs process_tracking_numbers over real HTTP (token requests, pooled session,
+rate limiter, credential cooldowns) against tests/ups_stub_server.py and
+checks every tracking number ends up with the stub's expected outcome, also
+when the stub answers part of the requests with HTTP 429.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The filter validates these at import time
+os.environ.setdefault("UPS_TOKEN_URL", "http://localhost/token")
+os.environ.setdefault("UPS_TRACKING_URL", "http://localhost/track/")
+os.environ.setdefault("UPS_USERNAME", "test-user")
+os.environ.setdefault("UPS_PASSWORD", "test-pass")
+
+# Add src directory and tests directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import ups_label_only_filter as label_filter  # noqa: E402
+from http_client import close_sessions  # noqa: E402
+from ups_stub_server import (  # noqa: E402
+    UPSStubServer,
+    expected_outcome,
+    make_tracking_numbers,
+)
+
+
+@pytest.fixture
+def stub_filter(monkeypatch):
+    """Point the filter at a fresh stub server with two credential pairs"""
+    monkeypatch.setenv("UPS_USERNAME", "stub-primary")
+    monkeypatch.setenv("UPS_PASSWORD", "stub")
+    monkeypatch.setenv("UPS_USERNAME_1", "stub-secondary")
+    monkeypatch.setenv("UPS_PASSWORD_1", "stub")
+    monkeypatch.setattr(label_filter, "MAX_CONCURRENCY", 4)
+    monkeypatch.setattr(label_filter, "RATE_LIMIT_RPS", 100.0)
+    monkeypatch.setattr(label_filter, "RATE_LIMIT_MAX_RPS", 100.0)
+
+    def start(**stub_kwargs):
+        stub = UPSStubServer(**stub_kwargs).start()
+        monkeypatch.setattr(label_filter, "UPS_TOKEN_URL", stub.token_url)
+        monkeypatch.setattr(label_filter, "UPS_TRACKING_URL", stub.tracking_url)
+        servers.append(stub)
+        return stub
+
+    servers = []
+    close_sessions()
+    yield start
+    close_sessions()
+    for stub in servers:
+        stub.stop()
+
+
+def run_filter(tracking_numbers, engine):
+    credential_manager = label_filter.CredentialManager()
+    try:
+        assert credential_manager.initialize_tokens()
+        results = label_filter.process_tracking_numbers(
+            tracking_numbers, credential_manager, engine=engine, max_workers=4
+        )
+    finally:
+        credential_manager.close()
+
+    outcomes = {}
+    for key, outcome in (
+        ("label_only_tracking_numbers", "label_only"),
+        ("excluded_tracking_numbers", "excluded"),
+        ("api_errors", "error"),
+    ):
+        for record in results[key]:
+            outcomes[record["tracking_number"]] = outcome
+    return results, outcomes
+
+
+@pytest.mark.parametrize("engine", label_filter.PROCESSING_ENGINES)
+def test_outcomes_match_stub(stub_filter, engine):
+    stub = stub_filter(latency_ms=2)
+    tracking_numbers = make_tracking_numbers(30)
+
+    results, outcomes = run_filter(tracking_numbers, engine)
+
+    for item in tracking_numbers:
+        tracking_number = item["tracking_number"]
+        assert outcomes[tracking_number] == expected_outcome(tracking_number)
+    assert len(results["label_only_tracking_numbers"]) == 12
+    assert set(stub.summary()["token_requests"]) == {"stub-primary", "stub-secondary"}
+
+
+def test_rate_limited_requests_are_retried(stub_filter):
+    stub = stub_filter(latency_ms=2, quota_rps=20, quota_burst=5)
+    tracking_numbers = make_tracking_numbers(40)
+
+    results, outcomes = run_filter(tracking_numbers, "concurrent")
+
+    stats = stub.summary()
+    assert sum(stats["rate_limited"].values()) > 0
+    for item in tracking_numbers:
+        tracking_number = item["tracking_number"]
+        assert outcomes[tracking_number] == expected_outcome(tracking_number)
+    assert results["credential_switches"] > 0
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+UPS API Stub Server
+===================
+
+Local stand-in for UPS_TOKEN_URL / UPS_TRACKING_URL so ups_label_only_filter.py
+can be tested and benchmarked without live UPS credentials.
+
+Endpoints:
+    POST /security/v1/oauth/token          -> {"access_token": ..., "expires_in": "14399"}
+    GET  /api/track/v1/details/<number>    -> canned tracking response
+
+Canned responses are chosen by the last digit of the tracking number
+(see expected_outcome()):
+    0-3  label-only (single "Shipper created a label" activity)
+    4-7  multi-activity (in transit / delivered)
+    8    single activity with a different status
+    9    HTTP 404 (tracking number not found)
+
+Each credential (HTTP basic auth username on the token request) gets its own
+token-bucket quota; requests above it are answered with HTTP 429 and a
+Retry-After header. Latency and jitter are configurable.
+
+Usage:
+    # In tests / benchmarks
+    with UPSStubServer(latency_ms=20, quota_rps=50) as stub:
+        label_filter.UPS_TOKEN_URL = stub.token_url
+        label_filter.UPS_TRACKING_URL = stub.tracking_url
+
+    # Standalone (point .env at the printed URLs)
+    poetry run python tests/ups_stub_server.py --port 8089 --latency-ms 50 --quota-rps 10
+
+Author: Gabriel Jerdhy Lapuz
+Project: gsr_automation
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+TOKEN_PATH = "/security/v1/oauth/token"
+TRACKING_PATH = "/api/track/v1/details/"
+
+LABEL_ONLY_STATUS = {
+    "type": "M",
+    "description": "Shipper created a label, UPS has not received the package yet. ",
+    "code": "MP",
+    "statusCode": "003",
+}
+IN_TRANSIT_STATUS = {
+    "type": "I",
+    "description": "Arrived at Facility",
+    "code": "AR",
+    "statusCode": "005",
+}
+DELIVERED_STATUS = {
+    "type": "D",
+    "description": "Delivered",
+    "code": "KB",
+    "statusCode": "011",
+}
+ORIGIN_SCAN_STATUS = {
+    "type": "I",
+    "description": "Origin Scan",
+    "code": "OR",
+    "statusCode": "005",
+}
+
+
+def expected_outcome(tracking_number: str) -> str:
+    """Outcome the filter should report for a stub tracking number"""
+    last_digit = int(tracking_number[-1])
+    if last_digit <= 3:
+        return "label_only"
+    if last_digit <= 8:
+        return "excluded"
+    return "error"
+
+
+def make_tracking_numbers(count: int) -> List[Dict[str, str]]:
+    """Stub tracking numbers in the filter's input format"""
+    return [
+        {"tracking_number": f"1ZSTUB{i:012d}", "account_number": f"STUB{i % 7}"}
+        for i in range(count)
+    ]
+
+
+def _activity(status: Dict, day: int) -> Dict:
+    return {
+        "location": {
+            "address": {
+                "city": "LOUISVILLE",
+                "stateProvince": "KY",
+                "countryCode": "US",
+                "country": "US",
+            }
+        },
+        "status": status,
+        "date": f"202501{day:02d}",
+        "time": "101500",
+    }
+
+
+def tracking_response(tracking_number: str) -> Optional[Dict]:
+    """Canned UPS tracking response, or None for a 404"""
+    last_digit = int(tracking_number[-1])
+    if last_digit <= 3:
+        activity = [_activity(LABEL_ONLY_STATUS, 1)]
+    elif last_digit <= 7:
+        activity = [
+            _activity(DELIVERED_STATUS, 5),
+            _activity(IN_TRANSIT_STATUS, 3),
+            _activity(LABEL_ONLY_STATUS, 1),
+        ][: 2 + last_digit % 2]
+    elif last_digit == 8:
+        activity = [_activity(ORIGIN_SCAN_STATUS, 2)]
+    else:
+        return None
+
+    return {
+        "trackResponse": {
+            "shipment": [
+                {
+                    "inquiryNumber": tracking_number,
+                    "package": [
+                        {
+                            "trackingNumber": tracking_number,
+                            "activity": activity,
+                            "packageCount": 1,
+                        }
+                    ],
+                }
+            ]
+        }
+    }
+
+
+class _Quota:
+    """Per-credential token bucket"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Consume one request; returns 0 if allowed, else seconds until allowed"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class UPSStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "UPSStubServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != TOKEN_PATH:
+            self._send_json(404, {"response": {"errors": [{"code": "404"}]}})
+            return
+
+        username = None
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Basic "):
+            username = base64.b64decode(auth[6:]).decode("utf-8").split(":", 1)[0]
+        if not username:
+            self._send_json(401, {"response": {"errors": [{"code": "250002"}]}})
+            return
+
+        self._send_json(200, self.server.issue_token(username))
+
+    def do_GET(self):
+        if not self.path.startswith(TRACKING_PATH):
+            self._send_json(404, {"response": {"errors": [{"code": "404"}]}})
+            return
+
+        auth = self.headers.get("Authorization", "")
+        username = self.server.token_owner(auth[len("Bearer ") :])
+        if username is None:
+            self._send_json(401, {"response": {"errors": [{"code": "250002"}]}})
+            return
+
+        self.server.simulate_latency()
+
+        retry_after = self.server.check_quota(username)
+        if retry_after:
+            self._send_json(
+                429,
+                {"response": {"errors": [{"code": "429", "message": "Quota exceeded"}]}},
+                # delay-seconds is an integer per RFC 9110
+                {"Retry-After": str(math.ceil(retry_after))},
+            )
+            return
+
+        tracking_number = self.path[len(TRACKING_PATH) :].split("?")[0]
+        response = tracking_response(tracking_number)
+        self.server.count("tracking_requests", username)
+        if response is None:
+            self.server.count("not_found", username)
+            self._send_json(
+                404,
+                {"response": {"errors": [{"code": "151044", "message": "Not found"}]}},
+            )
+            return
+        self._send_json(200, response)
+
+
+class UPSStubServer(ThreadingHTTPServer):
+    """Threaded UPS token + tracking stub; use as a context manager"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        quota_rps: float = 0.0,
+        quota_burst: float = 10.0,
+    ):
+        """
+        Args:
+            host, port: Bind address (port 0 picks a free port)
+            latency_ms: Base latency added to every tracking request
+            jitter_ms: Uniform random extra latency (0..jitter_ms)
+            quota_rps: Allowed tracking requests per second per credential
+                       (0 = unlimited); excess requests get HTTP 429
+            quota_burst: Token-bucket capacity of each credential's quota
+        """
+        super().__init__((host, port), UPSStubHandler)
+        self.latency_seconds = latency_ms / 1000.0
+        self.jitter_seconds = jitter_ms / 1000.0
+        self.quota_rps = quota_rps
+        self.quota_burst = max(1.0, quota_burst)
+
+        self.stats: Dict[str, Counter] = {
+            "token_requests": Counter(),
+            "tracking_requests": Counter(),
+            "rate_limited": Counter(),
+            "not_found": Counter(),
+        }
+        self._tokens: Dict[str, str] = {}
+        self._quotas: Dict[str, _Quota] = {}
+        self._token_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def token_url(self) -> str:
+        return self.base_url + TOKEN_PATH
+
+    @property
+    def tracking_url(self) -> str:
+        return self.base_url + TRACKING_PATH
+
+    def start(self) -> "UPSStubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "UPSStubServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def issue_token(self, username: str) -> Dict:
+        with self._lock:
+            token = f"stub-{username}-{next(self._token_ids)}"
+            self._tokens[token] = username
+            self.stats["token_requests"][username] += 1
+        return {"access_token": token, "token_type": "Bearer", "expires_in": "14399"}
+
+    def token_owner(self, token: str) -> Optional[str]:
+        with self._lock:
+            return self._tokens.get(token)
+
+    def simulate_latency(self):
+        delay = self.latency_seconds + random.uniform(0, self.jitter_seconds)
+        if delay > 0:
+            time.sleep(delay)
+
+    def check_quota(self, username: str) -> float:
+        """0 if the request is within quota, else the Retry-After in seconds"""
+        if not self.quota_rps:
+            return 0.0
+        with self._lock:
+            quota = self._quotas.setdefault(
+                username, _Quota(self.quota_rps, self.quota_burst)
+            )
+            retry_after = quota.take()
+            if retry_after:
+                self.stats["rate_limited"][username] += 1
+        return retry_after
+
+    def count(self, stat: str, username: str):
+        with self._lock:
+            self.stats[stat][username] += 1
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {stat: dict(counter) for stat, counter in self.stats.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the UPS API stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--quota-rps", type=float, default=0.0)
+    parser.add_argument("--quota-burst", type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = UPSStubServer(
+        args.host,
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        quota_rps=args.quota_rps,
+        quota_burst=args.quota_burst,
+    )
+    print("🚀 UPS API stub server running")
+    print(f"   UPS_TOKEN_URL={server.token_url}")
+    print(f"   UPS_TRACKING_URL={server.tracking_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping stub server")
+    finally:
+        server.server_close()
+        print(json.dumps(server.summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()